@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class PortfolioRiskEngine:
+    """VaR/CVaR לתיק - היסטורי, פרמטרי ו-Monte Carlo - מתשואות הנרות השמורים.
+
+    מודל התשואות (ממוצע, covariance, Cholesky ותרחישי Monte Carlo) נבנה פעם אחת לכל גרסה - גרסה
+    חדשה רק כשנוסף נר או סימל. בדיקת עסקה היא מכפלת מטריצה בוקטור מול התרחישים השמורים.
+    """
+
+    def __init__(self, ohlcv_store=None, interval: str = '1h', lookback_bars: int = 720,
+                 horizon_bars: int = 24, paths: int = 10000, confidence: float = 0.99, seed: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.ohlcv_store = ohlcv_store
+        self.interval = interval
+        self.lookback_bars = lookback_bars
+        self.horizon_bars = horizon_bars
+        self.paths = paths
+        self.confidence = confidence
+        self.seed = seed
+        self._lock = threading.RLock()
+
+        self.version = 0
+        self.symbols: List[str] = []
+        self._source: Optional[Tuple] = None
+        self._returns: Optional[np.ndarray] = None
+        self._mean: Optional[np.ndarray] = None
+        self._cov: Optional[np.ndarray] = None
+        # (version, factor) ו-(version, horizon, paths) -> תרחישים
+        self._cholesky: Optional[Tuple[int, np.ndarray]] = None
+        self._scenarios: Dict[Tuple[int, int, int], np.ndarray] = {}
+        self.stats = {'model_builds': 0, 'cholesky_builds': 0, 'simulations': 0, 'simulation_ms': 0.0}
+
+    # =============================================
+    # 📈 RETURNS MODEL
+    # =============================================
+
+    def set_returns(self, returns: pd.DataFrame):
+        """log returns לכל סימל (עמודה) על ציר זמן משותף - גרסה חדשה של המודל"""
+        returns = returns.dropna()
+        with self._lock:
+            self.symbols = [str(s).upper() for s in returns.columns]
+            self._returns = returns.to_numpy(dtype=float)
+            self._mean = self._returns.mean(axis=0)
+            self._cov = np.atleast_2d(np.cov(self._returns, rowvar=False))
+            self.version += 1
+            self._scenarios.clear()
+            self.stats['model_builds'] += 1
+
+    def refresh(self, symbols: List[str]) -> bool:
+        """טוען מחדש מה-store רק אם יש סימל חדש או נר חדש; True אם יש מודל תקף לכל הסימלים"""
+        requested = {s.upper() for s in symbols}
+        if self.ohlcv_store is None:
+            return self._returns is not None and requested <= set(self.symbols)
+
+        with self._lock:
+            # הסימלים שכבר במודל נשארים בו - בדיקה של סימל אחד לא מוחקת את השאר
+            wanted = sorted(requested | set(self.symbols))
+            source = tuple((s, self.ohlcv_store.get_last_timestamp(s, self.interval)) for s in wanted)
+            if source == self._source:
+                return self._returns is not None and requested <= set(self.symbols)
+
+            closes = {}
+            for symbol, last_ts in source:
+                if last_ts is None:
+                    continue
+                df = self.ohlcv_store.read_last(symbol, self.interval, self.lookback_bars + 1, columns=['close'])
+                if len(df) > 1:
+                    closes[symbol] = df['close']
+            if not closes:
+                return False
+
+            # ציר זמן משותף - רק נרות שקיימים בכל הסימלים
+            frame = pd.DataFrame(closes).dropna()
+            self.set_returns(np.log(frame).diff().iloc[1:])
+            self._source = source
+            self.logger.info(f"📐 Risk model v{self.version}: {len(self.symbols)} symbols x {len(self._returns)} bars")
+            return requested <= set(self.symbols)
+
+    def correlation(self) -> pd.DataFrame:
+        with self._lock:
+            if self._cov is None:
+                return pd.DataFrame()
+            std = np.sqrt(np.diag(self._cov))
+            corr = self._cov / np.outer(std, std)
+            return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+    def _cholesky_factor(self) -> np.ndarray:
+        """Cholesky של ה-covariance - מחושב פעם אחת לכל גרסה"""
+        if self._cholesky is None or self._cholesky[0] != self.version:
+            cov = self._cov
+            try:
+                factor = np.linalg.cholesky(cov)
+            except np.linalg.LinAlgError:
+                # covariance לא חיובית-מוגדרת (סימלים זהים / מעט נרות) - jitter קטן על האלכסון
+                factor = np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-10 * max(np.trace(cov), 1e-12))
+            self._cholesky = (self.version, factor)
+            self.stats['cholesky_builds'] += 1
+        return self._cholesky[1]
+
+    def simulate(self, horizon: Optional[int] = None, paths: Optional[int] = None) -> np.ndarray:
+        """תשואה פשוטה מצטברת ל-horizon נרות בכל תרחיש - (paths, symbols); נשמר לכל גרסה"""
+        horizon = horizon or self.horizon_bars
+        paths = paths or self.paths
+        with self._lock:
+            key = (self.version, horizon, paths)
+            if key not in self._scenarios:
+                started = time.perf_counter()
+                rng = np.random.default_rng(self.seed)
+                # (paths, horizon, symbols) נורמליים -> מתואמים דרך Cholesky, סכום log returns לאורך ה-horizon
+                shocks = rng.standard_normal((paths, horizon, len(self.symbols))) @ self._cholesky_factor().T
+                self._scenarios = {key: np.expm1(shocks.sum(axis=1) + horizon * self._mean)}
+                self.stats['simulations'] += 1
+                self.stats['simulation_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return self._scenarios[key]
+
+    # =============================================
+    # 📉 VaR / CVaR
+    # =============================================
+
+    def _weights(self, exposures: Dict[str, float]) -> np.ndarray:
+        """וקטור חשיפה (ערך, שלילי ל-SHORT) לפי סדר הסימלים של המודל"""
+        weights = np.zeros(len(self.symbols))
+        for symbol, value in exposures.items():
+            weights[self.symbols.index(symbol.upper())] += value
+        return weights
+
+    @staticmethod
+    def _tail(pnl: np.ndarray, confidence: float) -> Tuple[float, float]:
+        """(VaR, CVaR) כהפסד חיובי מתוך התפלגות רווח/הפסד"""
+        losses = -np.asarray(pnl)
+        var = float(np.quantile(losses, confidence))
+        tail = losses[losses >= var]
+        return var, float(tail.mean()) if len(tail) else var
+
+    def historical_var(self, weights: np.ndarray, confidence: float, horizon: int) -> Tuple[float, float]:
+        """תשואות היסטוריות מצטברות על horizon נרות (חלונות חופפים)"""
+        cumulative = np.vstack([np.zeros(len(self.symbols)), np.cumsum(self._returns, axis=0)])
+        horizon = min(horizon, len(self._returns))
+        windows = cumulative[horizon:] - cumulative[:-horizon]
+        return self._tail(np.expm1(windows) @ weights, confidence)
+
+    def parametric_var(self, weights: np.ndarray, confidence: float, horizon: int) -> Tuple[float, float]:
+        """התפלגות נורמלית של הרווח/הפסד - ממוצע וסטיית תקן מה-covariance"""
+        mean = float(weights @ self._mean) * horizon
+        std = float(np.sqrt(max(weights @ self._cov @ weights, 0.0) * horizon))
+        z = NormalDist().inv_cdf(confidence)
+        return std * z - mean, std * NormalDist().pdf(z) / (1 - confidence) - mean
+
+    def portfolio_var(self, exposures: Dict[str, float], confidence: Optional[float] = None,
+                      horizon: Optional[int] = None) -> Dict:
+        """VaR/CVaR של התיק בשלוש השיטות; exposures הוא ערך הפוזיציה לכל סימל"""
+        confidence = confidence or self.confidence
+        horizon = horizon or self.horizon_bars
+        with self._lock:
+            weights = self._weights(exposures)
+            historical = self.historical_var(weights, confidence, horizon)
+            parametric = self.parametric_var(weights, confidence, horizon)
+            monte_carlo = self._tail(self.simulate(horizon) @ weights, confidence)
+            return {
+                'confidence': confidence,
+                'horizon_bars': horizon,
+                'interval': self.interval,
+                'exposure': round(float(np.abs(weights).sum()), 2),
+                'historical': {'var': round(historical[0], 2), 'cvar': round(historical[1], 2)},
+                'parametric': {'var': round(parametric[0], 2), 'cvar': round(parametric[1], 2)},
+                'monte_carlo': {'var': round(monte_carlo[0], 2), 'cvar': round(monte_carlo[1], 2),
+                                'paths': self.paths},
+                'model_version': self.version,
+                'bars': len(self._returns),
+                'timestamp': datetime.now().isoformat()
+            }
+
+    def marginal_var(self, exposures: Dict[str, float], symbol: str, trade_value: float,
+                     confidence: Optional[float] = None) -> Dict:
+        """VaR של Monte Carlo לפני ואחרי עסקה מוצעת, ותרומת כל סימל ל-VaR שאחרי (component VaR)"""
+        confidence = confidence or self.confidence
+        with self._lock:
+            scenarios = self.simulate()
+            before = self._weights(exposures)
+            after = before.copy()
+            after[self.symbols.index(symbol.upper())] += trade_value
+
+            var_before, _ = self._tail(scenarios @ before, confidence)
+            pnl_after = scenarios @ after
+            var_after, cvar_after = self._tail(pnl_after, confidence)
+
+            # component VaR - התשואה הממוצעת של כל סימל ב-1% התרחישים הקרובים ל-VaR, כפול החשיפה
+            distance = np.abs(pnl_after + var_after)
+            near = np.argpartition(distance, max(1, len(distance) // 100) - 1)[:max(1, len(distance) // 100)]
+            components = -scenarios[near].mean(axis=0) * after
+            return {
+                'var_before': round(var_before, 2),
+                'var_after': round(var_after, 2),
+                'cvar_after': round(cvar_after, 2),
+                'incremental_var': round(var_after - var_before, 2),
+                'component_var': {s: round(float(c), 2) for s, c in zip(self.symbols, components) if after[self.symbols.index(s)]},
+                'confidence': confidence,
+                'horizon_bars': self.horizon_bars,
+                'model_version': self.version
+            }
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'version': self.version, 'symbols': list(self.symbols),
+                'bars': 0 if self._returns is None else len(self._returns),
+                'paths': self.paths, 'horizon_bars': self.horizon_bars, 'interval': self.interval}
@@ -6,6 +6,14 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    from order_book import get_order_book_manager
+    ORDER_BOOK_AVAILABLE = True
+except ImportError:
+    ORDER_BOOK_AVAILABLE = False
+
+from portfolio_risk import PortfolioRiskEngine
+
 class RiskLevel(Enum):
     LOW = "LOW"
     MEDIUM = "MEDIUM" 
@@ -38,12 +46,23 @@ class Position:
 class AdvancedRiskManager:
     """מנהל סיכונים מתקדם עם ניתוח רב-ממדי"""
     
-    def __init__(self):
+    def __init__(self, ohlcv_store=None, correlation_service=None):
         self.logger = logging.getLogger(__name__)
         self.positions = {}
         self.risk_metrics = {}
         self.risk_config = self._load_risk_config()
         self.market_regimes = {}
+        self.order_books = get_order_book_manager() if ORDER_BOOK_AVAILABLE else None
+        # VaR/CVaR מתשואות הנרות השמורים; בלי store - רק מתשואות שהוזנו ידנית (set_returns)
+        self.risk_engine = PortfolioRiskEngine(
+            ohlcv_store,
+            lookback_bars=self.risk_config['var_lookback_bars'],
+            horizon_bars=self.risk_config['var_horizon_bars'],
+            paths=self.risk_config['var_paths'],
+            confidence=self.risk_config['var_confidence']
+        )
+        # מטריצת קורלציה מתגלגלת משותפת (אם קיימת) - עדיפה על חישוב מתשואות ה-VaR
+        self.correlation_service = correlation_service
         
     def _load_risk_config(self) -> Dict:
         """טוען הגדרות סיכון"""
@@ -66,6 +85,7 @@ class AdvancedRiskManager:
             
             # הגדרות correlation
             'max_correlation': 0.7,      # correlation מקסימלי בין פוזיציות
+            'correlation_window': 168,   # נרות 1h בחלון הקורלציה המתגלגל
             'diversification_minimum': 3, # מינימום נכסים שונים
             
             # הגדרות volatility
@@ -74,6 +94,17 @@ class AdvancedRiskManager:
             
             # הגדרות market regime
             'regime_switch_threshold': 0.02,    # 2% threshold לשינוי regime
+            
+            # הגדרות נזילות (order book מקומי)
+            'max_slippage_bps': 50,      # מעל 50bps - סיכון נזילות גבוה
+            'warn_slippage_bps': 15,     # מעל 15bps - סיכון בינוני
+            
+            # הגדרות VaR (נרות 1h)
+            'var_confidence': 0.99,
+            'var_horizon_bars': 24,      # VaR ליום
+            'var_lookback_bars': 720,    # 30 יום של תשואות
+            'var_paths': 10000,          # תרחישי Monte Carlo
+            'max_portfolio_var': 0.05,   # VaR מקסימלי כאחוז מהתיק
         }
     
     def assess_trade_risk(self, symbol: str, action: TradeAction, 
@@ -101,11 +132,11 @@ class AdvancedRiskManager:
             risk_assessment['risk_factors']['position_risk'] = position_risk
             
             # 3. ניתוח סיכון תיק
-            portfolio_risk = self._assess_portfolio_risk(portfolio, symbol, quantity, price)
+            portfolio_risk = self._assess_portfolio_risk(portfolio, symbol, quantity, price, action)
             risk_assessment['risk_factors']['portfolio_risk'] = portfolio_risk
             
             # 4. ניתוח סיכון נזילות
-            liquidity_risk = self._assess_liquidity_risk(symbol, quantity, market_data)
+            liquidity_risk = self._assess_liquidity_risk(symbol, quantity, market_data, action)
             risk_assessment['risk_factors']['liquidity_risk'] = liquidity_risk
             
             # 5. ניתוח סיכון volatility
@@ -271,7 +302,7 @@ class AdvancedRiskManager:
             return {'error': str(e)}
     
     def _assess_portfolio_risk(self, portfolio: Dict, symbol: str, 
-                             quantity: float, price: float) -> Dict:
+                             quantity: float, price: float, action: TradeAction = TradeAction.BUY) -> Dict:
         """מעריך סיכון תיק"""
         try:
             risk_factors = {}
@@ -285,6 +316,14 @@ class AdvancedRiskManager:
                     'message': f"Current drawdown {current_drawdown:.1%} exceeds maximum"
                 }
             
+            # VaR של התיק אחרי העסקה (marginal VaR מול תרחישי Monte Carlo)
+            trade_value = quantity * price
+            if action in (TradeAction.SELL, TradeAction.REDUCE, TradeAction.CLOSE):
+                trade_value = -trade_value
+            var_risk = self._assess_var_risk(portfolio, symbol, trade_value)
+            if var_risk is not None:
+                risk_factors['value_at_risk'] = var_risk
+            
             # סיכון correlation
             correlation_risk = self._assess_correlation_risk(portfolio, symbol)
             risk_factors['correlation'] = correlation_risk
@@ -304,11 +343,74 @@ class AdvancedRiskManager:
             self.logger.error(f"Error assessing portfolio risk: {e}")
             return {'error': str(e)}
     
+    def _portfolio_exposures(self, portfolio: Dict) -> Dict[str, float]:
+        """ערך לכל סימל בתיק - שלילי לפוזיציית SHORT"""
+        exposures = {}
+        for symbol, position in portfolio.get('positions', {}).items():
+            value = position.get('value', 0)
+            if str(position.get('position_type', 'LONG')).upper() == 'SHORT':
+                value = -abs(value)
+            exposures[symbol.upper()] = exposures.get(symbol.upper(), 0) + value
+        return exposures
+    
+    def _assess_var_risk(self, portfolio: Dict, symbol: str, trade_value: float) -> Optional[Dict]:
+        """VaR לפני ואחרי העסקה מול max_portfolio_var; None אם אין תשואות לסימלים"""
+        try:
+            exposures = self._portfolio_exposures(portfolio)
+            if not self.risk_engine.refresh(list(exposures) + [symbol]):
+                return None
+            
+            marginal = self.risk_engine.marginal_var(exposures, symbol, trade_value)
+            portfolio_value = portfolio.get('total_value', 0) or sum(abs(v) for v in exposures.values()) or abs(trade_value)
+            var_ratio = marginal['var_after'] / portfolio_value if portfolio_value else 0.0
+            limit = self.risk_config['max_portfolio_var']
+            details = {**marginal, 'var_ratio': round(var_ratio, 4)}
+            
+            if var_ratio > limit:
+                return {'level': RiskLevel.VERY_HIGH, 'score': 0.9,
+                        'message': f"Portfolio VaR {var_ratio:.1%} after trade exceeds limit {limit:.1%}", **details}
+            if var_ratio > limit * 0.8:
+                return {'level': RiskLevel.HIGH, 'score': 0.7,
+                        'message': f"Portfolio VaR {var_ratio:.1%} after trade approaching limit", **details}
+            if marginal['incremental_var'] < 0:
+                return {'level': RiskLevel.LOW, 'score': 0.2,
+                        'message': "Trade reduces portfolio VaR", **details}
+            return {'level': RiskLevel.LOW, 'score': 0.3,
+                    'message': f"Portfolio VaR {var_ratio:.1%} within limits", **details}
+            
+        except Exception as e:
+            self.logger.error(f"Error assessing VaR risk: {e}")
+            return None
+    
     def _assess_liquidity_risk(self, symbol: str, quantity: float, 
-                             market_data: Dict) -> Dict:
-        """מעריך סיכון נזילות"""
+                             market_data: Dict, action: TradeAction = TradeAction.BUY) -> Dict:
+        """מעריך סיכון נזילות - slippage מה-order book המקומי, אחרת יחס ל-volume היומי"""
         try:
-            # סימולציה - בפועל ידרוש נתוני order book
+            book = None
+            if self.order_books is not None:
+                book = self.order_books.get_book(symbol)
+            
+            if book is not None:
+                side = 'SELL' if action in (TradeAction.SELL, TradeAction.REDUCE, TradeAction.CLOSE) else 'BUY'
+                fill = book.estimate_fill(side, quantity)
+                details = {
+                    'slippage_bps': round(fill['slippage_bps'], 2),
+                    'spread_bps': round(book.spread()['spread_bps'], 2),
+                    'book_imbalance': round(book.imbalance(bps=100), 4)
+                }
+                
+                if fill['unfilled_quantity'] > 0:
+                    return {'level': RiskLevel.VERY_HIGH, 'score': 0.95,
+                            'message': "Order larger than visible book depth", **details}
+                if fill['slippage_bps'] > self.risk_config['max_slippage_bps']:
+                    return {'level': RiskLevel.HIGH, 'score': 0.8,
+                            'message': "High liquidity risk - expected slippage above limit", **details}
+                if fill['slippage_bps'] > self.risk_config['warn_slippage_bps']:
+                    return {'level': RiskLevel.MEDIUM, 'score': 0.5,
+                            'message': "Moderate liquidity risk", **details}
+                return {'level': RiskLevel.LOW, 'score': 0.2,
+                        'message': "Low liquidity risk", **details}
+            
             daily_volume = market_data.get('volume_24h', 0)
             proposed_trade_value = quantity * market_data.get('current_price', 0)
             
@@ -562,21 +664,22 @@ class AdvancedRiskManager:
             return 0.5
     
     def _assess_correlation_risk(self, portfolio: Dict, new_symbol: str) -> Dict:
-        """מעריך סיכון correlation"""
+        """מעריך סיכון correlation - מתשואות הנרות השמורים"""
         try:
-            # סימולציה - בפועל ידרוש נתוני correlation
-            positions = portfolio.get('positions', {})
+            positions = [symbol.upper() for symbol in portfolio.get('positions', {}) if symbol.upper() != new_symbol.upper()]
             
             if len(positions) < 2:
                 return {'level': RiskLevel.LOW, 'score': 0.2, 'message': "Insufficient positions for correlation analysis"}
             
             # בדיקת correlation עם נכסים קיימים
-            high_correlation_count = 0
-            for symbol, position in positions.items():
-                # סימולציית correlation - בפועל תגיע ממסד נתונים
-                simulated_correlation = np.random.uniform(0.1, 0.8)
-                if simulated_correlation > self.risk_config['max_correlation']:
-                    high_correlation_count += 1
+            window = self.risk_config['correlation_window']
+            if self.correlation_service is not None and self.correlation_service.covers(positions + [new_symbol], window):
+                correlations = self.correlation_service.matrix(window).loc[new_symbol.upper(), positions]
+            elif self.risk_engine.refresh(positions + [new_symbol]):
+                correlations = self.risk_engine.correlation().loc[new_symbol.upper(), positions]
+            else:
+                return {'level': RiskLevel.MEDIUM, 'score': 0.5, 'message': "No return history for correlation analysis"}
+            high_correlation_count = int((correlations > self.risk_config['max_correlation']).sum())
             
             correlation_ratio = high_correlation_count / len(positions)
             
@@ -679,6 +782,20 @@ class AdvancedRiskManager:
                 'portfolio_value': portfolio.get('total_value', 0)
             }
             
+            # VaR/CVaR של התיק - היסטורי, פרמטרי ו-Monte Carlo
+            exposures = self._portfolio_exposures(portfolio)
+            if exposures and self.risk_engine.refresh(list(exposures)):
+                var_report = self.risk_engine.portfolio_var(exposures)
+                risk_report['portfolio_metrics']['value_at_risk'] = var_report
+                portfolio_value = portfolio.get('total_value', 0)
+                var_ratio = var_report['monte_carlo']['var'] / portfolio_value if portfolio_value else 0.0
+                if var_ratio > self.risk_config['max_portfolio_var']:
+                    risk_report['risk_alerts'].append({
+                        'type': 'VAR_LIMIT',
+                        'message': f"Portfolio VaR {var_ratio:.1%} exceeds limit {self.risk_config['max_portfolio_var']:.1%}",
+                        'severity': 'HIGH'
+                    })
+            
             return risk_report
             
         except Exception as e:
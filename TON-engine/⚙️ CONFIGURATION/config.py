@@ -42,6 +42,8 @@ class AdvancedConfig:
         self.SYMBOLS_TO_ANALYZE = ['TONUSDT', 'BNBUSDT', 'BTCUSDT', 'ETHUSDT']
         self.TIMEFRAMES = ['15m', '1h', '4h', '1d']
         self.ANALYSIS_INTERVAL_MINUTES = 15
+        self.INDICATOR_BACKEND = os.getenv('INDICATOR_BACKEND', 'numpy')  # numpy / ta
+        self.SINGLE_FLIGHT_MAX_AGE = float(os.getenv('SINGLE_FLIGHT_MAX_AGE', 0)) or None  # שניות; None = עד סגירת הנר
         
         # =============================================
         # 🧠 ML & AI CONFIGURATION
@@ -49,12 +51,35 @@ class AdvancedConfig:
         self.ML_ENABLED = os.getenv('ML_ENABLED', 'True').lower() == 'true'
         self.ML_MODEL_PATH = 'models/'
         self.ML_TRAINING_INTERVAL_HOURS = 24
+        self.ML_REGISTRY_KEEP_VERSIONS = int(os.getenv('ML_REGISTRY_KEEP_VERSIONS', 3))
+        self.ML_TRAINING_WORKERS = int(os.getenv('ML_TRAINING_WORKERS', 0))  # 0 = לפי מספר הליבות
+        self.ML_TRAINING_CPUS = int(os.getenv('ML_TRAINING_CPUS', 0))  # מכסת ליבות לאימון; 0 = כולן
+        self.ML_TRAINING_TIMEOUT = float(os.getenv('ML_TRAINING_TIMEOUT', 600))  # לסימל; קצר ממחזור הניתוח
+        self.ML_FEATURE_WARMUP_BARS = int(os.getenv('ML_FEATURE_WARMUP_BARS', 300))  # נרות קודמים לחישוב features לנר חדש
+        self.ML_HORIZONS = [int(h) for h in os.getenv('ML_HORIZONS', '1,3,6,12').split(',') if h.strip()]  # אופקים בנרות - head לכל אופק
+        self.ML_SEARCH_FOLDS = int(os.getenv('ML_SEARCH_FOLDS', 5))  # folds בחיפוש ה-walk-forward השבועי
+        self.ML_SEARCH_TIMEOUT = float(os.getenv('ML_SEARCH_TIMEOUT', 3600))  # לסימל
+        self.ML_MODELS = [m.strip() for m in os.getenv('ML_MODELS', '').split(',') if m.strip()] or None  # None = כל המותקנים
+        self.STARTUP_IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', 3000))
+        
+        # קורלציות מתגלגלות (נרות 1h)
+        self.CORRELATION_WINDOWS = tuple(int(w) for w in os.getenv('CORRELATION_WINDOWS', '24,168,720').split(',') if w.strip())
+        self.CORRELATION_WINDOW = int(os.getenv('CORRELATION_WINDOW', 168))  # החלון שמוגש כברירת מחדל
+        self.CORRELATION_HISTORY_BARS = int(os.getenv('CORRELATION_HISTORY_BARS', 720))
         
         # =============================================
         # 🔔 ALERTS CONFIGURATION
         # =============================================
         self.ALERTS_ENABLED = True
         self.WHALE_ALERT_THRESHOLD = 50000  # TON
+        self.WHALE_STREAM_ENABLED = os.getenv('WHALE_STREAM_ENABLED', 'True').lower() == 'true'  # aggTrade + forceOrder
+        self.WHALE_LIQUIDATIONS = os.getenv('WHALE_LIQUIDATIONS', 'True').lower() == 'true'  # חיבור futures ל-forceOrder
+        self.WHALE_MIN_NOTIONAL = float(os.getenv('WHALE_MIN_NOTIONAL', 50000))  # USDT - רצפה לסף ה-quantile
+        self.WHALE_QUANTILE = float(os.getenv('WHALE_QUANTILE', 0.999))  # של גודל האשכולות בסימל
+        self.WHALE_CLUSTER_GAP_MS = int(os.getenv('WHALE_CLUSTER_GAP_MS', 500))  # שקט שסוגר אשכול
+        self.WHALE_CLUSTER_WINDOW_MS = int(os.getenv('WHALE_CLUSTER_WINDOW_MS', 5000))  # אורך מקסימלי לאשכול
+        self.WHALE_HISTORY = int(os.getenv('WHALE_HISTORY', 500))  # אירועים בזיכרון לכל סימל
+        self.WHALE_ALERT_MIN_IMPACT = float(os.getenv('WHALE_ALERT_MIN_IMPACT', 0.7))
         self.PRICE_ALERT_PERCENT = 5.0
         self.VOLUME_ALERT_MULTIPLIER = 3.0
         
@@ -225,7 +250,8 @@ class AdvancedConfig:
         return {
             'enabled': self.ML_ENABLED,
             'model_path': self.ML_MODEL_PATH,
-            'training_interval': self.ML_TRAINING_INTERVAL_HOURS
+            'training_interval': self.ML_TRAINING_INTERVAL_HOURS,
+            'models': self.ML_MODELS
         }
 
     def get_alerts_config(self) -> Dict:
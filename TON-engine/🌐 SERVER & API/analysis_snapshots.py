@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+from response_encoder import dumps
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """ניתוח מפורסם - גוף JSON מוכן לשליחה, לא משתנה אחרי הפרסום"""
+    kind: str
+    symbol: str
+    version: int
+    etag: str
+    body: bytes
+    created_at: float
+
+    @property
+    def data(self) -> Dict:
+        return json.loads(self.body)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class SnapshotStore:
+    """snapshots של ניתוחים לפי (סוג, סימל) - בזיכרון לקריאה מיידית ובדיסק לשרידות בין הפעלות.
+
+    ה-scheduler מפרסם; ה-endpoints רק מחפשים במילון ומחזירים את הגוף המוכן (או 304 לפי ETag).
+    """
+
+    def __init__(self, root_path: str = 'database/snapshots'):
+        self.root_path = root_path
+        self.logger = logging.getLogger(__name__)
+        self._snapshots: Dict[Tuple[str, str], Snapshot] = {}
+        self._lock = threading.Lock()
+        self.stats = {'published': 0, 'unchanged': 0, 'served': 0, 'not_modified': 0, 'misses': 0}
+
+        os.makedirs(self.root_path, exist_ok=True)
+        self.load()
+
+    def _path(self, kind: str, symbol: str) -> str:
+        return os.path.join(self.root_path, f"{kind}_{symbol}.json")
+
+    def publish(self, kind: str, symbol: str, data: Dict) -> Snapshot:
+        """מסדר פעם אחת ומפרסם; תוכן זהה לקודם לא מקבל גרסה חדשה"""
+        symbol = symbol.upper()
+        body = dumps(data)
+        etag = hashlib.sha1(body).hexdigest()[:20]
+
+        with self._lock:
+            previous = self._snapshots.get((kind, symbol))
+            if previous is not None and previous.etag == etag:
+                # אותו תוכן ואותה גרסה - רק מרעננים את זמן הפרסום
+                snapshot = replace(previous, created_at=time.time())
+                self.stats['unchanged'] += 1
+            else:
+                snapshot = Snapshot(kind, symbol, (previous.version + 1) if previous else 1, etag, body, time.time())
+                self.stats['published'] += 1
+            self._snapshots[(kind, symbol)] = snapshot
+
+        try:
+            self._write(snapshot)
+        except OSError as e:
+            self.logger.error(f"Error persisting snapshot {kind}/{symbol}: {e}")
+        return snapshot
+
+    def get(self, kind: str, symbol: str, max_age: Optional[float] = None) -> Optional[Snapshot]:
+        """ה-snapshot האחרון, או None אם אין או שהוא ישן מ-max_age שניות"""
+        snapshot = self._snapshots.get((kind, symbol.upper()))
+        if snapshot is None or (max_age is not None and snapshot.age > max_age):
+            self.stats['misses'] += 1
+            return None
+        return snapshot
+
+    def record_hit(self, not_modified: bool):
+        self.stats['not_modified' if not_modified else 'served'] += 1
+
+    # =============================================
+    # 💾 PERSISTENCE
+    # =============================================
+
+    def _write(self, snapshot: Snapshot):
+        path = self._path(snapshot.kind, snapshot.symbol)
+        meta = {'kind': snapshot.kind, 'symbol': snapshot.symbol, 'version': snapshot.version,
+                'etag': snapshot.etag, 'created_at': snapshot.created_at}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n' + snapshot.body)
+        os.replace(tmp_path, path)
+
+    def load(self) -> int:
+        """טוען snapshots שנשמרו בהפעלה קודמת - השרת עונה מיד גם לפני הריצה המתוזמנת הראשונה"""
+        loaded = 0
+        for name in os.listdir(self.root_path):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.root_path, name), 'rb') as f:
+                    meta_line, body = f.read().split(b'\n', 1)
+                meta = json.loads(meta_line)
+                snapshot = Snapshot(meta['kind'], meta['symbol'], meta['version'], meta['etag'],
+                                    body, meta['created_at'])
+                self._snapshots[(snapshot.kind, snapshot.symbol)] = snapshot
+                loaded += 1
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.error(f"Error loading snapshot {name}: {e}")
+        return loaded
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'snapshots': {f"{kind}/{symbol}": {'version': s.version, 'age_s': round(s.age, 1)}
+                          for (kind, symbol), s in self._snapshots.items()}
+        }
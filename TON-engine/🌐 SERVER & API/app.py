@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, render_template_string, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template_string, send_from_directory, g
 import threading
 import schedule
 import time
@@ -8,6 +8,7 @@ import os
 import sys
 import traceback
 import json
+import queue
 from logging.handlers import RotatingFileHandler
 import sqlite3
 import pandas as pd
@@ -52,18 +53,31 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# jsonify דרך orjson (numpy/datetime ישירות ל-bytes) ודחיסה לפי Accept-Encoding
+from response_encoder import FastJSONProvider, get_response_encoder, negotiate_encoding
+app.json = FastJSONProvider(app)
+response_encoder = get_response_encoder()
+
+# זמן ייבוא ואתחול הרכיבים - נבדק מול STARTUP_IMPORT_BUDGET_MS
+startup_started = time.perf_counter()
+
 try:
     from advanced_trading_logic import AdvancedTradingLogic
     from telegram_bot import AdvancedTelegramBot
     from payment_manager import PaymentManager
     from fibonacci_calculator import FibonacciCalculator
     from whale_tracker import WhaleTracker
+    from whale_stream import get_whale_stream
     from correlation_analyzer import CorrelationAnalyzer
+    from correlation_service import get_correlation_service
     from binance_client import AdvancedBinanceClient
     from tradingview_client import TradingViewClient
     from technical_analyzer import AdvancedTechnicalAnalyzer
     from data_manager import AdvancedDataManager
     from ml_predictor import AdvancedMLPredictor
+    from model_registry import get_model_registry
+    from feature_store import get_feature_store
+    from training_orchestrator import TrainingOrchestrator
     from risk_manager import AdvancedRiskManager, TradeAction
     from dashboard import create_dashboard_app
     import config
@@ -83,7 +97,7 @@ except ImportError as e:
                 'current_data': {'price': 2.45, 'price_change_percent': 1.5},
                 'trading_decision': {'action': 'HOLD', 'confidence_score': 0.5}
             }
-        def multi_symbol_analysis(self):
+        def multi_symbol_analysis(self, symbols=None, **kwargs):
             return {'analyses': {}, 'timestamp': datetime.now().isoformat()}
     
     class AdvancedTelegramBot:
@@ -102,6 +116,9 @@ except ImportError as e:
         
         def send_message(self, chat_id, text):
             logger.info(f"💬 שליחת הודעה ל-{chat_id}")
+        
+        def send_whale_alert(self, whale_data):
+            logger.info(f"🐋 שליחת התראת לווייתן (ברירת מחדל) - {whale_data.get('symbol')}")
     
     class PaymentManager:
         def __init__(self):
@@ -157,12 +174,24 @@ except ImportError as e:
             return {'extension_levels': {}, 'current_position': 'UNKNOWN'}
 
     class WhaleTracker:
-        def track_whale_transactions(self, symbol):
+        def __init__(self, whale_stream=None):
+            pass
+        
+        def track_whale_transactions(self, symbol, limit=50):
             return []
+    
+    def get_whale_stream(liquidations=True, **detector_options):
+        return None
 
     class CorrelationAnalyzer:
+        def __init__(self, correlation_service=None):
+            pass
+        
         def analyze_correlation(self, symbol1, symbol2):
             return {}
+    
+    def get_correlation_service(symbols=None, interval='1h', windows=(24,), history=0, default_window=None):
+        return None
 
     class AdvancedBinanceClient:
         def get_current_price(self, symbol):
@@ -187,10 +216,16 @@ except ImportError as e:
             return {}
 
     class AdvancedMLPredictor:
+        def __init__(self, enabled_models=None, registry=None, feature_store=None, horizons=None):
+            self.model_performance = {}
+
         def predict_future(self, df, periods=10):
             return {'ensemble_prediction': 2.45, 'ensemble_confidence': 0.5}
 
     class AdvancedRiskManager:
+        def __init__(self, ohlcv_store=None, correlation_service=None):
+            pass
+        
         def assess_trade_risk(self, symbol, action, quantity, price, market_data, portfolio):
             return {'overall_risk_level': 'MEDIUM', 'can_proceed': True}
 
@@ -218,9 +253,32 @@ try:
     data_manager = AdvancedDataManager()
     technical_analyzer = AdvancedTechnicalAnalyzer()
     
-    # אתחול מודלים מתקדמים
-    ml_predictor = AdvancedMLPredictor()
-    risk_manager = AdvancedRiskManager()
+    # אתחול מודלים מתקדמים - ה-backends של ML נטענים רק באימון/טעינה הראשונים
+    ml_predictor = AdvancedMLPredictor(
+        getattr(config, 'ML_MODELS', None),
+        registry=get_model_registry(os.path.join(config.ML_MODEL_PATH, 'registry'), config.ML_REGISTRY_KEEP_VERSIONS),
+        feature_store=get_feature_store(os.path.join(config.ML_MODEL_PATH, 'features'), config.ML_FEATURE_WARMUP_BARS),
+        horizons=config.ML_HORIZONS
+    )
+    # אימון בתהליכים נפרדים - לא על thread של השרת או ה-scheduler
+    training_orchestrator = TrainingOrchestrator(
+        os.path.join(config.ML_MODEL_PATH, 'registry'), config.ML_REGISTRY_KEEP_VERSIONS,
+        max_workers=config.ML_TRAINING_WORKERS or None, cpu_quota=config.ML_TRAINING_CPUS or None,
+        enabled_models=getattr(config, 'ML_MODELS', None), timeout=config.ML_TRAINING_TIMEOUT,
+        feature_root=os.path.join(config.ML_MODEL_PATH, 'features'), horizons=config.ML_HORIZONS
+    )
+    # קורלציה מתגלגלת לכל זוגות הסימלים - מעודכנת מכל נר סגור
+    correlation_service = get_correlation_service(
+        config.SYMBOLS_TO_ANALYZE, windows=config.CORRELATION_WINDOWS,
+        history=config.CORRELATION_HISTORY_BARS, default_window=config.CORRELATION_WINDOW
+    )
+    risk_manager = AdvancedRiskManager(getattr(data_manager, 'ohlcv_store', None), correlation_service)
+    # זיהוי לווייתנים מזרם העסקאות (aggTrade + forceOrder) - החיבור נפתח ב-start_whale_stream
+    whale_stream = get_whale_stream(
+        cluster_gap_ms=config.WHALE_CLUSTER_GAP_MS, cluster_window_ms=config.WHALE_CLUSTER_WINDOW_MS,
+        quantile=config.WHALE_QUANTILE, min_notional=config.WHALE_MIN_NOTIONAL, history=config.WHALE_HISTORY,
+        liquidations=config.WHALE_LIQUIDATIONS
+    ) if config.WHALE_STREAM_ENABLED else None
     
     # אתחול לקוחות חיצוניים
     binance_client = AdvancedBinanceClient()
@@ -238,8 +296,8 @@ try:
     
     # אתחול אנלייזרים נוספים
     fibonacci_calc = FibonacciCalculator()
-    whale_tracker = WhaleTracker()
-    correlation_analyzer = CorrelationAnalyzer()
+    whale_tracker = WhaleTracker(whale_stream)
+    correlation_analyzer = CorrelationAnalyzer(correlation_service)
     
     logger.info("✅ כל הרכיבים אותחלו בהצלחה")
     
@@ -251,7 +309,10 @@ except Exception as e:
     data_manager = AdvancedDataManager()
     technical_analyzer = AdvancedTechnicalAnalyzer()
     ml_predictor = AdvancedMLPredictor()
-    risk_manager = AdvancedRiskManager()
+    training_orchestrator = None
+    correlation_service = None
+    whale_stream = None
+    risk_manager = AdvancedRiskManager(getattr(data_manager, 'ohlcv_store', None))
     binance_client = AdvancedBinanceClient()
     tradingview_client = TradingViewClient()
     trading_logic = AdvancedTradingLogic()
@@ -261,6 +322,87 @@ except Exception as e:
     whale_tracker = WhaleTracker()
     correlation_analyzer = CorrelationAnalyzer()
 
+try:
+    from ml_backends import log_startup_report
+    log_startup_report((time.perf_counter() - startup_started) * 1000,
+                       getattr(config, 'STARTUP_IMPORT_BUDGET_MS', 3000))
+except ImportError:
+    logger.info(f"📦 זמן ייבוא ואתחול רכיבים: {(time.perf_counter() - startup_started) * 1000:.0f}ms")
+
+# רישום אינדיקטורים משותף - memo לכל בקשה
+try:
+    from indicator_registry import registry as indicator_registry
+    indicator_registry.set_backend(getattr(config, 'INDICATOR_BACKEND', 'numpy'))
+except ImportError:
+    indicator_registry = None
+
+# איחוד בקשות זהות לניתוחים יקרים - חישוב אחד לכל (endpoint, symbol, timeframe, נר)
+from request_coalescer import SingleFlight
+single_flight = SingleFlight(max_age=getattr(config, 'SINGLE_FLIGHT_MAX_AGE', None))
+
+# snapshots שה-scheduler מפרסם - ה-endpoints מגישים אותם בלי לחשב מחדש
+from analysis_snapshots import SnapshotStore
+snapshot_store = SnapshotStore(os.path.join('database', 'snapshots'))
+SNAPSHOT_MAX_AGE = 2 * 60 * getattr(config, 'ANALYSIS_INTERVAL_MINUTES', 15)
+
+def snapshot_response(snapshot):
+    """מגיש snapshot כמו שהוא (בלי קידוד מחדש) - 304 אם ה-ETag של הלקוח עדכני"""
+    not_modified = request.if_none_match.contains_weak(snapshot.etag)
+    snapshot_store.record_hit(not_modified)
+    body, encoding = b'', None
+    if not not_modified:
+        response_encoder.record_passthrough(request.endpoint or 'snapshot', len(snapshot.body))
+        # דחיסה אחת לכל גרסת snapshot, לא לכל בקשה
+        body, encoding = response_encoder.compress(snapshot.body, negotiate_encoding(request.headers.get('Accept-Encoding')),
+                                                   cache_key=snapshot.etag)
+    response = Response(body, status=304 if not_modified else 200, mimetype='application/json')
+    # ETag חלש - אותו תוכן בכל encoding
+    response.set_etag(snapshot.etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Snapshot-Version'] = str(snapshot.version)
+    response.headers['X-Snapshot-Age'] = str(int(snapshot.age))
+    return response
+
+@app.before_request
+def open_indicator_context():
+    """פותח הקשר אינדיקטורים לבקשה - כל (אינדיקטור, פרמטרים) מחושב פעם אחת"""
+    if indicator_registry is not None:
+        g.indicator_context, g.indicator_token = indicator_registry.begin_context(request.path)
+
+@app.after_request
+def close_indicator_context(response):
+    """סוגר את הקשר האינדיקטורים ומוסיף מוני hit/miss לתשובה"""
+    token = g.pop('indicator_token', None)
+    if token is not None:
+        stats = indicator_registry.end_context(token)
+        if stats and (stats['hits'] or stats['misses']):
+            response.headers['X-Indicator-Cache'] = f"hits={stats['hits']}; misses={stats['misses']}"
+    return response
+
+@app.after_request
+def compress_json_response(response):
+    """דוחס תשובות JSON גדולות לפי Accept-Encoding של הלקוח"""
+    if (response.mimetype != 'application/json' or response.status_code != 200
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    body, encoding = response_encoder.compress(response.get_data(),
+                                               negotiate_encoding(request.headers.get('Accept-Encoding')))
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.teardown_request
+def teardown_indicator_context(exc):
+    """סוגר הקשר שנשאר פתוח אחרי שגיאה"""
+    token = g.pop('indicator_token', None)
+    if token is not None:
+        indicator_registry.end_context(token)
+
 # יצירת תיקיות נדרשות
 os.makedirs('database', exist_ok=True)
 os.makedirs('logs', exist_ok=True)
@@ -329,6 +471,13 @@ DASHBOARD_HTML = '''
                 <div class="alert {% if analysis.action == 'BUY' %}success{% elif analysis.action == 'SELL' %}danger{% else %}warning{% endif %}">
                     <strong>{{ symbol }}</strong>: {{ analysis.action }} (ביטחון: {{ "%.1f"|format(analysis.confidence * 100) }}%)
                     <br><small>מחיר: ${{ "%.4f"|format(analysis.price) }}</small>
+                    {% if analysis.forecast %}
+                    <br><small>🧠 חיזוי ML:
+                    {% for horizon, forecast in analysis.forecast.items() %}
+                        +{{ horizon }}: ${{ "%.4f"|format(forecast.predicted_price) }} ({{ "%+.2f"|format(forecast.price_change_percent) }}%){% if not loop.last %} · {% endif %}
+                    {% endfor %}
+                    </small>
+                    {% endif %}
                 </div>
                 {% endfor %}
             </div>
@@ -402,26 +551,44 @@ def dashboard():
         recent_alerts = []
 
         try:
-            # נתוני שוק
-            for symbol in config.SYMBOLS_TO_ANALYZE:
-                analysis = trading_logic.comprehensive_analysis(symbol)
+            # נתוני שוק - מה-snapshot המתוזמן, חישוב רק אם עדיין לא פורסם
+            snapshot = snapshot_store.get('multi', 'ALL', max_age=SNAPSHOT_MAX_AGE)
+            if snapshot is not None:
+                multi_analysis = snapshot.data
+            else:
+                multi_analysis = trading_logic.multi_symbol_analysis(config.SYMBOLS_TO_ANALYZE)
+            # חיזויי ML - מה-snapshots; סימלים בלי snapshot נחזים יחד בקריאת batch אחת
+            forecasts = {}
+            for symbol in multi_analysis.get('analyses', {}):
+                ml_snapshot = snapshot_store.get('ml', symbol, max_age=SNAPSHOT_MAX_AGE)
+                if ml_snapshot is not None:
+                    forecasts[symbol] = ml_snapshot.data
+            missing = [symbol for symbol in multi_analysis.get('analyses', {}) if symbol not in forecasts]
+            if missing:
+                forecasts.update(publish_ml_snapshots(missing))
+
+            for symbol, analysis in multi_analysis.get('analyses', {}).items():
                 decision = analysis.get('trading_decision', {})
                 market_data[symbol] = {
                     'action': decision.get('action', 'HOLD'),
                     'confidence': decision.get('confidence', 0),
-                    'price': analysis.get('market_analysis', {}).get('current_price', 0)
+                    'price': analysis.get('market_analysis', {}).get('current_price', 0),
+                    'forecast': forecasts.get(symbol, {}).get('horizons')
                 }
 
             # פעילות לווייתנים
             whale_activity = whale_tracker.track_whale_transactions('TONUSDT')[:5]
 
-            # קורלציות
-            corr_result = correlation_analyzer.analyze_correlation('TONUSDT', 'BNBUSDT')
-            correlations.append({
-                'symbols': 'TON-USDT/BNB-USDT',
-                'correlation': corr_result.get('correlation_coefficient', 0),
-                'strength': corr_result.get('strength', 'UNKNOWN')
-            })
+            # קורלציות - הזוגות המתואמים ביותר מהמטריצה המתגלגלת
+            if correlation_service is not None and correlation_service.last_open_time is not None:
+                correlations = correlation_service.top_pairs(3)
+            else:
+                corr_result = correlation_analyzer.analyze_correlation('TONUSDT', 'BNBUSDT')
+                correlations.append({
+                    'symbols': 'TON-USDT/BNB-USDT',
+                    'correlation': corr_result.get('correlation_coefficient', 0),
+                    'strength': corr_result.get('strength', 'UNKNOWN')
+                })
 
             # התראות אחרונות
             recent_alerts = [
@@ -444,116 +611,187 @@ def dashboard():
         logger.error(f"Error rendering dashboard: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """בדיקת בריאות מפורטת"""
+def collect_health():
+    """בדיקת בריאות מפורטת - מריצה כל רכיב (יקר, לשימוש ב-/health ומצב ה-ASGI)"""
+    components_status = {
+        'flask': 'healthy',
+        'trading_logic': 'unknown',
+        'telegram_bot': 'unknown',
+        'payment_system': 'unknown',
+        'database': 'unknown',
+        'fibonacci_calc': 'unknown',
+        'whale_tracker': 'unknown',
+        'correlation_analyzer': 'unknown',
+        'binance_client': 'unknown',
+        'technical_analyzer': 'unknown',
+        'data_manager': 'unknown',
+        'ml_predictor': 'unknown',
+        'risk_manager': 'unknown'
+    }
+    
     try:
-        components_status = {
-            'flask': 'healthy',
-            'trading_logic': 'unknown',
-            'telegram_bot': 'unknown',
-            'payment_system': 'unknown',
-            'database': 'unknown',
-            'fibonacci_calc': 'unknown',
-            'whale_tracker': 'unknown',
-            'correlation_analyzer': 'unknown',
-            'binance_client': 'unknown',
-            'technical_analyzer': 'unknown',
-            'data_manager': 'unknown',
-            'ml_predictor': 'unknown',
-            'risk_manager': 'unknown'
-        }
-        
-        try:
-            test_analysis = trading_logic.comprehensive_analysis('TONUSDT')
-            components_status['trading_logic'] = 'healthy'
-        except Exception as e:
-            components_status['trading_logic'] = f'error: {str(e)}'
-        
-        try:
-            if hasattr(telegram_bot, 'token') and telegram_bot.token:
-                components_status['telegram_bot'] = 'healthy'
-            else:
-                components_status['telegram_bot'] = 'not configured'
-        except Exception as e:
-            components_status['telegram_bot'] = f'error: {str(e)}'
-        
-        try:
-            test_user = payment_manager.get_user(1)
-            components_status['payment_system'] = 'healthy'
-        except Exception as e:
-            components_status['payment_system'] = f'error: {str(e)}'
-        
-        try:
-            conn = sqlite3.connect('database/payments.db')
-            conn.close()
-            components_status['database'] = 'healthy'
-        except Exception as e:
-            components_status['database'] = f'error: {str(e)}'
-        
-        try:
-            fib_test = fibonacci_calc.calculate_retracement(2.5, 2.4)
-            components_status['fibonacci_calc'] = 'healthy'
-        except Exception as e:
-            components_status['fibonacci_calc'] = f'error: {str(e)}'
+        test_analysis = trading_logic.comprehensive_analysis('TONUSDT')
+        components_status['trading_logic'] = 'healthy'
+    except Exception as e:
+        components_status['trading_logic'] = f'error: {str(e)}'
+    
+    try:
+        if hasattr(telegram_bot, 'token') and telegram_bot.token:
+            components_status['telegram_bot'] = 'healthy'
+        else:
+            components_status['telegram_bot'] = 'not configured'
+    except Exception as e:
+        components_status['telegram_bot'] = f'error: {str(e)}'
+    
+    try:
+        test_user = payment_manager.get_user(1)
+        components_status['payment_system'] = 'healthy'
+    except Exception as e:
+        components_status['payment_system'] = f'error: {str(e)}'
+    
+    try:
+        conn = sqlite3.connect('database/payments.db')
+        conn.close()
+        components_status['database'] = 'healthy'
+    except Exception as e:
+        components_status['database'] = f'error: {str(e)}'
+    
+    try:
+        fib_test = fibonacci_calc.calculate_retracement(2.5, 2.4)
+        components_status['fibonacci_calc'] = 'healthy'
+    except Exception as e:
+        components_status['fibonacci_calc'] = f'error: {str(e)}'
 
-        try:
-            whale_test = whale_tracker.track_whale_transactions('TONUSDT')
-            components_status['whale_tracker'] = 'healthy'
-        except Exception as e:
-            components_status['whale_tracker'] = f'error: {str(e)}'
+    try:
+        whale_test = whale_tracker.track_whale_transactions('TONUSDT')
+        components_status['whale_tracker'] = 'healthy'
+    except Exception as e:
+        components_status['whale_tracker'] = f'error: {str(e)}'
 
-        try:
-            corr_test = correlation_analyzer.analyze_correlation('TONUSDT', 'BNBUSDT')
-            components_status['correlation_analyzer'] = 'healthy'
-        except Exception as e:
-            components_status['correlation_analyzer'] = f'error: {str(e)}'
+    try:
+        corr_test = correlation_analyzer.analyze_correlation('TONUSDT', 'BNBUSDT')
+        components_status['correlation_analyzer'] = 'healthy'
+    except Exception as e:
+        components_status['correlation_analyzer'] = f'error: {str(e)}'
 
-        try:
-            price_test = binance_client.get_current_price('TONUSDT')
-            components_status['binance_client'] = 'healthy'
-        except Exception as e:
-            components_status['binance_client'] = f'error: {str(e)}'
+    try:
+        price_test = binance_client.get_current_price('TONUSDT')
+        components_status['binance_client'] = 'healthy'
+    except Exception as e:
+        components_status['binance_client'] = f'error: {str(e)}'
 
-        try:
-            df_test = data_manager.get_historical_data('TONUSDT', days=7)
-            components_status['data_manager'] = 'healthy'
-        except Exception as e:
-            components_status['data_manager'] = f'error: {str(e)}'
+    try:
+        df_test = data_manager.get_historical_data('TONUSDT', days=7)
+        components_status['data_manager'] = 'healthy'
+    except Exception as e:
+        components_status['data_manager'] = f'error: {str(e)}'
 
-        try:
-            ta_test = technical_analyzer.comprehensive_technical_analysis(df_test, 'TONUSDT')
-            components_status['technical_analyzer'] = 'healthy'
-        except Exception as e:
-            components_status['technical_analyzer'] = f'error: {str(e)}'
+    try:
+        ta_test = technical_analyzer.comprehensive_technical_analysis(df_test, 'TONUSDT')
+        components_status['technical_analyzer'] = 'healthy'
+    except Exception as e:
+        components_status['technical_analyzer'] = f'error: {str(e)}'
 
-        try:
-            ml_test = ml_predictor.predict_future(df_test, periods=3)
-            components_status['ml_predictor'] = 'healthy'
-        except Exception as e:
-            components_status['ml_predictor'] = f'error: {str(e)}'
+    try:
+        ml_test = ml_predictor.predict_future(df_test, periods=3)
+        components_status['ml_predictor'] = 'healthy'
+    except Exception as e:
+        components_status['ml_predictor'] = f'error: {str(e)}'
+
+    try:
+        risk_test = risk_manager.assess_trade_risk('TONUSDT', TradeAction.BUY, 100, 2.45, {}, {})
+        components_status['risk_manager'] = 'healthy'
+    except Exception as e:
+        components_status['risk_manager'] = f'error: {str(e)}'
+    
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'components': components_status,
+        'environment': {
+            'python_version': sys.version,
+            'server_port': config.SERVER_PORT,
+            'symbols_tracked': config.SYMBOLS_TO_ANALYZE
+        }
+    }
+
+# בדיקות רכיבים ברקע - כל רכיב במחזור משלו; ה-probes של Railway/nginx רק קוראים תוצאות
+from health_prober import HealthProber
+health_prober = HealthProber()
 
+def register_health_probes():
+    """רושם בדיקה זולה לכל רכיב (קריטי = משפיע על /readyz)"""
+    def check_database():
+        conn = sqlite3.connect('database/payments.db', timeout=5)
         try:
-            risk_test = risk_manager.assess_trade_risk('TONUSDT', TradeAction.BUY, 100, 2.45, {}, {})
-            components_status['risk_manager'] = 'healthy'
-        except Exception as e:
-            components_status['risk_manager'] = f'error: {str(e)}'
+            conn.execute('SELECT 1').fetchone()
+        finally:
+            conn.close()
+    
+    health_prober.register('database', check_database, interval=15, timeout=5)
+    health_prober.register('data_manager', lambda: data_manager.get_historical_data('TONUSDT', days=1) is not None,
+                           interval=30, timeout=10)
+    health_prober.register('binance_client', lambda: bool(binance_client.get_current_price('TONUSDT')),
+                           interval=30, timeout=10, critical=False)
+    health_prober.register('analysis_snapshots',
+                           lambda: snapshot_store.get('multi', 'ALL', max_age=SNAPSHOT_MAX_AGE) is not None,
+                           interval=60, timeout=1, critical=False)
+    health_prober.register('risk_manager',
+                           lambda: risk_manager.assess_trade_risk('TONUSDT', TradeAction.BUY, 100, 2.45, {}, {}),
+                           interval=120, timeout=10, critical=False)
+    health_prober.register('telegram_bot', lambda: bool(getattr(telegram_bot, 'token', None)),
+                           interval=300, timeout=1, critical=False)
+
+register_health_probes()
+
+@app.route('/livez', methods=['GET'])
+def liveness_check():
+    """התהליך חי - זמן קבוע, בלי לגעת ברכיבים"""
+    return jsonify(health_prober.liveness())
+
+@app.route('/readyz', methods=['GET'])
+def readiness_check():
+    """מוכן לתעבורה לפי ה-heartbeats השמורים של הרכיבים הקריטיים"""
+    ready, summary = health_prober.readiness()
+    return jsonify(summary), 200 if ready else 503
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """מצב הרכיבים מה-prober (כולל latency); ?deep=1 מריץ את הבדיקה המלאה"""
+    try:
+        if request.args.get('deep') in ('1', 'true'):
+            return jsonify(collect_health())
         
-        return jsonify({
-            'status': 'healthy',
-            'timestamp': datetime.now().isoformat(),
-            'components': components_status,
-            'environment': {
-                'python_version': sys.version,
-                'server_port': config.SERVER_PORT,
-                'symbols_tracked': config.SYMBOLS_TO_ANALYZE
-            }
-        })
+        return jsonify(health_prober.report())
         
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """מוני ביצועים - cache, אינדיקטורים ותעבורת Binance"""
+    try:
+        metrics = {'timestamp': datetime.now().isoformat()}
+
+        if hasattr(data_manager, 'get_cache_stats'):
+            metrics['cache'] = data_manager.get_cache_stats()
+        if indicator_registry is not None:
+            metrics['indicators'] = indicator_registry.get_stats()
+        metrics['single_flight'] = single_flight.get_stats()
+        metrics['snapshots'] = snapshot_store.get_stats()
+        metrics['serialization'] = response_encoder.get_stats()
+        if getattr(ml_predictor, 'feature_store', None) is not None:
+            metrics['feature_store'] = ml_predictor.feature_store.get_stats()
+        if hasattr(binance_client, 'transport'):
+            metrics['transport'] = binance_client.transport.get_stats()
+
+        return jsonify(metrics)
+
+    except Exception as e:
+        logger.error(f"Error collecting metrics: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/analysis', methods=['GET'])
 def get_current_analysis():
     """ניתוח שוק נוכחי"""
@@ -568,12 +806,20 @@ def get_current_analysis():
                 'upgrade_url': '/premium'
             }), 402
         
+        snapshot = snapshot_store.get('analysis', symbol, max_age=SNAPSHOT_MAX_AGE)
+        if snapshot is not None:
+            return snapshot_response(snapshot)
+        
         logger.info(f"📊 מתבצע ניתוח עבור: {symbol}")
         
-        analysis = trading_logic.comprehensive_analysis(symbol)
+        analysis, source = single_flight.run(
+            'analysis', symbol, '1h', lambda: trading_logic.comprehensive_analysis(symbol)
+        )
         
-        logger.info(f"✅ ניתוח הושלם: {analysis.get('trading_decision', {}).get('action')}")
-        return jsonify(analysis)
+        logger.info(f"✅ ניתוח הושלם ({source}): {analysis.get('trading_decision', {}).get('action')}")
+        response = jsonify(analysis)
+        response.headers['X-Single-Flight'] = source
+        return response
         
     except Exception as e:
         logger.error(f"❌ שגיאה בניתוח: {e}")
@@ -603,9 +849,13 @@ def get_multi_analysis():
                 'upgrade_url': '/premium'
             }), 402
         
+        snapshot = snapshot_store.get('multi', 'ALL', max_age=SNAPSHOT_MAX_AGE)
+        if snapshot is not None:
+            return snapshot_response(snapshot)
+        
         logger.info("🌐 מתבצע ניתוח מרובה מטבעות")
         
-        analysis = trading_logic.multi_symbol_analysis()
+        analysis = trading_logic.multi_symbol_analysis(config.SYMBOLS_TO_ANALYZE)
         
         logger.info(f"✅ ניתוח מרובה מטבעות הושלם: {len(analysis.get('analyses', {}))} מטבעות")
         return jsonify(analysis)
@@ -626,16 +876,26 @@ def get_technical_analysis(symbol):
                 'message': 'נדרש מנוי Premium לגישה לניתוח טכני מתקדם'
             }), 402
         
-        # קבלת נתונים היסטוריים
-        df = data_manager.get_historical_data(symbol, days=60)
+        snapshot = snapshot_store.get('technical', symbol, max_age=SNAPSHOT_MAX_AGE)
+        if snapshot is not None:
+            return snapshot_response(snapshot)
         
-        if df.empty:
-            return jsonify({'status': 'error', 'message': 'No data available'}), 404
+        def compute():
+            # קבלת נתונים היסטוריים
+            df = data_manager.get_historical_data(symbol, days=60)
+            if df.empty:
+                return None
+            # ניתוח טכני
+            return technical_analyzer.comprehensive_technical_analysis(df, symbol)
         
-        # ניתוח טכני
-        analysis = technical_analyzer.comprehensive_technical_analysis(df, symbol)
+        analysis, source = single_flight.run('technical', symbol, '1h', compute)
         
-        return jsonify(analysis)
+        if analysis is None:
+            return jsonify({'status': 'error', 'message': 'No data available'}), 404
+        
+        response = jsonify(analysis)
+        response.headers['X-Single-Flight'] = source
+        return response
         
     except Exception as e:
         logger.error(f"Error in technical analysis: {e}")
@@ -652,6 +912,9 @@ def get_ml_prediction(symbol):
                 'message': 'נדרש מנוי Premium לגישה לחיזוי ML'
             }), 402
         
+        if not getattr(config, 'ML_ENABLED', True):
+            return jsonify({'status': 'disabled', 'message': 'ML מושבת (ML_ENABLED=false)'}), 503
+        
         periods = int(request.args.get('periods', 10))
         
         # קבלת נתונים לאימון
@@ -660,12 +923,16 @@ def get_ml_prediction(symbol):
         if df.empty:
             return jsonify({'status': 'error', 'message': 'Insufficient data for ML prediction'}), 404
         
-        # אימון מודל (בפעם הראשונה) או שימוש במודל קיים
-        if not hasattr(ml_predictor, 'model_performance') or not ml_predictor.model_performance:
-            ml_predictor.train_models(df)
+        if not hasattr(ml_predictor, 'has_model'):
+            return jsonify(ml_predictor.predict_future(df, periods))
+        
+        # מודל מה-registry; אם אין - אימון ברקע ובינתיים חיזוי גיבוי (לא מאמנים על thread הבקשה)
+        if not ml_predictor.has_model(symbol) and not ml_predictor.load_best(symbol):
+            start_background_training(symbol)
+            return jsonify({**ml_predictor.predict_future(df, periods, symbol=symbol), 'model_status': 'training'})
         
         # חיזוי
-        prediction = ml_predictor.predict_future(df, periods)
+        prediction = ml_predictor.predict_future(df, periods, symbol=symbol)
         
         return jsonify(prediction)
         
@@ -752,12 +1019,15 @@ def get_whale_activity(symbol):
                 'message': 'נדרש מנוי Premium לגישה לנתוני לווייתנים'
             }), 402
         
-        whale_data = whale_tracker.track_whale_transactions(symbol)
+        limit = request.args.get('limit', 50, type=int)
+        whale_data = whale_tracker.track_whale_transactions(symbol, limit)
         
         return jsonify({
             'symbol': symbol,
             'whale_activity': whale_data,
             'total_whales': len(whale_data),
+            'source': 'stream' if whale_stream is not None and whale_stream.is_running() else 'polling',
+            'threshold': whale_stream.detector.threshold(symbol) if whale_stream is not None else None,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -784,6 +1054,44 @@ def get_correlation_analysis():
         logger.error(f"Error in correlation analysis: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/correlation/matrix', methods=['GET'])
+def get_correlation_matrix():
+    """מטריצת הקורלציה המתגלגלת של כל הסימלים והזוגות הקיצוניים"""
+    try:
+        if correlation_service is None:
+            return jsonify({'status': 'error', 'message': 'Correlation service not available'}), 503
+        window = request.args.get('window', type=int)
+        k = request.args.get('k', 5, type=int)
+        return jsonify(correlation_service.snapshot(k, window))
+        
+    except Exception as e:
+        logger.error(f"Error in correlation matrix: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/correlation/history', methods=['GET'])
+def get_correlation_history():
+    """היסטוריית הקורלציה המתגלגלת של זוג סימלים"""
+    try:
+        if correlation_service is None:
+            return jsonify({'status': 'error', 'message': 'Correlation service not available'}), 503
+        symbol1 = request.args.get('symbol1', 'TONUSDT')
+        symbol2 = request.args.get('symbol2', 'BNBUSDT')
+        window = request.args.get('window', type=int)
+        limit = request.args.get('limit', 168, type=int)
+        
+        return jsonify({
+            'symbols': f"{symbol1.upper()}/{symbol2.upper()}",
+            'window': window or correlation_service.default_window,
+            'history': correlation_service.history(symbol1, symbol2, window, limit),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except KeyError as e:
+        return jsonify({'status': 'error', 'message': f'Symbol not tracked: {e}'}), 404
+    except Exception as e:
+        logger.error(f"Error in correlation history: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/webhook', methods=['POST'])
 def handle_webhook():
     """מטפל בהתראות webhook"""
@@ -865,10 +1173,20 @@ def restart_system():
         trading_logic = AdvancedTradingLogic()
         telegram_bot = AdvancedTelegramBot()
         payment_manager = PaymentManager()
+        # ה-cache הישן נכתב לדיסק לפני שהחדש נפתח, ונסגר (threads + sqlite) אחרי ההחלפה
+        previous_data_manager = data_manager
+        if hasattr(previous_data_manager, 'cache'):
+            previous_data_manager.cache.flush()
         data_manager = AdvancedDataManager()
+        if hasattr(previous_data_manager, 'close'):
+            previous_data_manager.close()
         technical_analyzer = AdvancedTechnicalAnalyzer()
-        ml_predictor = AdvancedMLPredictor()
-        risk_manager = AdvancedRiskManager()
+        ml_predictor = AdvancedMLPredictor(getattr(config, 'ML_MODELS', None),
+                                           registry=getattr(ml_predictor, 'registry', None),
+                                           feature_store=getattr(ml_predictor, 'feature_store', None),
+                                           horizons=getattr(config, 'ML_HORIZONS', None))
+        risk_manager = AdvancedRiskManager(getattr(data_manager, 'ohlcv_store', None), correlation_service)
+        threading.Thread(target=warm_load_models, daemon=True).start()
         
         return jsonify({
             'status': 'success',
@@ -880,11 +1198,67 @@ def restart_system():
         logger.error(f"Error restarting system: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def publish_analysis_snapshots(analysis=None):
+    """מפרסם snapshots לכל סימל - ניתוח מלא, ניתוח טכני ותמונת multi"""
+    if analysis is None:
+        analysis = trading_logic.multi_symbol_analysis(config.SYMBOLS_TO_ANALYZE)
+    
+    for symbol, analysis_data in analysis.get('analyses', {}).items():
+        snapshot_store.publish('analysis', symbol, analysis_data)
+        try:
+            df = data_manager.get_historical_data(symbol, days=60)
+            if not df.empty:
+                snapshot_store.publish('technical', symbol,
+                                       technical_analyzer.comprehensive_technical_analysis(df, symbol))
+        except Exception as e:
+            logger.error(f"❌ שגיאה בניתוח טכני ל-snapshot של {symbol}: {e}")
+    
+    snapshot = snapshot_store.publish('multi', 'ALL', analysis)
+    logger.info(f"📸 פורסמו snapshots ל-{len(analysis.get('analyses', {}))} מטבעות (multi v{snapshot.version})")
+    publish_ml_snapshots(list(analysis.get('analyses', {})))
+    sync_correlations()
+    return analysis
+
+def sync_correlations():
+    """משלים למטריצת הקורלציה נרות שנשמרו ולא הגיעו מה-stream החי"""
+    if correlation_service is None or not hasattr(data_manager, 'ohlcv_store'):
+        return
+    try:
+        correlation_service.sync_from_store(data_manager.ohlcv_store)
+    except Exception as e:
+        logger.error(f"❌ שגיאה בעדכון מטריצת הקורלציה: {e}")
+
+def publish_ml_snapshots(symbols):
+    """חיזוי ML לכל הסימלים בקריאת batch אחת (predict אחד לכל מודל) ו-snapshot 'ml' לכל סימל"""
+    if not getattr(config, 'ML_ENABLED', True) or not hasattr(ml_predictor, 'predict_batch'):
+        return {}
+    try:
+        frames = {}
+        for symbol in symbols:
+            if ml_predictor.has_model(symbol):
+                df = data_manager.get_historical_data(symbol, days=180)
+                if not df.empty:
+                    frames[symbol] = df
+        if not frames:
+            return {}
+        
+        batch = ml_predictor.predict_batch([(symbol, None) for symbol in frames], frames)
+        forecasts = {}
+        for result in batch['results']:
+            if result.get('status') == 'success':
+                forecasts[result['symbol']] = result
+                snapshot_store.publish('ml', result['symbol'], result)
+        logger.info(f"🧠 חיזוי ML ל-{len(forecasts)} מטבעות ב-{batch['total_ms']:.0f}ms")
+        return forecasts
+    except Exception as e:
+        logger.error(f"❌ שגיאה בחיזוי ML מתוזמן: {e}")
+        return {}
+
 def scheduled_analysis():
-    """מריץ ניתוח לפי לוח זמנים"""
+    """מריץ ניתוח לפי לוח זמנים ומפרסם snapshots"""
     try:
         logger.info("⏰ מתבצע ניתוח מתוזמן...")
-        analysis = trading_logic.multi_symbol_analysis()
+        analysis = publish_analysis_snapshots()
         
         symbols_analyzed = len(analysis.get('analyses', {}))
         decisions = []
@@ -908,6 +1282,9 @@ def scheduled_analysis():
 def whale_monitoring():
     """מעקב אחר לווייתנים"""
     try:
+        # כשה-stream פועל האירועים נדחפים ישירות לתור ההתראות (וההיסטוריה שלו כבר נשלחה) - הסקירה רק כגיבוי
+        if whale_stream is not None and whale_stream.is_running():
+            return
         logger.info("🐋 מתבצע מעקב לווייתנים...")
         
         for symbol in config.SYMBOLS_TO_ANALYZE:
@@ -921,6 +1298,28 @@ def whale_monitoring():
     except Exception as e:
         logger.error(f"Error in whale monitoring: {e}")
 
+# התראות לווייתנים מה-stream - התור מפריד את שליחת Telegram מה-thread של ה-WebSocket
+whale_alert_queue = queue.Queue(maxsize=100)
+
+def enqueue_whale_alert(event):
+    """subscriber של ה-WhaleDetector - רק אירועים משמעותיים נכנסים לתור"""
+    if event.get('impact_score', 0) < getattr(config, 'WHALE_ALERT_MIN_IMPACT', 0.7):
+        return
+    try:
+        whale_alert_queue.put_nowait(event)
+    except queue.Full:
+        logger.warning(f"⚠️ תור התראות הלווייתנים מלא - התראה ל-{event['symbol']} נזרקה")
+
+def whale_alert_worker():
+    """שולח ל-Telegram את ההתראות מהתור"""
+    while True:
+        event = whale_alert_queue.get()
+        try:
+            telegram_bot.send_whale_alert(event)
+            logger.info(f"🚨 Whale alert sent for {event['symbol']} ({event['notional']:,.0f} USDT, {event['latency_ms']}ms)")
+        except Exception as e:
+            logger.error(f"Error sending whale alert: {e}")
+
 def premium_status_check():
     """בודק תוקף Premium של משתמשים"""
     try:
@@ -948,21 +1347,94 @@ def premium_status_check():
 
 def ml_model_retraining():
     """מאמן מחדש את מודלי ה-ML"""
+    if not getattr(config, 'ML_ENABLED', True):
+        return
     try:
         logger.info("🧠 מתבצע אימון מחדש של מודלי ML...")
-        
-        for symbol in config.SYMBOLS_TO_ANALYZE[:2]:  # מאמן רק על 2 סימלים ראשונים
-            df = data_manager.get_historical_data(symbol, days=180)
-            if not df.empty:
-                ml_predictor.train_models(df)
-                logger.info(f"✅ ML model retrained for {symbol}")
-        
-        ml_predictor.save_models()
-        logger.info("💾 ML models saved")
+        train_frames(ml_training_frames())
         
     except Exception as e:
         logger.error(f"Error in ML retraining: {e}")
 
+def ml_hyperparameter_search():
+    """חיפוש walk-forward שבועי לכל סימל, ואז אימון עם הפרמטרים שנבחרו"""
+    if not getattr(config, 'ML_ENABLED', True) or training_orchestrator is None:
+        return
+    try:
+        logger.info("🔎 מתבצע חיפוש היפר-פרמטרים למודלי ML...")
+        frames = ml_training_frames()
+        summary = training_orchestrator.search_all(frames, n_folds=getattr(config, 'ML_SEARCH_FOLDS', 5),
+                                                   timeout=getattr(config, 'ML_SEARCH_TIMEOUT', 3600))
+        logger.info(f"🔎 חיפוש הסתיים ב-{summary['wall_seconds']}s - הצליחו: {', '.join(summary['succeeded']) or 'אין'}")
+        train_frames(frames)
+        
+    except Exception as e:
+        logger.error(f"Error in ML hyperparameter search: {e}")
+
+def ml_training_frames():
+    """180 יום של נרות לכל סימל, אחרי השלמת מה שחסר באחסון"""
+    frames = {}
+    for symbol in config.SYMBOLS_TO_ANALYZE:
+        # משלים רק את מה שחסר באחסון לפני האימון
+        report = data_manager.backfill_history(symbol, days=180)
+        logger.info(f"⬇️ Backfill {symbol}: {report.get('bars_written', 0)} נרות חדשים "
+                    f"({report.get('bars_per_sec', 0)} נרות/שנייה)")
+        df = data_manager.get_historical_data(symbol, days=180)
+        if not df.empty:
+            frames[symbol] = df
+    return frames
+
+def train_frames(frames):
+    """סט מודלים לכל סימל - ב-pool התהליכים אם קיים, וכל סימל שהסתיים נטען מיד לשרת"""
+    if training_orchestrator is not None and hasattr(ml_predictor, 'load_latest'):
+        summary = training_orchestrator.train_all(frames, on_complete=lambda symbol, report: ml_predictor.load_latest(symbol))
+        logger.info(f"🧠 אימון ML הסתיים ב-{summary['wall_seconds']}s - הצליחו: {', '.join(summary['succeeded']) or 'אין'}"
+                    f"{', נכשלו: ' + ', '.join(summary['failed']) if summary['failed'] else ''}")
+        return summary['succeeded']
+    
+    trained = []
+    for symbol, df in frames.items():
+        if ml_predictor.train_models(df, symbol=symbol) is not None:
+            trained.append(symbol)
+    return trained
+
+# סימלים שמתאמנים כרגע ברקע - בקשות חיזוי לא פותחות אימון כפול
+ml_training_in_progress = set()
+ml_training_lock = threading.Lock()
+
+def train_symbol_model(symbol):
+    """מאמן סט מודלים לסימל, שומר ב-registry ומחליף את הסט המשרת (חיזויים ממשיכים על הקודם)"""
+    df = data_manager.get_historical_data(symbol, days=180)
+    if df.empty:
+        return False
+    return symbol in train_frames({symbol: df})
+
+def start_background_training(symbol):
+    """אימון ברקע לסימל אם עוד לא רץ"""
+    with ml_training_lock:
+        if symbol in ml_training_in_progress:
+            return False
+        ml_training_in_progress.add(symbol)
+    
+    def run():
+        try:
+            train_symbol_model(symbol)
+        except Exception as e:
+            logger.error(f"Error training {symbol} in background: {e}")
+        finally:
+            with ml_training_lock:
+                ml_training_in_progress.discard(symbol)
+    
+    threading.Thread(target=run, name=f"ml-train-{symbol}", daemon=True).start()
+    return True
+
+def warm_load_models():
+    """טוען מה-registry את המודל הטוב ביותר לכל סימל - בעלייה, בלי לאמן"""
+    if not getattr(config, 'ML_ENABLED', True) or not hasattr(ml_predictor, 'load_best'):
+        return
+    loaded = [symbol for symbol in config.SYMBOLS_TO_ANALYZE if ml_predictor.load_best(symbol)]
+    logger.info(f"📂 מודלי ML נטענו מה-registry: {', '.join(loaded) or 'אין'}")
+
 def run_scheduler():
     """מריץ את ה-scheduler"""
     logger.info("🔄 מתחיל scheduler...")
@@ -971,7 +1443,9 @@ def run_scheduler():
     schedule.every(10).minutes.do(whale_monitoring)
     schedule.every().day.at("09:00").do(lambda: scheduled_analysis())
     schedule.every().day.at("03:00").do(premium_status_check)
-    schedule.every().day.at("04:00").do(ml_model_retraining)
+    # האימון ארוך - thread משלו כדי לא לעכב את שאר המשימות
+    schedule.every().day.at("04:00").do(lambda: threading.Thread(target=ml_model_retraining, daemon=True).start())
+    schedule.every().sunday.at("02:00").do(lambda: threading.Thread(target=ml_hyperparameter_search, daemon=True).start())
     schedule.every(5).minutes.do(lambda: logger.info("💓 System heartbeat"))
     
     while True:
@@ -1008,6 +1482,60 @@ def start_server():
         logger.error(traceback.format_exc())
         raise
 
+def start_live_candles():
+    """פותח חיבור klines משולב אחד לכל הסמלים וה-timeframes ומזין נרות סגורים למנוע האינדיקטורים"""
+    try:
+        from live_candles import get_kline_stream
+        from indicator_engine import get_indicator_engine
+    except ImportError as e:
+        logger.warning(f"⚠️ נרות חיים לא זמינים: {e}")
+        return
+    
+    stream = get_kline_stream()
+    engine = get_indicator_engine()
+    
+    def feed_engine(symbol, interval, bar):
+        # רק מצבים שכבר נזרעו מהיסטוריה - נר בודד לא מספיק לאתחול
+        if engine.get_state(symbol, interval) is not None:
+            engine.update(symbol, interval, bar)
+    
+    def persist_bar(symbol, interval, bar):
+        # מודל הסיכון קורא מהאחסון - נר סגור חייב להגיע אליו (data_manager נפתר בזמן הקריאה, שורד restart)
+        if hasattr(data_manager, 'persist_closed_bar'):
+            data_manager.persist_closed_bar(symbol, interval, bar)
+    
+    stream.buffer.add_listener(feed_engine)
+    stream.buffer.add_listener(persist_bar)
+    # קורלציות - זריעה מהאחסון לפני שהנרות החיים מתחילים להגיע
+    if correlation_service is not None:
+        sync_correlations()
+        stream.buffer.add_listener(correlation_service.on_bar)
+    pairs = [(symbol, interval)
+             for symbol in config.SYMBOLS_TO_ANALYZE
+             for interval in getattr(config, 'TIMEFRAMES', ['1h'])]
+    if stream.start(pairs):
+        logger.info(f"✅ חיבור נרות חי הופעל עבור {len(pairs)} streams")
+
+def start_order_books():
+    """פותח order books מקומיים רק לסמלים המוגדרים - נקודות הקריאה לא מוסיפות סמלים מקלט משתמש"""
+    try:
+        from order_book import get_order_book_manager
+    except ImportError as e:
+        logger.warning(f"⚠️ order books מקומיים לא זמינים: {e}")
+        return
+    
+    if get_order_book_manager().track(config.SYMBOLS_TO_ANALYZE):
+        logger.info(f"✅ order books מקומיים הופעלו עבור {len(config.SYMBOLS_TO_ANALYZE)} סמלים")
+
+def start_whale_stream():
+    """פותח את חיבורי aggTrade/forceOrder ומחבר את תור התראות Telegram"""
+    if whale_stream is None:
+        return
+    whale_stream.detector.subscribe(enqueue_whale_alert)
+    threading.Thread(target=whale_alert_worker, name='whale-alerts', daemon=True).start()
+    if whale_stream.start(config.SYMBOLS_TO_ANALYZE):
+        logger.info(f"✅ זרם לווייתנים הופעל עבור {len(config.SYMBOLS_TO_ANALYZE)} סמלים")
+
 if __name__ == '__main__':
     print("🤖 Initializing TON Trading Bot Pro with Advanced Features...")
     
@@ -1019,6 +1547,19 @@ if __name__ == '__main__':
         scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
         scheduler_thread.start()
         logger.info("✅ Scheduler started successfully")
+        
+        # המשך backfill שנקטע בהרצה קודמת
+        if hasattr(data_manager, 'resume_backfills'):
+            threading.Thread(target=data_manager.resume_backfills, daemon=True).start()
+        
+        start_live_candles()
+        start_order_books()
+        start_whale_stream()
+        health_prober.start()
+        threading.Thread(target=warm_load_models, daemon=True).start()
+        
+        # snapshot ראשון מיד - לא מחכים 15 דקות לריצה המתוזמנת
+        threading.Thread(target=publish_analysis_snapshots, daemon=True).start()
     except Exception as e:
         logger.error(f"❌ Failed to start scheduler: {e}")
         logger.error(traceback.format_exc())
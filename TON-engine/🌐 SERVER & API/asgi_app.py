@@ -0,0 +1,337 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+    A2WSGI_AVAILABLE = True
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+    A2WSGI_AVAILABLE = False
+
+import app as server
+from response_encoder import negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """pool threads עם תור מוגבל - עומס יתר מקבל 503 מהר במקום להיערם"""
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"asgi-{name}")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {'submitted': 0, 'rejected': 0, 'active': 0}
+
+    async def run(self, func: Callable, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        if self._semaphore.locked():
+            self.stats['rejected'] += 1
+            raise ExecutorSaturated(self.name)
+
+        async with self._semaphore:
+            self.stats['submitted'] += 1
+            self.stats['active'] += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            finally:
+                self.stats['active'] -= 1
+
+    def get_stats(self):
+        return {**self.stats, 'max_workers': self.max_workers, 'max_pending': self.max_pending}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutorSaturated(Exception):
+    """התור של ה-executor מלא"""
+
+
+# analysis - ניתוחים ו-ML (CPU/רשת כבדים), io - בדיקות DB וקריאות קצרות
+analysis_pool = BoundedExecutor('analysis', int(os.getenv('ASGI_ANALYSIS_WORKERS', 8)),
+                                int(os.getenv('ASGI_ANALYSIS_PENDING', 256)))
+io_pool = BoundedExecutor('io', int(os.getenv('ASGI_IO_WORKERS', 32)),
+                          int(os.getenv('ASGI_IO_PENDING', 1024)))
+
+
+# =============================================
+# 📤 RESPONSES
+# =============================================
+
+def _endpoint_label(request: Optional[Request]) -> str:
+    """שם ה-route (כמו request.endpoint ב-Flask) - מונים לפי endpoint ולא לפי path"""
+    if request is None:
+        return 'asgi'
+    return getattr(request.scope.get('endpoint'), '__name__', 'asgi')
+
+
+def json_response(data, status_code: int = 200, headers: Optional[dict] = None,
+                  request: Optional[Request] = None) -> Response:
+    """קידוד דרך ה-encoder המשותף; עם request - גם דחיסה לפי Accept-Encoding"""
+    body = server.response_encoder.encode(data, _endpoint_label(request))
+    headers = dict(headers or {})
+    if request is not None and status_code == 200:
+        body, encoding = server.response_encoder.compress(body, negotiate_encoding(request.headers.get('accept-encoding')))
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+    return Response(body, status_code=status_code, media_type='application/json', headers=headers)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/').strip('"') == etag for tag in tags)
+
+
+def snapshot_response(request: Request, snapshot) -> Response:
+    """אותו חוזה כמו ב-Flask: גוף מוכן, ETag ו-304"""
+    not_modified = _etag_matches(request, snapshot.etag)
+    server.snapshot_store.record_hit(not_modified)
+    headers = {
+        'ETag': f'W/"{snapshot.etag}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+        'X-Snapshot-Version': str(snapshot.version),
+        'X-Snapshot-Age': str(int(snapshot.age))
+    }
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    server.response_encoder.record_passthrough(_endpoint_label(request), len(snapshot.body))
+    body, encoding = server.response_encoder.compress(snapshot.body, negotiate_encoding(request.headers.get('accept-encoding')),
+                                                      cache_key=snapshot.etag)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, media_type='application/json', headers=headers)
+
+
+async def premium_required(user_id: Optional[str], message: str) -> Optional[Response]:
+    """בדיקת Premium (שאילתת SQLite) ב-pool ה-I/O"""
+    if not user_id:
+        return None
+    if await io_pool.run(server.payment_manager.check_premium_status, int(user_id)):
+        return None
+    return json_response({'status': 'premium_required', 'message': message, 'upgrade_url': '/premium'}, 402)
+
+
+# =============================================
+# ⚡ ASYNC ROUTES
+# =============================================
+
+async def analysis(request: Request) -> Response:
+    symbol = request.query_params.get('symbol', 'TONUSDT')
+    denied = await premium_required(request.query_params.get('user_id'), 'נדרש מנוי Premium לגישה לניתוח מתקדם')
+    if denied is not None:
+        return denied
+
+    snapshot = server.snapshot_store.get('analysis', symbol, max_age=server.SNAPSHOT_MAX_AGE)
+    if snapshot is not None:
+        return snapshot_response(request, snapshot)
+
+    result, source = await analysis_pool.run(
+        server.single_flight.run, 'analysis', symbol, '1h',
+        lambda: server.trading_logic.comprehensive_analysis(symbol)
+    )
+    return json_response(result, headers={'X-Single-Flight': source}, request=request)
+
+
+async def multi_analysis(request: Request) -> Response:
+    user_id = request.query_params.get('user_id')
+    if not user_id:
+        return json_response({'status': 'auth_required',
+                              'message': 'נדרש מזהה משתמש לגישה לניתוח מרובה מטבעות'}, 401)
+    denied = await premium_required(user_id, 'נדרש מנוי Premium לגישה לניתוח מרובה מטבעות')
+    if denied is not None:
+        return denied
+
+    snapshot = server.snapshot_store.get('multi', 'ALL', max_age=server.SNAPSHOT_MAX_AGE)
+    if snapshot is not None:
+        return snapshot_response(request, snapshot)
+
+    result, source = await analysis_pool.run(
+        server.single_flight.run, 'multi_analysis', 'ALL', '1h',
+        lambda: server.trading_logic.multi_symbol_analysis(server.config.SYMBOLS_TO_ANALYZE)
+    )
+    return json_response(result, headers={'X-Single-Flight': source}, request=request)
+
+
+async def technical(request: Request) -> Response:
+    symbol = request.path_params['symbol']
+    denied = await premium_required(request.query_params.get('user_id'), 'נדרש מנוי Premium לגישה לניתוח טכני מתקדם')
+    if denied is not None:
+        return denied
+
+    snapshot = server.snapshot_store.get('technical', symbol, max_age=server.SNAPSHOT_MAX_AGE)
+    if snapshot is not None:
+        return snapshot_response(request, snapshot)
+
+    def compute():
+        df = server.data_manager.get_historical_data(symbol, days=60)
+        return None if df.empty else server.technical_analyzer.comprehensive_technical_analysis(df, symbol)
+
+    result, source = await analysis_pool.run(server.single_flight.run, 'technical', symbol, '1h', compute)
+    if result is None:
+        return json_response({'status': 'error', 'message': 'No data available'}, 404)
+    return json_response(result, headers={'X-Single-Flight': source}, request=request)
+
+
+async def livez(request: Request) -> Response:
+    return json_response(server.health_prober.liveness())
+
+
+async def readyz(request: Request) -> Response:
+    ready, summary = server.health_prober.readiness()
+    return json_response(summary, 200 if ready else 503)
+
+
+async def health(request: Request) -> Response:
+    if request.query_params.get('deep') not in ('1', 'true'):
+        return json_response(server.health_prober.report(), request=request)
+    # בדיקה עמוקה אחת לדקה משותפת לכל הבדיקות שמגיעות במקביל
+    result, source = await analysis_pool.run(server.single_flight.run, 'health', 'ALL', '1m', server.collect_health)
+    return json_response(result, headers={'X-Single-Flight': source}, request=request)
+
+
+async def asgi_stats(request: Request) -> Response:
+    return json_response({
+        'executors': {'analysis': analysis_pool.get_stats(), 'io': io_pool.get_stats()},
+        'scheduler': {name: 'running' if not task.done() else 'done' for name, task in scheduler_tasks.items()},
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+async def handle_saturated(request: Request, exc: ExecutorSaturated) -> Response:
+    return json_response({'status': 'overloaded', 'executor': str(exc)}, 503, headers={'Retry-After': '1'})
+
+
+# =============================================
+# ⏰ SCHEDULER (asyncio)
+# =============================================
+
+scheduler_tasks = {}
+
+
+async def _run_job(name: str, job: Callable):
+    started = time.perf_counter()
+    try:
+        await analysis_pool.run(job)
+    except Exception as e:
+        logger.error(f"❌ שגיאה במשימה מתוזמנת {name}: {e}")
+    else:
+        logger.info(f"⏱️ {name} הסתיים ב-{time.perf_counter() - started:.1f}s")
+
+
+async def every(seconds: float, name: str, job: Callable):
+    while True:
+        await asyncio.sleep(seconds)
+        await _run_job(name, job)
+
+
+async def daily_at(at: str, name: str, job: Callable):
+    hour, minute = map(int, at.split(':'))
+    while True:
+        now = datetime.now()
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        await asyncio.sleep((target - now).total_seconds())
+        await _run_job(name, job)
+
+
+async def weekly_at(weekday: int, at: str, name: str, job: Callable):
+    """פעם בשבוע ביום weekday (0 = שני ... 6 = ראשון) בשעה at"""
+    hour, minute = map(int, at.split(':'))
+    while True:
+        now = datetime.now()
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(days=(weekday - now.weekday()) % 7)
+        if target <= now:
+            target += timedelta(days=7)
+        await asyncio.sleep((target - now).total_seconds())
+        await _run_job(name, job)
+
+
+def _start_scheduler():
+    """אותן משימות של run_scheduler - כ-tasks באותו event loop"""
+    interval = 60 * getattr(server.config, 'ANALYSIS_INTERVAL_MINUTES', 15)
+    jobs = {
+        'scheduled_analysis': every(interval, 'scheduled_analysis', server.scheduled_analysis),
+        # snapshot ראשון מיד בעלייה; אחריו scheduled_analysis מפרסם
+        'snapshot_warmup': _run_job('snapshot_warmup', server.publish_analysis_snapshots),
+        'whale_monitoring': every(600, 'whale_monitoring', server.whale_monitoring),
+        'daily_report': daily_at('09:00', 'daily_report', server.scheduled_analysis),
+        'premium_status_check': daily_at('03:00', 'premium_status_check', server.premium_status_check),
+        'ml_model_retraining': daily_at('04:00', 'ml_model_retraining', server.ml_model_retraining),
+        'ml_hyperparameter_search': weekly_at(6, '02:00', 'ml_hyperparameter_search', server.ml_hyperparameter_search),
+        'heartbeat': every(300, 'heartbeat', lambda: logger.info("💓 System heartbeat"))
+    }
+    for name, coroutine in jobs.items():
+        scheduler_tasks[name] = asyncio.create_task(coroutine, name=name)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    logger.info("🚀 TON Trading Bot Pro - ASGI mode")
+    _start_scheduler()
+
+    loop = asyncio.get_running_loop()
+    if hasattr(server.data_manager, 'resume_backfills'):
+        loop.run_in_executor(io_pool.executor, server.data_manager.resume_backfills)
+    loop.run_in_executor(io_pool.executor, server.start_live_candles)
+    loop.run_in_executor(io_pool.executor, server.start_order_books)
+    loop.run_in_executor(io_pool.executor, server.start_whale_stream)
+    loop.run_in_executor(io_pool.executor, server.warm_load_models)
+    server.health_prober.start()
+
+    yield
+
+    for task in scheduler_tasks.values():
+        task.cancel()
+    server.health_prober.stop()
+    if server.whale_stream is not None:
+        server.whale_stream.stop()
+    analysis_pool.shutdown()
+    io_pool.shutdown()
+
+
+# שאר ה-routes של Flask רצים כמו שהם דרך WSGI (ב-threads של ה-middleware)
+wsgi_workers = int(os.getenv('ASGI_WSGI_WORKERS', 16))
+flask_mount = WSGIMiddleware(server.app, workers=wsgi_workers) if A2WSGI_AVAILABLE else WSGIMiddleware(server.app)
+
+asgi_app = Starlette(
+    routes=[
+        Route('/analysis', analysis, methods=['GET']),
+        Route('/multi_analysis', multi_analysis, methods=['GET']),
+        Route('/technical/{symbol}', technical, methods=['GET']),
+        Route('/livez', livez, methods=['GET']),
+        Route('/readyz', readyz, methods=['GET']),
+        Route('/health', health, methods=['GET']),
+        Route('/asgi/stats', asgi_stats, methods=['GET']),
+        Mount('/', app=flask_mount)
+    ],
+    exception_handlers={ExecutorSaturated: handle_saturated},
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    uvicorn.run(asgi_app, host='0.0.0.0', port=server.config.SERVER_PORT,
+                log_level='info', timeout_keep_alive=30)
@@ -0,0 +1,212 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class LatencyHistogram:
+    """היסטוגרמת latency בדליים קבועים (מילישניות) - זיכרון קבוע גם אחרי מיליוני דגימות"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)  # הדלי האחרון = מעל הגבול העליון
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float):
+        self.counts[bisect_left(self.BUCKETS_MS, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, pct: float) -> float:
+        """הגבול העליון של הדלי שמכיל את האחוזון"""
+        if self.count == 0:
+            return 0.0
+        target = pct / 100 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return float(self.BUCKETS_MS[index]) if index < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 1) if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 1),
+            'buckets': {f"le_{bound}": count for bound, count in zip(self.BUCKETS_MS, self.counts)}
+        }
+
+
+class ComponentProbe:
+    """בדיקה של רכיב אחד - מתי רצה, מה יצא ומה ה-latency"""
+
+    def __init__(self, name: str, check: Callable[[], object], interval: float,
+                 timeout: float, critical: bool):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.timeout = timeout
+        self.critical = critical
+
+        self.status = 'unknown'
+        self.last_run: Optional[float] = None
+        self.last_ok: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.histogram = LatencyHistogram()
+        self.inflight: Optional[Future] = None
+
+    def is_fresh(self, now: float) -> bool:
+        """heartbeat טרי - הבדיקה המוצלחת האחרונה בתוך 3 מחזורים"""
+        return self.last_ok is not None and now - self.last_ok <= 3 * self.interval + self.timeout
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            'status': self.status if self.is_fresh(now) or self.status != 'healthy' else 'stale',
+            'critical': self.critical,
+            'interval_s': self.interval,
+            'last_run': datetime.fromtimestamp(self.last_run).isoformat() if self.last_run else None,
+            'last_ok_age_s': round(now - self.last_ok, 1) if self.last_ok else None,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'latency': self.histogram.to_dict()
+        }
+
+
+class HealthProber:
+    """בודק רכיבים ברקע, כל אחד במחזור משלו; /readyz ו-/health רק קוראים את התוצאות השמורות"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.probes: Dict[str, ComponentProbe] = {}
+        self.started_at = time.time()
+        self._queue: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+
+    def register(self, name: str, check: Callable[[], object], interval: float = 30.0,
+                 timeout: float = 10.0, critical: bool = True):
+        """check נחשב כשל אם זרק חריגה, החזיר False או חרג מ-timeout"""
+        with self._lock:
+            self.probes[name] = ComponentProbe(name, check, interval, timeout, critical)
+            heapq.heappush(self._queue, (time.time(), name))
+        self._wakeup.set()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        threading.Thread(target=self._run, name='health-prober', daemon=True).start()
+        self.logger.info(f"🩺 Health prober started ({len(self.probes)} components)")
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                due_at, name = self._queue[0] if self._queue else (time.time() + 60, None)
+            delay = due_at - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+
+            with self._lock:
+                heapq.heappop(self._queue)
+            # כל בדיקה ב-thread משלה כדי שבדיקה תקועה לא תעכב את האחרות
+            threading.Thread(target=self._probe, args=(self.probes[name],), daemon=True).start()
+
+    def _call(self, probe: ComponentProbe) -> Future:
+        """מריץ את ה-check ב-thread משלו - check תקוע לא תופס worker של בדיקה אחרת"""
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(probe.check())
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f'health-probe-{probe.name}', daemon=True).start()
+        return future
+
+    def _probe(self, probe: ComponentProbe):
+        started = time.perf_counter()
+        error = None
+        # קריאה קודמת שעדיין רצה - ממתינים לה במקום לשלוח check נוסף
+        if probe.inflight is None or probe.inflight.done():
+            probe.inflight = self._call(probe)
+        try:
+            result = probe.inflight.result(timeout=probe.timeout)
+            if result is False:
+                error = 'check returned False'
+        except FutureTimeout:
+            error = f'timeout after {probe.timeout}s'
+        except Exception as e:
+            error = str(e)
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        now = time.time()
+        with self._lock:
+            probe.histogram.record(latency_ms)
+            probe.last_run = now
+            if error is None:
+                probe.status = 'healthy'
+                probe.last_ok = now
+                probe.last_error = None
+                probe.consecutive_failures = 0
+            else:
+                probe.consecutive_failures += 1
+                probe.status = 'degraded' if probe.consecutive_failures < 3 else 'failing'
+                probe.last_error = error
+            heapq.heappush(self._queue, (now + probe.interval, probe.name))
+        # ה-scheduler אולי ישן על תור ריק - מעירים אותו לתזמון החדש
+        self._wakeup.set()
+
+        if error is not None:
+            self.logger.warning(f"⚠️ Health probe {probe.name} failed ({probe.consecutive_failures}x): {error}")
+
+    # =============================================
+    # 📋 READ SIDE
+    # =============================================
+
+    def liveness(self) -> Dict:
+        """התהליך חי - בלי לגעת באף רכיב"""
+        return {'status': 'alive', 'uptime_s': round(time.time() - self.started_at, 1)}
+
+    def readiness(self) -> Tuple[bool, Dict]:
+        """מוכן אם כל רכיב קריטי עבר בדיקה לאחרונה"""
+        now = time.time()
+        with self._lock:
+            components = {name: probe.status if probe.is_fresh(now) or probe.status != 'healthy' else 'stale'
+                          for name, probe in self.probes.items()}
+            not_ready = [name for name, probe in self.probes.items()
+                         if probe.critical and not (probe.status == 'healthy' and probe.is_fresh(now))]
+        return not not_ready, {
+            'status': 'ready' if not not_ready else 'not_ready',
+            'not_ready': not_ready,
+            'components': components,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def report(self) -> Dict:
+        """מצב מלא כולל היסטוגרמות latency"""
+        ready, summary = self.readiness()
+        now = time.time()
+        with self._lock:
+            details = {name: probe.to_dict(now) for name, probe in self.probes.items()}
+        return {**summary, 'uptime_s': round(now - self.started_at, 1), 'components': details}
@@ -0,0 +1,97 @@
+"""בדיקת עומס ל-API - הרבה בקשות במקביל והשוואת latency ו-throughput בין מצב Flask למצב ASGI.
+
+    python loadtest.py --url http://localhost:8080 --paths /analysis /health --concurrency 200 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import aiohttp
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def worker(session: aiohttp.ClientSession, base_url: str, paths: List[str], deadline: float,
+                 latencies: Dict[str, List[float]], statuses: Dict[str, Counter], etags: Dict[str, str],
+                 revalidate: bool, worker_id: int):
+    """כל worker עובר על ה-paths בסבב עד שהזמן נגמר"""
+    index = worker_id
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        headers = {'If-None-Match': f'"{etags[path]}"'} if revalidate and path in etags else {}
+        started = time.perf_counter()
+        try:
+            async with session.get(base_url + path, headers=headers) as response:
+                await response.read()
+                status = response.status
+                etag = response.headers.get('ETag')
+                if etag:
+                    etags[path] = etag.strip('"')
+        except Exception as e:
+            status = type(e).__name__
+        latencies[path].append((time.perf_counter() - started) * 1000)
+        statuses[path][status] += 1
+
+
+async def run(base_url: str, paths: List[str], concurrency: int, duration: float,
+              revalidate: bool, timeout: float) -> Dict:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    etags: Dict[str, str] = {}
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            worker(session, base_url.rstrip('/'), paths, deadline, latencies, statuses, etags, revalidate, i)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    report = {'url': base_url, 'concurrency': concurrency, 'duration_s': round(elapsed, 2), 'paths': {}}
+    total = 0
+    for path in paths:
+        values = latencies[path]
+        total += len(values)
+        report['paths'][path] = {
+            'requests': len(values),
+            'rps': round(len(values) / elapsed, 1),
+            'p50_ms': round(percentile(values, 50), 1),
+            'p95_ms': round(percentile(values, 95), 1),
+            'p99_ms': round(percentile(values, 99), 1),
+            'max_ms': round(max(values), 1) if values else 0.0,
+            'statuses': {str(status): count for status, count in statuses[path].items()}
+        }
+    report['total_requests'] = total
+    report['total_rps'] = round(total / elapsed, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TON-engine API load test')
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--paths', nargs='+', default=['/analysis?symbol=TONUSDT', '/health'])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--revalidate', action='store_true', help='send If-None-Match with the last ETag seen')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.paths, args.concurrency, args.duration, args.revalidate, args.timeout))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
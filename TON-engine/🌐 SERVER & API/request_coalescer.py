@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_UNIT_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+
+def interval_ms(interval: str) -> int:
+    """'15m' / '1h' / '1d' -> מילישניות"""
+    return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+
+
+def candle_version(interval: str, now: Optional[float] = None) -> Tuple[int, float]:
+    """(מספר הנר הנוכחי, זמן הסגירה שלו בשניות) - גרסת הנתונים מתחלפת בכל סגירת נר"""
+    step = interval_ms(interval)
+    now_ms = int((now if now is not None else time.time()) * 1000)
+    index = now_ms // step
+    return index, (index + 1) * step / 1000
+
+
+class _Call:
+    """חישוב אחד שנמצא בביצוע - ממתינים נוספים נצמדים אליו"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """מאחד בקשות זהות במקביל לחישוב אחד (single-flight) ושומר את התוצאה עד סגירת הנר הבא.
+
+    המפתח הוא (endpoint, symbol, timeframe, data-version). בקשה ראשונה מחשבת, בקשות
+    שמגיעות בזמן החישוב ממתינות לאותה תוצאה, ובקשות אחריו מקבלות אותה מהחלון הטרי.
+    """
+
+    def __init__(self, max_age: Optional[float] = None):
+        self.max_age = max_age  # תקרה לחלון הטריות בשניות (None = עד סגירת הנר)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, _Call] = {}
+        self._results: Dict[Hashable, Tuple[Any, float]] = {}
+        self.stats = {'requests': 0, 'computed': 0, 'coalesced': 0, 'fresh_hits': 0, 'errors': 0}
+
+    def run(self, endpoint: str, symbol: str, timeframe: str, compute: Callable[[], Any],
+            version: Optional[Hashable] = None) -> Tuple[Any, str]:
+        """מחזיר (תוצאה, מקור) כאשר המקור הוא computed / coalesced / fresh"""
+        candle, closes_at = candle_version(timeframe)
+        key = (endpoint, symbol.upper(), timeframe, version if version is not None else candle)
+        fresh_until = closes_at if self.max_age is None else min(closes_at, time.time() + self.max_age)
+
+        with self._lock:
+            self.stats['requests'] += 1
+            cached = self._results.get(key)
+            if cached is not None and cached[1] > time.time():
+                self.stats['fresh_hits'] += 1
+                return cached[0], 'fresh'
+
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, 'coalesced'
+
+        try:
+            call.result = compute()
+            with self._lock:
+                self.stats['computed'] += 1
+                self._results[key] = (call.result, fresh_until)
+                self._prune()
+            return call.result, 'computed'
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                self.logger.info(f"🔗 {endpoint} {symbol}: shared result with {call.waiters} waiting requests")
+
+    def _prune(self):
+        now = time.time()
+        for key in [key for key, (_, expires) in self._results.items() if expires <= now]:
+            del self._results[key]
+
+    def invalidate(self, endpoint: Optional[str] = None, symbol: Optional[str] = None):
+        """מבטל תוצאות טריות (למשל אחרי פרסום snapshot חדש)"""
+        with self._lock:
+            for key in list(self._results):
+                if (endpoint is None or key[0] == endpoint) and (symbol is None or key[1] == symbol.upper()):
+                    del self._results[key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'in_flight': len(self._in_flight), 'fresh_results': len(self._results)}
@@ -0,0 +1,211 @@
+import gzip
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+
+def _json_default(value: Any):
+    """טיפוסים שה-encoder לא מכיר בעצמו (numpy ב-fallback, Timestamp, Enum)"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'value'):
+        return value.value
+    return str(value)
+
+
+def dumps(data: Any) -> bytes:
+    """JSON ל-bytes - orjson אם מותקן (numpy ו-datetime נתמכים ישירות), אחרת json הרגיל"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_json_default, option=ORJSON_OPTIONS)
+    return json.dumps(data, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """בוחר br/gzip לפי Accept-Encoding (כולל q=0); None = בלי דחיסה"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    candidates = (['br'] if BROTLI_AVAILABLE else []) + ['gzip']
+    wildcard = accepted.get('*', 0.0)
+    best = max(candidates, key=lambda name: accepted.get(name, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+
+class ResponseEncoder:
+    """שכבת סריאליזציה לתשובות JSON - קידוד, דחיסה לפי הלקוח ומוני גודל/זמן לכל endpoint"""
+
+    def __init__(self, min_compress_bytes: int = 1024, gzip_level: int = 5,
+                 brotli_quality: int = 5, cache_entries: int = 64):
+        self.logger = logging.getLogger(__name__)
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+
+        # גופים שלא משתנים (snapshots) נדחסים פעם אחת לכל (מפתח, encoding)
+        self._compressed: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict] = {}
+        self._compression: Dict[str, Dict] = {}
+
+    def encode(self, data: Any, label: str = 'other') -> bytes:
+        started = time.perf_counter()
+        body = dumps(data)
+        self._record(label, len(body), (time.perf_counter() - started) * 1000)
+        return body
+
+    def record_passthrough(self, label: str, size: int):
+        """גוף שקודד מראש (snapshot) - נספר בלי זמן קידוד"""
+        self._record(label, size, None)
+
+    def compress(self, body: bytes, encoding: Optional[str],
+                 cache_key: Optional[str] = None) -> Tuple[bytes, Optional[str]]:
+        """דוחס אם יש encoding מוסכם והגוף גדול מספיק; cache_key לגופים קבועים"""
+        if encoding is None or len(body) < self.min_compress_bytes:
+            return body, None
+
+        if cache_key is not None:
+            with self._lock:
+                cached = self._compressed.get((cache_key, encoding))
+                if cached is not None:
+                    self._compressed.move_to_end((cache_key, encoding))
+                    self._record_compression(encoding, len(body), len(cached), None)
+                    return cached, encoding
+
+        started = time.perf_counter()
+        try:
+            if encoding == 'br':
+                # גוף קבוע נדחס פעם אחת - שווה לשלם על איכות גבוהה יותר
+                compressed = brotli.compress(body, quality=9 if cache_key else self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=9 if cache_key else self.gzip_level)
+        except Exception as e:
+            self.logger.error(f"Error compressing response ({encoding}): {e}")
+            return body, None
+        self._record_compression(encoding, len(body), len(compressed), (time.perf_counter() - started) * 1000)
+
+        if cache_key is not None:
+            with self._lock:
+                self._compressed[(cache_key, encoding)] = compressed
+                while len(self._compressed) > self.cache_entries:
+                    self._compressed.popitem(last=False)
+        return compressed, encoding
+
+    # =============================================
+    # 📊 STATS
+    # =============================================
+
+    def _record(self, label: str, size: int, encode_ms: Optional[float]):
+        with self._lock:
+            stats = self._endpoints.setdefault(label, {
+                'responses': 0, 'encoded': 0, 'passthrough': 0, 'bytes': 0, 'max_bytes': 0,
+                'encode_ms': 0.0, 'max_encode_ms': 0.0
+            })
+            stats['responses'] += 1
+            stats['bytes'] += size
+            stats['max_bytes'] = max(stats['max_bytes'], size)
+            if encode_ms is None:
+                stats['passthrough'] += 1
+            else:
+                stats['encoded'] += 1
+                stats['encode_ms'] += encode_ms
+                stats['max_encode_ms'] = max(stats['max_encode_ms'], encode_ms)
+
+    def _record_compression(self, encoding: str, raw: int, compressed: int, compress_ms: Optional[float]):
+        with self._lock:
+            stats = self._compression.setdefault(encoding, {
+                'responses': 0, 'cached': 0, 'bytes_in': 0, 'bytes_out': 0, 'compress_ms': 0.0
+            })
+            stats['responses'] += 1
+            stats['bytes_in'] += raw
+            stats['bytes_out'] += compressed
+            if compress_ms is None:
+                stats['cached'] += 1
+            else:
+                stats['compress_ms'] += compress_ms
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            endpoints = {
+                label: {
+                    'responses': s['responses'],
+                    'encoded': s['encoded'],
+                    'passthrough': s['passthrough'],
+                    'avg_bytes': round(s['bytes'] / s['responses']),
+                    'max_bytes': s['max_bytes'],
+                    'avg_encode_ms': round(s['encode_ms'] / s['encoded'], 3) if s['encoded'] else 0.0,
+                    'max_encode_ms': round(s['max_encode_ms'], 3)
+                }
+                for label, s in self._endpoints.items()
+            }
+            compression = {
+                encoding: {
+                    **{k: v for k, v in s.items() if k != 'compress_ms'},
+                    'ratio': round(s['bytes_out'] / s['bytes_in'], 3) if s['bytes_in'] else 1.0,
+                    'avg_compress_ms': round(s['compress_ms'] / (s['responses'] - s['cached']), 3)
+                    if s['responses'] > s['cached'] else 0.0
+                }
+                for encoding, s in self._compression.items()
+            }
+        return {
+            'encoder': 'orjson' if ORJSON_AVAILABLE else 'json',
+            'brotli': BROTLI_AVAILABLE,
+            'endpoints': endpoints,
+            'compression': compression,
+            'compressed_cache_entries': len(self._compressed)
+        }
+
+
+_response_encoder: Optional[ResponseEncoder] = None
+
+
+def get_response_encoder() -> ResponseEncoder:
+    """encoder משותף לכל התהליך (Flask, ASGI ו-snapshots)"""
+    global _response_encoder
+    if _response_encoder is None:
+        _response_encoder = ResponseEncoder()
+    return _response_encoder
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify דרך ה-encoder המשותף - bytes ישר לתשובה, בלי מעבר דרך str"""
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        label = (request.endpoint or 'other') if has_request_context() else 'other'
+        return self._app.response_class(get_response_encoder().encode(obj, label), mimetype=self.mimetype)
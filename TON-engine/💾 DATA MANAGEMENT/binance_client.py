@@ -1,8 +1,3 @@
-import requests
-import hmac
-import hashlib
-import time
-from urllib.parse import urlencode
 from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import numpy as np
@@ -12,11 +7,15 @@ import json
 import websocket
 import threading
 from concurrent.futures import ThreadPoolExecutor
+from binance_transport import (BinanceTransport, BinanceTransportError, Priority,
+                               get_transport, request_weight, sign_params)
+from live_candles import get_kline_stream
+from order_book import get_order_book_manager
 
 class AdvancedBinanceClient:
     """לקוח Binance מתקדם עם תכונות נוספות"""
     
-    def __init__(self, api_key: str = None, secret_key: str = None):
+    def __init__(self, api_key: str = None, secret_key: str = None, transport: BinanceTransport = None):
         self.base_url = "https://api.binance.com"
         self.futures_url = "https://fapi.binance.com"
         self.websocket_url = "wss://stream.binance.com:9443"
@@ -25,73 +24,45 @@ class AdvancedBinanceClient:
         self.secret_key = secret_key
         self.logger = logging.getLogger(__name__)
         
-        self.rate_limits = {
-            'requests': 1200,
-            'interval': 60
-        }
-        
+        # תעבורה משותפת - pool חיבורים אחד ומגבלת משקל אחת לכל הלקוחות בתהליך
+        self.transport = transport or get_transport()
+        self.order_books = get_order_book_manager()
         self.request_count = 0
-        self.last_reset = time.time()
         
         self.websocket_connections = {}
         self.callbacks = {}
         
-        self.session = requests.Session()
-        self.session.headers.update({
-            'X-MBX-APIKEY': self.api_key,
-            'User-Agent': 'TON-Trading-Bot/3.0'
-        })
-        
         self.thread_pool = ThreadPoolExecutor(max_workers=10)
         
-    def _make_request(self, endpoint: str, params: Dict = None, signed: bool = False, futures: bool = False) -> Dict:
-        """מבצע בקשה ל-API עם ניהול rate limiting"""
+    def _make_request(self, endpoint: str, params: Dict = None, signed: bool = False, futures: bool = False,
+                      priority: Priority = Priority.NORMAL) -> Dict:
+        """מבצע בקשה ל-API דרך התעבורה המשותפת (הגבלת משקל ועדיפות במקום sleep)"""
         try:
-            # ניהול rate limiting
-            self._check_rate_limit()
-            
             base_url = self.futures_url if futures else self.base_url
             url = f"{base_url}/api/v3/{endpoint}"
             
             if params is None:
                 params = {}
-                
-            if signed:
-                params['timestamp'] = int(time.time() * 1000)
-                query_string = urlencode(params)
-                signature = hmac.new(
-                    self.secret_key.encode('utf-8'),
-                    query_string.encode('utf-8'),
-                    hashlib.sha256
-                ).hexdigest()
-                params['signature'] = signature
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            
+            # החתימה מתבצעת אחרי ההמתנה בתור - כדי שה-timestamp לא יתיישן
+            data = self.transport.request_sync(
+                url, params,
+                headers={'X-MBX-APIKEY': self.api_key or ''},
+                priority=priority,
+                weight=request_weight(endpoint, params),
+                signer=sign_params(self.secret_key) if signed else None
+            )
             
             self.request_count += 1
-            return response.json()
+            return data
             
-        except requests.exceptions.RequestException as e:
+        except BinanceTransportError as e:
             self.logger.error(f"Binance API request failed: {e}")
             return {}
         except Exception as e:
             self.logger.error(f"Unexpected error in Binance request: {e}")
             return {}
     
-    def _check_rate_limit(self):
-        """בודק ומנהל rate limiting"""
-        current_time = time.time()
-        if current_time - self.last_reset >= 60:
-            self.request_count = 0
-            self.last_reset = current_time
-            
-        if self.request_count >= self.rate_limits['requests']:
-            sleep_time = 60 - (current_time - self.last_reset)
-            if sleep_time > 0:
-                self.logger.warning(f"Rate limit approaching, sleeping for {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-    
     def get_exchange_info(self, symbol: str = None) -> Dict:
         """מביא מידע על הבורסה"""
         params = {}
@@ -111,7 +82,7 @@ class AdvancedBinanceClient:
     
     def get_current_price(self, symbol: str) -> float:
         """מביא מחיר נוכחי"""
-        data = self._make_request('ticker/price', {'symbol': symbol})
+        data = self._make_request('ticker/price', {'symbol': symbol}, priority=Priority.LIVE)
         return float(data.get('price', 0)) if data else 0.0
     
     def get_24h_stats(self, symbol: str) -> Dict:
@@ -175,8 +146,12 @@ class AdvancedBinanceClient:
     
     def get_depth_data(self, symbol: str, limit: int = 100) -> Dict:
         """מביא נתוני עומק שוק (Order Book)"""
+        book = self.order_books.get_book(symbol)
+        if book is not None:
+            return book.to_depth(limit)
+        
         params = {'symbol': symbol, 'limit': limit}
-        data = self._make_request('depth', params)
+        data = self._make_request('depth', params, priority=Priority.LIVE)
         
         if data:
             return {
@@ -350,7 +325,7 @@ class AdvancedBinanceClient:
         if order_type == 'LIMIT':
             params['timeInForce'] = 'GTC'
         
-        return self._make_request('order/test', params, signed=True)
+        return self._make_request('order/test', params, signed=True, priority=Priority.LIVE)
     
     def get_server_time(self) -> Dict:
         """מביא את זמן השרת"""
@@ -392,10 +367,12 @@ class AdvancedBinanceClient:
         return coins
     
     # WebSocket functionality
-    def start_kline_stream(self, symbol: str, interval: str, callback: callable):
-        """מתחיל stream של קווים"""
-        stream_name = f"{symbol.lower()}@kline_{interval}"
-        return self._start_stream(stream_name, callback)
+    def start_kline_stream(self, symbol: str, interval: str, callback: callable = None):
+        """מצרף את הזוג לחיבור ה-klines המשותף (combined stream) שמזין את חוצץ הנרות החי"""
+        stream = get_kline_stream()
+        if callback:
+            stream.add_callback(symbol, interval, callback)
+        return stream.start([(symbol, interval)])
     
     def start_trade_stream(self, symbol: str, callback: callable):
         """מתחיל stream של עסקאות"""
@@ -556,14 +533,20 @@ class AdvancedBinanceClient:
             # נתוני 24 שעות
             stats_24h = self.get_24h_stats(symbol)
             
-            # נתוני עומק שוק
-            depth = self.get_depth_data(symbol)
+            # נתוני עומק שוק - מה-order book המקומי (רק סמלים שנפתחו באתחול); אחרת REST
+            book = self.order_books.get_book(symbol)
+            depth = self.get_depth_data(symbol) if book is None else {}
             
             # נתוני funding rate (עבור futures)
             funding_rate = self.get_funding_rate(symbol) if 'USDT' in symbol else {}
             
             # חישוב מדדים מתקדמים
-            if depth and 'bids' in depth and 'asks' in depth:
+            if book is not None:
+                volume_imbalance = book.imbalance(bps=100)
+                spread_data = book.spread()
+                spread = spread_data['spread']
+                spread_percent = spread_data['spread_percent']
+            elif depth and 'bids' in depth and 'asks' in depth:
                 bid_volume = sum([bid[1] for bid in depth['bids']])
                 ask_volume = sum([ask[1] for ask in depth['asks']])
                 volume_imbalance = (bid_volume - ask_volume) / (bid_volume + ask_volume) if (bid_volume + ask_volume) > 0 else 0
@@ -676,6 +659,7 @@ class AdvancedBinanceClient:
                 'system_status': system_status.get('msg', 'UNKNOWN'),
                 'api_key_configured': bool(self.api_key and self.secret_key),
                 'websocket_connections': len(self.websocket_connections),
+                'transport': self.transport.get_stats(),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -0,0 +1,375 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+
+class Priority(IntEnum):
+    """מסלולי עדיפות - ערך נמוך יותר יוצא קודם"""
+    LIVE = 0      # מסחר חי, מחיר נוכחי, order book
+    NORMAL = 1    # ניתוחים ובקשות API רגילות
+    BULK = 2      # backfill והורדות היסטוריות
+
+
+class BinanceTransportError(Exception):
+    """שגיאת תעבורה מול Binance (HTTP, timeout או חסימת rate limit)"""
+
+    def __init__(self, message: str, status: int = 0, payload=None):
+        super().__init__(message)
+        self.status = status
+        self.payload = payload
+
+
+# משקלי בקשות לפי https://binance-docs.github.io/apidocs/spot/en/ (בקירוב)
+ENDPOINT_WEIGHTS = {
+    'ping': 1, 'time': 1, 'exchangeInfo': 20, 'trades': 25, 'historicalTrades': 25,
+    'aggTrades': 2, 'klines': 2, 'uiKlines': 2, 'avgPrice': 2, 'ticker/bookTicker': 2,
+    'account': 20, 'myTrades': 20, 'order': 4, 'order/test': 1, 'openOrders': 6,
+    'fundingRate': 1, 'openInterest': 1, 'allForceOrders': 20, 'systemStatus': 1,
+    'capital/config/getall': 10
+}
+
+
+def request_weight(endpoint: str, params: Optional[Dict] = None) -> int:
+    """משקל בקשה לפי endpoint ופרמטרים"""
+    params = params or {}
+    if endpoint == 'depth':
+        limit = int(params.get('limit', 100))
+        return 5 if limit <= 100 else 25 if limit <= 500 else 50 if limit <= 1000 else 250
+    if endpoint == 'ticker/24hr':
+        return 2 if 'symbol' in params else 80
+    if endpoint == 'ticker/price':
+        return 2 if 'symbol' in params else 4
+    return ENDPOINT_WEIGHTS.get(endpoint, 1)
+
+
+class WeightLimiter:
+    """דלי אסימונים של משקל לדקה - מסונכרן לכותרת X-MBX-USED-WEIGHT-1M שמחזירה Binance"""
+
+    # חלק מהתקציב שכל מסלול רשאי לנצל - BULK לא יכול לחנוק את LIVE
+    LANE_SHARE = {Priority.LIVE: 1.0, Priority.NORMAL: 0.85, Priority.BULK: 0.6}
+
+    def __init__(self, weight_per_minute: int = 1200):
+        self.capacity = weight_per_minute
+        self.used = 0
+        self.window_start = self._window_start(time.time())
+        self.blocked_until = 0.0
+
+    @staticmethod
+    def _window_start(now: float) -> float:
+        # Binance סופרת משקל בחלונות של דקה שלמה
+        return now - (now % 60)
+
+    def _roll(self, now: float):
+        window = self._window_start(now)
+        if window > self.window_start:
+            self.window_start = window
+            self.used = 0
+
+    def wait_time(self, weight: int, priority: Priority, now: Optional[float] = None) -> float:
+        """כמה שניות לחכות לפני שאפשר להוציא את המשקל (0 = מיד)"""
+        now = time.time() if now is None else now
+        self._roll(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        budget = self.capacity * self.LANE_SHARE[priority]
+        if self.used + weight <= budget or self.used == 0:
+            return 0.0
+        return self.window_start + 60 - now
+
+    def spend(self, weight: int):
+        self._roll(time.time())
+        self.used += weight
+
+    def sync(self, used_weight: int):
+        """עדכון מהשרת - כולל בקשות של תהליכים אחרים מאותה IP; בקשות שעוד בדרך נספרות מקומית"""
+        self._roll(time.time())
+        self.used = max(self.used, used_weight)
+
+    def block(self, seconds: float):
+        """חסימה מלאה אחרי 429/418 לפי Retry-After"""
+        self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+
+class BinanceTransport:
+    """תעבורת HTTP משותפת ל-Binance - pool חיבורי keep-alive, הגבלת משקל ומסלולי עדיפות.
+
+    כל הבקשות רצות על event loop יחיד ב-thread רקע; קוד סינכרוני קורא ל-request_sync.
+    """
+
+    def __init__(self, weight_per_minute: int = 1200, max_concurrent: int = 10,
+                 pool_size: int = 20, timeout: float = 10.0):
+        self.logger = logging.getLogger(__name__)
+        self.limiter = WeightLimiter(weight_per_minute)
+        self.max_concurrent = max_concurrent
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._session = None
+        self._sync_session = None
+
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'rate_limited': 0,
+                      'weight_spent': 0, 'by_priority': {p.name: 0 for p in Priority}}
+
+    # =============================================
+    # 🔄 EVENT LOOP
+    # =============================================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_loop, name='binance-transport', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _get_session(self):
+        if AIOHTTP_AVAILABLE:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    headers={'User-Agent': 'TON-Trading-Bot/3.0'}
+                )
+            return self._session
+
+        if not REQUESTS_AVAILABLE:
+            raise BinanceTransportError("Neither aiohttp nor requests is installed")
+        if self._sync_session is None:
+            # גיבוי ללא aiohttp - Session של requests עם pool חיבורים, מורץ ב-executor
+            self._sync_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self._sync_session.mount('https://', adapter)
+            self._sync_session.headers.update({'User-Agent': 'TON-Trading-Bot/3.0'})
+        return self._sync_session
+
+    # =============================================
+    # 🚦 PRIORITY GATE
+    # =============================================
+
+    async def _acquire(self, weight: int, priority: Priority):
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), weight, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # בוטל אחרי שכבר קיבל מקום - מחזירים אותו
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """משחרר ממתינים לפי סדר עדיפות כל עוד יש משקל וחיבורים פנויים"""
+        while self._waiters:
+            priority, _, weight, future = self._waiters[0]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            if self._in_flight >= self.max_concurrent:
+                return
+
+            delay = self.limiter.wait_time(weight, Priority(priority))
+            if delay > 0:
+                self.stats['throttled'] += 1
+                if self._wakeup is None:
+                    self._wakeup = self._loop.call_later(delay, self._on_wakeup)
+                return
+
+            heapq.heappop(self._waiters)
+            self.limiter.spend(weight)
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    # =============================================
+    # 📡 REQUESTS
+    # =============================================
+
+    async def request(self, url: str, params: Optional[Dict] = None, method: str = 'GET',
+                      headers: Optional[Dict] = None, priority: Priority = Priority.NORMAL,
+                      weight: int = 1, signer: Optional[Callable[[Dict], Dict]] = None):
+        """בקשה אסינכרונית - ממתינה לתור העדיפות, וחותמת רק אחרי ההמתנה (timestamp טרי)"""
+        await self._acquire(weight, priority)
+        try:
+            params = dict(params or {})
+            if signer is not None:
+                params = signer(params)
+
+            status, payload, response_headers = await self._send(method, url, params, headers or {})
+            self._update_limits(status, response_headers)
+
+            self.stats['requests'] += 1
+            self.stats['weight_spent'] += weight
+            self.stats['by_priority'][Priority(priority).name] += 1
+
+            if status >= 400:
+                self.stats['errors'] += 1
+                raise BinanceTransportError(f"Binance HTTP {status}: {payload}", status, payload)
+            return payload
+        finally:
+            self._release()
+
+    async def _send(self, method: str, url: str, params: Dict, headers: Dict):
+        session = await self._get_session()
+        if AIOHTTP_AVAILABLE:
+            try:
+                async with session.request(method, url, params=params, headers=headers) as response:
+                    text = await response.text()
+                    return response.status, self._parse(text), dict(response.headers)
+            except asyncio.TimeoutError as e:
+                self.stats['errors'] += 1
+                raise BinanceTransportError(f"Binance request timed out: {url}") from e
+            except aiohttp.ClientError as e:
+                self.stats['errors'] += 1
+                raise BinanceTransportError(f"Binance connection error: {e}") from e
+
+        def send_blocking():
+            response = session.request(method, url, params=params, headers=headers, timeout=self.timeout)
+            return response.status_code, self._parse(response.text), dict(response.headers)
+
+        try:
+            return await self._loop.run_in_executor(None, send_blocking)
+        except requests.exceptions.RequestException as e:
+            self.stats['errors'] += 1
+            raise BinanceTransportError(f"Binance connection error: {e}") from e
+
+    @staticmethod
+    def _parse(text: str):
+        try:
+            return json.loads(text) if text else {}
+        except ValueError:
+            return {'raw': text}
+
+    def _update_limits(self, status: int, headers: Dict):
+        normalized = {key.lower(): value for key, value in headers.items()}
+        used = normalized.get('x-mbx-used-weight-1m') or normalized.get('x-mbx-used-weight')
+        if used is not None:
+            try:
+                self.limiter.sync(int(used))
+            except ValueError:
+                pass
+
+        if status in (418, 429):
+            retry_after = float(normalized.get('retry-after', 60))
+            self.stats['rate_limited'] += 1
+            self.limiter.block(retry_after)
+            self.logger.warning(f"🚫 Binance rate limit hit ({status}), backing off {retry_after:.0f}s")
+
+    def request_sync(self, url: str, params: Optional[Dict] = None, method: str = 'GET',
+                     headers: Optional[Dict] = None, priority: Priority = Priority.NORMAL,
+                     weight: int = 1, signer: Optional[Callable[[Dict], Dict]] = None,
+                     timeout: Optional[float] = None):
+        """חזית סינכרונית לקוד הקיים - לא לקרוא מתוך ה-event loop של התעבורה"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self.request(url, params, method, headers, priority, weight, signer), loop
+        )
+        # כולל זמן המתנה בתור - בקשת BULK יכולה לחכות לחלון הבא
+        wait_timeout = timeout if timeout is not None else self.timeout + 65
+        try:
+            return future.result(timeout=wait_timeout)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            raise BinanceTransportError(f"Binance request not completed within {wait_timeout:.0f}s: {url}") from e
+
+    def get_stats(self) -> Dict:
+        """מצב התעבורה - משקל בשימוש, תורים ומונים"""
+        queued = {p.name: 0 for p in Priority}
+        for priority, _, _, future in list(self._waiters):
+            if not future.done():
+                queued[Priority(priority).name] += 1
+        return {
+            **self.stats,
+            'backend': 'aiohttp' if AIOHTTP_AVAILABLE else 'requests',
+            'used_weight': self.limiter.used,
+            'weight_capacity': self.limiter.capacity,
+            'blocked_for': max(0.0, round(self.limiter.blocked_until - time.time(), 1)),
+            'in_flight': self._in_flight,
+            'queued': queued
+        }
+
+    def close(self):
+        """סוגר את ה-session ועוצר את ה-event loop"""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        except Exception as e:
+            self.logger.error(f"Error closing Binance transport: {e}")
+        if self._sync_session is not None:
+            self._sync_session.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def sign_params(secret_key: str) -> Callable[[Dict], Dict]:
+    """מחזיר signer שמוסיף timestamp וחתימת HMAC-SHA256 לפרמטרים"""
+    def signer(params: Dict) -> Dict:
+        params['timestamp'] = int(time.time() * 1000)
+        query_string = urlencode(params)
+        params['signature'] = hmac.new(
+            secret_key.encode('utf-8'), query_string.encode('utf-8'), hashlib.sha256
+        ).hexdigest()
+        return params
+
+    return signer
+
+
+_shared_transport: Optional[BinanceTransport] = None
+_shared_lock = threading.Lock()
+
+
+def get_transport() -> BinanceTransport:
+    """תעבורה משותפת לכל התהליך - pool ומגבלת משקל אחת לכל כתובת IP"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = BinanceTransport()
+        return _shared_transport
@@ -1 +1,330 @@
+import pandas as pd
+import sqlite3
+import logging
+import os
+import pickle
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Optional, Tuple
 
+
+class CacheEntry:
+    """רשומה בשכבת הזיכרון"""
+
+    __slots__ = ('value', 'expires_at', 'size', 'pinned')
+
+    def __init__(self, value: Any, expires_at: float, size: int, pinned: bool):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.pinned = pinned
+
+
+class TwoTierCacheManager:
+    """cache דו-שכבתי: LRU/TTL בזיכרון (מוגבל בבתים) מעל טבלת cache ב-SQLite.
+
+    קריאות מוגשות מהזיכרון; רק החטאה יורדת לדיסק. כתיבות לדיסק נאספות ונכתבות
+    ב-batch מ-thread רקע (write-behind), ו-thread נוסף מנקה רשומות שפג תוקפן.
+    """
+
+    # מדיניות לפי prefix של המפתח - ttl בדקות, pinned = לא נזרק מה-LRU (קריאה לעולם לא מהדיסק)
+    DEFAULT_POLICIES = {
+        'ta_': {'ttl_minutes': 15, 'pinned': True},
+        'hist_': {'ttl_minutes': 60, 'pinned': False},
+        'perf_': {'ttl_minutes': 30, 'pinned': False}
+    }
+
+    def __init__(self, db_path: str = 'database/cache.db', max_memory_bytes: int = 64 * 1024 * 1024,
+                 default_ttl_minutes: int = 30, flush_interval: float = 2.0,
+                 sweep_interval: float = 300.0, policies: Optional[Dict[str, Dict]] = None):
+        self.db_path = db_path
+        self.max_memory_bytes = max_memory_bytes
+        self.default_ttl_minutes = default_ttl_minutes
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self.policies = {**self.DEFAULT_POLICIES, **(policies or {})}
+        self.logger = logging.getLogger(__name__)
+
+        self._memory: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+
+        # None = מחיקה ממתינה; אחרת (blob, expires_at)
+        self._pending: Dict[str, Optional[Tuple[bytes, float]]] = {}
+        self._pending_patterns: List[str] = []
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self.stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'sets': 0,
+            'evictions': 0, 'expired': 0, 'flushes': 0, 'flushed_rows': 0, 'errors': 0
+        }
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._setup()
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._loop, args=(self.flush_interval, self.flush),
+                             name='cache-write-behind', daemon=True),
+            threading.Thread(target=self._loop, args=(self.sweep_interval, self.sweep),
+                             name='cache-expiry-sweep', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _setup(self):
+        """טבלת ה-cache (אותה סכמה של AdvancedDataManager) ו-WAL לקריאות במקביל לכתיבה"""
+        with self._db_lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at DATETIME NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at)')
+            self._conn.commit()
+
+    def _policy(self, key: str) -> Dict:
+        for prefix, policy in self.policies.items():
+            if key.startswith(prefix):
+                return policy
+        return {'ttl_minutes': self.default_ttl_minutes, 'pinned': False}
+
+    @staticmethod
+    def _to_db_time(epoch: float) -> str:
+        return datetime.fromtimestamp(epoch).isoformat(sep=' ')
+
+    @staticmethod
+    def _from_db_time(value: str) -> float:
+        return datetime.fromisoformat(value).timestamp()
+
+    @staticmethod
+    def _public(value: Any) -> Any:
+        # עותק רדוד ל-DataFrame - הוספת עמודות אצל הקורא לא משנה את הרשומה ב-cache
+        return value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+
+    # =============================================
+    # 🧠 MEMORY TIER
+    # =============================================
+
+    def _store_memory(self, key: str, entry: CacheEntry):
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.size
+            if entry.size > self.max_memory_bytes:
+                return
+            self._memory[key] = entry
+            self._memory_bytes += entry.size
+            self._evict()
+
+    def _evict(self):
+        """זורק רשומות לא-pinned מהקצה הישן של ה-LRU עד שחוזרים לתקציב הבתים"""
+        if self._memory_bytes <= self.max_memory_bytes:
+            return
+        for key in list(self._memory):
+            if self._memory_bytes <= self.max_memory_bytes:
+                break
+            entry = self._memory[key]
+            if entry.pinned:
+                continue
+            del self._memory[key]
+            self._memory_bytes -= entry.size
+            self.stats['evictions'] += 1
+
+    def _drop_memory(self, key: str):
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= entry.size
+
+    # =============================================
+    # 🔑 API
+    # =============================================
+
+    def get(self, key: str) -> Optional[Any]:
+        """ערך מה-cache או None - זיכרון, אחר כך כתיבות ממתינות, ורק אז SQLite"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return self._public(entry.value)
+                self._drop_memory(key)
+                self.stats['expired'] += 1
+
+        try:
+            with self._pending_lock:
+                pending = self._pending.get(key, ...)
+                if pending is ... and any(fnmatchcase(key, pattern) for pattern in self._pending_patterns):
+                    pending = None
+            if pending is None:
+                self.stats['misses'] += 1
+                return None
+            if pending is not ...:
+                blob, expires_at = pending
+            else:
+                with self._db_lock:
+                    row = self._conn.execute(
+                        'SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?',
+                        (key, self._to_db_time(now))
+                    ).fetchone()
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+                blob, expires_at = row[0], self._from_db_time(row[1])
+
+            if expires_at <= now:
+                self.stats['misses'] += 1
+                return None
+
+            value = pickle.loads(blob)
+            with self._lock:
+                # set() מקביל אחרי הקריאה מהדיסק כבר שם ערך חדש יותר - לא דורסים אותו
+                current = self._memory.get(key)
+                if current is None:
+                    self._store_memory(key, CacheEntry(value, expires_at, len(blob), self._policy(key)['pinned']))
+                else:
+                    value = current.value
+            self.stats['disk_hits'] += 1
+            return self._public(value)
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error reading cache key {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any, ttl_minutes: Optional[float] = None):
+        """שומר בזיכרון מיד; הכתיבה לדיסק נדחית ל-batch הבא"""
+        try:
+            policy = self._policy(key)
+            ttl = ttl_minutes if ttl_minutes is not None else policy['ttl_minutes']
+            expires_at = time.time() + ttl * 60
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+            self._store_memory(key, CacheEntry(value, expires_at, len(blob), policy['pinned']))
+            with self._pending_lock:
+                self._pending[key] = (blob, expires_at)
+            self.stats['sets'] += 1
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error setting cache key {key}: {e}")
+
+    def delete(self, key: str):
+        self._drop_memory(key)
+        with self._pending_lock:
+            self._pending[key] = None
+
+    def delete_pattern(self, pattern: str) -> int:
+        """מוחק מפתחות לפי glob (למשל hist_TONUSDT_*_1h) משתי השכבות; מחזיר כמה נמחקו מהזיכרון"""
+        with self._lock:
+            keys = [key for key in self._memory if fnmatchcase(key, pattern)]
+            for key in keys:
+                self._drop_memory(key)
+        with self._pending_lock:
+            for key in [key for key in self._pending if fnmatchcase(key, pattern)]:
+                self._pending[key] = None
+            self._pending_patterns.append(pattern)
+        return len(keys)
+
+    # =============================================
+    # 💾 DISK TIER
+    # =============================================
+
+    def _loop(self, interval: float, task):
+        while not self._stop.wait(interval):
+            task()
+
+    def flush(self) -> int:
+        """כותב את כל השינויים הממתינים בטרנזקציה אחת"""
+        # ה-batch נשלף בזמן שמחזיקים את נעילת ה-DB - קריאה מקבילה רואה אותו בתור או ב-DB, לא "באוויר"
+        with self._db_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                patterns, self._pending_patterns = self._pending_patterns, []
+            if not pending and not patterns:
+                return 0
+
+            upserts = [(key, item[0], self._to_db_time(item[1])) for key, item in pending.items() if item is not None]
+            deletes = [(key,) for key, item in pending.items() if item is None]
+            try:
+                with self._conn:
+                    # מחיקות לפי תבנית קודם - כתיבות חדשות יותר באותו batch נשמרות
+                    for pattern in patterns:
+                        self._conn.execute('DELETE FROM cache WHERE key GLOB ?', (pattern,))
+                    self._conn.executemany('DELETE FROM cache WHERE key = ?', deletes)
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)', upserts
+                    )
+                self.stats['flushes'] += 1
+                self.stats['flushed_rows'] += len(upserts) + len(deletes)
+                return len(upserts) + len(deletes)
+
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error flushing cache batch: {e}")
+                # מחזירים את ה-batch לתור - כתיבות חדשות יותר גוברות
+                with self._pending_lock:
+                    self._pending = {**pending, **self._pending}
+                    self._pending_patterns = patterns + self._pending_patterns
+                return 0
+
+    def sweep(self) -> int:
+        """מנקה רשומות שפג תוקפן משתי השכבות"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._memory.items() if entry.expires_at <= now]
+            for key in expired:
+                self._drop_memory(key)
+        self.stats['expired'] += len(expired)
+
+        try:
+            with self._db_lock:
+                with self._conn:
+                    removed = self._conn.execute(
+                        'DELETE FROM cache WHERE expires_at <= ?', (self._to_db_time(now),)
+                    ).rowcount
+            if expired or removed:
+                self.logger.info(f"🧹 Cache sweep: {len(expired)} memory / {removed} disk entries expired")
+            return len(expired) + removed
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error sweeping cache: {e}")
+            return len(expired)
+
+    def close(self):
+        """עוצר את threads הרקע וכותב את מה שנשאר"""
+        self._stop.set()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+        with self._lock:
+            entries = len(self._memory)
+            pinned = sum(1 for entry in self._memory.values() if entry.pinned)
+            memory_bytes = self._memory_bytes
+        return {
+            **self.stats,
+            'hit_rate': round((self.stats['memory_hits'] + self.stats['disk_hits']) / lookups, 4) if lookups else 0.0,
+            'memory_entries': entries,
+            'pinned_entries': pinned,
+            'memory_bytes': memory_bytes,
+            'max_memory_bytes': self.max_memory_bytes,
+            'pending_writes': len(self._pending)
+        }
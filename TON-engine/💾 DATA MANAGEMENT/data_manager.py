@@ -1,23 +1,35 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 import os
 import json
+import threading
 from typing import Dict, List, Optional, Any
-import pickle
 import hashlib
 from contextlib import contextmanager
 
+from ohlcv_store import ColumnarOHLCVStore
+from kline_backfill import KlineBackfillService
+from cache_manager import TwoTierCacheManager
+
 class AdvancedDataManager:
     def __init__(self):
         self.conn = sqlite3.connect('database/market_data.db', check_same_thread=False)
-        self.cache_conn = sqlite3.connect('database/cache.db', check_same_thread=False)
         self.setup_database()
         self.logger = logging.getLogger(__name__)
         self.cache_enabled = True
-        self.setup_cache()
+        self.cache = TwoTierCacheManager(
+            'database/cache.db',
+            max_memory_bytes=int(os.getenv('CACHE_MEMORY_MB', 64)) * 1024 * 1024
+        )
+        self.ohlcv_store = ColumnarOHLCVStore(os.path.join('database', 'ohlcv'))
+        self.backfill_service = KlineBackfillService(self.ohlcv_store)
+        self._pending_bars: Dict[tuple, List[Dict]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self.migrate_market_data()
         
     def setup_database(self):
         """מאתחל את מסדי הנתונים עם טבלאות מתקדמות"""
@@ -124,21 +136,6 @@ class AdvancedDataManager:
         
         self.conn.commit()
         
-    def setup_cache(self):
-        """מאתחל את מערכת ה-cache"""
-        cursor = self.cache_conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cache (
-                key TEXT PRIMARY KEY,
-                value BLOB NOT NULL,
-                expires_at DATETIME NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.cache_conn.commit()
-    
     @contextmanager
     def get_cursor(self, connection):
         """נותן cursor עם טיפול בשגיאות"""
@@ -153,30 +150,39 @@ class AdvancedDataManager:
         finally:
             cursor.close()
     
-    def save_market_data(self, symbol: str, data: pd.DataFrame, data_type: str = 'klines'):
-        """שומר נתוני שוק במסד הנתונים"""
+    def save_market_data(self, symbol: str, data: pd.DataFrame, data_type: str = 'klines',
+                         interval: str = '1h'):
+        """שומר נתוני שוק באחסון העמודתי - כתיבה אחת לכל DataFrame"""
         try:
-            with self.get_cursor(self.conn) as cursor:
-                for index, row in data.iterrows():
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO market_data 
-                        (symbol, timestamp, open, high, low, close, volume,
-                         quote_asset_volume, number_of_trades,
-                         taker_buy_base_asset_volume, taker_buy_quote_asset_volume)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        symbol, index, row['open'], row['high'], row['low'],
-                        row['close'], row['volume'], row.get('quote_asset_volume', 0),
-                        row.get('number_of_trades', 0),
-                        row.get('taker_buy_base_asset_volume', 0),
-                        row.get('taker_buy_quote_asset_volume', 0)
-                    ))
-            
-            self.logger.info(f"💾 Saved market data for {symbol} - {len(data)} records")
+            saved = self.ohlcv_store.append(symbol, interval, data)
+            
+            self.logger.info(f"💾 Saved market data for {symbol} {interval} - {saved} records")
             
         except Exception as e:
             self.logger.error(f"Error saving market data: {e}")
     
+    def migrate_market_data(self, interval: str = '1h') -> Dict[str, int]:
+        """מעביר חד-פעמית את טבלת market_data הישנה לאחסון העמודתי"""
+        marker_path = os.path.join(self.ohlcv_store.root_path, '.migrated_from_sqlite')
+        if os.path.exists(marker_path):
+            return {}
+        
+        try:
+            migrated = self.ohlcv_store.migrate_from_sqlite(self.conn, interval=interval)
+            
+            with open(marker_path, 'w') as f:
+                json.dump({
+                    'migrated_at': datetime.now().isoformat(),
+                    'interval': interval,
+                    'symbols': migrated
+                }, f)
+            
+            return migrated
+            
+        except Exception as e:
+            self.logger.error(f"Error migrating market data: {e}")
+            return {}
+    
     def save_technical_analysis(self, symbol: str, analysis_type: str, 
                               analysis_data: Dict, time_frame: str = '1h'):
         """שומר ניתוח טכני"""
@@ -193,7 +199,7 @@ class AdvancedDataManager:
             
             # שמירה ב-cache
             cache_key = f"ta_{symbol}_{analysis_type}_{time_frame}"
-            self.set_cache(cache_key, analysis_data, expires_minutes=15)
+            self.set_cache(cache_key, analysis_data)
             
             self.logger.info(f"💾 Saved technical analysis for {symbol} - {analysis_type}")
             
@@ -233,25 +239,17 @@ class AdvancedDataManager:
             
             if cached_data is not None:
                 self.logger.info(f"📂 Using cached historical data for {symbol}")
-                return pd.DataFrame(cached_data)
-            
-            query = '''
-                SELECT timestamp, open, high, low, close, volume
-                FROM market_data 
-                WHERE symbol = ? AND timestamp >= datetime('now', ?)
-                ORDER BY timestamp
-            '''
-            
-            df = pd.read_sql_query(
-                query, self.conn, 
-                params=(symbol, f'-{days} days'),
-                parse_dates=['timestamp'],
-                index_col='timestamp'
+                return cached_data
+            
+            start = datetime.now(timezone.utc) - timedelta(days=days)
+            df = self.ohlcv_store.read_range(
+                symbol, interval, start=start,
+                columns=['open', 'high', 'low', 'close', 'volume']
             )
             
-            # שמירה ב-cache
+            # שמירה ב-cache - ה-DataFrame עצמו כדי לשמור על אינדקס הזמן
             if not df.empty:
-                self.set_cache(cache_key, df.to_dict('records'), expires_minutes=60)
+                self.set_cache(cache_key, df)
             
             self.logger.info(f"📊 Loaded historical data for {symbol}: {len(df)} records")
             return df
@@ -260,6 +258,57 @@ class AdvancedDataManager:
             self.logger.error(f"Error loading historical data: {e}")
             return pd.DataFrame()
     
+    def backfill_history(self, symbol: str, days: int = 30, interval: str = '1h') -> Dict:
+        """משלים היסטוריה חסרה מ-Binance לאחסון (רק החורים) ומבטל את ה-cache של הטווח"""
+        try:
+            report = self.backfill_service.backfill(symbol, interval, days=days)
+            
+            if report['bars_written']:
+                self.cache.delete_pattern(f"hist_{symbol}_*_{interval}")
+            
+            return report
+            
+        except Exception as e:
+            self.logger.error(f"Error backfilling {symbol} {interval}: {e}")
+            return {'symbol': symbol, 'interval': interval, 'error': str(e)}
+    
+    def resume_backfills(self) -> List[Dict]:
+        """ממשיך עבודות backfill שנקטעו"""
+        try:
+            return self.backfill_service.resume_pending()
+        except Exception as e:
+            self.logger.error(f"Error resuming backfills: {e}")
+            return []
+    
+    def persist_closed_bar(self, symbol: str, interval: str, bar: Dict):
+        """listener לנרות חיים שנסגרו - צובר אותם וכותב לאחסון ב-chunk אחד לכל סדרה"""
+        with self._pending_lock:
+            self._pending_bars.setdefault((symbol, interval), []).append(bar)
+            if self._flush_timer is None:
+                # debounce - פרץ זריעה מ-REST הופך לכתיבה אחת במקום chunk לכל נר
+                self._flush_timer = threading.Timer(0.5, self._flush_closed_bars)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _flush_closed_bars(self) -> int:
+        """כותב את הנרות הסגורים הממתינים לאחסון ומבטל את ה-cache של הסדרות שהשתנו"""
+        with self._pending_lock:
+            pending, self._pending_bars = self._pending_bars, {}
+            self._flush_timer = None
+        
+        written = 0
+        for (symbol, interval), bars in pending.items():
+            try:
+                frame = pd.DataFrame(bars)
+                frame['open_time'] = pd.to_datetime(frame['open_time'], unit='ms')
+                count = self.ohlcv_store.append(symbol, interval, frame)
+                if count:
+                    self.cache.delete_pattern(f"hist_{symbol}_*_{interval}")
+                written += count
+            except Exception as e:
+                self.logger.error(f"Error persisting live bars for {symbol} {interval}: {e}")
+        return written
+    
     def get_technical_analysis(self, symbol: str, analysis_type: str, 
                              time_frame: str = '1h') -> Optional[Dict]:
         """מביא ניתוח טכני"""
@@ -280,7 +329,7 @@ class AdvancedDataManager:
                 result = cursor.fetchone()
                 if result:
                     analysis_data = json.loads(result[0])
-                    self.set_cache(cache_key, analysis_data, expires_minutes=15)
+                    self.set_cache(cache_key, analysis_data)
                     return analysis_data
             
             return None
@@ -348,7 +397,7 @@ class AdvancedDataManager:
                 metrics = self._calculate_advanced_metrics(decisions)
                 
                 # שמירה ב-cache
-                self.set_cache(cache_key, metrics, expires_minutes=30)
+                self.set_cache(cache_key, metrics)
                 
                 return metrics
                 
@@ -449,56 +498,44 @@ class AdvancedDataManager:
             'profit_factor': 0
         }
     
-    def set_cache(self, key: str, value: Any, expires_minutes: int = 30):
-        """שומר נתונים ב-cache"""
+    def set_cache(self, key: str, value: Any, expires_minutes: Optional[int] = None):
+        """שומר נתונים ב-cache (ברירת המחדל ל-TTL לפי ה-namespace של המפתח)"""
         if not self.cache_enabled:
             return
-            
-        try:
-            expires_at = datetime.now() + timedelta(minutes=expires_minutes)
-            
-            with self.get_cursor(self.cache_conn) as cursor:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO cache (key, value, expires_at)
-                    VALUES (?, ?, ?)
-                ''', (key, pickle.dumps(value), expires_at))
-                
-        except Exception as e:
-            self.logger.error(f"Error setting cache: {e}")
+        self.cache.set(key, value, ttl_minutes=expires_minutes)
     
     def get_cache(self, key: str) -> Optional[Any]:
-        """מביא נתונים מ-cache"""
+        """מביא נתונים מ-cache - מהזיכרון, ומ-SQLite רק בהחטאה"""
         if not self.cache_enabled:
             return None
-            
-        try:
-            with self.get_cursor(self.cache_conn) as cursor:
-                cursor.execute('''
-                    SELECT value FROM cache 
-                    WHERE key = ? AND expires_at > datetime('now')
-                ''', (key,))
-                
-                result = cursor.fetchone()
-                if result:
-                    return pickle.loads(result[0])
-                
-            return None
-            
-        except Exception as e:
-            self.logger.error(f"Error getting cache: {e}")
-            return None
+        return self.cache.get(key)
     
     def clear_expired_cache(self):
-        """מנקה cache שפג תוקפו"""
+        """מנקה cache שפג תוקפו (רץ גם אוטומטית ברקע)"""
         try:
-            with self.get_cursor(self.cache_conn) as cursor:
-                cursor.execute('DELETE FROM cache WHERE expires_at <= datetime("now")')
-                
-            self.logger.info("🧹 Cleared expired cache entries")
+            removed = self.cache.sweep()
+            self.logger.info(f"🧹 Cleared {removed} expired cache entries")
             
         except Exception as e:
             self.logger.error(f"Error clearing expired cache: {e}")
     
+    def close(self):
+        """כותב את ה-cache הממתין, עוצר את threads הרקע שלו וסוגר את החיבורים"""
+        try:
+            with self._pending_lock:
+                timer = self._flush_timer
+            if timer is not None:
+                timer.cancel()
+            self._flush_closed_bars()
+            self.cache.close()
+            self.conn.close()
+        except Exception as e:
+            self.logger.error(f"Error closing data manager: {e}")
+    
+    def get_cache_stats(self) -> Dict:
+        """מוני hit/miss/eviction של ה-cache"""
+        return self.cache.get_stats()
+    
     def log_user_activity(self, user_id: int, activity_type: str, 
                          symbol: str = None, details: Dict = None):
         """רושם פעילות משתמש"""
@@ -615,16 +652,8 @@ class AdvancedDataManager:
     def get_current_price(self, symbol: str) -> float:
         """מביא מחיר נוכחי"""
         try:
-            with self.get_cursor(self.conn) as cursor:
-                cursor.execute('''
-                    SELECT close FROM market_data
-                    WHERE symbol = ?
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                ''', (symbol,))
-                
-                result = cursor.fetchone()
-                return result[0] if result else 0.0
+            price = self.ohlcv_store.get_latest_close(symbol)
+            return price if price is not None else 0.0
                 
         except Exception as e:
             self.logger.error(f"Error getting current price: {e}")
@@ -666,8 +695,7 @@ class AdvancedDataManager:
         try:
             with self.get_cursor(self.conn) as cursor:
                 # ספירת רשומות
-                cursor.execute('SELECT COUNT(*) FROM market_data')
-                market_data_count = cursor.fetchone()[0]
+                ohlcv_stats = self.ohlcv_store.get_stats()
                 
                 cursor.execute('SELECT COUNT(*) FROM technical_analysis')
                 technical_analysis_count = cursor.fetchone()[0]
@@ -675,19 +703,18 @@ class AdvancedDataManager:
                 cursor.execute('SELECT COUNT(*) FROM trading_decisions')
                 trading_decisions_count = cursor.fetchone()[0]
                 
-                cursor.execute('SELECT COUNT(DISTINCT symbol) FROM market_data')
-                symbols_count = cursor.fetchone()[0]
-                
                 # גודל מסד נתונים
                 cursor.execute("SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()")
                 db_size = cursor.fetchone()[0]
                 
                 return {
-                    'market_data_records': market_data_count,
+                    'market_data_records': ohlcv_stats.get('total_rows', 0),
                     'technical_analysis_records': technical_analysis_count,
                     'trading_decisions_records': trading_decisions_count,
-                    'unique_symbols': symbols_count,
+                    'unique_symbols': ohlcv_stats.get('unique_symbols', 0),
                     'database_size_mb': round(db_size / (1024 * 1024), 2),
+                    'ohlcv_store_size_mb': ohlcv_stats.get('size_mb', 0),
+                    'ohlcv_series': len(ohlcv_stats.get('series', {})),
                     'last_optimized': datetime.now().isoformat()
                 }
                 
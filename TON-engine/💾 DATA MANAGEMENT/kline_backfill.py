@@ -0,0 +1,251 @@
+import pandas as pd
+import numpy as np
+import logging
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ohlcv_store import ColumnarOHLCVStore
+from binance_transport import BinanceTransport, BinanceTransportError, Priority, get_transport, request_weight
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000,
+    '1w': 604_800_000
+}
+
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_asset_volume', 'number_of_trades',
+    'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
+]
+
+
+def klines_to_frame(rows: List) -> pd.DataFrame:
+    """ממיר תשובת klines של Binance ל-DataFrame עם open_time כ-datetime"""
+    df = pd.DataFrame(rows, columns=KLINE_COLUMNS).drop(columns=['close_time', 'ignore'])
+    df['open_time'] = pd.to_datetime(df['open_time'].astype(np.int64), unit='ms')
+    numeric_cols = [column for column in df.columns if column != 'open_time']
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+    return df
+
+
+class KlineBackfillService:
+    """השלמת היסטוריית klines - מזהה חורים באחסון, מוריד רק אותם בעמודים מקבילים וכותב ישר לאחסון.
+
+    ההתקדמות נשמרת בקובץ מצב ליד האחסון; אחרי קריסה resume_pending מריץ שוב את העבודות
+    שלא הסתיימו, וזיהוי החורים דואג שרק מה שחסר יורד.
+    """
+
+    PAGE_LIMIT = 1000  # מקסימום נרות לבקשת klines
+
+    def __init__(self, store: ColumnarOHLCVStore, transport: BinanceTransport = None,
+                 base_url: str = "https://api.binance.com/api/v3", max_concurrent: int = 4):
+        self.store = store
+        self.transport = transport or get_transport()
+        self.base_url = base_url
+        self.max_concurrent = max_concurrent
+        self.logger = logging.getLogger(__name__)
+        self.state_path = os.path.join(store.root_path, 'backfill_state.json')
+        self._state_lock = threading.Lock()
+
+    # =============================================
+    # 🗂️ STATE
+    # =============================================
+
+    def _load_state(self) -> Dict:
+        if not os.path.exists(self.state_path):
+            return {'jobs': {}, 'empty_ranges': {}}
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            state.setdefault('jobs', {})
+            state.setdefault('empty_ranges', {})
+            return state
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error reading backfill state: {e}")
+            return {'jobs': {}, 'empty_ranges': {}}
+
+    def _save_state(self, state: Dict):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _update_state(self, update):
+        with self._state_lock:
+            state = self._load_state()
+            update(state)
+            self._save_state(state)
+
+    @staticmethod
+    def _series_key(symbol: str, interval: str) -> str:
+        return f"{symbol.upper()}:{interval}"
+
+    # =============================================
+    # 🔍 GAP DETECTION
+    # =============================================
+
+    def find_gaps(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """טווחי open_time חסרים (כולל שני הקצוות) ביחס לרשת ה-interval"""
+        step = INTERVAL_MS[interval]
+        first = -(-start_ms // step) * step
+        if first > end_ms:
+            return []
+
+        expected = np.arange(first, end_ms + 1, step, dtype=np.int64)
+        stored = self.store.get_timestamps(symbol, interval, first, end_ms)
+        missing = expected[~np.isin(expected, stored)]
+
+        # טווחים שהבורסה כבר החזירה עבורם "אין נתונים" (לפני הרישום, תחזוקה)
+        empty = self._load_state()['empty_ranges'].get(self._series_key(symbol, interval), [])
+        for empty_start, empty_end in empty:
+            missing = missing[(missing < empty_start) | (missing > empty_end)]
+
+        if len(missing) == 0:
+            return []
+
+        breaks = np.flatnonzero(np.diff(missing) != step) + 1
+        return [(int(group[0]), int(group[-1])) for group in np.split(missing, breaks)]
+
+    def _pages(self, gaps: List[Tuple[int, int]], step: int) -> List[Tuple[int, int]]:
+        """מפצל חורים לעמודים של עד PAGE_LIMIT נרות"""
+        pages = []
+        span = step * (self.PAGE_LIMIT - 1)
+        for gap_start, gap_end in gaps:
+            page_start = gap_start
+            while page_start <= gap_end:
+                page_end = min(page_start + span, gap_end)
+                pages.append((page_start, page_end))
+                page_start = page_end + step
+        return pages
+
+    # =============================================
+    # ⬇️ BACKFILL
+    # =============================================
+
+    def backfill(self, symbol: str, interval: str = '1h', days: Optional[int] = None,
+                 start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict:
+        """משלים את הטווח המבוקש (ברירת מחדל: days ימים אחורה עד הנר הסגור האחרון)"""
+        symbol = symbol.upper()
+        step = INTERVAL_MS.get(interval)
+        if step is None:
+            raise ValueError(f"Unsupported interval for backfill: {interval}")
+
+        now_ms = int(time.time() * 1000)
+        if end_ms is None:
+            end_ms = (now_ms // step) * step - step  # הנר האחרון שנסגר
+        if start_ms is None:
+            start_ms = end_ms - (days or 30) * 86_400_000
+
+        started = time.time()
+        gaps = self.find_gaps(symbol, interval, start_ms, end_ms)
+        pages = self._pages(gaps, step)
+        key = self._series_key(symbol, interval)
+
+        report = {
+            'symbol': symbol,
+            'interval': interval,
+            'start': pd.Timestamp(start_ms, unit='ms').isoformat(),
+            'end': pd.Timestamp(end_ms, unit='ms').isoformat(),
+            'gaps': len(gaps),
+            'missing_bars': int(sum((gap_end - gap_start) // step + 1 for gap_start, gap_end in gaps)),
+            'pages': len(pages),
+            'bars_written': 0,
+            'empty_bars': 0,
+            'failed_pages': 0
+        }
+
+        if not pages:
+            report.update({'duration_s': 0.0, 'bars_per_sec': 0.0})
+            return report
+
+        def register_job(state: Dict):
+            state['jobs'][key] = {'symbol': symbol, 'interval': interval, 'start_ms': start_ms,
+                                  'end_ms': end_ms, 'pages': len(pages),
+                                  'started_at': datetime.now().isoformat()}
+
+        self._update_state(register_job)
+        self.logger.info(f"⬇️ Backfilling {symbol} {interval}: {report['missing_bars']} bars "
+                         f"in {len(gaps)} gaps / {len(pages)} pages")
+
+        # BULK - הבקשות מוגבלות לחלק מתקציב המשקל, כך שמחירים חיים לא ממתינים
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='kline-backfill') as executor:
+            futures = {executor.submit(self._fetch_page, symbol, interval, page_start, page_end): (page_start, page_end)
+                       for page_start, page_end in pages}
+            for future in as_completed(futures):
+                try:
+                    written, empty = future.result()
+                    report['bars_written'] += written
+                    report['empty_bars'] += empty
+                except Exception as e:
+                    page_start, page_end = futures[future]
+                    report['failed_pages'] += 1
+                    self.logger.error(f"Backfill page {symbol} {interval} {page_start}-{page_end} failed: {e}")
+
+        if report['failed_pages'] == 0:
+            self._update_state(lambda state: state['jobs'].pop(key, None))
+
+        duration = time.time() - started
+        report['duration_s'] = round(duration, 2)
+        report['bars_per_sec'] = round(report['bars_written'] / duration, 1) if duration > 0 else 0.0
+        self.logger.info(f"✅ Backfill {symbol} {interval}: {report['bars_written']} bars "
+                         f"({report['bars_per_sec']} bars/sec, {report['failed_pages']} failed pages)")
+        return report
+
+    def _fetch_page(self, symbol: str, interval: str, page_start: int, page_end: int) -> Tuple[int, int]:
+        """מוריד עמוד אחד וכותב אותו לאחסון; מחזיר (נכתבו, חסרים בבורסה)"""
+        params = {'symbol': symbol, 'interval': interval, 'startTime': page_start,
+                  'endTime': page_end, 'limit': self.PAGE_LIMIT}
+        rows = self.transport.request_sync(
+            f"{self.base_url}/klines", params,
+            priority=Priority.BULK,
+            weight=request_weight('klines', params)
+        )
+        if not isinstance(rows, list):
+            raise BinanceTransportError(f"Unexpected klines response: {rows}")
+
+        written = 0
+        returned = np.array([int(row[0]) for row in rows], dtype=np.int64)
+        if rows:
+            written = self.store.append(symbol, interval, klines_to_frame(rows))
+
+        # נרות שהבורסה לא החזירה בתוך העמוד נרשמים כטווח ריק - לא נוריד אותם שוב
+        step = INTERVAL_MS[interval]
+        expected = np.arange(page_start, page_end + 1, step, dtype=np.int64)
+        absent = expected[~np.isin(expected, returned)]
+        # נרות אחרונים עשויים פשוט להתעכב - לא מסמנים אותם כריקים
+        absent = absent[absent < int(time.time() * 1000) - 3 * step]
+        if len(absent):
+            breaks = np.flatnonzero(np.diff(absent) != step) + 1
+            ranges = [[int(group[0]), int(group[-1])] for group in np.split(absent, breaks)]
+            key = self._series_key(symbol, interval)
+            self._update_state(lambda state: state['empty_ranges'].setdefault(key, []).extend(ranges))
+
+        return written, int(len(absent))
+
+    def resume_pending(self) -> List[Dict]:
+        """ממשיך עבודות backfill שנקטעו (קריסה/כיבוי) - רק החורים שנותרו יורדים"""
+        reports = []
+        for job in list(self._load_state()['jobs'].values()):
+            try:
+                self.logger.info(f"🔁 Resuming backfill {job['symbol']} {job['interval']}")
+                reports.append(self.backfill(job['symbol'], job['interval'],
+                                             start_ms=job['start_ms'], end_ms=job['end_ms']))
+            except Exception as e:
+                self.logger.error(f"Error resuming backfill {job}: {e}")
+        return reports
+
+    def get_stats(self) -> Dict:
+        """עבודות פתוחות וטווחים ריקים ידועים"""
+        state = self._load_state()
+        return {
+            'pending_jobs': list(state['jobs']),
+            'empty_ranges': {key: len(ranges) for key, ranges in state['empty_ranges'].items()}
+        }
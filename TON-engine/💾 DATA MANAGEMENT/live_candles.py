@@ -0,0 +1,340 @@
+import pandas as pd
+import numpy as np
+import logging
+import json
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+from binance_transport import BinanceTransport, BinanceTransportError, Priority, get_transport, request_weight
+from kline_backfill import INTERVAL_MS
+
+
+class CandleRing:
+    """חוצץ טבעתי של נרות עם שיקוף כפול - N הנרות האחרונים תמיד רציפים בזיכרון (view ללא העתקה)"""
+
+    COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        # כל נר נכתב פעמיים (i ו-i+capacity), כך שכל חלון של עד capacity שורות רציף
+        self._data = np.zeros((2 * capacity, len(self.COLUMNS)), dtype=np.float64)
+        self._head = 0      # המיקום הבא לכתיבה
+        self.size = 0
+        self.last_open_time: Optional[int] = None
+        self.forming = False  # האם הנר האחרון עדיין פתוח
+
+    def _write(self, position: int, row: np.ndarray):
+        self._data[position] = row
+        self._data[position + self.capacity] = row
+
+    def update(self, row: np.ndarray, closed: bool) -> str:
+        """מעדכן את הנר הפתוח במקום או מגלגל לנר חדש; מחזיר 'update' / 'append' / 'stale'"""
+        open_time = int(row[0])
+        if self.last_open_time is not None and open_time < self.last_open_time:
+            return 'stale'
+
+        if open_time == self.last_open_time:
+            self._write((self._head - 1) % self.capacity, row)
+            action = 'update'
+        else:
+            self._write(self._head, row)
+            self._head = (self._head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self.last_open_time = open_time
+            action = 'append'
+
+        self.forming = not closed
+        return action
+
+    def view(self, n: Optional[int] = None, include_forming: bool = True) -> np.ndarray:
+        """view לקריאה בלבד של N הנרות האחרונים (סדר כרונולוגי) - ללא העתקה.
+
+        ה-view חי: עדכון הנר הפתוח נראה בו מיד. להעתקה יציבה יש לקרוא ל-copy().
+        """
+        available = self.size - (1 if self.forming and not include_forming else 0)
+        n = available if n is None else max(0, min(n, available))
+        # העותק השני מתחיל ב-capacity, ולכן החלון [end-n, end) תמיד רציף
+        end = self._head + self.capacity - (0 if include_forming or not self.forming else 1)
+        result = self._data[end - n:end]
+        result.flags.writeable = False
+        return result
+
+
+class LiveCandleBuffer:
+    """חוצצי נרות חיים לכל (symbol, interval) - מתעדכנים מה-WebSocket ומוזנים ל-REST רק בהשלמת חורים"""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.rings: Dict[Tuple[str, str], CandleRing] = {}
+        self.listeners: List[Callable] = []
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.stats = {'updates': 0, 'rollovers': 0, 'stale': 0, 'seeded_bars': 0, 'reads': 0}
+
+    def _ring(self, symbol: str, interval: str) -> CandleRing:
+        key = (symbol.upper(), interval)
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = self.rings[key] = CandleRing(self.capacity)
+        return ring
+
+    def add_listener(self, callback: Callable[[str, str, Dict], None]):
+        """callback(symbol, interval, bar) לכל נר שנסגר"""
+        self.listeners.append(callback)
+
+    def apply(self, symbol: str, interval: str, open_time: int, open_: float, high: float,
+              low: float, close: float, volume: float, closed: bool):
+        """מעדכן נר בודד; נר שנסגר מופץ למאזינים"""
+        row = np.array([open_time, open_, high, low, close, volume], dtype=np.float64)
+        with self._lock:
+            ring = self._ring(symbol, interval)
+            action = ring.update(row, closed)
+
+        if action == 'stale':
+            self.stats['stale'] += 1
+            return
+        self.stats['updates'] += 1
+        if action == 'append':
+            self.stats['rollovers'] += 1
+
+        if closed:
+            bar = {'open_time': int(open_time), 'open': open_, 'high': high, 'low': low,
+                   'close': close, 'volume': volume}
+            for listener in self.listeners:
+                try:
+                    listener(symbol.upper(), interval, bar)
+                except Exception as e:
+                    self.logger.error(f"Error in candle listener: {e}")
+
+    def apply_kline_event(self, data: Dict):
+        """מעבד הודעת kline של Binance (השדה 'k')"""
+        kline = data['k']
+        self.apply(kline['s'], kline['i'], int(kline['t']), float(kline['o']), float(kline['h']),
+                   float(kline['l']), float(kline['c']), float(kline['v']), bool(kline['x']))
+
+    def apply_rest_klines(self, symbol: str, interval: str, rows: List, now_ms: Optional[int] = None) -> int:
+        """מזין klines מ-REST (זריעה/השלמת חורים) - נר שזמן הסגירה שלו עוד לא עבר נשאר פתוח"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        for row in rows:
+            self.apply(symbol, interval, int(row[0]), float(row[1]), float(row[2]), float(row[3]),
+                       float(row[4]), float(row[5]), int(row[6]) < now_ms)
+        self.stats['seeded_bars'] += len(rows)
+        return len(rows)
+
+    def get_view(self, symbol: str, interval: str, n: Optional[int] = None,
+                 include_forming: bool = True) -> np.ndarray:
+        """מערך (n, 6) של open_time/open/high/low/close/volume - view ללא העתקה"""
+        ring = self.rings.get((symbol.upper(), interval))
+        self.stats['reads'] += 1
+        if ring is None:
+            return np.empty((0, len(CandleRing.COLUMNS)))
+        return ring.view(n, include_forming)
+
+    def get_frame(self, symbol: str, interval: str, n: Optional[int] = None,
+                  include_forming: bool = True) -> pd.DataFrame:
+        """DataFrame עם אינדקס זמן (עותק) עבור קוד שעובד עם pandas"""
+        values = self.get_view(symbol, interval, n, include_forming)
+        index = pd.DatetimeIndex(values[:, 0].astype('datetime64[ms]'), name='timestamp')
+        return pd.DataFrame(values[:, 1:].copy(), index=index, columns=list(CandleRing.COLUMNS[1:]))
+
+    def size(self, symbol: str, interval: str) -> int:
+        ring = self.rings.get((symbol.upper(), interval))
+        return ring.size if ring else 0
+
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        ring = self.rings.get((symbol.upper(), interval))
+        return ring.last_open_time if ring else None
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'series': {f"{symbol}:{interval}": ring.size for (symbol, interval), ring in self.rings.items()}
+        }
+
+
+class CombinedKlineStream:
+    """חיבור WebSocket יחיד (combined stream) לכל ה-klines - התחברות מחדש אוטומטית עם השלמת חורים ב-REST"""
+
+    def __init__(self, buffer: LiveCandleBuffer, transport: BinanceTransport = None,
+                 ws_url: str = "wss://stream.binance.com:9443",
+                 rest_url: str = "https://api.binance.com/api/v3"):
+        self.buffer = buffer
+        self.transport = transport or get_transport()
+        self.ws_url = ws_url
+        self.rest_url = rest_url
+        self.logger = logging.getLogger(__name__)
+
+        self.streams: Dict[str, Tuple[str, str]] = {}
+        self.callbacks: Dict[str, List[Callable]] = {}
+        self._ws = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._connected = threading.Event()
+        self._request_id = 0
+        # stream name -> זמן ההודעה האחרונה של אותו זוג
+        self._last_update: Dict[str, float] = {}
+        self.stats = {'messages': 0, 'reconnects': 0, 'gap_fills': 0, 'gap_filled_bars': 0,
+                      'last_message': None}
+
+    @staticmethod
+    def stream_name(symbol: str, interval: str) -> str:
+        return f"{symbol.lower()}@kline_{interval}"
+
+    # =============================================
+    # 🔌 LIFECYCLE
+    # =============================================
+
+    def start(self, pairs: List[Tuple[str, str]]) -> bool:
+        """זורע את החוצצים ב-REST ופותח חיבור משולב אחד לכל הזוגות"""
+        if self._running:
+            for symbol, interval in pairs:
+                self.subscribe(symbol, interval)
+            return True
+
+        for symbol, interval in pairs:
+            self.streams[self.stream_name(symbol, interval)] = (symbol.upper(), interval)
+
+        if not WEBSOCKET_AVAILABLE:
+            self.logger.warning("⚠️ websocket-client not installed - live candles disabled")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='kline-stream', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._running = False
+        if self._ws is not None:
+            self._ws.close()
+
+    def subscribe(self, symbol: str, interval: str):
+        """מוסיף זוג לחיבור הקיים (SUBSCRIBE) - בלי לפתוח חיבור נוסף"""
+        name = self.stream_name(symbol, interval)
+        if name in self.streams:
+            return
+        self.streams[name] = (symbol.upper(), interval)
+        self._fill_gap(symbol.upper(), interval)
+        if self._ws is not None and self._connected.is_set():
+            self._request_id += 1
+            self._ws.send(json.dumps({'method': 'SUBSCRIBE', 'params': [name], 'id': self._request_id}))
+
+    def add_callback(self, symbol: str, interval: str, callback: Callable[[Dict], None]):
+        """callback(data) עם הודעת ה-kline הגולמית של הזוג (כל עדכון, גם של נר פתוח)"""
+        self.callbacks.setdefault(self.stream_name(symbol, interval), []).append(callback)
+
+    def _run(self):
+        backoff = 1.0
+        while self._running:
+            # השלמת חורים לפני כל חיבור - כולל הזריעה הראשונית
+            for symbol, interval in list(self.streams.values()):
+                self._fill_gap(symbol, interval)
+
+            url = f"{self.ws_url}/stream?streams={'/'.join(self.streams)}"
+            self._ws = websocket.WebSocketApp(
+                url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: self.logger.error(f"Kline stream error: {error}"),
+                on_close=lambda ws, code, msg: self._connected.clear()
+            )
+            started = time.time()
+            self._ws.run_forever(ping_interval=180, ping_timeout=10)
+            self._connected.clear()
+
+            if not self._running:
+                break
+            # חיבור שהחזיק מעמד מאפס את ה-backoff (Binance מנתקת כל 24 שעות)
+            backoff = 1.0 if time.time() - started > 60 else min(backoff * 2, 60.0)
+            self.stats['reconnects'] += 1
+            self.logger.warning(f"🔌 Kline stream disconnected, reconnecting in {backoff:.0f}s")
+            time.sleep(backoff)
+
+    def _on_open(self, ws):
+        self._connected.set()
+        self.logger.info(f"✅ Combined kline stream connected ({len(self.streams)} streams)")
+
+    def _on_message(self, ws, message: str):
+        try:
+            payload = json.loads(message)
+            data = payload.get('data', payload)
+            if data.get('e') == 'kline':
+                self.buffer.apply_kline_event(data)
+                self.stats['messages'] += 1
+                self.stats['last_message'] = time.time()
+                self._last_update[payload.get('stream') or self.stream_name(data['s'], data['k']['i'])] = time.time()
+                for callback in self.callbacks.get(payload.get('stream'), []):
+                    callback(data)
+        except Exception as e:
+            self.logger.error(f"Error processing kline message: {e}")
+
+    # =============================================
+    # 🩹 GAP FILL
+    # =============================================
+
+    def _fill_gap(self, symbol: str, interval: str):
+        """מוריד ב-REST את הנרות מאז הנר האחרון בחוצץ (או מילוי מלא אם ריק)"""
+        try:
+            params = {'symbol': symbol, 'interval': interval, 'limit': min(self.buffer.capacity, 1000)}
+            last_open_time = self.buffer.last_open_time(symbol, interval)
+            if last_open_time is not None:
+                params['startTime'] = last_open_time
+
+            rows = self.transport.request_sync(
+                f"{self.rest_url}/klines", params,
+                priority=Priority.NORMAL,
+                weight=request_weight('klines', params)
+            )
+            if isinstance(rows, list) and rows:
+                filled = self.buffer.apply_rest_klines(symbol, interval, rows)
+                self.stats['gap_fills'] += 1
+                self.stats['gap_filled_bars'] += filled
+        except BinanceTransportError as e:
+            self.logger.error(f"Gap fill failed for {symbol} {interval}: {e}")
+
+    def is_live(self, max_silence: float = 90.0) -> bool:
+        """מחובר וקיבל הודעה לאחרונה"""
+        last = self.stats['last_message']
+        return self._connected.is_set() and last is not None and time.time() - last < max_silence
+
+    def is_series_live(self, symbol: str, interval: str) -> bool:
+        """הזוג רשום ב-stream וקיבל עדכון בתוך interval אחד - אחרת החוצץ שלו עלול להיות ישן"""
+        name = self.stream_name(symbol, interval)
+        last = self._last_update.get(name)
+        max_age = INTERVAL_MS.get(interval, 3_600_000) / 1000
+        return (self._connected.is_set() and name in self.streams
+                and last is not None and time.time() - last < max_age)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'connected': self._connected.is_set(), 'streams': sorted(self.streams)}
+
+
+_shared_buffer: Optional[LiveCandleBuffer] = None
+_shared_stream: Optional[CombinedKlineStream] = None
+_shared_lock = threading.Lock()
+
+
+def get_live_buffer() -> LiveCandleBuffer:
+    """חוצץ הנרות המשותף לתהליך"""
+    global _shared_buffer
+    with _shared_lock:
+        if _shared_buffer is None:
+            _shared_buffer = LiveCandleBuffer()
+        return _shared_buffer
+
+
+def get_kline_stream() -> CombinedKlineStream:
+    """ה-stream המשותף שמזין את get_live_buffer()"""
+    global _shared_stream
+    buffer = get_live_buffer()
+    with _shared_lock:
+        if _shared_stream is None:
+            _shared_stream = CombinedKlineStream(buffer)
+        return _shared_stream
@@ -0,0 +1,431 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+from datetime import datetime
+import logging
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Union
+
+
+class ColumnarOHLCVStore:
+    """אחסון עמודתי של נתוני OHLCV - קבצי chunk של NumPy לכל סימל ו-interval"""
+
+    DTYPE = np.dtype([
+        ('open_time', '<i8'),
+        ('open', '<f8'),
+        ('high', '<f8'),
+        ('low', '<f8'),
+        ('close', '<f8'),
+        ('volume', '<f8'),
+        ('quote_asset_volume', '<f8'),
+        ('number_of_trades', '<i8'),
+        ('taker_buy_base_asset_volume', '<f8'),
+        ('taker_buy_quote_asset_volume', '<f8')
+    ])
+
+    VALUE_COLUMNS = [name for name in DTYPE.names if name != 'open_time']
+
+    def __init__(self, root_path: str = 'database/ohlcv', max_chunks: int = 64):
+        self.root_path = root_path
+        self.max_chunks = max_chunks
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._manifests = {}
+
+        os.makedirs(self.root_path, exist_ok=True)
+
+    # =============================================
+    # 📁 MANIFEST
+    # =============================================
+
+    def _series_dir(self, symbol: str, interval: str) -> str:
+        """מחזיר את תיקיית הסדרה עבור סימל ו-interval"""
+        return os.path.join(self.root_path, symbol.upper(), interval)
+
+    def _load_manifest(self, symbol: str, interval: str) -> Dict:
+        """טוען את ה-manifest של הסדרה (עם cache בזיכרון)"""
+        key = (symbol.upper(), interval)
+        if key in self._manifests:
+            return self._manifests[key]
+
+        manifest_path = os.path.join(self._series_dir(symbol, interval), 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        else:
+            manifest = {
+                'symbol': symbol.upper(),
+                'interval': interval,
+                'chunks': [],
+                'rows': 0,
+                'next_chunk_id': 0,
+                'updated_at': None
+            }
+
+        self._manifests[key] = manifest
+        return manifest
+
+    def _save_manifest(self, symbol: str, interval: str, manifest: Dict):
+        """שומר manifest באופן אטומי"""
+        series_dir = self._series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+
+        manifest['updated_at'] = datetime.now().isoformat()
+        manifest_path = os.path.join(series_dir, 'manifest.json')
+        tmp_path = manifest_path + '.tmp'
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+        self._manifests[(symbol.upper(), interval)] = manifest
+
+    # =============================================
+    # 🔄 CONVERSIONS
+    # =============================================
+
+    @staticmethod
+    def _to_epoch_ms(values) -> np.ndarray:
+        """ממיר אינדקס/עמודת זמן ל-epoch במילישניות (וקטורי)"""
+        index = pd.DatetimeIndex(values)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        return index.values.astype('datetime64[ms]').astype(np.int64)
+
+    def _frame_to_records(self, data: pd.DataFrame) -> np.ndarray:
+        """ממיר DataFrame למערך מובנה ללא לולאות שורה"""
+        if 'timestamp' in data.columns:
+            timestamps = self._to_epoch_ms(data['timestamp'])
+        elif 'open_time' in data.columns:
+            timestamps = self._to_epoch_ms(data['open_time'])
+        else:
+            timestamps = self._to_epoch_ms(data.index)
+
+        records = np.zeros(len(data), dtype=self.DTYPE)
+        records['open_time'] = timestamps
+
+        for column in self.VALUE_COLUMNS:
+            if column in data.columns:
+                values = pd.to_numeric(data[column], errors='coerce').to_numpy()
+                if column == 'number_of_trades':
+                    records[column] = np.nan_to_num(values, nan=0).astype(np.int64)
+                else:
+                    records[column] = values.astype(np.float64)
+
+        # מיון והסרת כפילויות בתוך ה-batch (האחרון גובר)
+        order = np.argsort(records['open_time'], kind='stable')
+        records = records[order]
+        reversed_ts = records['open_time'][::-1]
+        _, last_positions = np.unique(reversed_ts, return_index=True)
+        keep = len(records) - 1 - last_positions
+        return records[np.sort(keep)]
+
+    def _records_to_frame(self, records: np.ndarray, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """ממיר מערך מובנה ל-DataFrame עם אינדקס זמן"""
+        columns = columns or self.VALUE_COLUMNS
+        index = pd.DatetimeIndex(records['open_time'].astype('datetime64[ms]'), name='timestamp')
+        return pd.DataFrame({column: records[column] for column in columns}, index=index)
+
+    # =============================================
+    # ✍️ WRITE PATH
+    # =============================================
+
+    def append(self, symbol: str, interval: str, data: pd.DataFrame) -> int:
+        """מוסיף DataFrame שלם כ-chunk יחיד (כתיבה אחת)"""
+        if data is None or data.empty:
+            return 0
+
+        with self._lock:
+            records = self._frame_to_records(data)
+            records = self._drop_stored_rows(symbol, interval, records)
+
+            if len(records) == 0:
+                return 0
+
+            manifest = self._load_manifest(symbol, interval)
+            series_dir = self._series_dir(symbol, interval)
+            os.makedirs(series_dir, exist_ok=True)
+
+            chunk_id = manifest['next_chunk_id']
+            filename = f"chunk_{chunk_id:08d}.npy"
+            chunk_path = os.path.join(series_dir, filename)
+            tmp_path = chunk_path + '.tmp'
+
+            with open(tmp_path, 'wb') as f:
+                np.save(f, records)
+            os.replace(tmp_path, chunk_path)
+
+            manifest['chunks'].append({
+                'file': filename,
+                'start': int(records['open_time'][0]),
+                'end': int(records['open_time'][-1]),
+                'rows': int(len(records))
+            })
+            manifest['rows'] += int(len(records))
+            manifest['next_chunk_id'] = chunk_id + 1
+            self._save_manifest(symbol, interval, manifest)
+
+            if len(manifest['chunks']) > self.max_chunks:
+                self.compact(symbol, interval)
+
+            return int(len(records))
+
+    def _drop_stored_rows(self, symbol: str, interval: str, records: np.ndarray) -> np.ndarray:
+        """מסנן שורות שכבר שמורות ללא שינוי (הנר האחרון נכתב מחדש אם השתנה)"""
+        manifest = self._load_manifest(symbol, interval)
+        if not manifest['chunks'] or len(records) == 0:
+            return records
+
+        stored = self._read_records(symbol, interval,
+                                    int(records['open_time'][0]),
+                                    int(records['open_time'][-1]))
+        if len(stored) == 0:
+            return records
+
+        position = np.searchsorted(stored['open_time'], records['open_time'])
+        position = np.clip(position, 0, len(stored) - 1)
+        exists = stored['open_time'][position] == records['open_time']
+
+        # שורות קיימות נשמרות מחדש רק אם הערכים השתנו (למשל נר שעדיין נבנה)
+        changed = np.zeros(len(records), dtype=bool)
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            changed |= stored[column][position] != records[column]
+
+        return records[~exists | changed]
+
+    def compact(self, symbol: str, interval: str):
+        """מאחד את כל ה-chunks של הסדרה לקובץ יחיד"""
+        with self._lock:
+            manifest = self._load_manifest(symbol, interval)
+            if len(manifest['chunks']) <= 1:
+                return
+
+            records = self._read_records(symbol, interval)
+            series_dir = self._series_dir(symbol, interval)
+            old_files = [chunk['file'] for chunk in manifest['chunks']]
+
+            chunk_id = manifest['next_chunk_id']
+            filename = f"chunk_{chunk_id:08d}.npy"
+            chunk_path = os.path.join(series_dir, filename)
+            tmp_path = chunk_path + '.tmp'
+
+            with open(tmp_path, 'wb') as f:
+                np.save(f, records)
+            os.replace(tmp_path, chunk_path)
+
+            manifest['chunks'] = [{
+                'file': filename,
+                'start': int(records['open_time'][0]),
+                'end': int(records['open_time'][-1]),
+                'rows': int(len(records))
+            }]
+            manifest['rows'] = int(len(records))
+            manifest['next_chunk_id'] = chunk_id + 1
+            self._save_manifest(symbol, interval, manifest)
+
+            for old_file in old_files:
+                try:
+                    os.remove(os.path.join(series_dir, old_file))
+                except OSError:
+                    pass
+
+            self.logger.info(f"🗜️ Compacted {symbol} {interval}: {len(old_files)} chunks -> 1 ({len(records)} rows)")
+
+    # =============================================
+    # 📖 READ PATH
+    # =============================================
+
+    def _read_records(self, symbol: str, interval: str,
+                      start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> np.ndarray:
+        """קורא רשומות בטווח זמן מכל ה-chunks הרלוונטיים (memory-mapped)"""
+        manifest = self._load_manifest(symbol, interval)
+        series_dir = self._series_dir(symbol, interval)
+
+        parts = []
+        for chunk in manifest['chunks']:
+            if start_ms is not None and chunk['end'] < start_ms:
+                continue
+            if end_ms is not None and chunk['start'] > end_ms:
+                continue
+
+            data = np.load(os.path.join(series_dir, chunk['file']), mmap_mode='r')
+            lo = 0 if start_ms is None else np.searchsorted(data['open_time'], start_ms, side='left')
+            hi = len(data) if end_ms is None else np.searchsorted(data['open_time'], end_ms, side='right')
+            if hi > lo:
+                parts.append(data[lo:hi])
+
+        if not parts:
+            return np.zeros(0, dtype=self.DTYPE)
+
+        if len(parts) == 1:
+            return np.array(parts[0])
+
+        records = np.concatenate(parts)
+
+        # chunks חופפים (backfill / עדכון נר) - מיון יציב והשארת הכתיבה האחרונה
+        order = np.argsort(records['open_time'], kind='stable')
+        records = records[order]
+        reversed_ts = records['open_time'][::-1]
+        _, last_positions = np.unique(reversed_ts, return_index=True)
+        keep = len(records) - 1 - last_positions
+        return records[np.sort(keep)]
+
+    def read_range(self, symbol: str, interval: str,
+                   start: Optional[Union[datetime, pd.Timestamp, int]] = None,
+                   end: Optional[Union[datetime, pd.Timestamp, int]] = None,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """קורא טווח זמן ומחזיר DataFrame ללא פענוח שורה-שורה"""
+        try:
+            with self._lock:
+                records = self._read_records(symbol, interval,
+                                             self._to_ms(start), self._to_ms(end))
+            return self._records_to_frame(records, columns)
+
+        except Exception as e:
+            self.logger.error(f"Error reading OHLCV range for {symbol} {interval}: {e}")
+            return pd.DataFrame(columns=columns or self.VALUE_COLUMNS)
+
+    def read_last(self, symbol: str, interval: str, limit: int,
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """קורא את N הנרות האחרונים"""
+        with self._lock:
+            records = self._read_records(symbol, interval)
+        return self._records_to_frame(records[-limit:] if limit else records, columns)
+
+    def get_timestamps(self, symbol: str, interval: str,
+                       start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> np.ndarray:
+        """מחזיר את חותמות הזמן השמורות (epoch ms) בטווח"""
+        with self._lock:
+            return np.array(self._read_records(symbol, interval, start_ms, end_ms)['open_time'])
+
+    def get_last_timestamp(self, symbol: str, interval: str) -> Optional[int]:
+        """מחזיר את חותמת הזמן של הנר האחרון השמור"""
+        manifest = self._load_manifest(symbol, interval)
+        if not manifest['chunks']:
+            return None
+        return max(chunk['end'] for chunk in manifest['chunks'])
+
+    def get_latest_close(self, symbol: str) -> Optional[float]:
+        """מחזיר את מחיר הסגירה העדכני ביותר מכל ה-intervals של הסימל"""
+        latest_ts, latest_close = None, None
+
+        for interval in self.list_intervals(symbol):
+            last_ts = self.get_last_timestamp(symbol, interval)
+            if last_ts is None or (latest_ts is not None and last_ts <= latest_ts):
+                continue
+
+            with self._lock:
+                records = self._read_records(symbol, interval, last_ts, last_ts)
+            if len(records):
+                latest_ts, latest_close = last_ts, float(records['close'][-1])
+
+        return latest_close
+
+    @staticmethod
+    def _to_ms(value) -> Optional[int]:
+        """ממיר ערך זמן ל-epoch ms"""
+        if value is None:
+            return None
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert(None)
+        return int(ts.value // 10**6)
+
+    # =============================================
+    # 📊 CATALOG & STATS
+    # =============================================
+
+    def list_symbols(self) -> List[str]:
+        """מחזיר את רשימת הסימלים השמורים"""
+        if not os.path.isdir(self.root_path):
+            return []
+        return sorted(name for name in os.listdir(self.root_path)
+                      if os.path.isdir(os.path.join(self.root_path, name)))
+
+    def list_intervals(self, symbol: str) -> List[str]:
+        """מחזיר את ה-intervals השמורים עבור סימל"""
+        symbol_dir = os.path.join(self.root_path, symbol.upper())
+        if not os.path.isdir(symbol_dir):
+            return []
+        return sorted(name for name in os.listdir(symbol_dir)
+                      if os.path.exists(os.path.join(symbol_dir, name, 'manifest.json')))
+
+    def get_stats(self) -> Dict:
+        """מחזיר סטטיסטיקות אחסון"""
+        series = {}
+        total_rows = 0
+        total_bytes = 0
+
+        for symbol in self.list_symbols():
+            for interval in self.list_intervals(symbol):
+                manifest = self._load_manifest(symbol, interval)
+                series_dir = self._series_dir(symbol, interval)
+                size = sum(os.path.getsize(os.path.join(series_dir, chunk['file']))
+                           for chunk in manifest['chunks']
+                           if os.path.exists(os.path.join(series_dir, chunk['file'])))
+
+                series[f"{symbol}_{interval}"] = {
+                    'rows': manifest['rows'],
+                    'chunks': len(manifest['chunks']),
+                    'first': pd.Timestamp(min(c['start'] for c in manifest['chunks']), unit='ms').isoformat()
+                             if manifest['chunks'] else None,
+                    'last': pd.Timestamp(max(c['end'] for c in manifest['chunks']), unit='ms').isoformat()
+                            if manifest['chunks'] else None
+                }
+                total_rows += manifest['rows']
+                total_bytes += size
+
+        return {
+            'series': series,
+            'total_rows': total_rows,
+            'unique_symbols': len(self.list_symbols()),
+            'size_mb': round(total_bytes / (1024 * 1024), 2)
+        }
+
+    # =============================================
+    # 🚚 MIGRATION
+    # =============================================
+
+    def migrate_from_sqlite(self, conn: sqlite3.Connection, interval: str = '1h',
+                            table: str = 'market_data') -> Dict[str, int]:
+        """מעביר נתונים מטבלת SQLite הישנה (market_data) לאחסון העמודתי - זורק חריגה אם ההעברה לא הושלמה"""
+        migrated = {}
+
+        try:
+            symbols = [row[0] for row in conn.execute(f'SELECT DISTINCT symbol FROM {table}').fetchall()]
+
+            for symbol in symbols:
+                df = pd.read_sql_query(
+                    f'''
+                        SELECT timestamp, open, high, low, close, volume,
+                               quote_asset_volume, number_of_trades,
+                               taker_buy_base_asset_volume, taker_buy_quote_asset_volume
+                        FROM {table}
+                        WHERE symbol = ?
+                        ORDER BY timestamp
+                    ''',
+                    conn, params=(symbol,)
+                )
+
+                if df.empty:
+                    continue
+
+                # פענוח תאריכים וקטורי - פעם אחת לכל סימל
+                df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+                df = df.dropna(subset=['timestamp'])
+
+                migrated[symbol] = self.append(symbol, interval, df)
+                self.compact(symbol, interval)
+
+            self.logger.info(f"🚚 Migrated {sum(migrated.values())} rows from SQLite {table} "
+                             f"({len(migrated)} symbols)")
+            return migrated
+
+        except Exception as e:
+            # העברה חלקית - הקורא לא יסמן אותה כהושלמה וינסה שוב (append מדלג על שורות שכבר נשמרו)
+            self.logger.error(f"Error migrating market data from SQLite after {len(migrated)} symbols: {e}")
+            raise
@@ -0,0 +1,425 @@
+import logging
+import json
+import time
+import threading
+from datetime import datetime
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+from binance_transport import BinanceTransport, BinanceTransportError, Priority, get_transport, request_weight
+
+
+class BookSide:
+    """צד אחד של ה-order book - מחירים ממוינים בעלייה עם כמויות מקבילות (חיפוש בינארי)"""
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.prices: List[float] = []
+        self.quantities: List[float] = []
+        self.total_quantity = 0.0
+        self.total_notional = 0.0
+
+    def clear(self):
+        self.prices, self.quantities = [], []
+        self.total_quantity = self.total_notional = 0.0
+
+    def set(self, price: float, quantity: float):
+        """מעדכן רמת מחיר (כמות 0 מוחקת) - מצטברים מתעדכנים בהפרש בלבד"""
+        index = bisect_left(self.prices, price)
+        exists = index < len(self.prices) and self.prices[index] == price
+        previous = self.quantities[index] if exists else 0.0
+
+        if quantity == 0:
+            if not exists:
+                return
+            del self.prices[index]
+            del self.quantities[index]
+        elif exists:
+            self.quantities[index] = quantity
+        else:
+            self.prices.insert(index, price)
+            self.quantities.insert(index, quantity)
+
+        self.total_quantity += quantity - previous
+        self.total_notional += (quantity - previous) * price
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self.prices:
+            return None
+        index = -1 if self.is_bid else 0
+        return self.prices[index], self.quantities[index]
+
+    def slice_to(self, limit_price: float) -> slice:
+        """הרמות שבין המחיר הטוב ביותר ל-limit_price (כולל)"""
+        if self.is_bid:
+            return slice(bisect_left(self.prices, limit_price), len(self.prices))
+        return slice(0, bisect_right(self.prices, limit_price))
+
+    def levels(self, limit: Optional[int] = None) -> List[Tuple[float, float]]:
+        """רמות מהטובה ביותר והלאה"""
+        pairs = zip(self.prices, self.quantities)
+        ordered = list(pairs)[::-1] if self.is_bid else list(pairs)
+        return ordered[:limit] if limit else ordered
+
+
+class LocalOrderBook:
+    """order book מקומי שמתוחזק מ-diff depth stream לפי אלגוריתם snapshot+buffer של Binance"""
+
+    def __init__(self, symbol: str, max_buffer: int = 5000):
+        self.symbol = symbol.upper()
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.synced = False
+        self._awaiting_first = False  # האירוע הראשון אחרי snapshot רק צריך לכסות את lastUpdateId + 1
+        self.last_event_time = None
+        self.buffer: deque = deque(maxlen=max_buffer)
+        self.lock = threading.Lock()
+        self.stats = {'events': 0, 'resyncs': 0, 'dropped': 0}
+
+    # =============================================
+    # 🔄 SYNC
+    # =============================================
+
+    def apply_snapshot(self, snapshot: Dict):
+        """טוען snapshot ומריץ עליו את האירועים שנאגרו (מדלג על u <= lastUpdateId)"""
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, quantity in snapshot.get('bids', []):
+                self.bids.set(float(price), float(quantity))
+            for price, quantity in snapshot.get('asks', []):
+                self.asks.set(float(price), float(quantity))
+            self.last_update_id = int(snapshot['lastUpdateId'])
+            self.synced = True
+            self._awaiting_first = True
+
+            pending, self.buffer = list(self.buffer), deque(maxlen=self.buffer.maxlen)
+            for event in pending:
+                if not self._accept(event):
+                    return
+
+    def _accept(self, event: Dict) -> bool:
+        """בודק רציפות ומחיל; False אם נמצא חור (ה-book מסומן כלא מסונכרן)"""
+        if event['u'] <= self.last_update_id:
+            self.stats['dropped'] += 1
+            return True
+        if self._awaiting_first:
+            continuous = event['U'] <= self.last_update_id + 1 <= event['u']
+        else:
+            continuous = event['U'] == self.last_update_id + 1
+        if not continuous:
+            self.synced = False
+            self.stats['resyncs'] += 1
+            self.buffer.clear()
+            self.buffer.append(event)
+            return False
+        self._awaiting_first = False
+        self._apply(event)
+        return True
+
+    def apply_diff(self, event: Dict) -> bool:
+        """מחיל diff; מחזיר False אם נמצא חור ב-update ids וצריך snapshot חדש"""
+        with self.lock:
+            if not self.synced:
+                self.buffer.append(event)
+                return True
+            return self._accept(event)
+
+    def _apply(self, event: Dict):
+        for price, quantity in event.get('b', []):
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in event.get('a', []):
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = event['u']
+        self.last_event_time = event.get('E')
+        self.stats['events'] += 1
+
+    # =============================================
+    # 📐 QUERIES
+    # =============================================
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        return self.asks.best()
+
+    def mid_price(self) -> float:
+        bid, ask = self.bids.best(), self.asks.best()
+        return (bid[0] + ask[0]) / 2 if bid and ask else 0.0
+
+    def spread(self) -> Dict:
+        bid, ask = self.bids.best(), self.asks.best()
+        if not bid or not ask:
+            return {'spread': 0.0, 'spread_percent': 0.0, 'spread_bps': 0.0}
+        spread = ask[0] - bid[0]
+        return {
+            'spread': spread,
+            'spread_percent': spread / bid[0] * 100,
+            'spread_bps': spread / self.mid_price() * 10_000
+        }
+
+    def depth_within(self, bps: float) -> Dict:
+        """כמות ושווי מצטברים בכל צד עד bps נקודות בסיס מהמחיר האמצעי"""
+        with self.lock:
+            mid = self.mid_price()
+            if mid == 0:
+                return {'bps': bps, 'bid_quantity': 0.0, 'ask_quantity': 0.0,
+                        'bid_notional': 0.0, 'ask_notional': 0.0}
+            bid_slice = self.bids.slice_to(mid * (1 - bps / 10_000))
+            ask_slice = self.asks.slice_to(mid * (1 + bps / 10_000))
+            bid_prices, bid_quantities = self.bids.prices[bid_slice], self.bids.quantities[bid_slice]
+            ask_prices, ask_quantities = self.asks.prices[ask_slice], self.asks.quantities[ask_slice]
+
+        return {
+            'bps': bps,
+            'bid_quantity': sum(bid_quantities),
+            'ask_quantity': sum(ask_quantities),
+            'bid_notional': sum(p * q for p, q in zip(bid_prices, bid_quantities)),
+            'ask_notional': sum(p * q for p, q in zip(ask_prices, ask_quantities))
+        }
+
+    def imbalance(self, bps: Optional[float] = None) -> float:
+        """(bid - ask) / (bid + ask) - על כל הספר מתוך המצטברים (O(1)), או בתוך רצועת bps"""
+        if bps is None:
+            bid_quantity, ask_quantity = self.bids.total_quantity, self.asks.total_quantity
+        else:
+            depth = self.depth_within(bps)
+            bid_quantity, ask_quantity = depth['bid_quantity'], depth['ask_quantity']
+        total = bid_quantity + ask_quantity
+        return (bid_quantity - ask_quantity) / total if total > 0 else 0.0
+
+    def estimate_fill(self, side: str, quantity: float) -> Dict:
+        """מחיר ביצוע ממוצע ו-slippage לפקודת שוק בגודל quantity (BUY אוכל asks, SELL אוכל bids)"""
+        with self.lock:
+            levels = (self.asks if side.upper() == 'BUY' else self.bids).levels()
+            mid = self.mid_price()
+
+        remaining, cost = quantity, 0.0
+        for price, level_quantity in levels:
+            take = min(remaining, level_quantity)
+            cost += take * price
+            remaining -= take
+            if remaining <= 0:
+                break
+
+        filled = quantity - max(remaining, 0.0)
+        average_price = cost / filled if filled > 0 else 0.0
+        slippage_bps = abs(average_price - mid) / mid * 10_000 if mid and filled else 0.0
+        return {
+            'filled_quantity': filled,
+            'unfilled_quantity': max(remaining, 0.0),
+            'average_price': average_price,
+            'slippage_bps': slippage_bps
+        }
+
+    def to_depth(self, limit: int = 100) -> Dict:
+        """אותו פורמט כמו get_depth_data (REST)"""
+        with self.lock:
+            return {
+                'lastUpdateId': self.last_update_id,
+                'bids': [[price, quantity] for price, quantity in self.bids.levels(limit)],
+                'asks': [[price, quantity] for price, quantity in self.asks.levels(limit)],
+                'timestamp': datetime.fromtimestamp(self.last_event_time / 1000) if self.last_event_time else datetime.now()
+            }
+
+
+class OrderBookManager:
+    """מתחזק order books מקומיים לכמה סמלים על חיבור combined אחד של @depth@100ms"""
+
+    SNAPSHOT_LIMIT = 1000
+
+    def __init__(self, transport: BinanceTransport = None,
+                 ws_url: str = "wss://stream.binance.com:9443",
+                 rest_url: str = "https://api.binance.com/api/v3"):
+        self.transport = transport or get_transport()
+        self.ws_url = ws_url
+        self.rest_url = rest_url
+        self.logger = logging.getLogger(__name__)
+
+        self.books: Dict[str, LocalOrderBook] = {}
+        self._ws = None
+        self._running = False
+        self._connected = threading.Event()
+        self._snapshot_pending = set()
+        # סמלים שה-stream שלהם בכתובת החיבור הנוכחי / נשלח להם SUBSCRIBE - רק הם מסתנכרנים
+        self._connecting = set()
+        self._subscribed = set()
+        self._lock = threading.Lock()
+        self._request_id = 0
+        self.stats = {'messages': 0, 'snapshots': 0, 'reconnects': 0}
+
+    @staticmethod
+    def stream_name(symbol: str) -> str:
+        return f"{symbol.lower()}@depth@100ms"
+
+    def track(self, symbols: List[str]) -> bool:
+        """מתחיל לתחזק books לסמלים (מצטרף לחיבור הקיים אם פתוח)"""
+        # נקרא באתחול מה-thread של WSGI/ASGI ואולי במקביל - ההחלטה אם להפעיל/להירשם תחת ה-lock
+        subscribed = []
+        with self._lock:
+            new_symbols = [s for s in dict.fromkeys(s.upper() for s in symbols) if s not in self.books]
+            for symbol in new_symbols:
+                self.books[symbol] = LocalOrderBook(symbol)
+            if not WEBSOCKET_AVAILABLE:
+                self.logger.warning("⚠️ websocket-client not installed - local order books disabled")
+                return False
+            start = not self._running
+            self._running = True
+            # לפני החיבור - הסמלים ייכנסו לכתובת ב-_run או יירשמו ב-_on_open
+            if not start and new_symbols and self._connected.is_set():
+                subscribed = self._subscribe(new_symbols)
+
+        if start:
+            threading.Thread(target=self._run, name='depth-stream', daemon=True).start()
+        # snapshot רק אחרי ה-SUBSCRIBE - ה-diffs כבר נאגרים ב-buffer של ה-book
+        for symbol in subscribed:
+            self._request_snapshot(self.books[symbol])
+        return True
+
+    def _subscribe(self, symbols: List[str]) -> List[str]:
+        """שולח SUBSCRIBE על החיבור הפתוח (תחת self._lock); ה-books מתחילים לאגור diffs"""
+        for symbol in symbols:
+            book = self.books[symbol]
+            with book.lock:
+                book.synced = False
+                book.buffer.clear()
+        self._request_id += 1
+        self._ws.send(json.dumps({'method': 'SUBSCRIBE', 'id': self._request_id,
+                                  'params': [self.stream_name(s) for s in symbols]}))
+        self._subscribed.update(symbols)
+        return symbols
+
+    def get_book(self, symbol: str) -> Optional[LocalOrderBook]:
+        """ה-book המסונכרן של הסמל, או None אם עדיין לא מסונכרן"""
+        book = self.books.get(symbol.upper())
+        return (book if book is not None and book.synced and book.symbol in self._subscribed
+                and self._connected.is_set() else None)
+
+    def stop(self):
+        self._running = False
+        if self._ws is not None:
+            self._ws.close()
+
+    # =============================================
+    # 🔌 STREAM
+    # =============================================
+
+    def _run(self):
+        backoff = 1.0
+        while self._running:
+            with self._lock:
+                self._connecting = set(self.books)
+            url = f"{self.ws_url}/stream?streams={'/'.join(self.stream_name(s) for s in self._connecting)}"
+            self._ws = websocket.WebSocketApp(
+                url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: self.logger.error(f"Depth stream error: {error}"),
+                on_close=lambda ws, code, msg: self._connected.clear()
+            )
+            started = time.time()
+            self._ws.run_forever(ping_interval=180, ping_timeout=10)
+            self._connected.clear()
+
+            if not self._running:
+                break
+            backoff = 1.0 if time.time() - started > 60 else min(backoff * 2, 60.0)
+            self.stats['reconnects'] += 1
+            self.logger.warning(f"🔌 Depth stream disconnected, reconnecting in {backoff:.0f}s")
+            time.sleep(backoff)
+
+    def _on_open(self, ws):
+        with self._lock:
+            self._connected.set()
+            self._subscribed = set(self._connecting)
+            # אחרי ניתוק כל ה-books לא רציפים - מסנכרנים מחדש מ-snapshot
+            for symbol in self._subscribed:
+                book = self.books[symbol]
+                with book.lock:
+                    book.synced = False
+                    book.buffer.clear()
+            # סמלים שנוספו אחרי בניית הכתובת - נרשמים עכשיו
+            missing = [s for s in self.books if s not in self._subscribed]
+            if missing:
+                self._subscribe(missing)
+            subscribed = list(self._subscribed)
+        for symbol in subscribed:
+            self._request_snapshot(self.books[symbol])
+        self.logger.info(f"✅ Depth stream connected ({len(subscribed)} books)")
+
+    def _on_message(self, ws, message: str):
+        try:
+            payload = json.loads(message)
+            event = payload.get('data', payload)
+            if event.get('e') != 'depthUpdate':
+                return
+            book = self.books.get(event['s'])
+            if book is None:
+                return
+            self.stats['messages'] += 1
+            if not book.apply_diff(event):
+                self.logger.warning(f"⚠️ Order book gap for {book.symbol} - resyncing")
+                self._request_snapshot(book)
+        except Exception as e:
+            self.logger.error(f"Error processing depth message: {e}")
+
+    def _request_snapshot(self, book: LocalOrderBook):
+        """מוריד snapshot ברקע - האירועים ממשיכים להיאגר ב-buffer של ה-book"""
+        with self._lock:
+            if book.symbol in self._snapshot_pending:
+                return
+            self._snapshot_pending.add(book.symbol)
+        threading.Thread(target=self._load_snapshot, args=(book,), daemon=True).start()
+
+    def _load_snapshot(self, book: LocalOrderBook):
+        try:
+            params = {'symbol': book.symbol, 'limit': self.SNAPSHOT_LIMIT}
+            snapshot = self.transport.request_sync(
+                f"{self.rest_url}/depth", params,
+                priority=Priority.LIVE,
+                weight=request_weight('depth', params)
+            )
+            book.apply_snapshot(snapshot)
+            self.stats['snapshots'] += 1
+            if not book.synced:
+                self.logger.warning(f"⚠️ Snapshot for {book.symbol} behind the stream - retrying")
+        except BinanceTransportError as e:
+            self.logger.error(f"Depth snapshot failed for {book.symbol}: {e}")
+        finally:
+            with self._lock:
+                self._snapshot_pending.discard(book.symbol)
+
+        if not book.synced and self._running and self._connected.is_set():
+            time.sleep(1)
+            self._request_snapshot(book)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'connected': self._connected.is_set(),
+            'books': {symbol: {'synced': book.synced, 'subscribed': symbol in self._subscribed, 'last_update_id': book.last_update_id,
+                               'levels': len(book.bids.prices) + len(book.asks.prices), **book.stats}
+                      for symbol, book in self.books.items()}
+        }
+
+
+_shared_manager: Optional[OrderBookManager] = None
+_shared_lock = threading.Lock()
+
+
+def get_order_book_manager() -> OrderBookManager:
+    """מנהל ה-order books המשותף לתהליך"""
+    global _shared_manager
+    with _shared_lock:
+        if _shared_manager is None:
+            _shared_manager = OrderBookManager()
+        return _shared_manager
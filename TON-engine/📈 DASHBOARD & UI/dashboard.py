@@ -9,6 +9,15 @@ import logging
 from typing import Dict, List, Optional
 import json
 
+try:
+    import plotly.io as pio
+    from response_encoder import FastJSONProvider, ORJSON_AVAILABLE
+    # fig.to_json דרך orjson - המערכים של numpy מקודדים בלי מעבר דרך רשימות Python
+    if ORJSON_AVAILABLE:
+        pio.json.config.default_engine = 'orjson'
+except ImportError:
+    FastJSONProvider = None
+
 from data_manager import AdvancedDataManager
 from technical_analyzer import AdvancedTechnicalAnalyzer
 from payment_manager import PaymentManager
@@ -433,6 +442,8 @@ def create_dashboard_app(data_manager: AdvancedDataManager,
     """יוצר אפליקציית Flask עבור הדשבורד"""
     
     app = Flask(__name__)
+    if FastJSONProvider is not None:
+        app.json = FastJSONProvider(app)
     dashboard = TradingDashboard(data_manager, technical_analyzer, payment_manager)
     
     @app.route('/')
@@ -2,18 +2,16 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
-from typing import Dict, List, Tuple
-import requests
-import hashlib
-import hmac
+from typing import Dict, List, Optional, Tuple
 import time
-from urllib.parse import urlencode
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import os
-import ta
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.trend import MACD, EMAIndicator, ADXIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
-from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator
+
+from indicator_registry import registry as indicator_registry
+from binance_transport import BinanceTransportError, Priority, get_transport, request_weight, sign_params
+from kline_backfill import klines_to_frame
+from live_candles import get_kline_stream
 
 class AdvancedTradingLogic:
     def __init__(self):
@@ -24,6 +22,8 @@ class AdvancedTradingLogic:
         self.binance_secret_key = os.getenv('BINANCE_SECRET_KEY', '')
         
         self.base_url = "https://api.binance.com/api/v3"
+        self.transport = get_transport()
+        self.kline_stream = get_kline_stream()
         
         # בדיקה אם המפתחות הוגדרו
         if not self.binance_api_key or not self.binance_secret_key:
@@ -54,6 +54,18 @@ class AdvancedTradingLogic:
             'BNBUSDT': {'volatility': 'medium', 'spread': 0.002, 'lot_size': 0.1},
             'BTCUSDT': {'volatility': 'low', 'spread': 0.0005, 'lot_size': 0.001}
         }
+        
+        # ניתוח מרובה מטבעות - threads ל-I/O, pool נפרד לחישובי numpy (0 = באותו thread)
+        self.analysis_config = {
+            'max_workers': int(os.getenv('ANALYSIS_MAX_WORKERS', 8)),
+            'cpu_workers': int(os.getenv('ANALYSIS_CPU_WORKERS', 0)),
+            'symbol_timeout': float(os.getenv('ANALYSIS_SYMBOL_TIMEOUT', 60)),
+            'batch_timeout': float(os.getenv('ANALYSIS_BATCH_TIMEOUT', 180))
+        }
+        self._io_executor = None
+        self._io_workers = 0
+        self._cpu_executor = None
+        self._executor_lock = threading.Lock()
     
     def _binance_request(self, endpoint: str, params: Dict = None, signed: bool = False) -> Dict:
         """בקשה מתקדמת ל-Binance API"""
@@ -61,27 +73,44 @@ class AdvancedTradingLogic:
             return self._advanced_simulation(endpoint, params)
             
         try:
-            url = f"{self.base_url}/{endpoint}"
-            headers = {"X-MBX-APIKEY": self.binance_api_key}
-            
-            if signed and params:
-                params['timestamp'] = int(time.time() * 1000)
-                query_string = urlencode(params)
-                signature = hmac.new(
-                    self.binance_secret_key.encode('utf-8'),
-                    query_string.encode('utf-8'),
-                    hashlib.sha256
-                ).hexdigest()
-                params['signature'] = signature
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            # בקשות מסחר חתומות ומחירים חיים עוקפים בקשות רקע בתור
+            live = signed or endpoint in ('ticker/price', 'ticker/bookTicker', 'depth')
+            return self.transport.request_sync(
+                f"{self.base_url}/{endpoint}", params,
+                headers={"X-MBX-APIKEY": self.binance_api_key},
+                priority=Priority.LIVE if live else Priority.NORMAL,
+                weight=request_weight(endpoint, params),
+                signer=sign_params(self.binance_secret_key) if signed else None
+            )
             
+        except BinanceTransportError as e:
+            self.logger.error(f"Binance API error: {e}")
+            return self._advanced_simulation(endpoint, params)
         except Exception as e:
             self.logger.error(f"Binance API error: {e}")
             return self._advanced_simulation(endpoint, params)
     
+    def get_klines_data(self, symbol: str, interval: str = '1h', limit: int = 100) -> pd.DataFrame:
+        """נרות אחרונים - מהחוצץ החי כשהזוג מנוי ומתעדכן, אחרת REST (והתוצאה זורעת את החוצץ)"""
+        try:
+            buffer = self.kline_stream.buffer
+            # זוג שנזרע רק מ-REST ולא נרשם ל-stream לא מתעדכן - לא מגישים ממנו
+            if self.kline_stream.is_series_live(symbol, interval) and buffer.size(symbol, interval) >= limit:
+                return buffer.get_frame(symbol, interval, limit)
+            
+            rows = self._binance_request('klines', {'symbol': symbol, 'interval': interval, 'limit': limit})
+            if not isinstance(rows, list) or not rows:
+                return pd.DataFrame()
+            
+            buffer.apply_rest_klines(symbol, interval, rows)
+            df = klines_to_frame(rows).set_index('open_time')
+            df.index.name = 'timestamp'
+            return df[['open', 'high', 'low', 'close', 'volume']]
+            
+        except Exception as e:
+            self.logger.error(f"Error getting klines for {symbol}: {e}")
+            return pd.DataFrame()
+    
     def _advanced_simulation(self, endpoint: str, params: Dict = None) -> Dict:
         """סימולציה מתקדמת כאשר ה-API לא זמין"""
         symbol = params.get('symbol', 'TONUSDT') if params else 'TONUSDT'
@@ -176,15 +205,8 @@ class AdvancedTradingLogic:
             if df.empty:
                 return self._get_sample_technical_analysis()
             
-            # אינדיקטורים מתקדמים
-            indicators = {
-                'trend_indicators': self._calculate_trend_indicators(df),
-                'momentum_indicators': self._calculate_momentum_indicators(df),
-                'volatility_indicators': self._calculate_volatility_indicators(df),
-                'volume_indicators': self._calculate_volume_indicators(df),
-                'cycle_indicators': self._calculate_cycle_indicators(df),
-                'market_structure': self._analyze_market_structure(df)
-            }
+            # אינדיקטורים מתקדמים - בתהליך עובד אם הוגדר pool לחישובים
+            indicators = self._run_cpu('_compute_indicators', df, symbol)
             
             # ניתוח רב- timeframe
             multi_timeframe_analysis = self._multi_timeframe_analysis(symbol)
@@ -203,20 +225,37 @@ class AdvancedTradingLogic:
             self.logger.error(f"Error in advanced technical analysis: {e}")
             return self._get_sample_technical_analysis()
     
+    def _compute_indicators(self, df: pd.DataFrame, symbol: str) -> Dict:
+        """מחשב את כל קבוצות האינדיקטורים - כל (אינדיקטור, פרמטרים) מחושב פעם אחת בהקשר"""
+        with indicator_registry.request_context(f"trading_{symbol}"):
+            return {
+                'trend_indicators': self._calculate_trend_indicators(df),
+                'momentum_indicators': self._calculate_momentum_indicators(df),
+                'volatility_indicators': self._calculate_volatility_indicators(df),
+                'volume_indicators': self._calculate_volume_indicators(df),
+                'cycle_indicators': self._calculate_cycle_indicators(df),
+                'market_structure': self._analyze_market_structure(df)
+            }
+    
     def _calculate_trend_indicators(self, df: pd.DataFrame) -> Dict:
         """מחשב אינדיקטורי מגמה מתקדמים"""
         try:
+            series = indicator_registry.resolve_many(df, {
+                'ema_9': ('ema', {'window': 9}),
+                'ema_21': ('ema', {'window': 21}),
+                'ema_50': ('ema', {'window': 50}),
+                'ema_200': ('ema', {'window': 200}),
+                'adx': ('adx', {'window': 14}),
+                'plus_di': ('plus_di', {'window': 14}),
+                'minus_di': ('minus_di', {'window': 14})
+            })
+            
             # ממוצעים נעים
-            ema_9 = EMAIndicator(close=df['close'], window=9).ema_indicator()
-            ema_21 = EMAIndicator(close=df['close'], window=21).ema_indicator()
-            ema_50 = EMAIndicator(close=df['close'], window=50).ema_indicator()
-            ema_200 = EMAIndicator(close=df['close'], window=200).ema_indicator()
+            ema_9, ema_21 = series['ema_9'], series['ema_21']
+            ema_50, ema_200 = series['ema_50'], series['ema_200']
             
             # ADX - Average Directional Index
-            adx_indicator = ADXIndicator(high=df['high'], low=df['low'], close=df['close'], window=14)
-            adx = adx_indicator.adx()
-            plus_di = adx_indicator.adx_pos()
-            minus_di = adx_indicator.adx_neg()
+            adx, plus_di, minus_di = series['adx'], series['plus_di'], series['minus_di']
             
             # Ichimoku Cloud
             ichimoku = self._calculate_ichimoku(df)
@@ -250,19 +289,26 @@ class AdvancedTradingLogic:
     def _calculate_momentum_indicators(self, df: pd.DataFrame) -> Dict:
         """מחשב אינדיקטורי מומנטום מתקדמים"""
         try:
+            series = indicator_registry.resolve_many(df, {
+                'rsi': ('rsi', {'window': 14}),
+                'macd': ('macd', {}),
+                'macd_signal': ('macd_signal', {}),
+                'macd_diff': ('macd_diff', {}),
+                'stoch_k': ('stoch_k', {}),
+                'stoch_d': ('stoch_d', {})
+            })
+            
             # RSI
-            rsi = RSIIndicator(close=df['close'], window=14).rsi()
+            rsi = series['rsi']
             
             # MACD
-            macd_indicator = MACD(close=df['close'])
-            macd_line = macd_indicator.macd()
-            macd_signal = macd_indicator.macd_signal()
-            macd_histogram = macd_indicator.macd_diff()
+            macd_line = series['macd']
+            macd_signal = series['macd_signal']
+            macd_histogram = series['macd_diff']
             
             # Stochastic
-            stoch = StochasticOscillator(high=df['high'], low=df['low'], close=df['close'])
-            stoch_k = stoch.stoch()
-            stoch_d = stoch.stoch_signal()
+            stoch_k = series['stoch_k']
+            stoch_d = series['stoch_d']
             
             # Williams %R
             williams_r = self._calculate_williams_r(df)
@@ -298,15 +344,20 @@ class AdvancedTradingLogic:
     def _calculate_volatility_indicators(self, df: pd.DataFrame) -> Dict:
         """מחשב אינדיקטורי תנודתיות"""
         try:
+            series = indicator_registry.resolve_many(df, {
+                'bb_upper': ('bb_upper', {'window': 20, 'window_dev': 2}),
+                'bb_lower': ('bb_lower', {'window': 20, 'window_dev': 2}),
+                'bb_middle': ('bb_middle', {'window': 20}),
+                'atr': ('atr', {'window': 14})
+            })
+            
             # Bollinger Bands
-            bb = BollingerBands(close=df['close'], window=20, window_dev=2)
-            bb_upper = bb.bollinger_hband()
-            bb_lower = bb.bollinger_lband()
-            bb_middle = bb.bollinger_mavg()
+            bb_upper = series['bb_upper']
+            bb_lower = series['bb_lower']
+            bb_middle = series['bb_middle']
             
             # ATR - Average True Range
-            atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14)
-            atr_value = atr.average_true_range()
+            atr_value = series['atr']
             
             # Keltner Channel
             keltner = self._calculate_keltner_channel(df)
@@ -366,10 +417,10 @@ class AdvancedTradingLogic:
                 return self._get_sample_volume_analysis()
             
             # OBV - On Balance Volume
-            obv = OnBalanceVolumeIndicator(close=df['close'], volume=df['volume']).on_balance_volume()
+            obv = indicator_registry.resolve(df, 'obv')
             
             # VWAP - Volume Weighted Average Price
-            vwap = VolumeWeightedAveragePrice(high=df['high'], low=df['low'], close=df['close'], volume=df['volume']).volume_weighted_average_price()
+            vwap = indicator_registry.resolve(df, 'vwap')
             
             # Accumulation/Distribution
             adl = self._calculate_adl(df)
@@ -413,7 +464,7 @@ class AdvancedTradingLogic:
             current_price = df['close'].iloc[-1]
             
             # סימולצית חיזוי (בפועל זה יהיה מודל ML אמיתי)
-            predictions = self._simulate_ml_predictions(df)
+            predictions = self._run_cpu('_simulate_ml_predictions', df)
             
             return {
                 'predicted_price_1h': round(predictions['1h'], 4),
@@ -494,16 +545,21 @@ class AdvancedTradingLogic:
             self.logger.error(f"Error generating trading signals: {e}")
             return {'action': 'HOLD', 'confidence': 0.5}
     
-    def multi_symbol_analysis(self) -> Dict:
-        """ניתוח מרובה מטבעות מתקדם"""
-        symbols = ['TONUSDT', 'BNBUSDT', 'BTCUSDT']
-        analyses = {}
+    def multi_symbol_analysis(self, symbols: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                              symbol_timeout: Optional[float] = None) -> Dict:
+        """ניתוח מרובה מטבעות מתקדם - במקביל, עם timeout לכל מטבע ותוצאות חלקיות"""
+        symbols = list(dict.fromkeys(symbols or self.symbol_configs))
+        started = time.time()
+        analyses, execution = self._run_symbol_analyses(
+            symbols,
+            max_workers or self.analysis_config['max_workers'],
+            symbol_timeout or self.analysis_config['symbol_timeout']
+        )
         portfolio_recommendations = []
         
         for symbol in symbols:
             try:
-                analysis = self.comprehensive_analysis(symbol)
-                analyses[symbol] = analysis
+                analysis = analyses[symbol]
                 
                 # המלצות תיק
                 if analysis['trading_signals']['action'] in ['STRONG_BUY', 'BUY']:
@@ -520,9 +576,11 @@ class AdvancedTradingLogic:
         
         # ניתוח תיק כולל
         portfolio_analysis = self._analyze_portfolio(analyses, portfolio_recommendations)
+        execution['duration_ms'] = round((time.time() - started) * 1000, 1)
         
         return {
             'analyses': analyses,
+            'execution': execution,
             'portfolio_recommendations': portfolio_recommendations,
             'portfolio_analysis': portfolio_analysis,
             'market_correlation': self._analyze_market_correlation(analyses),
@@ -530,6 +588,110 @@ class AdvancedTradingLogic:
             'timestamp': datetime.now().isoformat()
         }
     
+    # =============================================
+    # ⚡ CONCURRENT EXECUTION
+    # =============================================
+    
+    def _run_symbol_analyses(self, symbols: List[str], max_workers: int,
+                             symbol_timeout: float) -> Tuple[Dict, Dict]:
+        """מריץ comprehensive_analysis לכל מטבע ב-thread pool - מטבע שחורג מה-timeout מקבל ניתוח גיבוי"""
+        executor = self._get_io_executor(max_workers)
+        started_at: Dict[str, float] = {}
+        
+        def run(symbol: str) -> Dict:
+            started_at[symbol] = time.time()
+            return self.comprehensive_analysis(symbol)
+        
+        futures = {executor.submit(run, symbol): symbol for symbol in symbols}
+        deadline = time.time() + self.analysis_config['batch_timeout']
+        pending = set(futures)
+        analyses, timed_out, failed = {}, [], []
+        
+        while pending:
+            now = time.time()
+            expiries = [started_at[futures[f]] + symbol_timeout for f in pending if futures[f] in started_at]
+            next_expiry = min(expiries + [deadline])
+            done, pending = wait(pending, timeout=max(next_expiry - now, 0.01), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                symbol = futures[future]
+                try:
+                    analyses[symbol] = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error analyzing {symbol}: {e}")
+                    analyses[symbol] = self._get_fallback_analysis(symbol)
+                    failed.append(symbol)
+            
+            now = time.time()
+            for future in list(pending):
+                symbol = futures[future]
+                started = started_at.get(symbol)
+                if now >= deadline or (started is not None and now - started >= symbol_timeout):
+                    # thread שכבר רץ לא ניתן לעצירה - התוצאה שלו פשוט לא תיכלל
+                    future.cancel()
+                    pending.discard(future)
+                    timed_out.append(symbol)
+                    analyses[symbol] = {**self._get_fallback_analysis(symbol), 'error': 'Analysis timed out'}
+        
+        if timed_out:
+            self.logger.warning(f"⏱️ Multi-symbol analysis timed out for: {', '.join(timed_out)}")
+        
+        execution = {
+            'symbols': len(symbols),
+            'completed': len(symbols) - len(timed_out) - len(failed),
+            'timed_out': timed_out,
+            'failed': failed,
+            'partial': bool(timed_out or failed),
+            'max_workers': max_workers,
+            'cpu_workers': self.analysis_config['cpu_workers']
+        }
+        return {symbol: analyses[symbol] for symbol in symbols}, execution
+    
+    def _get_io_executor(self, max_workers: int) -> ThreadPoolExecutor:
+        """thread pool משותף ל-I/O - נבנה מחדש רק אם גודל המקביליות השתנה"""
+        with self._executor_lock:
+            if self._io_executor is None or self._io_workers != max_workers:
+                # בלי shutdown - בקשות שכבר מחזיקות את ה-pool הישן ממשיכות להגיש אליו; ה-threads
+                # שלו יוצאים לבד כשהתור מתרוקן ואין עוד הפניות אליו
+                self._io_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='symbol-analysis')
+                self._io_workers = max_workers
+            return self._io_executor
+    
+    def _get_cpu_executor(self) -> Optional[ThreadPoolExecutor]:
+        """pool לחישובי אינדיקטורים ו-ML - None כאשר cpu_workers=0.
+
+        threads ולא תהליכים: spawn מתוך השרת מריץ מחדש את מודול ה-main (כל האתחול של app) בכל עובד,
+        והקרנלים של numpy משחררים את ה-GIL ממילא.
+        """
+        if self.analysis_config['cpu_workers'] <= 0:
+            return None
+        with self._executor_lock:
+            if self._cpu_executor is None:
+                self._cpu_executor = ThreadPoolExecutor(
+                    max_workers=self.analysis_config['cpu_workers'],
+                    thread_name_prefix='analysis-compute'
+                )
+            return self._cpu_executor
+    
+    def _run_cpu(self, method_name: str, *args):
+        """מריץ מתודת חישוב ב-pool החישובים, או באותו thread אם אין pool"""
+        executor = self._get_cpu_executor()
+        if executor is None:
+            return getattr(self, method_name)(*args)
+        
+        return executor.submit(getattr(self, method_name), *args).result(
+            timeout=self.analysis_config['symbol_timeout']
+        )
+    
+    def shutdown(self):
+        """סוגר את ה-pools (בכיבוי השרת)"""
+        with self._executor_lock:
+            for executor in (self._io_executor, self._cpu_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._io_executor = None
+            self._cpu_executor = None
+    
     # helper methods נוספים...
     
     def _simulate_advanced_klines(self, symbol: str, limit: int, interval: str) -> List:
@@ -539,13 +701,26 @@ class AdvancedTradingLogic:
     
     def _calculate_ichimoku(self, df: pd.DataFrame) -> Dict:
         """מחשב Ichimoku Cloud"""
-        # מימוש Ichimoku
-        pass
+        ichimoku = indicator_registry.resolve(df, 'ichimoku').iloc[-1]
+        price = df['close'].iloc[-1]
+        
+        return {
+            'conversion_line': round(ichimoku['conversion'], 4),
+            'base_line': round(ichimoku['base'], 4),
+            'leading_span_a': round(ichimoku['span_a'], 4),
+            'leading_span_b': round(ichimoku['span_b'], 4),
+            'cloud_position': 'ABOVE_CLOUD' if price > max(ichimoku['span_a'], ichimoku['span_b']) else
+                              'BELOW_CLOUD' if price < min(ichimoku['span_a'], ichimoku['span_b']) else 'IN_CLOUD'
+        }
     
     def _calculate_parabolic_sar(self, df: pd.DataFrame) -> Dict:
         """מחשב Parabolic SAR"""
-        # מימוש Parabolic SAR
-        pass
+        psar = indicator_registry.resolve(df, 'psar')
+        
+        return {
+            'value': round(psar.iloc[-1], 4),
+            'trend': 'BULLISH' if df['close'].iloc[-1] > psar.iloc[-1] else 'BEARISH'
+        }
     
     def _check_ma_alignment(self, ema_9, ema_21, ema_50, ema_200) -> str:
         """בודק יישור ממוצעים נעים"""
@@ -1,12 +1,17 @@
 import pandas as pd
 import numpy as np
+from datetime import datetime
 from typing import Dict, List, Tuple
 import logging
 from scipy.stats import pearsonr
 
+from correlation_service import correlation_strength
+
 class CorrelationAnalyzer:
-    def __init__(self):
+    def __init__(self, correlation_service=None):
         self.logger = logging.getLogger(__name__)
+        # מטריצה מתגלגלת מהנרות השמורים/החיים - אם קיימת, multi_symbol_correlation קורא ממנה
+        self.correlation_service = correlation_service
     
     def analyze_correlation(self, symbol1: str, symbol2: str, period: int = 30) -> Dict:
         """מנתח קורלציה בין שני מטבעות"""
@@ -38,17 +43,16 @@ class CorrelationAnalyzer:
     def multi_symbol_correlation(self, symbols: List[str]) -> pd.DataFrame:
         """מנתח קורלציה בין מספר מטבעות"""
         try:
-            corr_matrix = pd.DataFrame(index=symbols, columns=symbols)
+            if self.correlation_service is not None and self.correlation_service.covers(symbols):
+                return self.correlation_service.matrix(symbols=symbols)
             
-            for i, sym1 in enumerate(symbols):
-                for j, sym2 in enumerate(symbols):
-                    if i == j:
-                        corr_matrix.loc[sym1, sym2] = 1.0
-                    else:
-                        correlation = self.analyze_correlation(sym1, sym2)
-                        corr_matrix.loc[sym1, sym2] = correlation.get('correlation_coefficient', 0)
+            # כל זוג פעם אחת - המטריצה סימטרית
+            corr_matrix = np.eye(len(symbols))
+            for i, j in zip(*np.triu_indices(len(symbols), k=1)):
+                correlation = self.analyze_correlation(symbols[i], symbols[j])
+                corr_matrix[i, j] = corr_matrix[j, i] = correlation.get('correlation_coefficient', 0)
             
-            return corr_matrix
+            return pd.DataFrame(corr_matrix, index=symbols, columns=symbols)
             
         except Exception as e:
             self.logger.error(f"Error in multi-symbol correlation: {e}")
@@ -76,18 +80,7 @@ class CorrelationAnalyzer:
     
     def _get_correlation_strength(self, correlation: float) -> str:
         """מחזיר חוזק קורלציה"""
-        abs_corr = abs(correlation)
-        
-        if abs_corr >= 0.8:
-            return "VERY_STRONG"
-        elif abs_corr >= 0.6:
-            return "STRONG"
-        elif abs_corr >= 0.4:
-            return "MODERATE"
-        elif abs_corr >= 0.2:
-            return "WEAK"
-        else:
-            return "VERY_WEAK"
+        return correlation_strength(correlation)
     
     def _get_sample_data(self, symbol: str, period: int) -> Dict:
         """נתוני דמה - בפועל יגיעו מ-API"""
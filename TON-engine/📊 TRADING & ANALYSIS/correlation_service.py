@@ -0,0 +1,266 @@
+import pandas as pd
+import numpy as np
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+def correlation_strength(correlation: float) -> str:
+    """חוזק קורלציה לפי הערך המוחלט"""
+    abs_corr = abs(correlation)
+
+    if abs_corr >= 0.8:
+        return "VERY_STRONG"
+    elif abs_corr >= 0.6:
+        return "STRONG"
+    elif abs_corr >= 0.4:
+        return "MODERATE"
+    elif abs_corr >= 0.2:
+        return "WEAK"
+    else:
+        return "VERY_WEAK"
+
+
+class _RollingCovariance:
+    """Σx ו-Σxy לכל זוגות הסימלים על חלון מתגלגל - עדכון O(N²) לכל נר (Σx² הוא האלכסון של Σxy)"""
+
+    def __init__(self, window: int, n_symbols: int):
+        self.window = window
+        self.buffer = np.zeros((window, n_symbols))
+        self.pos = 0
+        self.count = 0
+        self.total = np.zeros(n_symbols)
+        self.products = np.zeros((n_symbols, n_symbols))
+
+    def update(self, x: np.ndarray):
+        if self.count >= self.window:
+            old = self.buffer[self.pos]
+            self.total -= old
+            self.products -= np.outer(old, old)
+        else:
+            self.count += 1
+
+        self.buffer[self.pos] = x
+        self.total += x
+        self.products += np.outer(x, x)
+        self.pos = (self.pos + 1) % self.window
+
+        # סנכרון מחדש בכל סיבוב של ה-buffer כדי למנוע צבירת שגיאות עיגול
+        if self.pos == 0:
+            self.total = self.buffer.sum(axis=0)
+            self.products = self.buffer.T @ self.buffer
+
+    def ready(self) -> bool:
+        return self.count >= 2
+
+    def correlation(self) -> np.ndarray:
+        """מטריצת קורלציה (N x N); NaN לסימל בלי תנודה בחלון"""
+        if not self.ready():
+            return np.full(self.products.shape, np.nan)
+        mean = self.total / self.count
+        cov = self.products / self.count - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        np.fill_diagonal(corr, 1.0)
+        return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationService:
+    """מטריצת קורלציה מתגלגלת לכל זוגות הסימלים, מעודכנת בכל נר סגור.
+
+    כל נר שנסגר לכל הסימלים (אותו open_time) נכנס כשורת תשואות לכל החלונות; המטריצה וההיסטוריה
+    נקראות מהזיכרון בלי חישוב מחדש על החלון.
+    """
+
+    def __init__(self, symbols: List[str], interval: str = '1h', windows: Tuple[int, ...] = (24, 168, 720),
+                 history: int = 720, default_window: Optional[int] = None, max_pending: int = 8):
+        self.logger = logging.getLogger(__name__)
+        self.symbols = [s.upper() for s in symbols]
+        self.interval = interval
+        self.windows = tuple(sorted(windows))
+        self.default_window = default_window if default_window in self.windows else self.windows[0]
+        self.max_pending = max_pending
+        self._lock = threading.RLock()
+        self._column = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._rolling = {window: _RollingCovariance(window, len(self.symbols)) for window in self.windows}
+
+        # closes של נרות שעוד לא הגיעו לכל הסימלים: open_time -> {symbol: close}
+        self._pending: Dict[int, Dict[str, float]] = {}
+        self._last_close = np.full(len(self.symbols), np.nan)
+        self.last_open_time: Optional[int] = None
+
+        # היסטוריה: מטריצה לכל חלון בכל נר (ring buffer, float32)
+        self.history_size = history
+        self._history = {window: np.full((history, len(self.symbols), len(self.symbols)), np.nan, dtype=np.float32)
+                         for window in self.windows}
+        self._history_times = np.zeros(history, dtype=np.int64)
+        self._history_pos = 0
+        self._history_count = 0
+        self.stats = {'bars': 0, 'dropped_incomplete': 0, 'seeded_bars': 0}
+
+    # =============================================
+    # 📥 UPDATES
+    # =============================================
+
+    def on_bar(self, symbol: str, interval: str, bar: Dict):
+        """listener ל-LiveCandleBuffer - callback(symbol, interval, bar) לכל נר שנסגר"""
+        if interval != self.interval or symbol.upper() not in self._column:
+            return
+        self.update(symbol, int(bar['open_time']), float(bar['close']))
+
+    def update(self, symbol: str, open_time: int, close: float):
+        """close של נר סגור לסימל אחד; השורה נכנסת לחלונות כשהנר הגיע לכל הסימלים"""
+        with self._lock:
+            if self.last_open_time is not None and open_time <= self.last_open_time:
+                return
+            self._pending.setdefault(open_time, {})[symbol.upper()] = close
+            complete = [t for t, closes in self._pending.items() if len(closes) == len(self.symbols)]
+            for t in sorted(complete):
+                if self.last_open_time is None or t > self.last_open_time:
+                    closes = self._pending[t]
+                    self._apply(t, np.array([closes[s] for s in self.symbols]))
+            # נרות ישנים שלא הושלמו - הסימל החסר ימשיך מה-close האחרון שלו
+            stale = [t for t in self._pending if self.last_open_time is not None and t <= self.last_open_time]
+            self.stats['dropped_incomplete'] += sum(1 for t in stale if len(self._pending[t]) < len(self.symbols))
+            for t in stale:
+                del self._pending[t]
+            # סימל שהפסיק לדווח לא מחזיק את השאר לנצח
+            while len(self._pending) > self.max_pending:
+                del self._pending[min(self._pending)]
+                self.stats['dropped_incomplete'] += 1
+
+    def _apply(self, open_time: int, closes: np.ndarray):
+        previous = self._last_close
+        self._last_close = closes
+        self.last_open_time = open_time
+        if np.isnan(previous).any():
+            return
+
+        returns = np.log(closes / previous)
+        for window, rolling in self._rolling.items():
+            rolling.update(returns)
+            self._history[window][self._history_pos] = rolling.correlation()
+        self._history_times[self._history_pos] = open_time
+        self._history_pos = (self._history_pos + 1) % self.history_size
+        self._history_count = min(self._history_count + 1, self.history_size)
+        self.stats['bars'] += 1
+
+    def sync_from_store(self, ohlcv_store) -> int:
+        """משלים מה-store נרות שנסגרו אחרי האחרון שנקלט (בעלייה - את כל החלון וההיסטוריה)"""
+        bars = max(self.windows) + self.history_size + 1
+        closes = {}
+        for symbol in self.symbols:
+            if self.last_open_time is None:
+                df = ohlcv_store.read_last(symbol, self.interval, bars, columns=['close'])
+            else:
+                df = ohlcv_store.read_range(symbol, self.interval, start=self.last_open_time + 1, columns=['close'])
+            closes[symbol] = df['close']
+
+        # ציר זמן משותף - רק נרות שקיימים בכל הסימלים
+        frame = pd.DataFrame(closes).dropna()
+        if frame.empty:
+            return 0
+        open_times = frame.index.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        values = frame[self.symbols].to_numpy(dtype=float)
+        with self._lock:
+            applied = 0
+            for open_time, row in zip(open_times, values):
+                if self.last_open_time is None or open_time > self.last_open_time:
+                    self._apply(int(open_time), row)
+                    applied += 1
+            self.stats['seeded_bars'] += applied
+        if applied:
+            self.logger.info(f"🔗 Correlation service synced {applied} bars for {len(self.symbols)} symbols")
+        return applied
+
+    # =============================================
+    # 📊 QUERIES
+    # =============================================
+
+    def _window(self, window: Optional[int]) -> int:
+        return window if window in self._rolling else self.default_window
+
+    def matrix(self, window: Optional[int] = None, symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """מטריצת הקורלציה הנוכחית (float) - כל הסימלים או תת-קבוצה"""
+        with self._lock:
+            corr = self._rolling[self._window(window)].correlation()
+        frame = pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+        if symbols is not None:
+            symbols = [s.upper() for s in symbols]
+            frame = frame.loc[symbols, symbols]
+        return frame
+
+    def covers(self, symbols: List[str], window: Optional[int] = None) -> bool:
+        """True אם כל הסימלים במעקב ויש מספיק נרות בחלון"""
+        return (all(s.upper() in self._column for s in symbols)
+                and self._rolling[self._window(window)].count >= self._window(window))
+
+    def top_pairs(self, k: int = 5, window: Optional[int] = None, least: bool = False) -> List[Dict]:
+        """k הזוגות עם הקורלציה הגבוהה (או הנמוכה) ביותר"""
+        window = self._window(window)
+        with self._lock:
+            corr = self._rolling[window].correlation()
+        rows, cols = np.triu_indices(len(self.symbols), k=1)
+        values = corr[rows, cols]
+        valid = ~np.isnan(values)
+        rows, cols, values = rows[valid], cols[valid], values[valid]
+        order = np.argsort(values if least else -values)[:k]
+        return [{
+            'symbols': f"{self.symbols[rows[i]]}/{self.symbols[cols[i]]}",
+            'symbol1': self.symbols[rows[i]],
+            'symbol2': self.symbols[cols[i]],
+            'correlation': round(float(values[i]), 4),
+            'strength': correlation_strength(values[i]),
+            'window': window
+        } for i in order]
+
+    def history(self, symbol1: str, symbol2: str, window: Optional[int] = None,
+                limit: Optional[int] = None) -> List[Dict]:
+        """קורלציית הזוג בכל נר (הישן ראשון)"""
+        window = self._window(window)
+        i, j = self._column[symbol1.upper()], self._column[symbol2.upper()]
+        with self._lock:
+            count = self._history_count if limit is None else min(limit, self._history_count)
+            positions = (self._history_pos - count + np.arange(count)) % self.history_size
+            values = self._history[window][positions, i, j]
+            times = self._history_times[positions]
+        return [{'open_time': int(t), 'timestamp': pd.Timestamp(int(t), unit='ms').isoformat(),
+                 'correlation': None if np.isnan(v) else round(float(v), 4)} for t, v in zip(times, values)]
+
+    def snapshot(self, k: int = 5, window: Optional[int] = None) -> Dict:
+        """מטריצה וזוגות קיצוניים - לדשבורד ול-API"""
+        window = self._window(window)
+        matrix = self.matrix(window).round(4)
+        return {
+            'window': window,
+            'interval': self.interval,
+            'symbols': self.symbols,
+            'matrix': matrix.where(matrix.notna(), None).values.tolist(),
+            'most_correlated': self.top_pairs(k, window),
+            'least_correlated': self.top_pairs(k, window, least=True),
+            'last_bar': None if self.last_open_time is None else pd.Timestamp(self.last_open_time, unit='ms').isoformat(),
+            'bars_in_window': min(self._rolling[window].count, window),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'symbols': len(self.symbols), 'windows': list(self.windows),
+                'pending_bars': len(self._pending), 'history': self._history_count,
+                'last_open_time': self.last_open_time}
+
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_correlation_service(symbols: Optional[List[str]] = None, interval: str = '1h',
+                            windows: Tuple[int, ...] = (24, 168, 720), history: int = 720,
+                            default_window: Optional[int] = None) -> CorrelationService:
+    """שירות קורלציה משותף לכל הרכיבים בתהליך"""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            _shared_service = CorrelationService(symbols or [], interval, windows, history, default_window)
+        return _shared_service
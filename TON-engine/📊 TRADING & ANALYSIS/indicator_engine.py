@@ -0,0 +1,765 @@
+import pandas as pd
+import numpy as np
+import logging
+import threading
+import copy
+import math
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+NAN = float('nan')
+
+# משך כל interval במילישניות - לזיהוי נר שעדיין לא נסגר
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000,
+    '1w': 604_800_000
+}
+
+# =============================================
+# 🧮 STREAMING PRIMITIVES
+# =============================================
+
+class _EMA:
+    """ממוצע נע מעריכי (adjust=False) - זהה ל-ewm של pandas"""
+
+    def __init__(self, alpha: float, min_periods: int):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        if x != x:  # NaN - ewm מדלג על ערכים חסרים
+            return self.value if self.count >= self.min_periods else NAN
+
+        self.value = x if self.count == 0 else self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.value if self.count >= self.min_periods else NAN
+
+
+class _RollingWindow:
+    """חלון מתגלגל עם סכומים רצים - ממוצע וסטיית תקן ב-O(1)"""
+
+    def __init__(self, window: int, min_periods: Optional[int] = None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.buffer = np.zeros(window)
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, x: float):
+        if self.count >= self.window:
+            old = self.buffer[self.pos]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+
+        self.buffer[self.pos] = x
+        self.total += x
+        self.total_sq += x * x
+        self.pos = (self.pos + 1) % self.window
+
+        # סנכרון מחדש בכל סיבוב של ה-buffer כדי למנוע צבירת שגיאות עיגול
+        if self.pos == 0:
+            self.total = float(self.buffer.sum())
+            self.total_sq = float(np.dot(self.buffer, self.buffer))
+
+    def ready(self) -> bool:
+        return self.count >= self.min_periods and self.count > 0
+
+    def mean(self) -> float:
+        return self.total / self.count if self.ready() else NAN
+
+    def std(self) -> float:
+        """סטיית תקן אוכלוסייה (ddof=0) כמו ב-BollingerBands של ta"""
+        if not self.ready():
+            return NAN
+        mean = self.total / self.count
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+
+class _RollingExtreme:
+    """מקסימום/מינימום מתגלגל עם deque מונוטוני - O(1) לשלב"""
+
+    def __init__(self, window: int, mode: str = 'max', min_periods: Optional[int] = None):
+        self.window = window
+        self.is_max = mode == 'max'
+        self.min_periods = window if min_periods is None else min_periods
+        self.items = deque()
+        self.index = -1
+
+    def update(self, x: float) -> float:
+        self.index += 1
+        items = self.items
+
+        if self.is_max:
+            while items and items[-1][1] <= x:
+                items.pop()
+        else:
+            while items and items[-1][1] >= x:
+                items.pop()
+        items.append((self.index, x))
+
+        if items[0][0] <= self.index - self.window:
+            items.popleft()
+
+        if min(self.index + 1, self.window) < self.min_periods:
+            return NAN
+        return items[0][1]
+
+
+class _Wilder:
+    """החלקת Wilder שמתחילה בממוצע של N הערכים הראשונים (ATR/ADX)"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.seed = []
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if self.seed is not None:
+            self.seed.append(x)
+            if len(self.seed) == self.window:
+                self.value = sum(self.seed) / self.window
+                self.seed = None
+            return self.value
+
+        self.value = (self.value * (self.window - 1) + x) / self.window
+        return self.value
+
+
+# =============================================
+# 📈 STREAMING STATE PER SERIES
+# =============================================
+
+class StreamingIndicatorState:
+    """מצב אינדיקטורים מצטבר עבור סימל ו-interval - כל נר סגור מקדם את המצב ב-O(1)
+
+    הערכים תואמים ל-ta כאשר שניהם מחושבים מאותו נר התחלתי. לאחר שהמצב ממשיך
+    מעבר ל-DataFrame שממנו נזרע, ערכי EMA/Wilder משקפים את כל ההיסטוריה ולא חלון חתוך.
+    """
+
+    OUTPUTS = [
+        'close', 'high', 'low', 'volume',
+        'ema_9', 'ema_21', 'ema_50', 'ema_200',
+        'adx', 'plus_di', 'minus_di',
+        'ichimoku_conversion', 'ichimoku_base', 'ichimoku_a', 'ichimoku_b',
+        'psar', 'psar_up_trend',
+        'rsi', 'macd', 'macd_signal', 'macd_diff',
+        'stoch_k', 'stoch_d', 'williams_r', 'roc',
+        'bb_upper', 'bb_middle', 'bb_lower', 'atr',
+        'kc_upper', 'kc_middle', 'kc_lower',
+        'dc_upper', 'dc_middle', 'dc_lower',
+        'obv', 'vwap', 'adl', 'volume_sma_20'
+    ]
+
+    def __init__(self, config: Optional[Dict] = None, history_size: int = 50):
+        self.config = config or self.default_config()
+        self.history_size = history_size
+        self.bars = 0
+        self.last_open_time = None
+        self.last_close = NAN
+        self.latest = {name: NAN for name in self.OUTPUTS}
+
+        self._column = {name: i for i, name in enumerate(self.OUTPUTS)}
+        self._history = np.full((history_size, len(self.OUTPUTS)), np.nan)
+        self._history_times = np.zeros(history_size, dtype=np.int64)
+        self._history_pos = 0
+
+        self._setup_state()
+
+    @staticmethod
+    def default_config() -> Dict:
+        """פרמטרים זהים לברירות המחדל של ta ולהגדרות ה-analyzer"""
+        return {
+            'ema_windows': [9, 21, 50, 200],
+            'rsi': 14,
+            'macd': {'fast': 12, 'slow': 26, 'signal': 9},
+            'adx': 14,
+            'atr': 14,
+            'ichimoku': {'conversion': 9, 'base': 26, 'span_b': 52},
+            'psar': {'step': 0.02, 'max_step': 0.20},
+            'stochastic': {'k_period': 14, 'd_period': 3},
+            'williams_r': 14,
+            'roc': 12,
+            'bollinger': {'period': 20, 'std_dev': 2},
+            'keltner': 20,
+            'donchian': 20,
+            'vwap': 14,
+            'volume_sma': 20
+        }
+
+    def _setup_state(self):
+        """מאתחל את כל צוברי המצב"""
+        cfg = self.config
+
+        # מגמה
+        self._emas = {w: _EMA(2.0 / (w + 1), w) for w in cfg['ema_windows']}
+        self._macd_fast = _EMA(2.0 / (cfg['macd']['fast'] + 1), cfg['macd']['fast'])
+        self._macd_slow = _EMA(2.0 / (cfg['macd']['slow'] + 1), cfg['macd']['slow'])
+        self._macd_signal = _EMA(2.0 / (cfg['macd']['signal'] + 1), cfg['macd']['signal'])
+
+        # RSI - החלקת Wilder כ-ewm(alpha=1/n)
+        rsi_window = cfg['rsi']
+        self._rsi_up = _EMA(1.0 / rsi_window, rsi_window)
+        self._rsi_down = _EMA(1.0 / rsi_window, rsi_window)
+
+        # ATR
+        self._atr = _Wilder(cfg['atr'])
+
+        # ADX - סכומי Wilder של TR/+DM/-DM
+        self._adx_window = cfg['adx']
+        self._adx_seed = [0.0, 0.0, 0.0]
+        self._adx_sums = None
+        self._adx_dx_seed = []
+        self._adx_value = NAN
+
+        # Ichimoku
+        ichi = cfg['ichimoku']
+        self._conv_high = _RollingExtreme(ichi['conversion'], 'max')
+        self._conv_low = _RollingExtreme(ichi['conversion'], 'min')
+        self._base_high = _RollingExtreme(ichi['base'], 'max')
+        self._base_low = _RollingExtreme(ichi['base'], 'min')
+        self._span_b_high = _RollingExtreme(ichi['span_b'], 'max', min_periods=1)
+        self._span_b_low = _RollingExtreme(ichi['span_b'], 'min', min_periods=1)
+
+        # PSAR
+        self._psar = {
+            'up_trend': True,
+            'af': cfg['psar']['step'],
+            'up_high': NAN,
+            'down_low': NAN,
+            'value': NAN,
+            'highs': deque(maxlen=2),
+            'lows': deque(maxlen=2)
+        }
+
+        # מתנדים
+        stoch = cfg['stochastic']
+        self._stoch_high = _RollingExtreme(stoch['k_period'], 'max')
+        self._stoch_low = _RollingExtreme(stoch['k_period'], 'min')
+        self._stoch_d = _RollingWindow(stoch['d_period'])
+        self._williams_high = _RollingExtreme(cfg['williams_r'], 'max')
+        self._williams_low = _RollingExtreme(cfg['williams_r'], 'min')
+        self._roc_closes = deque(maxlen=cfg['roc'] + 1)
+
+        # תנודתיות
+        self._bb = _RollingWindow(cfg['bollinger']['period'])
+        self._kc_mid = _RollingWindow(cfg['keltner'])
+        self._kc_high = _RollingWindow(cfg['keltner'], min_periods=1)
+        self._kc_low = _RollingWindow(cfg['keltner'], min_periods=1)
+        self._dc_high = _RollingExtreme(cfg['donchian'], 'max')
+        self._dc_low = _RollingExtreme(cfg['donchian'], 'min')
+
+        # ווליום
+        self._vwap_pv = _RollingWindow(cfg['vwap'])
+        self._vwap_v = _RollingWindow(cfg['vwap'])
+        self._volume_sma = _RollingWindow(cfg['volume_sma'])
+        self._obv = 0.0
+        self._adl = 0.0
+
+        self._prev = None  # (high, low, close) של הנר הקודם
+
+    # =============================================
+    # ⏩ UPDATE
+    # =============================================
+
+    def update(self, open_time: int, high: float, low: float, close: float, volume: float) -> Dict:
+        """מקדם את המצב בנר סגור אחד ומחזיר את הערכים העדכניים"""
+        out = self.latest = {}
+        prev = self._prev
+
+        out['close'], out['high'], out['low'], out['volume'] = close, high, low, volume
+
+        # ממוצעים נעים ו-MACD
+        for window, ema in self._emas.items():
+            out[f'ema_{window}'] = ema.update(close)
+
+        fast = self._macd_fast.update(close)
+        slow = self._macd_slow.update(close)
+        macd = fast - slow
+        signal = self._macd_signal.update(macd)
+        out['macd'], out['macd_signal'], out['macd_diff'] = macd, signal, macd - signal
+
+        # RSI
+        diff = close - prev[2] if prev else 0.0
+        up = self._rsi_up.update(diff if diff > 0 else 0.0)
+        down = self._rsi_down.update(-diff if diff < 0 else 0.0)
+        if up != up or down != down:
+            out['rsi'] = NAN
+        else:
+            out['rsi'] = 100.0 if down == 0 else 100.0 - 100.0 / (1.0 + up / down)
+
+        # True Range
+        if prev:
+            true_range = max(high, prev[2]) - min(low, prev[2])
+        else:
+            true_range = high - low
+        out['atr'] = self._atr.update(true_range)
+
+        self._update_adx(out, high, low, true_range)
+        self._update_ichimoku(out, high, low)
+        self._update_psar(out, high, low, close)
+        self._update_oscillators(out, high, low, close)
+        self._update_volatility(out, high, low, close)
+        self._update_volume(out, high, low, close, volume)
+
+        self._prev = (high, low, close)
+        self.bars += 1
+        self.last_open_time = int(open_time)
+        self.last_close = close
+        self._record(open_time, out)
+        return out
+
+    def _update_adx(self, out: Dict, high: float, low: float, true_range: float):
+        """ADX/+DI/-DI - סכומי Wilder כמו ADXIndicator של ta"""
+        window = self._adx_window
+        out['adx'] = out['plus_di'] = out['minus_di'] = NAN
+
+        if self._prev is None:
+            return
+
+        prev_high, prev_low, _ = self._prev
+        diff_up = high - prev_high
+        diff_down = prev_low - low
+        pos = diff_up if (diff_up > diff_down and diff_up > 0) else 0.0
+        neg = diff_down if (diff_down > diff_up and diff_down > 0) else 0.0
+
+        bar = self.bars  # אינדקס הנר הנוכחי
+        if self._adx_sums is None:
+            self._adx_seed[0] += true_range
+            self._adx_seed[1] += pos
+            self._adx_seed[2] += neg
+            if bar < window:
+                return
+            self._adx_sums = list(self._adx_seed)
+        else:
+            tr_sum, pos_sum, neg_sum = self._adx_sums
+            self._adx_sums = [
+                tr_sum - tr_sum / window + true_range,
+                pos_sum - pos_sum / window + pos,
+                neg_sum - neg_sum / window + neg
+            ]
+
+        tr_sum, pos_sum, neg_sum = self._adx_sums
+        dip = 100.0 * pos_sum / tr_sum if tr_sum != 0 else 0.0
+        din = 100.0 * neg_sum / tr_sum if tr_sum != 0 else 0.0
+        dx = 100.0 * abs((dip - din) / (dip + din)) if (dip + din) != 0 else 0.0
+
+        # ta מחזיר 0 ל-DI בנר הראשון של ההחלקה
+        if bar > window:
+            out['plus_di'], out['minus_di'] = dip, din
+
+        if self._adx_dx_seed is not None:
+            self._adx_dx_seed.append(dx)
+            if len(self._adx_dx_seed) == window:
+                self._adx_value = sum(self._adx_dx_seed) / window
+                self._adx_dx_seed = None
+        else:
+            self._adx_value = (self._adx_value * (window - 1) + dx) / window
+
+        out['adx'] = self._adx_value
+
+    def _update_ichimoku(self, out: Dict, high: float, low: float):
+        """Ichimoku - מקסימום/מינימום מתגלגלים"""
+        conversion = 0.5 * (self._conv_high.update(high) + self._conv_low.update(low))
+        base = 0.5 * (self._base_high.update(high) + self._base_low.update(low))
+        out['ichimoku_conversion'] = conversion
+        out['ichimoku_base'] = base
+        out['ichimoku_a'] = 0.5 * (conversion + base)
+        out['ichimoku_b'] = 0.5 * (self._span_b_high.update(high) + self._span_b_low.update(low))
+
+    def _update_psar(self, out: Dict, high: float, low: float, close: float):
+        """Parabolic SAR - אותו אלגוריתם כמו PSARIndicator של ta"""
+        state = self._psar
+        step = self.config['psar']['step']
+        max_step = self.config['psar']['max_step']
+
+        if self.bars < 2:
+            if self.bars == 0:
+                state['up_high'] = high
+                state['down_low'] = low
+            state['value'] = close
+        else:
+            prev_psar = state['value']
+            low2, low1 = state['lows']
+            high2, high1 = state['highs']
+            reversal = False
+
+            if state['up_trend']:
+                psar = prev_psar + state['af'] * (state['up_high'] - prev_psar)
+                if low < psar:
+                    reversal = True
+                    psar = state['up_high']
+                    state['down_low'] = low
+                    state['af'] = step
+                else:
+                    if high > state['up_high']:
+                        state['up_high'] = high
+                        state['af'] = min(state['af'] + step, max_step)
+                    if low2 < psar:
+                        psar = low2
+                    elif low1 < psar:
+                        psar = low1
+            else:
+                psar = prev_psar - state['af'] * (prev_psar - state['down_low'])
+                if high > psar:
+                    reversal = True
+                    psar = state['down_low']
+                    state['up_high'] = high
+                    state['af'] = step
+                else:
+                    if low < state['down_low']:
+                        state['down_low'] = low
+                        state['af'] = min(state['af'] + step, max_step)
+                    if high2 > psar:
+                        psar = high2
+                    elif high1 > psar:
+                        psar = high1
+
+            state['up_trend'] = state['up_trend'] != reversal
+            state['value'] = psar
+
+        state['highs'].append(high)
+        state['lows'].append(low)
+        out['psar'] = state['value']
+        out['psar_up_trend'] = 1.0 if state['up_trend'] else 0.0
+
+    def _update_oscillators(self, out: Dict, high: float, low: float, close: float):
+        """Stochastic, Williams %R ו-ROC"""
+        highest = self._stoch_high.update(high)
+        lowest = self._stoch_low.update(low)
+        stoch_k = 100.0 * (close - lowest) / (highest - lowest) if highest != lowest else NAN
+        out['stoch_k'] = stoch_k
+        if stoch_k == stoch_k:
+            self._stoch_d.update(stoch_k)
+            out['stoch_d'] = self._stoch_d.mean()
+        else:
+            self._stoch_d = _RollingWindow(self._stoch_d.window)
+            out['stoch_d'] = NAN
+
+        highest = self._williams_high.update(high)
+        lowest = self._williams_low.update(low)
+        out['williams_r'] = -100.0 * (highest - close) / (highest - lowest) if highest != lowest else NAN
+
+        closes = self._roc_closes
+        closes.append(close)
+        if len(closes) == closes.maxlen and closes[0] != 0:
+            out['roc'] = (close - closes[0]) / closes[0] * 100.0
+        else:
+            out['roc'] = NAN
+
+    def _update_volatility(self, out: Dict, high: float, low: float, close: float):
+        """Bollinger, Keltner ו-Donchian"""
+        bb = self._bb
+        bb.update(close)
+        middle = bb.mean()
+        deviation = self.config['bollinger']['std_dev'] * bb.std()
+        out['bb_middle'] = middle
+        out['bb_upper'] = middle + deviation
+        out['bb_lower'] = middle - deviation
+
+        self._kc_mid.update((high + low + close) / 3.0)
+        self._kc_high.update((4 * high - 2 * low + close) / 3.0)
+        self._kc_low.update((-2 * high + 4 * low + close) / 3.0)
+        out['kc_middle'] = self._kc_mid.mean()
+        out['kc_upper'] = self._kc_high.mean()
+        out['kc_lower'] = self._kc_low.mean()
+
+        dc_upper = self._dc_high.update(high)
+        dc_lower = self._dc_low.update(low)
+        out['dc_upper'] = dc_upper
+        out['dc_lower'] = dc_lower
+        out['dc_middle'] = dc_lower + (dc_upper - dc_lower) / 2.0
+
+    def _update_volume(self, out: Dict, high: float, low: float, close: float, volume: float):
+        """OBV, VWAP, Accumulation/Distribution וממוצע ווליום"""
+        if self._prev is not None and close < self._prev[2]:
+            self._obv -= volume
+        else:
+            self._obv += volume
+        out['obv'] = self._obv
+
+        typical_price = (high + low + close) / 3.0
+        self._vwap_pv.update(typical_price * volume)
+        self._vwap_v.update(volume)
+        total_volume = self._vwap_v.total if self._vwap_v.ready() else NAN
+        out['vwap'] = self._vwap_pv.total / total_volume if total_volume == total_volume and total_volume != 0 else NAN
+
+        price_range = high - low
+        clv = ((close - low) - (high - close)) / price_range if price_range != 0 else 0.0
+        self._adl += clv * volume
+        out['adl'] = self._adl
+
+        self._volume_sma.update(volume)
+        out['volume_sma_20'] = self._volume_sma.mean()
+
+    # =============================================
+    # 📜 HISTORY
+    # =============================================
+
+    def _record(self, open_time: int, values: Dict):
+        """שומר את הערכים בהיסטוריה קצרה (ring buffer) עבור בדיקות iloc[-k]"""
+        row = self._history_pos % self.history_size
+        self._history[row] = [values[name] for name in self.OUTPUTS]
+        self._history_times[row] = open_time
+        self._history_pos += 1
+
+    def _ordered_rows(self) -> np.ndarray:
+        """מחזיר את שורות ההיסטוריה בסדר כרונולוגי"""
+        count = min(self._history_pos, self.history_size)
+        start = self._history_pos - count
+        return np.arange(start, self._history_pos) % self.history_size
+
+    def series(self, name: str, length: Optional[int] = None) -> pd.Series:
+        """מחזיר את ההיסטוריה האחרונה של אינדיקטור כ-Series"""
+        rows = self._ordered_rows()
+        if length:
+            rows = rows[-length:]
+        index = pd.to_datetime(self._history_times[rows], unit='ms')
+        return pd.Series(self._history[rows, self._column[name]], index=index, name=name)
+
+    def history_frame(self, length: Optional[int] = None) -> pd.DataFrame:
+        """מחזיר את ההיסטוריה האחרונה של כל האינדיקטורים"""
+        rows = self._ordered_rows()
+        if length:
+            rows = rows[-length:]
+        index = pd.to_datetime(self._history_times[rows], unit='ms')
+        return pd.DataFrame(self._history[rows], index=index, columns=self.OUTPUTS)
+
+    def preview(self, open_time: int, high: float, low: float, close: float, volume: float):
+        """מחשב ערכים לנר פתוח על עותק של המצב - ללא שינוי המצב עצמו"""
+        state = copy.deepcopy(self)
+        state.update(open_time, high, low, close, volume)
+        return state
+
+
+# =============================================
+# 🏭 ENGINE
+# =============================================
+
+class IncrementalIndicatorEngine:
+    """מנהל מצבי אינדיקטורים מצטברים לכל (symbol, interval)"""
+
+    def __init__(self, history_size: int = 50, config: Optional[Dict] = None):
+        self.history_size = history_size
+        self.config = config
+        self.states: Dict[Tuple[str, str], StreamingIndicatorState] = {}
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self.stats = {'bars_applied': 0, 'reseeds': 0, 'syncs': 0, 'previews': 0}
+
+    def _new_state(self) -> StreamingIndicatorState:
+        return StreamingIndicatorState(self.config, self.history_size)
+
+    def get_state(self, symbol: str, interval: str) -> Optional[StreamingIndicatorState]:
+        """מחזיר את המצב השמור עבור סימל ו-interval"""
+        return self.states.get((symbol.upper(), interval))
+
+    def update(self, symbol: str, interval: str, kline: Dict) -> Dict:
+        """מקדם את המצב בנר סגור אחד (למשל מ-WebSocket)"""
+        with self._lock:
+            key = (symbol.upper(), interval)
+            state = self.states.get(key)
+            if state is None:
+                state = self.states[key] = self._new_state()
+
+            open_time = int(kline.get('open_time', kline.get('t', 0)))
+            if state.last_open_time is not None and open_time <= state.last_open_time:
+                return state.latest
+
+            self.stats['bars_applied'] += 1
+            return state.update(
+                open_time,
+                float(kline.get('high', kline.get('h'))),
+                float(kline.get('low', kline.get('l'))),
+                float(kline.get('close', kline.get('c'))),
+                float(kline.get('volume', kline.get('v', 0)))
+            )
+
+    def sync(self, symbol: str, interval: str, df: pd.DataFrame,
+             now: Optional[datetime] = None) -> StreamingIndicatorState:
+        """מיישר את המצב מול DataFrame - מקדם רק נרות חדשים, וזורע מחדש רק כשאין חפיפה
+
+        נר אחרון שעדיין לא נסגר לא נכנס למצב; הוא מחושב על עותק (preview).
+        """
+        with self._lock:
+            self.stats['syncs'] += 1
+            key = (symbol.upper(), interval)
+            open_times, high, low, close, volume = self._frame_arrays(df)
+
+            # הפרדת הנר הפתוח (אם יש) מהנרות הסגורים
+            interval_ms = INTERVAL_MS.get(interval)
+            now_ms = int(pd.Timestamp(now or datetime.now(timezone.utc)).value // 10**6)
+            closed = len(open_times)
+            if interval_ms and closed and open_times[-1] + interval_ms > now_ms:
+                closed -= 1
+
+            state = self.states.get(key)
+            start = self._resume_position(state, open_times, close, closed, interval_ms)
+
+            if start is None:
+                state = self.states[key] = self._new_state()
+                start = 0
+                self.stats['reseeds'] += 1
+                self.logger.info(f"🌱 Seeding indicator state for {symbol} {interval} from {closed} bars")
+
+            for i in range(start, closed):
+                state.update(open_times[i], high[i], low[i], close[i], volume[i])
+            self.stats['bars_applied'] += max(closed - start, 0)
+
+            if closed < len(open_times) and (state.last_open_time is None or open_times[-1] > state.last_open_time):
+                self.stats['previews'] += 1
+                return state.preview(open_times[-1], high[-1], low[-1], close[-1], volume[-1])
+
+            return state
+
+    @staticmethod
+    def _resume_position(state: Optional[StreamingIndicatorState], open_times: np.ndarray,
+                         close: np.ndarray, closed: int, interval_ms: Optional[int]) -> Optional[int]:
+        """מחזיר מאיזה אינדקס להמשיך, או None אם צריך לזרוע מחדש"""
+        if state is None or state.last_open_time is None:
+            return None
+        if closed == 0:
+            return 0
+
+        last = state.last_open_time
+        pos = int(np.searchsorted(open_times[:closed], last))
+
+        if pos < closed and open_times[pos] == last:
+            # הנר האחרון במצב קיים ב-DataFrame - בודקים שלא תוקן בדיעבד
+            if math.isclose(close[pos], state.last_close, rel_tol=1e-12, abs_tol=1e-12):
+                return pos + 1
+            return None
+
+        # ה-DataFrame מתחיל בדיוק בנר שאחרי המצב
+        if pos == 0 and interval_ms and open_times[0] == last + interval_ms:
+            return 0
+
+        return None
+
+    @staticmethod
+    def _frame_arrays(df: pd.DataFrame):
+        """ממיר DataFrame למערכי NumPy (ללא iterrows)"""
+        if 'open_time' in df.columns:
+            times = df['open_time']
+        elif 'timestamp' in df.columns:
+            times = df['timestamp']
+        else:
+            times = df.index
+
+        if pd.api.types.is_numeric_dtype(getattr(times, 'dtype', None)):
+            open_times = np.asarray(times, dtype=np.int64)
+        else:
+            open_times = (pd.to_datetime(times).values.astype('datetime64[ms]')
+                          .astype(np.int64))
+
+        volume = df['volume'] if 'volume' in df.columns else pd.Series(0.0, index=df.index)
+        return (
+            open_times,
+            df['high'].to_numpy(dtype=float),
+            df['low'].to_numpy(dtype=float),
+            df['close'].to_numpy(dtype=float),
+            volume.to_numpy(dtype=float)
+        )
+
+    def reset(self, symbol: Optional[str] = None, interval: Optional[str] = None):
+        """מוחק מצבים שמורים"""
+        with self._lock:
+            for key in list(self.states):
+                if (symbol is None or key[0] == symbol.upper()) and (interval is None or key[1] == interval):
+                    del self.states[key]
+
+    def get_stats(self) -> Dict:
+        """מחזיר סטטיסטיקות מנוע"""
+        return {
+            **self.stats,
+            'series': {f"{s}_{i}": state.bars for (s, i), state in self.states.items()}
+        }
+
+    # =============================================
+    # ✅ PARITY CHECK
+    # =============================================
+
+    @staticmethod
+    def compare_with_ta(df: pd.DataFrame, tail: int = 50) -> Dict[str, float]:
+        """משווה את המנוע מול ספריית ta על אותו DataFrame - מחזיר סטייה יחסית מקסימלית"""
+        from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator, ROCIndicator
+        from ta.trend import MACD, EMAIndicator, ADXIndicator, IchimokuIndicator, PSARIndicator
+        from ta.volatility import BollingerBands, AverageTrueRange, KeltnerChannel, DonchianChannel
+        from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator, AccDistIndexIndicator
+
+        # אינדקס מספרי - PSARIndicator כותב לפי תווית ונשבר על DatetimeIndex
+        frame = df[['high', 'low', 'close', 'volume']].reset_index(drop=True)
+        h, l, c, v = frame['high'], frame['low'], frame['close'], frame['volume']
+        adx = ADXIndicator(high=h, low=l, close=c, window=14)
+        ichimoku = IchimokuIndicator(high=h, low=l, window1=9, window2=26, window3=52)
+        macd = MACD(close=c)
+        stoch = StochasticOscillator(high=h, low=l, close=c)
+        bb = BollingerBands(close=c, window=20, window_dev=2)
+        keltner = KeltnerChannel(high=h, low=l, close=c)
+        donchian = DonchianChannel(high=h, low=l, close=c)
+
+        reference = {
+            'ema_9': EMAIndicator(close=c, window=9).ema_indicator(),
+            'ema_21': EMAIndicator(close=c, window=21).ema_indicator(),
+            'ema_50': EMAIndicator(close=c, window=50).ema_indicator(),
+            'ema_200': EMAIndicator(close=c, window=200).ema_indicator(),
+            'adx': adx.adx(), 'plus_di': adx.adx_pos(), 'minus_di': adx.adx_neg(),
+            'ichimoku_conversion': ichimoku.ichimoku_conversion_line(),
+            'ichimoku_base': ichimoku.ichimoku_base_line(),
+            'ichimoku_a': ichimoku.ichimoku_a(), 'ichimoku_b': ichimoku.ichimoku_b(),
+            'psar': PSARIndicator(high=h, low=l, close=c).psar(),
+            'rsi': RSIIndicator(close=c, window=14).rsi(),
+            'macd': macd.macd(), 'macd_signal': macd.macd_signal(), 'macd_diff': macd.macd_diff(),
+            'stoch_k': stoch.stoch(), 'stoch_d': stoch.stoch_signal(),
+            'williams_r': WilliamsRIndicator(high=h, low=l, close=c).williams_r(),
+            'roc': ROCIndicator(close=c).roc(),
+            'bb_upper': bb.bollinger_hband(), 'bb_middle': bb.bollinger_mavg(),
+            'bb_lower': bb.bollinger_lband(),
+            'atr': AverageTrueRange(high=h, low=l, close=c, window=14).average_true_range(),
+            'kc_upper': keltner.keltner_channel_hband(), 'kc_middle': keltner.keltner_channel_mband(),
+            'kc_lower': keltner.keltner_channel_lband(),
+            'dc_upper': donchian.donchian_channel_hband(), 'dc_middle': donchian.donchian_channel_mband(),
+            'dc_lower': donchian.donchian_channel_lband(),
+            'obv': OnBalanceVolumeIndicator(close=c, volume=v).on_balance_volume(),
+            'vwap': VolumeWeightedAveragePrice(high=h, low=l, close=c, volume=v).volume_weighted_average_price(),
+            'adl': AccDistIndexIndicator(high=h, low=l, close=c, volume=v).acc_dist_index()
+        }
+
+        state = StreamingIndicatorState(history_size=tail)
+        open_times, high, low, close, volume = IncrementalIndicatorEngine._frame_arrays(df)
+        for i in range(len(open_times)):
+            state.update(open_times[i], high[i], low[i], close[i], volume[i])
+
+        deviations = {}
+        for name, expected in reference.items():
+            expected = np.asarray(expected, dtype=float)[-tail:]
+            actual = state.series(name).to_numpy()[-len(expected):]
+            mask = np.isfinite(expected) & np.isfinite(actual)
+            if not mask.any():
+                deviations[name] = NAN
+                continue
+            scale = np.maximum(np.abs(expected[mask]), 1e-12)
+            deviations[name] = float(np.max(np.abs(actual[mask] - expected[mask]) / scale))
+
+        return deviations
+
+
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_indicator_engine() -> IncrementalIndicatorEngine:
+    """מחזיר מנוע אינדיקטורים משותף לכל הרכיבים בתהליך"""
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            _shared_engine = IncrementalIndicatorEngine()
+        return _shared_engine
@@ -0,0 +1,644 @@
+import numpy as np
+import pandas as pd
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# כל הקרנלים מקבלים מערך float64 רציף - חד-ממדי (n,) או אצווה דו-ממדית (סמלים, n).
+# ציר הזמן הוא תמיד הציר האחרון, והתוצאות זהות ל-ta (כולל האפסים/NaN בתחילת הסדרה).
+
+_BLOCK = 64
+
+
+# =============================================
+# 🔧 PRIMITIVES
+# =============================================
+
+def as_batch(x) -> Tuple[np.ndarray, bool]:
+    """ממיר קלט למערך דו-ממדי רציף - ומחזיר האם הקלט היה חד-ממדי"""
+    array = np.ascontiguousarray(x, dtype=np.float64)
+    if array.ndim == 1:
+        return array[np.newaxis, :], True
+    if array.ndim != 2:
+        raise ValueError(f"Expected 1-D or 2-D array, got {array.ndim}-D")
+    return array, False
+
+
+def _restore(result: np.ndarray, squeeze: bool) -> np.ndarray:
+    return result[0] if squeeze else result
+
+
+def _nan_like(x: np.ndarray) -> np.ndarray:
+    return np.full(x.shape, np.nan)
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """אינדקס הערך התקין הראשון בכל שורה (n אם אין)"""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=-1), valid.argmax(axis=-1), x.shape[-1])
+
+
+def linear_filter(x: np.ndarray, decay: float, gain: float, initial: np.ndarray) -> np.ndarray:
+    """מסנן רקורסיבי y[t] = decay*y[t-1] + gain*x[t] - בבלוקים של מכפלות מטריצה במקום לולאה על כל נר"""
+    rows, n = x.shape
+    result = np.empty_like(x)
+    if n == 0:
+        return result
+
+    block = min(_BLOCK, n)
+    powers = decay ** np.arange(block + 1)
+    lags = np.arange(block)[:, np.newaxis] - np.arange(block)[np.newaxis, :]
+    weights = np.where(lags >= 0, powers[np.clip(lags, 0, block)], 0.0) * gain
+    carry = powers[1:]
+
+    previous = np.asarray(initial, dtype=np.float64).reshape(rows)
+    for start in range(0, n, block):
+        chunk = x[:, start:start + block]
+        size = chunk.shape[1]
+        out = chunk @ weights[:size, :size].T + previous[:, np.newaxis] * carry[np.newaxis, :size]
+        result[:, start:start + size] = out
+        previous = out[:, -1]
+    return result
+
+
+def _smooth(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """ewm(alpha, adjust=False) - תומך ב-NaN בתחילת כל שורה (אורך שונה לכל סמל)"""
+    start = _first_valid(x)
+    rows = np.arange(x.shape[0])
+    has_data = start < x.shape[1]
+    seed = np.zeros(x.shape[0])
+    seed[has_data] = x[rows[has_data], start[has_data]]
+
+    # ממלאים את הראש בערך הראשון - המסנן נשאר קבוע עליו ולכן התוצאה זהה להתחלה מאוחרת
+    positions = np.arange(x.shape[1])[np.newaxis, :]
+    head = positions < start[:, np.newaxis]
+    filled = np.where(head, seed[:, np.newaxis], x)
+
+    result = linear_filter(filled, 1.0 - alpha, alpha, seed)
+    result[positions < (start + max(min_periods, 1) - 1)[:, np.newaxis]] = np.nan
+    return result
+
+
+def ema(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """EMA - זהה ל-ewm(span=window, adjust=False)"""
+    batch, squeeze = as_batch(x)
+    alpha = 2.0 / (window + 1)
+    return _restore(_smooth(batch, alpha, window if min_periods is None else min_periods), squeeze)
+
+
+def rma(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Wilder RMA - ewm(alpha=1/window, adjust=False)"""
+    batch, squeeze = as_batch(x)
+    return _restore(_smooth(batch, 1.0 / window, window if min_periods is None else min_periods), squeeze)
+
+
+def _window_sums(x: np.ndarray, window: int, min_periods: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """סכום ומספר ערכים תקינים בחלון מתגלגל - באמצעות סכומים מצטברים"""
+    valid = ~np.isnan(x)
+    padded = np.zeros((x.shape[0], x.shape[1] + 1))
+    counts = np.zeros_like(padded)
+    np.cumsum(np.where(valid, x, 0.0), axis=-1, out=padded[:, 1:])
+    np.cumsum(valid, axis=-1, out=counts[:, 1:])
+
+    upper = np.arange(1, x.shape[1] + 1)
+    lower = np.maximum(upper - window, 0)
+    sums = padded[:, upper] - padded[:, lower]
+    count = counts[:, upper] - counts[:, lower]
+    return sums, count
+
+
+def rolling_sum(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """סכום מתגלגל (NaN עד שיש min_periods ערכים תקינים)"""
+    batch, squeeze = as_batch(x)
+    sums, count = _window_sums(batch, window)
+    required = window if min_periods is None else max(min_periods, 1)
+    return _restore(np.where(count >= required, sums, np.nan), squeeze)
+
+
+def rolling_mean(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """ממוצע מתגלגל באמצעות סכומים מצטברים"""
+    batch, squeeze = as_batch(x)
+    sums, count = _window_sums(batch, window)
+    required = window if min_periods is None else max(min_periods, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(count >= required, sums / count, np.nan)
+    return _restore(result, squeeze)
+
+
+def rolling_std(x, window: int, ddof: int = 1) -> np.ndarray:
+    """סטיית תקן מתגלגלת - מוזזת לערך הראשון של כל שורה למניעת אובדן דיוק"""
+    batch, squeeze = as_batch(x)
+    start = _first_valid(batch)
+    rows = np.arange(batch.shape[0])
+    offset = np.zeros(batch.shape[0])
+    has_data = start < batch.shape[1]
+    offset[has_data] = batch[rows[has_data], start[has_data]]
+    centered = batch - offset[:, np.newaxis]
+
+    sums, count = _window_sums(centered, window)
+    squares, _ = _window_sums(centered * centered, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums * sums / window) / (window - ddof)
+    variance = np.maximum(variance, 0.0)
+    return _restore(np.where(count >= window, np.sqrt(variance), np.nan), squeeze)
+
+
+def _rolling_extreme(x: np.ndarray, window: int, mode: str, partial: bool = False) -> np.ndarray:
+    """מקסימום/מינימום מתגלגל; partial=True ממלא את תחילת הסדרה בחלון חלקי (min_periods=0)"""
+    result = _nan_like(x)
+    if partial:
+        accumulate = np.fmax.accumulate if mode == 'max' else np.fmin.accumulate
+        head = min(window - 1, x.shape[-1])
+        result[:, :head] = accumulate(x[:, :head], axis=-1)
+    if x.shape[-1] < window:
+        return result
+    view = sliding_window_view(x, window, axis=-1)
+    result[:, window - 1:] = view.max(axis=-1) if mode == 'max' else view.min(axis=-1)
+    return result
+
+
+def rolling_max(x, window: int) -> np.ndarray:
+    """מקסימום מתגלגל"""
+    batch, squeeze = as_batch(x)
+    return _restore(_rolling_extreme(batch, window, 'max'), squeeze)
+
+
+def rolling_min(x, window: int) -> np.ndarray:
+    """מינימום מתגלגל"""
+    batch, squeeze = as_batch(x)
+    return _restore(_rolling_extreme(batch, window, 'min'), squeeze)
+
+
+def shift(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    """הזזה לאורך ציר הזמן עם NaN (כמו Series.shift)"""
+    result = _nan_like(x)
+    if periods < x.shape[-1]:
+        result[..., periods:] = x[..., :x.shape[-1] - periods]
+    return result
+
+
+# =============================================
+# 📈 TREND
+# =============================================
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD, קו אות והיסטוגרמה"""
+    batch, squeeze = as_batch(close)
+    line = _smooth(batch, 2.0 / (fast + 1), fast) - _smooth(batch, 2.0 / (slow + 1), slow)
+    signal_line = _smooth(line, 2.0 / (signal + 1), signal)
+    return {
+        'macd': _restore(line, squeeze),
+        'signal': _restore(signal_line, squeeze),
+        'diff': _restore(line - signal_line, squeeze)
+    }
+
+
+def _wilder_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """סכום Wilder כפי ש-ADXIndicator של ta מחשב - זרע מ-window ערכים תקינים, האיבר האחרון נשאר 0"""
+    rows, n = x.shape
+    length = n - (window - 1)
+    result = np.zeros((rows, length))
+    if length <= 0:
+        return result
+    result[:, 0] = x[:, 1:window + 1].sum(axis=-1)
+    if length > 2:
+        tail = x[:, window + 1:window + length - 1]
+        result[:, 1:length - 1] = linear_filter(tail, 1.0 - 1.0 / window, 1.0, result[:, 0])
+    return result
+
+
+def adx(high, low, close, window: int = 14) -> Dict[str, np.ndarray]:
+    """ADX, +DI, -DI - כולל המוזרויות של ta (אפסים בתחילה, +DI/-DI מוזזים)"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    rows, n = close.shape
+
+    output = {key: np.zeros((rows, n)) for key in ('adx', 'plus_di', 'minus_di')}
+    if n <= 2 * window:
+        return {key: _restore(value, squeeze) for key, value in output.items()}
+
+    close_shift = shift(close)
+    true_range = np.maximum(high, close_shift) - np.minimum(low, close_shift)
+    diff_up = high - shift(high)
+    diff_down = shift(low) - low
+    with np.errstate(invalid='ignore'):
+        pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+        neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    trs = _wilder_sum(true_range, window)
+    dip = _wilder_sum(pos, window)
+    din = _wilder_sum(neg, window)
+    length = trs.shape[1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus = np.where(trs != 0, 100 * dip / trs, 0.0)
+        minus = np.where(trs != 0, 100 * din / trs, 0.0)
+        total = plus + minus
+        dx = np.where(total != 0, 100 * np.abs((plus - minus) / total), 0.0)
+
+    # +DI/-DI ממוקמים ב-i+window עבור i=1..length-2
+    output['plus_di'][:, window + 1:window + length - 1] = plus[:, 1:length - 1]
+    output['minus_di'][:, window + 1:window + length - 1] = minus[:, 1:length - 1]
+
+    smoothed = np.zeros((rows, length))
+    smoothed[:, window] = dx[:, :window].mean(axis=-1)
+    if length > window + 1:
+        smoothed[:, window + 1:] = linear_filter(dx[:, window:length - 1], (window - 1) / window,
+                                                 1.0 / window, smoothed[:, window])
+    output['adx'][:, window - 1:] = smoothed
+
+    return {key: _restore(value, squeeze) for key, value in output.items()}
+
+
+def ichimoku(high, low, window1: int = 9, window2: int = 26, window3: int = 52) -> Dict[str, np.ndarray]:
+    """קווי Ichimoku (ללא הזזה ויזואלית)"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    conversion = 0.5 * (_rolling_extreme(high, window1, 'max') + _rolling_extreme(low, window1, 'min'))
+    base = 0.5 * (_rolling_extreme(high, window2, 'max') + _rolling_extreme(low, window2, 'min'))
+    # ta מחשב את span_b עם min_periods=0 - גם על חלון חלקי בתחילת הסדרה
+    span_b = 0.5 * (_rolling_extreme(high, window3, 'max', partial=True)
+                    + _rolling_extreme(low, window3, 'min', partial=True))
+    return {
+        'conversion': _restore(conversion, squeeze),
+        'base': _restore(base, squeeze),
+        'span_a': _restore(0.5 * (conversion + base), squeeze),
+        'span_b': _restore(span_b, squeeze)
+    }
+
+
+def psar(high, low, close, step: float = 0.02, max_step: float = 0.2) -> Dict[str, np.ndarray]:
+    """Parabolic SAR - רקורסיה תלוית-מצב, לולאה אחת לכל סמל על רשימות פייתון"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    rows, n = close.shape
+    values = close.copy()
+    up_trends = np.ones((rows, n))
+
+    for row in range(rows):
+        highs = high[row].tolist()
+        lows = low[row].tolist()
+        sar = close[row].tolist()
+        trend = up_trends[row]
+        up_trend = True
+        factor = step
+        up_trend_high = highs[0] if n else 0.0
+        down_trend_low = lows[0] if n else 0.0
+
+        for i in range(2, n):
+            reversal = False
+            if up_trend:
+                value = sar[i - 1] + factor * (up_trend_high - sar[i - 1])
+                if lows[i] < value:
+                    reversal = True
+                    value = up_trend_high
+                    down_trend_low = lows[i]
+                    factor = step
+                else:
+                    if highs[i] > up_trend_high:
+                        up_trend_high = highs[i]
+                        factor = min(factor + step, max_step)
+                    if lows[i - 2] < value:
+                        value = lows[i - 2]
+                    elif lows[i - 1] < value:
+                        value = lows[i - 1]
+            else:
+                value = sar[i - 1] - factor * (sar[i - 1] - down_trend_low)
+                if highs[i] > value:
+                    reversal = True
+                    value = down_trend_low
+                    up_trend_high = highs[i]
+                    factor = step
+                else:
+                    if lows[i] < down_trend_low:
+                        down_trend_low = lows[i]
+                        factor = min(factor + step, max_step)
+                    if highs[i - 2] > value:
+                        value = highs[i - 2]
+                    elif highs[i - 1] > value:
+                        value = highs[i - 1]
+
+            sar[i] = value
+            up_trend = up_trend != reversal
+            trend[i] = 1.0 if up_trend else 0.0
+
+        values[row] = sar
+
+    return {'psar': _restore(values, squeeze), 'up_trend': _restore(up_trends, squeeze)}
+
+
+# =============================================
+# ⚡ MOMENTUM
+# =============================================
+
+def rsi(close, window: int = 14) -> np.ndarray:
+    """RSI לפי Wilder"""
+    batch, squeeze = as_batch(close)
+    diff = batch - shift(batch)
+    # כמו ta - ההפרש החסר בנר הראשון נספר כ-0
+    with np.errstate(invalid='ignore'):
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+    alpha = 1.0 / window
+    ema_up = _smooth(up, alpha, window)
+    ema_down = _smooth(down, alpha, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(ema_down == 0, 100.0, 100.0 - 100.0 / (1.0 + ema_up / ema_down))
+    result[np.isnan(ema_down)] = np.nan
+    return _restore(result, squeeze)
+
+
+def stochastic(high, low, close, window: int = 14, smooth_window: int = 3) -> Dict[str, np.ndarray]:
+    """Stochastic %K ו-%D"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    lowest = _rolling_extreme(low, window, 'min')
+    highest = _rolling_extreme(high, window, 'max')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k = 100 * (close - lowest) / (highest - lowest)
+    d = rolling_mean(k, smooth_window)
+    return {'k': _restore(k, squeeze), 'd': _restore(d, squeeze)}
+
+
+def williams_r(high, low, close, lbp: int = 14) -> np.ndarray:
+    """Williams %R"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    highest = _rolling_extreme(high, lbp, 'max')
+    lowest = _rolling_extreme(low, lbp, 'min')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = -100 * (highest - close) / (highest - lowest)
+    return _restore(result, squeeze)
+
+
+def roc(close, window: int = 12) -> np.ndarray:
+    """Rate of Change באחוזים"""
+    batch, squeeze = as_batch(close)
+    previous = shift(batch, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = (batch - previous) / previous * 100
+    return _restore(result, squeeze)
+
+
+# =============================================
+# 🌊 VOLATILITY
+# =============================================
+
+def true_range(high, low, close) -> np.ndarray:
+    """True Range - בנר הראשון high-low"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    previous = shift(close)
+    with np.errstate(invalid='ignore'):
+        result = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    return _restore(result, squeeze)
+
+
+def atr(high, low, close, window: int = 14) -> np.ndarray:
+    """ATR - זרע מממוצע window הנרות הראשונים ואז Wilder (אפסים לפני כן, כמו ta)"""
+    ranges, squeeze = as_batch(true_range(high, low, close))
+    rows, n = ranges.shape
+    result = np.zeros((rows, n))
+    if n >= window:
+        seed = ranges[:, :window].mean(axis=-1)
+        result[:, window - 1] = seed
+        if n > window:
+            result[:, window:] = linear_filter(ranges[:, window:], (window - 1) / window, 1.0 / window, seed)
+    return _restore(result, squeeze)
+
+
+def bollinger(close, window: int = 20, window_dev: float = 2) -> Dict[str, np.ndarray]:
+    """רצועות בולינגר (סטיית תקן של אוכלוסייה)"""
+    batch, squeeze = as_batch(close)
+    middle = rolling_mean(batch, window)
+    std = rolling_std(batch, window, ddof=0)
+    return {
+        'upper': _restore(middle + window_dev * std, squeeze),
+        'middle': _restore(middle, squeeze),
+        'lower': _restore(middle - window_dev * std, squeeze)
+    }
+
+
+def keltner(high, low, close, window: int = 20) -> Dict[str, np.ndarray]:
+    """תעלת Keltner בגרסה המקורית (ממוצע מחיר טיפוסי)"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    middle = rolling_mean((high + low + close) / 3.0, window)
+    upper = rolling_mean((4 * high - 2 * low + close) / 3.0, window, min_periods=1)
+    lower = rolling_mean((-2 * high + 4 * low + close) / 3.0, window, min_periods=1)
+    return {'upper': _restore(upper, squeeze), 'middle': _restore(middle, squeeze),
+            'lower': _restore(lower, squeeze)}
+
+
+def donchian(high, low, window: int = 20) -> Dict[str, np.ndarray]:
+    """תעלת Donchian"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    upper = _rolling_extreme(high, window, 'max')
+    lower = _rolling_extreme(low, window, 'min')
+    return {'upper': _restore(upper, squeeze), 'middle': _restore(lower + (upper - lower) / 2, squeeze),
+            'lower': _restore(lower, squeeze)}
+
+
+# =============================================
+# 📦 VOLUME
+# =============================================
+
+def obv(close, volume) -> np.ndarray:
+    """On Balance Volume"""
+    close, squeeze = as_batch(close)
+    volume, _ = as_batch(volume)
+    with np.errstate(invalid='ignore'):
+        signed = np.where(close < shift(close), -volume, volume)
+    return _restore(np.cumsum(signed, axis=-1), squeeze)
+
+
+def vwap(high, low, close, volume, window: int = 14) -> np.ndarray:
+    """VWAP מתגלגל"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    volume, _ = as_batch(volume)
+    typical = (high + low + close) / 3.0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = rolling_sum(typical * volume, window) / rolling_sum(volume, window)
+    return _restore(result, squeeze)
+
+
+def adl(high, low, close, volume) -> np.ndarray:
+    """Accumulation/Distribution Line"""
+    high, squeeze = as_batch(high)
+    low, _ = as_batch(low)
+    close, _ = as_batch(close)
+    volume, _ = as_batch(volume)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        clv = ((close - low) - (high - close)) / (high - low)
+    clv = np.where(np.isfinite(clv), clv, 0.0)
+    return _restore(np.cumsum(clv * volume, axis=-1), squeeze)
+
+
+# =============================================
+# 🧪 PARITY & BENCHMARK
+# =============================================
+
+def _kernel_outputs(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    high, low, close, volume = (df[column].to_numpy(dtype=float) for column in ('high', 'low', 'close', 'volume'))
+    outputs = {
+        'ema_21': ema(close, 21),
+        'sma_20': rolling_mean(close, 20),
+        'rsi': rsi(close),
+        'roc': roc(close),
+        'williams_r': williams_r(high, low, close),
+        'atr': atr(high, low, close),
+        'obv': obv(close, volume),
+        'vwap': vwap(high, low, close, volume),
+        'adl': adl(high, low, close, volume)
+    }
+    for prefix, values in (('macd', macd(close)), ('adx', adx(high, low, close)),
+                           ('stoch', stochastic(high, low, close)), ('bb', bollinger(close)),
+                           ('kc', keltner(high, low, close)), ('dc', donchian(high, low)),
+                           ('ichimoku', ichimoku(high, low)), ('psar', psar(high, low, close))):
+        for key, value in values.items():
+            outputs[f"{prefix}_{key}"] = value
+    return outputs
+
+
+def _ta_outputs(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator, ROCIndicator
+    from ta.trend import EMAIndicator, MACD, ADXIndicator, IchimokuIndicator, PSARIndicator
+    from ta.volatility import AverageTrueRange, BollingerBands, KeltnerChannel, DonchianChannel
+    from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator, AccDistIndexIndicator
+
+    frame = df.reset_index(drop=True)
+    high, low, close, volume = frame['high'], frame['low'], frame['close'], frame['volume']
+    macd_indicator = MACD(close)
+    adx_indicator = ADXIndicator(high, low, close)
+    stoch = StochasticOscillator(high, low, close)
+    bb = BollingerBands(close)
+    kc = KeltnerChannel(high, low, close)
+    dc = DonchianChannel(high, low, close)
+    ichimoku_indicator = IchimokuIndicator(high, low)
+    psar_indicator = PSARIndicator(high, low, close)
+
+    series = {
+        'ema_21': EMAIndicator(close, 21).ema_indicator(),
+        'sma_20': close.rolling(20).mean(),
+        'rsi': RSIIndicator(close).rsi(),
+        'roc': ROCIndicator(close).roc(),
+        'williams_r': WilliamsRIndicator(high, low, close).williams_r(),
+        'atr': AverageTrueRange(high, low, close).average_true_range(),
+        'obv': OnBalanceVolumeIndicator(close, volume).on_balance_volume(),
+        'vwap': VolumeWeightedAveragePrice(high, low, close, volume).volume_weighted_average_price(),
+        'adl': AccDistIndexIndicator(high, low, close, volume).acc_dist_index(),
+        'macd_macd': macd_indicator.macd(),
+        'macd_signal': macd_indicator.macd_signal(),
+        'macd_diff': macd_indicator.macd_diff(),
+        'adx_adx': adx_indicator.adx(),
+        'adx_plus_di': adx_indicator.adx_pos(),
+        'adx_minus_di': adx_indicator.adx_neg(),
+        'stoch_k': stoch.stoch(),
+        'stoch_d': stoch.stoch_signal(),
+        'bb_upper': bb.bollinger_hband(),
+        'bb_middle': bb.bollinger_mavg(),
+        'bb_lower': bb.bollinger_lband(),
+        'kc_upper': kc.keltner_channel_hband(),
+        'kc_middle': kc.keltner_channel_mband(),
+        'kc_lower': kc.keltner_channel_lband(),
+        'dc_upper': dc.donchian_channel_hband(),
+        'dc_middle': dc.donchian_channel_mband(),
+        'dc_lower': dc.donchian_channel_lband(),
+        'ichimoku_conversion': ichimoku_indicator.ichimoku_conversion_line(),
+        'ichimoku_base': ichimoku_indicator.ichimoku_base_line(),
+        'ichimoku_span_a': ichimoku_indicator.ichimoku_a(),
+        'ichimoku_span_b': ichimoku_indicator.ichimoku_b(),
+        'psar_psar': psar_indicator.psar(),
+        'psar_up_trend': psar_indicator.psar_up().notna().astype(float)
+    }
+    # ta לא מסמן מגמה בשני הנרות הראשונים - הקרנל מתחיל במגמה עולה
+    series['psar_up_trend'].iloc[:2] = 1.0
+    return {name: value.to_numpy(dtype=float) for name, value in series.items()}
+
+
+def synthetic_ohlcv(bars: int = 1500, symbols: int = 1, seed: int = 7) -> Dict[str, np.ndarray]:
+    """נתוני OHLCV סינתטיים (random walk) לבדיקות ולמדידה - צורה (symbols, bars)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (symbols, bars)), axis=-1))
+    spread = np.abs(rng.normal(0, 0.006, (symbols, bars))) * close
+    open_ = close * (1 + rng.normal(0, 0.003, (symbols, bars)))
+    high = np.maximum(np.maximum(open_, close) + spread, close)
+    low = np.minimum(np.minimum(open_, close) - spread, close)
+    volume = rng.lognormal(10, 1, (symbols, bars))
+    return {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+
+
+def parity_check(df: Optional[pd.DataFrame] = None, tolerance: float = 1e-9) -> Dict[str, Dict]:
+    """משווה כל קרנל ל-ta - סטייה יחסית מקסימלית לכל פלט (NaN חייב להופיע באותם מקומות)"""
+    if df is None:
+        data = synthetic_ohlcv()
+        df = pd.DataFrame({key: value[0] for key, value in data.items()})
+
+    expected = _ta_outputs(df)
+    actual = _kernel_outputs(df)
+    report = {}
+    for name, reference in expected.items():
+        values = actual[name]
+        nan_match = bool(np.array_equal(np.isnan(reference), np.isnan(values)))
+        both = ~np.isnan(reference) & ~np.isnan(values)
+        scale = np.maximum(np.abs(reference[both]), 1.0)
+        deviation = float(np.max(np.abs(values[both] - reference[both]) / scale)) if both.any() else 0.0
+        report[name] = {'max_rel_deviation': deviation, 'nan_match': nan_match,
+                        'ok': nan_match and deviation <= tolerance}
+    return report
+
+
+def benchmark(bars: int = 1500, symbols: int = 20, repeats: int = 3) -> Dict[str, float]:
+    """מודד עלות לסמל: ta מול קרנלים בודדים מול אצווה דו-ממדית (מילישניות)"""
+    data = synthetic_ohlcv(bars, symbols)
+    frames = [pd.DataFrame({key: value[row] for key, value in data.items()}) for row in range(symbols)]
+
+    def measure(func) -> float:
+        best = float('inf')
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000 / symbols
+
+    def run_batch():
+        high, low, close, volume = data['high'], data['low'], data['close'], data['volume']
+        ema(close, 21), rolling_mean(close, 20), rsi(close), roc(close), williams_r(high, low, close)
+        atr(high, low, close), obv(close, volume), vwap(high, low, close, volume), adl(high, low, close, volume)
+        macd(close), adx(high, low, close), stochastic(high, low, close), bollinger(close)
+        keltner(high, low, close), donchian(high, low), ichimoku(high, low), psar(high, low, close)
+
+    results = {
+        'bars': bars,
+        'symbols': symbols,
+        'ta_ms_per_symbol': measure(lambda: [_ta_outputs(frame) for frame in frames]),
+        'numpy_ms_per_symbol': measure(lambda: [_kernel_outputs(frame) for frame in frames]),
+        'numpy_batch_ms_per_symbol': measure(run_batch)
+    }
+    results['speedup'] = round(results['ta_ms_per_symbol'] / max(results['numpy_batch_ms_per_symbol'], 1e-9), 1)
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    failures = 0
+    for name, result in parity_check().items():
+        status = "✅" if result['ok'] else "❌"
+        failures += not result['ok']
+        print(f"{status} {name:22s} max_rel={result['max_rel_deviation']:.2e} nan_match={result['nan_match']}")
+
+    print(benchmark())
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,538 @@
+import pandas as pd
+import numpy as np
+import logging
+import os
+import threading
+import hashlib
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import indicator_kernels as kernels
+
+try:
+    from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator, ROCIndicator
+    from ta.trend import ADXIndicator, IchimokuIndicator, PSARIndicator
+    from ta.volatility import AverageTrueRange, KeltnerChannel
+    from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator, AccDistIndexIndicator
+    TA_AVAILABLE = True
+except ImportError:
+    TA_AVAILABLE = False
+
+
+@dataclass
+class IndicatorSpec:
+    """הגדרת אינדיקטור - פונקציה, עמודות קלט, פרמטרים ותלויות"""
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    depends: Optional[Callable[[Dict], Dict[str, Tuple[str, Dict]]]] = None
+    backends: Dict[str, Callable] = field(default_factory=dict)
+
+
+class IndicatorContext:
+    """הקשר בקשה - memo של תוצאות ומוני hit/miss"""
+
+    def __init__(self, name: str = 'request'):
+        self.name = name
+        self.memo: Dict[Hashable, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        self.computed = Counter()
+        self._fingerprints: Dict[int, Tuple] = {}
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'context': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'computed': dict(self.computed)
+        }
+
+
+_current_context: contextvars.ContextVar = contextvars.ContextVar('indicator_context', default=None)
+
+
+class IndicatorRegistry:
+    """רישום משותף של אינדיקטורים - פתרון כגרף תלויות עם memo לכל הקשר בקשה"""
+
+    FINGERPRINT_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+    BACKENDS = ('numpy', 'ta')
+
+    def __init__(self, backend: str = 'numpy'):
+        self.specs: Dict[str, IndicatorSpec] = {}
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.totals = {'hits': 0, 'misses': 0, 'contexts': 0}
+        self.backend = 'numpy'
+        self.set_backend(backend)
+
+    # =============================================
+    # 📝 REGISTRATION
+    # =============================================
+
+    def register(self, name: str, inputs: Tuple[str, ...] = (), defaults: Optional[Dict] = None,
+                 depends: Optional[Callable[[Dict], Dict[str, Tuple[str, Dict]]]] = None):
+        """דקורטור לרישום אינדיקטור"""
+        def decorator(func: Callable) -> Callable:
+            self.specs[name] = IndicatorSpec(name, func, tuple(inputs), dict(defaults or {}), depends)
+            return func
+        return decorator
+
+    def implement(self, name: str, backend: str):
+        """דקורטור למימוש חלופי של אינדיקטור רשום עבור backend מסוים"""
+        def decorator(func: Callable) -> Callable:
+            self.specs[name].backends[backend] = func
+            return func
+        return decorator
+
+    def set_backend(self, backend: str) -> str:
+        """בחירת מימוש האינדיקטורים - numpy (קרנלים וקטוריים) או ta (ספריית הייחוס)"""
+        if backend not in self.BACKENDS:
+            self.logger.warning(f"⚠️ Unknown indicator backend {backend}, keeping {self.backend}")
+        elif backend == 'ta' and not TA_AVAILABLE:
+            self.logger.warning("⚠️ ta library not installed, keeping numpy indicator backend")
+        else:
+            self.backend = backend
+        return self.backend
+
+    # =============================================
+    # 🧵 REQUEST CONTEXT
+    # =============================================
+
+    @contextmanager
+    def request_context(self, name: str = 'request'):
+        """פותח הקשר בקשה; הקשר פנימי מצטרף להקשר החיצוני אם קיים"""
+        context = _current_context.get()
+        if context is not None:
+            yield context
+            return
+
+        context = IndicatorContext(name)
+        token = _current_context.set(context)
+        try:
+            yield context
+        finally:
+            _current_context.reset(token)
+            self._close_context(context)
+
+    def begin_context(self, name: str = 'request') -> Tuple[IndicatorContext, contextvars.Token]:
+        """פותח הקשר ידנית (למשל ב-before_request של Flask)"""
+        context = IndicatorContext(name)
+        return context, _current_context.set(context)
+
+    def end_context(self, token: contextvars.Token) -> Optional[Dict]:
+        """סוגר הקשר שנפתח ב-begin_context ומחזיר את הסטטיסטיקות שלו"""
+        context = _current_context.get()
+        _current_context.reset(token)
+        if context is None:
+            return None
+        self._close_context(context)
+        return context.stats()
+
+    def _close_context(self, context: IndicatorContext):
+        with self._lock:
+            self.totals['hits'] += context.hits
+            self.totals['misses'] += context.misses
+            self.totals['contexts'] += 1
+        self.logger.debug(f"🧮 Indicator context {context.name}: "
+                          f"{context.hits} hits / {context.misses} misses")
+
+    def current_context(self) -> Optional[IndicatorContext]:
+        return _current_context.get()
+
+    # =============================================
+    # 🔍 RESOLUTION
+    # =============================================
+
+    def fingerprint(self, df: pd.DataFrame, context: Optional[IndicatorContext] = None) -> Tuple:
+        """טביעת אצבע של DataFrame לפי תוכן - זהה גם עבור עותקים של אותם נתונים"""
+        if context is not None and id(df) in context._fingerprints:
+            cached_df, fp = context._fingerprints[id(df)]
+            if cached_df is df:
+                return fp
+
+        digest = hashlib.blake2b(digest_size=16)
+        for column in self.FINGERPRINT_COLUMNS:
+            if column in df.columns:
+                digest.update(column.encode())
+                digest.update(np.ascontiguousarray(df[column].to_numpy(dtype=float)).tobytes())
+        digest.update(np.ascontiguousarray(df.index.to_numpy()).tobytes())
+        fp = (len(df), digest.hexdigest())
+
+        if context is not None:
+            context._fingerprints[id(df)] = (df, fp)
+        return fp
+
+    @staticmethod
+    def _params_key(params: Dict) -> Tuple:
+        return tuple(sorted(params.items()))
+
+    def resolve(self, df: pd.DataFrame, name: str, **params) -> pd.Series:
+        """מחזיר סדרת אינדיקטור - מחושבת פעם אחת לכל (אינדיקטור, פרמטרים) בהקשר"""
+        with self.request_context('adhoc') as context:
+            return self._resolve(df, self.fingerprint(df, context), name, params, context, ())
+
+    def resolve_many(self, df: pd.DataFrame, requests: Dict[str, Tuple[str, Dict]]) -> Dict[str, pd.Series]:
+        """פותר כמה אינדיקטורים בבת אחת - {alias: (name, params)}"""
+        with self.request_context('adhoc') as context:
+            fp = self.fingerprint(df, context)
+            return {alias: self._resolve(df, fp, name, params, context, ())
+                    for alias, (name, params) in requests.items()}
+
+    def _resolve(self, df: pd.DataFrame, fp: Tuple, name: str, params: Dict,
+                 context: IndicatorContext, stack: Tuple[str, ...]):
+        spec = self.specs.get(name)
+        if spec is None:
+            raise KeyError(f"Unknown indicator: {name}")
+        if name in stack:
+            raise ValueError(f"Circular indicator dependency: {' -> '.join(stack + (name,))}")
+
+        full_params = {**spec.defaults, **params}
+        key = (fp, name, self._params_key(full_params), self.backend)
+
+        if key in context.memo:
+            context.hits += 1
+            return context.memo[key]
+
+        context.misses += 1
+        context.computed[name] += 1
+
+        kwargs = {column: df[column] for column in spec.inputs if column in df.columns}
+        if spec.depends:
+            for arg, (dep_name, dep_params) in spec.depends(full_params).items():
+                kwargs[arg] = self._resolve(df, fp, dep_name, dep_params, context, stack + (name,))
+
+        func = spec.backends.get(self.backend, spec.func)
+        result = func(**kwargs, **full_params)
+        context.memo[key] = result
+        return result
+
+    def memoize(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """memo כללי בהקשר הבקשה - לתוצאות מורכבות (למשל סעיף ניתוח שלם)"""
+        context = _current_context.get()
+        if context is None:
+            return compute()
+
+        if key in context.memo:
+            context.hits += 1
+            return context.memo[key]
+
+        context.misses += 1
+        context.computed[str(key[0]) if isinstance(key, tuple) else str(key)] += 1
+        result = context.memo[key] = compute()
+        return result
+
+    def get_stats(self) -> Dict:
+        """סטטיסטיקות מצטברות של כל ההקשרים"""
+        total = self.totals['hits'] + self.totals['misses']
+        return {
+            **self.totals,
+            'hit_rate': round(self.totals['hits'] / total, 3) if total else 0.0,
+            'backend': self.backend,
+            'registered': sorted(self.specs)
+        }
+
+
+registry = IndicatorRegistry(os.getenv('INDICATOR_BACKEND', 'numpy'))
+
+
+# =============================================
+# 📈 SHARED DEFINITIONS
+# =============================================
+
+@registry.register('returns', inputs=('close',))
+def _returns(close):
+    return close.pct_change()
+
+
+@registry.register('log_returns', inputs=('close',))
+def _log_returns(close):
+    return np.log(close / close.shift(1))
+
+
+@registry.register('sma', inputs=('open', 'high', 'low', 'close', 'volume'), defaults={'column': 'close', 'window': 20})
+def _sma(column, window, **series):
+    return series[column].rolling(window=window).mean()
+
+
+@registry.register('ema', inputs=('close',), defaults={'window': 14})
+def _ema(close, window):
+    # זהה ל-EMAIndicator של ta
+    return close.ewm(span=window, min_periods=window, adjust=False).mean()
+
+
+@registry.register('rolling_std', inputs=('open', 'high', 'low', 'close', 'volume'),
+                   defaults={'column': 'close', 'window': 20, 'ddof': 1})
+def _rolling_std(column, window, ddof, **series):
+    return series[column].rolling(window=window).std(ddof=ddof)
+
+
+@registry.register('returns_mean', defaults={'window': 20},
+                   depends=lambda p: {'returns': ('returns', {})})
+def _returns_mean(returns, window):
+    return returns.rolling(window=window).mean()
+
+
+@registry.register('returns_std', defaults={'window': 20},
+                   depends=lambda p: {'returns': ('returns', {})})
+def _returns_std(returns, window):
+    return returns.rolling(window=window).std()
+
+
+@registry.register('rsi', inputs=('close',), defaults={'window': 14})
+def _rsi(close, window):
+    return RSIIndicator(close=close, window=window).rsi()
+
+
+@registry.register('macd', defaults={'fast': 12, 'slow': 26},
+                   depends=lambda p: {'ema_fast': ('ema', {'window': p['fast']}),
+                                      'ema_slow': ('ema', {'window': p['slow']})})
+def _macd(ema_fast, ema_slow, fast, slow):
+    return ema_fast - ema_slow
+
+
+@registry.register('macd_signal', defaults={'fast': 12, 'slow': 26, 'signal': 9},
+                   depends=lambda p: {'macd': ('macd', {'fast': p['fast'], 'slow': p['slow']})})
+def _macd_signal(macd, fast, slow, signal):
+    return macd.ewm(span=signal, min_periods=signal, adjust=False).mean()
+
+
+@registry.register('macd_diff', defaults={'fast': 12, 'slow': 26, 'signal': 9},
+                   depends=lambda p: {'macd': ('macd', {'fast': p['fast'], 'slow': p['slow']}),
+                                      'macd_signal': ('macd_signal', p)})
+def _macd_diff(macd, macd_signal, fast, slow, signal):
+    return macd - macd_signal
+
+
+@registry.register('bb_middle', defaults={'window': 20},
+                   depends=lambda p: {'middle': ('sma', {'column': 'close', 'window': p['window']})})
+def _bb_middle(middle, window):
+    return middle
+
+
+@registry.register('bb_upper', defaults={'window': 20, 'window_dev': 2},
+                   depends=lambda p: {'middle': ('sma', {'column': 'close', 'window': p['window']}),
+                                      'std': ('rolling_std', {'column': 'close', 'window': p['window'], 'ddof': 0})})
+def _bb_upper(middle, std, window, window_dev):
+    return middle + window_dev * std
+
+
+@registry.register('bb_lower', defaults={'window': 20, 'window_dev': 2},
+                   depends=lambda p: {'middle': ('sma', {'column': 'close', 'window': p['window']}),
+                                      'std': ('rolling_std', {'column': 'close', 'window': p['window'], 'ddof': 0})})
+def _bb_lower(middle, std, window, window_dev):
+    return middle - window_dev * std
+
+
+@registry.register('atr', inputs=('high', 'low', 'close'), defaults={'window': 14})
+def _atr(high, low, close, window):
+    return AverageTrueRange(high=high, low=low, close=close, window=window).average_true_range()
+
+
+@registry.register('adx_components', inputs=('high', 'low', 'close'), defaults={'window': 14})
+def _adx_components(high, low, close, window):
+    indicator = ADXIndicator(high=high, low=low, close=close, window=window)
+    return pd.DataFrame({'adx': indicator.adx(), 'plus_di': indicator.adx_pos(),
+                         'minus_di': indicator.adx_neg()}, index=close.index)
+
+
+for _component in ('adx', 'plus_di', 'minus_di'):
+    registry.register(_component, defaults={'window': 14},
+                      depends=lambda p: {'components': ('adx_components', p)})(
+        lambda components, window, _column=_component: components[_column])
+
+
+@registry.register('stoch_k', inputs=('high', 'low', 'close'), defaults={'window': 14})
+def _stoch_k(high, low, close, window):
+    return StochasticOscillator(high=high, low=low, close=close, window=window).stoch()
+
+
+@registry.register('stoch_d', defaults={'window': 14, 'smooth_window': 3},
+                   depends=lambda p: {'stoch_k': ('stoch_k', {'window': p['window']})})
+def _stoch_d(stoch_k, window, smooth_window):
+    return stoch_k.rolling(smooth_window, min_periods=smooth_window).mean()
+
+
+@registry.register('williams_r', inputs=('high', 'low', 'close'), defaults={'lbp': 14})
+def _williams_r(high, low, close, lbp):
+    return WilliamsRIndicator(high=high, low=low, close=close, lbp=lbp).williams_r()
+
+
+@registry.register('roc', inputs=('close',), defaults={'window': 12})
+def _roc(close, window):
+    return ROCIndicator(close=close, window=window).roc()
+
+
+@registry.register('ichimoku', inputs=('high', 'low'), defaults={'window1': 9, 'window2': 26, 'window3': 52})
+def _ichimoku(high, low, window1, window2, window3):
+    indicator = IchimokuIndicator(high=high, low=low, window1=window1, window2=window2, window3=window3)
+    return pd.DataFrame({
+        'conversion': indicator.ichimoku_conversion_line(),
+        'base': indicator.ichimoku_base_line(),
+        'span_a': indicator.ichimoku_a(),
+        'span_b': indicator.ichimoku_b()
+    }, index=high.index)
+
+
+@registry.register('psar', inputs=('high', 'low', 'close'), defaults={'step': 0.02, 'max_step': 0.2})
+def _psar(high, low, close, step, max_step):
+    # אינדקס מספרי - PSARIndicator כותב לפי תווית ונשבר על DatetimeIndex
+    psar = PSARIndicator(high=high.reset_index(drop=True), low=low.reset_index(drop=True),
+                         close=close.reset_index(drop=True), step=step, max_step=max_step).psar()
+    return pd.Series(psar.to_numpy(), index=close.index, name='psar')
+
+
+@registry.register('keltner', inputs=('high', 'low', 'close'), defaults={'window': 20})
+def _keltner(high, low, close, window):
+    indicator = KeltnerChannel(high=high, low=low, close=close, window=window)
+    return pd.DataFrame({
+        'upper': indicator.keltner_channel_hband(),
+        'middle': indicator.keltner_channel_mband(),
+        'lower': indicator.keltner_channel_lband()
+    }, index=close.index)
+
+
+@registry.register('donchian', inputs=('high', 'low'), defaults={'window': 20})
+def _donchian(high, low, window):
+    upper = high.rolling(window).max()
+    lower = low.rolling(window).min()
+    return pd.DataFrame({'upper': upper, 'middle': lower + (upper - lower) / 2, 'lower': lower},
+                        index=high.index)
+
+
+@registry.register('obv', inputs=('close', 'volume'))
+def _obv(close, volume):
+    return OnBalanceVolumeIndicator(close=close, volume=volume).on_balance_volume()
+
+
+@registry.register('vwap', inputs=('high', 'low', 'close', 'volume'), defaults={'window': 14})
+def _vwap(high, low, close, volume, window):
+    return VolumeWeightedAveragePrice(high=high, low=low, close=close, volume=volume,
+                                      window=window).volume_weighted_average_price()
+
+
+@registry.register('adl', inputs=('high', 'low', 'close', 'volume'))
+def _adl(high, low, close, volume):
+    return AccDistIndexIndicator(high=high, low=low, close=close, volume=volume).acc_dist_index()
+
+
+@registry.register('zscore', inputs=('open', 'high', 'low', 'close', 'volume'),
+                   defaults={'column': 'close', 'window': 20},
+                   depends=lambda p: {'mean': ('sma', {'column': p['column'], 'window': p['window']}),
+                                      'std': ('rolling_std', {'column': p['column'], 'window': p['window'], 'ddof': 1})})
+def _zscore(mean, std, column, window, **series):
+    return (series[column] - mean) / std
+
+
+# =============================================
+# ⚡ NUMPY BACKEND
+# =============================================
+# מימושים על indicator_kernels - ללא ta במסלול החם; ההגדרות למעלה הן מימוש הייחוס (backend ta)
+
+def _series(values: np.ndarray, index: pd.Index) -> pd.Series:
+    return pd.Series(values, index=index)
+
+
+def _frame(values: Dict[str, np.ndarray], index: pd.Index) -> pd.DataFrame:
+    return pd.DataFrame(values, index=index)
+
+
+def _array(series: pd.Series) -> np.ndarray:
+    return series.to_numpy(dtype=np.float64)
+
+
+@registry.implement('sma', 'numpy')
+def _sma_numpy(column, window, **series):
+    return _series(kernels.rolling_mean(_array(series[column]), window), series[column].index)
+
+
+@registry.implement('ema', 'numpy')
+def _ema_numpy(close, window):
+    return _series(kernels.ema(_array(close), window), close.index)
+
+
+@registry.implement('rolling_std', 'numpy')
+def _rolling_std_numpy(column, window, ddof, **series):
+    return _series(kernels.rolling_std(_array(series[column]), window, ddof=ddof), series[column].index)
+
+
+@registry.implement('rsi', 'numpy')
+def _rsi_numpy(close, window):
+    return _series(kernels.rsi(_array(close), window), close.index)
+
+
+@registry.implement('macd_signal', 'numpy')
+def _macd_signal_numpy(macd, fast, slow, signal):
+    return _series(kernels.ema(_array(macd), signal), macd.index)
+
+
+@registry.implement('atr', 'numpy')
+def _atr_numpy(high, low, close, window):
+    return _series(kernels.atr(_array(high), _array(low), _array(close), window), close.index)
+
+
+@registry.implement('adx_components', 'numpy')
+def _adx_components_numpy(high, low, close, window):
+    return _frame(kernels.adx(_array(high), _array(low), _array(close), window), close.index)
+
+
+@registry.implement('stoch_k', 'numpy')
+def _stoch_k_numpy(high, low, close, window):
+    return _series(kernels.stochastic(_array(high), _array(low), _array(close), window)['k'], close.index)
+
+
+@registry.implement('stoch_d', 'numpy')
+def _stoch_d_numpy(stoch_k, window, smooth_window):
+    return _series(kernels.rolling_mean(_array(stoch_k), smooth_window), stoch_k.index)
+
+
+@registry.implement('williams_r', 'numpy')
+def _williams_r_numpy(high, low, close, lbp):
+    return _series(kernels.williams_r(_array(high), _array(low), _array(close), lbp), close.index)
+
+
+@registry.implement('roc', 'numpy')
+def _roc_numpy(close, window):
+    return _series(kernels.roc(_array(close), window), close.index)
+
+
+@registry.implement('ichimoku', 'numpy')
+def _ichimoku_numpy(high, low, window1, window2, window3):
+    return _frame(kernels.ichimoku(_array(high), _array(low), window1, window2, window3), high.index)
+
+
+@registry.implement('psar', 'numpy')
+def _psar_numpy(high, low, close, step, max_step):
+    values = kernels.psar(_array(high), _array(low), _array(close), step, max_step)['psar']
+    return pd.Series(values, index=close.index, name='psar')
+
+
+@registry.implement('keltner', 'numpy')
+def _keltner_numpy(high, low, close, window):
+    return _frame(kernels.keltner(_array(high), _array(low), _array(close), window), close.index)
+
+
+@registry.implement('donchian', 'numpy')
+def _donchian_numpy(high, low, window):
+    return _frame(kernels.donchian(_array(high), _array(low), window), high.index)
+
+
+@registry.implement('obv', 'numpy')
+def _obv_numpy(close, volume):
+    return _series(kernels.obv(_array(close), _array(volume)), close.index)
+
+
+@registry.implement('vwap', 'numpy')
+def _vwap_numpy(high, low, close, volume, window):
+    return _series(kernels.vwap(_array(high), _array(low), _array(close), _array(volume), window), close.index)
+
+
+@registry.implement('adl', 'numpy')
+def _adl_numpy(high, low, close, volume):
+    return _series(kernels.adl(_array(high), _array(low), _array(close), _array(volume)), close.index)
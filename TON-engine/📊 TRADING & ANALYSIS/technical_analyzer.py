@@ -1,20 +1,18 @@
 import pandas as pd
 import numpy as np
-import ta
-from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator, ROCIndicator
-from ta.trend import MACD, EMAIndicator, ADXIndicator, IchimokuIndicator, PSARIndicator
-from ta.volatility import BollingerBands, AverageTrueRange, KeltnerChannel, DonchianChannel
-from ta.volume import VolumeWeightedAveragePrice, OnBalanceVolumeIndicator, AccDistIndexIndicator
-from ta.other import DailyReturnIndicator
 import logging
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from indicator_engine import IncrementalIndicatorEngine, StreamingIndicatorState, get_indicator_engine
+from indicator_registry import registry as indicator_registry
+
 class AdvancedTechnicalAnalyzer:
-    def __init__(self):
+    def __init__(self, indicator_engine: Optional[IncrementalIndicatorEngine] = None):
         self.logger = logging.getLogger(__name__)
+        self.indicator_engine = indicator_engine or get_indicator_engine()
         self.setup_indicators_config()
     
     def setup_indicators_config(self):
@@ -38,7 +36,8 @@ class AdvancedTechnicalAnalyzer:
             'market_structure': 0.15
         }
 
-    def comprehensive_technical_analysis(self, df: pd.DataFrame, symbol: str = "TONUSDT") -> Dict:
+    def comprehensive_technical_analysis(self, df: pd.DataFrame, symbol: str = "TONUSDT",
+                                         interval: str = '1h') -> Dict:
         """ניתוח טכני מקיף ומתקדם"""
         try:
             if df.empty or len(df) < 50:
@@ -46,17 +45,30 @@ class AdvancedTechnicalAnalyzer:
             
             self.logger.info(f"🔍 Running comprehensive technical analysis for {symbol}")
             
+            # מצב אינדיקטורים מצטבר - מתקדם רק בנרות חדשים
+            indicators = self.indicator_engine.sync(symbol, interval, df)
+            
+            with indicator_registry.request_context(f"analysis_{symbol}"):
+                return self._run_analysis(df, symbol, indicators)
+            
+        except Exception as e:
+            self.logger.error(f"❌ Error in comprehensive technical analysis: {e}")
+            return self._get_sample_analysis()
+
+    def _run_analysis(self, df: pd.DataFrame, symbol: str, indicators: StreamingIndicatorState) -> Dict:
+        """מריץ את כל שכבות הניתוח בתוך הקשר אינדיקטורים משותף"""
+        try:
             # ניתוח רב-שכבתי
             analysis = {
                 'timestamp': datetime.now().isoformat(),
                 'symbol': symbol,
                 'basic_analysis': self._basic_analysis(df),
-                'advanced_indicators': self._advanced_indicators_analysis(df),
+                'advanced_indicators': self._advanced_indicators_analysis(df, indicators),
                 'multi_timeframe_analysis': self._multi_timeframe_analysis(df),
                 'market_structure': self._market_structure_analysis(df),
                 'pattern_recognition': self._advanced_pattern_recognition(df),
                 'volume_analysis': self._comprehensive_volume_analysis(df),
-                'momentum_analysis': self._momentum_analysis(df),
+                'momentum_analysis': self._momentum_analysis(df, indicators),
                 'trend_analysis': self._trend_analysis(df),
                 'volatility_analysis': self._volatility_analysis(df),
                 'trading_signals': self._generate_trading_signals(df),
@@ -103,49 +115,43 @@ class AdvancedTechnicalAnalyzer:
             self.logger.error(f"Error in basic analysis: {e}")
             return {}
 
-    def _advanced_indicators_analysis(self, df: pd.DataFrame) -> Dict:
+    def _advanced_indicators_analysis(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
         """ניתוח אינדיקטורים מתקדמים"""
         try:
             return {
-                'trend_indicators': self._calculate_trend_indicators(df),
-                'momentum_indicators': self._calculate_momentum_indicators(df),
-                'volatility_indicators': self._calculate_volatility_indicators(df),
-                'volume_indicators': self._calculate_volume_indicators(df),
-                'cycle_indicators': self._calculate_cycle_indicators(df),
-                'market_health': self._calculate_market_health(df)
+                'trend_indicators': self._calculate_trend_indicators(df, indicators),
+                'momentum_indicators': self._momentum_indicators(df, indicators),
+                'volatility_indicators': self._calculate_volatility_indicators(df, indicators),
+                'volume_indicators': self._calculate_volume_indicators(df, indicators),
+                'cycle_indicators': self._calculate_cycle_indicators(df, indicators),
+                'market_health': self._calculate_market_health(df, indicators)
             }
         except Exception as e:
             self.logger.error(f"Error in advanced indicators analysis: {e}")
             return {}
 
-    def _calculate_trend_indicators(self, df: pd.DataFrame) -> Dict:
+    def _calculate_trend_indicators(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
         """מחשב אינדיקטורי מגמה מתקדמים"""
         try:
             # ממוצעים נעים
-            ema_9 = EMAIndicator(close=df['close'], window=9).ema_indicator()
-            ema_21 = EMAIndicator(close=df['close'], window=21).ema_indicator()
-            ema_50 = EMAIndicator(close=df['close'], window=50).ema_indicator()
-            ema_200 = EMAIndicator(close=df['close'], window=200).ema_indicator()
+            ema_9 = indicators.series('ema_9')
+            ema_21 = indicators.series('ema_21')
+            ema_50 = indicators.series('ema_50')
+            ema_200 = indicators.series('ema_200')
             
             # ADX - Average Directional Index
-            adx_indicator = ADXIndicator(high=df['high'], low=df['low'], close=df['close'], window=14)
-            adx = adx_indicator.adx()
-            plus_di = adx_indicator.adx_pos()
-            minus_di = adx_indicator.adx_neg()
+            adx = indicators.series('adx')
+            plus_di = indicators.series('plus_di')
+            minus_di = indicators.series('minus_di')
             
             # Ichimoku Cloud
-            ichimoku = IchimokuIndicator(
-                high=df['high'], low=df['low'],
-                window1=9, window2=26, window3=52
-            )
-            ichimoku_a = ichimoku.ichimoku_a()
-            ichimoku_b = ichimoku.ichimoku_b()
-            ichimoku_base = ichimoku.ichimoku_base_line()
-            ichimoku_conversion = ichimoku.ichimoku_conversion_line()
+            ichimoku_a = indicators.series('ichimoku_a')
+            ichimoku_b = indicators.series('ichimoku_b')
+            ichimoku_base = indicators.series('ichimoku_base')
+            ichimoku_conversion = indicators.series('ichimoku_conversion')
             
             # Parabolic SAR
-            psar = PSARIndicator(high=df['high'], low=df['low'], close=df['close'])
-            psar_value = psar.psar()
+            psar_value = indicators.series('psar')
             
             return {
                 'moving_averages': {
@@ -178,35 +184,39 @@ class AdvancedTechnicalAnalyzer:
                 'parabolic_sar': {
                     'value': round(psar_value.iloc[-1], 6),
                     'trend': 'BULLISH' if df['close'].iloc[-1] > psar_value.iloc[-1] else 'BEARISH',
-                    'reversal': self._check_psar_reversal(psar_value)
+                    'reversal': self._check_psar_reversal(indicators.series('psar_up_trend'))
                 }
             }
         except Exception as e:
             self.logger.error(f"Error calculating trend indicators: {e}")
             return {}
 
-    def _calculate_momentum_indicators(self, df: pd.DataFrame) -> Dict:
+    def _momentum_indicators(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
+        """אינדיקטורי מומנטום - מחושבים פעם אחת לכל בקשה ומשותפים בין הסעיפים"""
+        key = ('momentum_indicators', indicators.last_open_time, indicators.bars,
+               indicator_registry.fingerprint(df, indicator_registry.current_context()))
+        return indicator_registry.memoize(key, lambda: self._calculate_momentum_indicators(df, indicators))
+
+    def _calculate_momentum_indicators(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
         """מחשב אינדיקטורי מומנטום מתקדמים"""
         try:
             # RSI
-            rsi = RSIIndicator(close=df['close'], window=14).rsi()
+            rsi = indicators.series('rsi')
             
             # MACD
-            macd_indicator = MACD(close=df['close'])
-            macd_line = macd_indicator.macd()
-            macd_signal = macd_indicator.macd_signal()
-            macd_histogram = macd_indicator.macd_diff()
+            macd_line = indicators.series('macd')
+            macd_signal = indicators.series('macd_signal')
+            macd_histogram = indicators.series('macd_diff')
             
             # Stochastic
-            stoch = StochasticOscillator(high=df['high'], low=df['low'], close=df['close'])
-            stoch_k = stoch.stoch()
-            stoch_d = stoch.stoch_signal()
+            stoch_k = indicators.series('stoch_k')
+            stoch_d = indicators.series('stoch_d')
             
             # Williams %R
-            williams_r = WilliamsRIndicator(high=df['high'], low=df['low'], close=df['close']).williams_r()
+            williams_r = indicators.series('williams_r')
             
             # ROC - Rate of Change
-            roc = ROCIndicator(close=df['close']).roc()
+            roc = indicators.series('roc')
             
             # CCI - Commodity Channel Index
             cci = self._calculate_cci(df)
@@ -253,30 +263,26 @@ class AdvancedTechnicalAnalyzer:
             self.logger.error(f"Error calculating momentum indicators: {e}")
             return {}
 
-    def _calculate_volatility_indicators(self, df: pd.DataFrame) -> Dict:
+    def _calculate_volatility_indicators(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
         """מחשב אינדיקטורי תנודתיות מתקדמים"""
         try:
             # Bollinger Bands
-            bb = BollingerBands(close=df['close'], window=20, window_dev=2)
-            bb_upper = bb.bollinger_hband()
-            bb_lower = bb.bollinger_lband()
-            bb_middle = bb.bollinger_mavg()
+            bb_upper = indicators.series('bb_upper')
+            bb_lower = indicators.series('bb_lower')
+            bb_middle = indicators.series('bb_middle')
             
             # ATR - Average True Range
-            atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14)
-            atr_value = atr.average_true_range()
+            atr_value = indicators.series('atr')
             
             # Keltner Channel
-            keltner = KeltnerChannel(high=df['high'], low=df['low'], close=df['close'])
-            kc_upper = keltner.keltner_channel_hband()
-            kc_lower = keltner.keltner_channel_lband()
-            kc_middle = keltner.keltner_channel_mband()
+            kc_upper = indicators.series('kc_upper')
+            kc_lower = indicators.series('kc_lower')
+            kc_middle = indicators.series('kc_middle')
             
             # Donchian Channel
-            donchian = DonchianChannel(high=df['high'], low=df['low'], close=df['close'])
-            dc_upper = donchian.donchian_channel_hband()
-            dc_lower = donchian.donchian_channel_lband()
-            dc_middle = donchian.donchian_channel_mband()
+            dc_upper = indicators.series('dc_upper')
+            dc_lower = indicators.series('dc_lower')
+            dc_middle = indicators.series('dc_middle')
             
             return {
                 'bollinger_bands': {
@@ -312,22 +318,20 @@ class AdvancedTechnicalAnalyzer:
             self.logger.error(f"Error calculating volatility indicators: {e}")
             return {}
 
-    def _calculate_volume_indicators(self, df: pd.DataFrame) -> Dict:
+    def _calculate_volume_indicators(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
         """מחשב אינדיקטורי ווליום מתקדמים"""
         try:
             # OBV - On Balance Volume
-            obv = OnBalanceVolumeIndicator(close=df['close'], volume=df['volume']).on_balance_volume()
+            obv = indicators.series('obv')
             
             # VWAP - Volume Weighted Average Price
-            vwap = VolumeWeightedAveragePrice(
-                high=df['high'], low=df['low'], close=df['close'], volume=df['volume']
-            ).volume_weighted_average_price()
+            vwap = indicators.series('vwap')
             
             # Accumulation/Distribution Line
-            adl = AccDistIndexIndicator(high=df['high'], low=df['low'], close=df['close'], volume=df['volume']).acc_dist_index()
+            adl = indicators.series('adl')
             
             # Volume SMA
-            volume_sma = df['volume'].rolling(window=20).mean()
+            volume_sma = indicators.series('volume_sma_20')
             
             # Chaikin Money Flow
             cmf = self._calculate_cmf(df)
@@ -457,11 +461,11 @@ class AdvancedTechnicalAnalyzer:
             self.logger.error(f"Error in volume analysis: {e}")
             return {}
 
-    def _momentum_analysis(self, df: pd.DataFrame) -> Dict:
+    def _momentum_analysis(self, df: pd.DataFrame, indicators: StreamingIndicatorState) -> Dict:
         """ניתוח מומנטום מתקדם"""
         try:
             return {
-                'momentum_indicators': self._calculate_momentum_indicators(df),
+                'momentum_indicators': self._momentum_indicators(df, indicators),
                 'momentum_divergence': self._check_momentum_divergence(df),
                 'momentum_trend': self._analyze_momentum_trend(df),
                 'momentum_quality': self._assess_momentum_quality(df)
@@ -622,6 +626,153 @@ class AdvancedTechnicalAnalyzer:
             'hidden_bearish': False
         }
 
+    def _check_crossover(self, fast, slow) -> str:
+        """בודק חציה בין שתי סדרות בנר האחרון"""
+        try:
+            if fast.iloc[-1] > slow.iloc[-1] and fast.iloc[-2] <= slow.iloc[-2]:
+                return "BULLISH_CROSSOVER"
+            elif fast.iloc[-1] < slow.iloc[-1] and fast.iloc[-2] >= slow.iloc[-2]:
+                return "BEARISH_CROSSOVER"
+            return "NONE"
+        except:
+            return "UNKNOWN"
+
+    def _check_di_crossover(self, plus_di, minus_di) -> str:
+        """בודק חציית +DI/-DI"""
+        return self._check_crossover(plus_di, minus_di)
+
+    def _check_macd_crossover(self, macd_line, macd_signal) -> str:
+        """בודק חציית MACD וקו האות"""
+        return self._check_crossover(macd_line, macd_signal)
+
+    def _check_stochastic_crossover(self, stoch_k, stoch_d) -> str:
+        """בודק חציית %K/%D"""
+        return self._check_crossover(stoch_k, stoch_d)
+
+    def _check_macd_divergence(self, df, macd_line) -> Dict:
+        """בודק MACD Divergence"""
+        return self._check_rsi_divergence(df, macd_line)
+
+    def _get_ichimoku_cloud_position(self, df, ichimoku_a, ichimoku_b) -> str:
+        """מחזיר מיקום מחיר ביחס לענן"""
+        try:
+            price = df['close'].iloc[-1]
+            cloud_top = max(ichimoku_a.iloc[-1], ichimoku_b.iloc[-1])
+            cloud_bottom = min(ichimoku_a.iloc[-1], ichimoku_b.iloc[-1])
+            if price > cloud_top:
+                return "ABOVE_CLOUD"
+            elif price < cloud_bottom:
+                return "BELOW_CLOUD"
+            return "IN_CLOUD"
+        except:
+            return "UNKNOWN"
+
+    def _get_ichimoku_signal(self, df, conversion, base, ichimoku_a, ichimoku_b) -> str:
+        """מחזיר אות Ichimoku"""
+        try:
+            position = self._get_ichimoku_cloud_position(df, ichimoku_a, ichimoku_b)
+            if position == "ABOVE_CLOUD" and conversion.iloc[-1] > base.iloc[-1]:
+                return "BULLISH"
+            elif position == "BELOW_CLOUD" and conversion.iloc[-1] < base.iloc[-1]:
+                return "BEARISH"
+            return "NEUTRAL"
+        except:
+            return "UNKNOWN"
+
+    def _check_psar_reversal(self, psar_up_trend) -> bool:
+        """בודק היפוך מגמה ב-Parabolic SAR"""
+        try:
+            return bool(psar_up_trend.iloc[-1] != psar_up_trend.iloc[-2])
+        except:
+            return False
+
+    def _get_bb_signal(self, df, bb_upper, bb_lower) -> str:
+        """מחזיר אות Bollinger Bands"""
+        try:
+            price = df['close'].iloc[-1]
+            if price <= bb_lower.iloc[-1]:
+                return "OVERSOLD"
+            elif price >= bb_upper.iloc[-1]:
+                return "OVERBOUGHT"
+            return "NEUTRAL"
+        except:
+            return "UNKNOWN"
+
+    def _get_kc_position(self, price, kc_upper, kc_lower) -> str:
+        """מחזיר מיקום מחיר ב-Keltner Channel"""
+        return self._get_bb_position(price, kc_upper, kc_lower)
+
+    def _check_donchian_breakout(self, df, dc_upper, dc_lower) -> str:
+        """בודק פריצה של Donchian Channel ביחס לנר הקודם"""
+        try:
+            price = df['close'].iloc[-1]
+            if price > dc_upper.iloc[-2]:
+                return "BULLISH_BREAKOUT"
+            elif price < dc_lower.iloc[-2]:
+                return "BEARISH_BREAKOUT"
+            return "NONE"
+        except:
+            return "UNKNOWN"
+
+    def _check_volume_divergence(self, df, obv) -> bool:
+        """בודק סטייה בין כיוון המחיר לכיוון OBV"""
+        try:
+            price_change = df['close'].iloc[-1] - df['close'].iloc[-10]
+            obv_change = obv.iloc[-1] - obv.iloc[-10]
+            return bool(np.sign(price_change) != np.sign(obv_change))
+        except:
+            return False
+
+    def _get_obv_signal(self, obv) -> str:
+        """מחזיר אות OBV לפי מגמת 10 נרות"""
+        try:
+            return 'BULLISH' if obv.iloc[-1] > obv.iloc[-10] else 'BEARISH'
+        except:
+            return 'NEUTRAL'
+
+    def _get_adl_signal(self, adl) -> str:
+        """מחזיר אות Accumulation/Distribution לפי מגמת 10 נרות"""
+        try:
+            return 'BULLISH' if adl.iloc[-1] > adl.iloc[-10] else 'BEARISH'
+        except:
+            return 'NEUTRAL'
+
+    def _calculate_cycle_indicators(self, df, indicators: StreamingIndicatorState) -> Dict:
+        """מחזיר מצב מחזור לפי Stochastic ו-Williams %R"""
+        try:
+            stoch_k = indicators.latest['stoch_k']
+            williams_r = indicators.latest['williams_r']
+            if stoch_k < 20 and williams_r < -80:
+                phase = 'CYCLE_BOTTOM'
+            elif stoch_k > 80 and williams_r > -20:
+                phase = 'CYCLE_TOP'
+            else:
+                phase = 'MID_CYCLE'
+            return {
+                'phase': phase,
+                'stoch_k': round(stoch_k, 2),
+                'williams_r': round(williams_r, 2)
+            }
+        except:
+            return {}
+
+    def _calculate_market_health(self, df, indicators: StreamingIndicatorState) -> Dict:
+        """מחזיר מדד בריאות שוק פשוט מ-ADX, RSI ורוחב Bollinger"""
+        try:
+            latest = indicators.latest
+            bandwidth = (latest['bb_upper'] - latest['bb_lower']) / latest['bb_middle']
+            trending = latest['adx'] > 25
+            balanced = 30 <= latest['rsi'] <= 70
+            return {
+                'trending': bool(trending),
+                'balanced_momentum': bool(balanced),
+                'bandwidth': round(bandwidth, 4),
+                'status': 'HEALTHY' if trending and balanced else
+                          'OVEREXTENDED' if not balanced else 'RANGING'
+            }
+        except:
+            return {}
+
     def _calculate_comprehensive_summary(self, analysis: Dict) -> Dict:
         """מחשב סיכום משוקלל"""
         try:
@@ -0,0 +1,460 @@
+import logging
+import json
+import math
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+
+class QuantileSketch:
+    """היסטוגרמה לוגריתמית (בסגנון DDSketch) עם דעיכה - quantile בדיוק יחסי קבוע ובזיכרון קבוע.
+
+    bucket k מכסה (γ^(k-1), γ^k]; הספירות דועכות עם half_life (בשניות של זמן האירועים),
+    כך שה-quantile משקף את השעות האחרונות ולא את כל ההיסטוריה.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1.0, max_value: float = 1e10,
+                 half_life: float = 3600.0):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        self.counts = np.zeros(math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1)
+        self.half_life = half_life
+        self.total = 0.0
+        self.count = 0
+        self._decayed_at: Optional[float] = None
+
+    def _decay(self, now: float):
+        if self._decayed_at is None:
+            self._decayed_at = now
+            return
+        elapsed = now - self._decayed_at
+        # דעיכה לכל היותר פעם בשנייה - כפל וקטורי על כל ה-buckets
+        if elapsed >= 1.0:
+            factor = 0.5 ** (elapsed / self.half_life)
+            self.counts *= factor
+            self.total *= factor
+            self._decayed_at = now
+
+    def add(self, value: float, now: float):
+        self._decay(now)
+        index = math.ceil(math.log(max(value, 1e-12)) / self._log_gamma) - self._offset
+        self.counts[min(max(index, 0), len(self.counts) - 1)] += 1
+        self.total += 1
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.total <= 0:
+            return None
+        index = min(int(np.searchsorted(np.cumsum(self.counts), q * self.total)), len(self.counts) - 1)
+        return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+
+
+class VolumeBaseline:
+    """נפח (notional) לדקה על חלון מתגלגל - ring של דקות לפי זמן העסקאות"""
+
+    def __init__(self, minutes: int = 60):
+        self.buckets = np.zeros(minutes)
+        self.minute: Optional[int] = None
+        self.completed = 0
+
+    def add(self, notional: float, time_ms: int):
+        minute = time_ms // 60000
+        if self.minute is None:
+            self.minute = minute
+        elif minute > self.minute:
+            # דקות בלי עסקאות נכנסות כאפס
+            for step in range(1, min(minute - self.minute, len(self.buckets)) + 1):
+                self.buckets[(self.minute + step) % len(self.buckets)] = 0.0
+            self.completed += minute - self.minute
+            self.minute = minute
+        elif minute < self.minute:
+            # עסקה מאחרת מדקה שכבר נסגרה - נספרת בדקה הנוכחית
+            minute = self.minute
+        self.buckets[minute % len(self.buckets)] += notional
+
+    def per_minute(self) -> Optional[float]:
+        """ממוצע הדקות השלמות בחלון (בלי הדקה הנוכחית)"""
+        completed = min(self.completed, len(self.buckets) - 1)
+        if completed == 0:
+            return None
+        return float(self.buckets.sum() - self.buckets[self.minute % len(self.buckets)]) / completed
+
+
+class _Cluster:
+    """רצף מילויים באותו צד - אירוע לווייתן מועמד"""
+
+    __slots__ = ('kind', 'side', 'first_time', 'last_time', 'received', 'quantity', 'notional',
+                 'first_price', 'last_price', 'fills')
+
+    def __init__(self, kind: str, side: str, price: float, quantity: float, time_ms: int, received: float):
+        self.kind = kind
+        self.side = side
+        self.first_time = self.last_time = time_ms
+        self.received = received
+        self.quantity = quantity
+        self.notional = price * quantity
+        self.first_price = self.last_price = price
+        self.fills = 1
+
+    def extend(self, price: float, quantity: float, time_ms: int, received: float):
+        self.last_time = time_ms
+        self.received = received
+        self.quantity += quantity
+        self.notional += price * quantity
+        self.last_price = price
+        self.fills += 1
+
+
+class _SymbolState:
+    def __init__(self, baseline_minutes: int, half_life: float, history: int):
+        self.baseline = VolumeBaseline(baseline_minutes)
+        self.sketches = {'trade': QuantileSketch(half_life=half_life),
+                         'liquidation': QuantileSketch(half_life=half_life)}
+        self.clusters: Dict[str, _Cluster] = {}
+        self.history: deque = deque(maxlen=history)
+
+
+class WhaleDetector:
+    """זיהוי לווייתנים מזרם העסקאות: מילויים רצופים באותו צד מתקבצים לאירוע אחד.
+
+    אשכול נסגר כשעובר cluster_gap_ms בלי מילוי נוסף באותו צד (או כשהצד מתהפך / עובר cluster_window_ms);
+    הוא לווייתן אם ה-notional שלו מעל ה-quantile של האשכולות האחרונים בסימל וגם מעל min_notional.
+    אירועים נשמרים בהיסטוריה חסומה ונדחפים ל-subscribers מיד עם הסגירה.
+    """
+
+    def __init__(self, cluster_gap_ms: int = 500, cluster_window_ms: int = 5000, quantile: float = 0.999,
+                 min_notional: float = 50000.0, min_samples: int = 500, baseline_minutes: int = 60,
+                 half_life: float = 3600.0, history: int = 500):
+        self.logger = logging.getLogger(__name__)
+        self.cluster_gap_ms = cluster_gap_ms
+        self.cluster_window_ms = cluster_window_ms
+        self.quantile = quantile
+        self.min_notional = min_notional
+        self.min_samples = min_samples
+        self.baseline_minutes = baseline_minutes
+        self.half_life = half_life
+        self.history_size = history
+        self.subscribers: List[Callable[[Dict], None]] = []
+        self.symbols: Dict[str, _SymbolState] = {}
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.stats = {'trades': 0, 'liquidations': 0, 'clusters': 0, 'events': 0,
+                      'subscriber_errors': 0, 'last_latency_ms': None, 'max_latency_ms': 0.0}
+
+    def subscribe(self, callback: Callable[[Dict], None]):
+        """callback(event) לכל אירוע לווייתן - נקרא על thread של ה-stream, צריך לחזור מהר"""
+        self.subscribers.append(callback)
+
+    def _state(self, symbol: str) -> _SymbolState:
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = _SymbolState(self.baseline_minutes, self.half_life, self.history_size)
+        return state
+
+    # =============================================
+    # 📥 FILLS
+    # =============================================
+
+    def on_agg_trade(self, data: Dict):
+        """הודעת aggTrade של Binance; m=True - הקונה הוא ה-maker, כלומר מוכר אגרסיבי"""
+        self.on_fill(data['s'], 'trade', 'SELL' if data['m'] else 'BUY', float(data['p']), float(data['q']),
+                     int(data['T']))
+
+    def on_force_order(self, data: Dict):
+        """הודעת forceOrder (חיסול) מה-futures; SELL - חיסול של לונג"""
+        order = data['o']
+        price = float(order.get('ap') or 0) or float(order['p'])
+        quantity = float(order.get('z') or 0) or float(order['q'])
+        self.on_fill(order['s'], 'liquidation', order['S'], price, quantity, int(order['T']))
+
+    def on_fill(self, symbol: str, kind: str, side: str, price: float, quantity: float, time_ms: int,
+                received: Optional[float] = None):
+        received = time.time() if received is None else received
+        symbol = symbol.upper()
+        events = []
+        with self._lock:
+            state = self._state(symbol)
+            if kind == 'trade':
+                state.baseline.add(price * quantity, time_ms)
+                self.stats['trades'] += 1
+            else:
+                self.stats['liquidations'] += 1
+
+            cluster = state.clusters.get(kind)
+            if (cluster is not None and cluster.side == side
+                    and time_ms - cluster.last_time <= self.cluster_gap_ms
+                    and time_ms - cluster.first_time <= self.cluster_window_ms):
+                cluster.extend(price, quantity, time_ms, received)
+            else:
+                if cluster is not None:
+                    events.append(self._close(symbol, state, cluster))
+                state.clusters[kind] = _Cluster(kind, side, price, quantity, time_ms, received)
+        self._publish(events)
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """סוגר אשכולות שלא קיבלו מילוי cluster_gap_ms (בשעון המקומי) - נקרא מה-flusher כמה פעמים בשנייה"""
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            for symbol, state in self.symbols.items():
+                for kind, cluster in list(state.clusters.items()):
+                    if (now - cluster.received) * 1000 >= self.cluster_gap_ms:
+                        events.append(self._close(symbol, state, cluster))
+                        del state.clusters[kind]
+        return self._publish(events)
+
+    # =============================================
+    # 🐋 EVENTS
+    # =============================================
+
+    def threshold(self, symbol: str, kind: str = 'trade') -> float:
+        """notional מינימלי לאירוע לווייתן - ה-quantile אחרי חימום, ולא פחות מ-min_notional"""
+        state = self.symbols.get(symbol.upper())
+        if state is None:
+            return self.min_notional
+        sketch = state.sketches[kind]
+        if sketch.count < self.min_samples:
+            return self.min_notional
+        return max(self.min_notional, sketch.quantile(self.quantile) or 0.0)
+
+    def _close(self, symbol: str, state: _SymbolState, cluster: _Cluster) -> Optional[Dict]:
+        self.stats['clusters'] += 1
+        # הסף נקבע לפני שהאשכול עצמו נכנס ל-sketch
+        threshold = self.threshold(symbol, cluster.kind)
+        state.sketches[cluster.kind].add(cluster.notional, cluster.last_time / 1000)
+        if cluster.notional < threshold:
+            return None
+
+        self._sequence += 1
+        detected = time.time()
+        baseline = state.baseline.per_minute()
+        volume_ratio = cluster.notional / baseline if baseline else 0.0
+        price_impact = (cluster.last_price / cluster.first_price - 1) * 100
+        ratio = cluster.notional / threshold
+        event = {
+            'id': self._sequence,
+            'symbol': symbol,
+            'kind': cluster.kind,
+            'type': cluster.side,
+            'amount': round(cluster.quantity, 4),
+            'price': round(cluster.notional / cluster.quantity, 8),
+            'notional': round(cluster.notional, 2),
+            'fills': cluster.fills,
+            'first_price': cluster.first_price,
+            'last_price': cluster.last_price,
+            'price_impact': round(price_impact, 4),
+            'duration_ms': cluster.last_time - cluster.first_time,
+            'volume_ratio': round(volume_ratio, 4),
+            'threshold': round(threshold, 2),
+            'whale_size': 'MEGA_WHALE' if ratio >= 5 else 'LARGE_WHALE' if ratio >= 2 else 'WHALE',
+            'impact_score': round(min(min(ratio / 5, 1.0) * 0.5 + min(abs(price_impact), 1.0) * 0.3
+                                      + min(volume_ratio, 1.0) * 0.2, 1.0), 4),
+            'timestamp': datetime.fromtimestamp(cluster.first_time / 1000).isoformat(),
+            'trade_time': cluster.last_time,
+            'latency_ms': round((detected - cluster.received) * 1000, 1)
+        }
+        state.history.append(event)
+        self.stats['events'] += 1
+        self.stats['last_latency_ms'] = event['latency_ms']
+        self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], event['latency_ms'])
+        return event
+
+    def _publish(self, events: List[Optional[Dict]]) -> int:
+        # מחוץ ל-lock - subscriber איטי לא עוצר את קליטת העסקאות של סימלים אחרים
+        published = 0
+        for event in events:
+            if event is None:
+                continue
+            published += 1
+            for callback in self.subscribers:
+                try:
+                    callback(event)
+                except Exception as e:
+                    self.stats['subscriber_errors'] += 1
+                    self.logger.error(f"Error in whale subscriber: {e}")
+        return published
+
+    def events(self, symbol: Optional[str] = None, limit: int = 50, kind: Optional[str] = None) -> List[Dict]:
+        """אירועים אחרונים (החדש ראשון) - סימל אחד או כולם"""
+        with self._lock:
+            if symbol is not None:
+                state = self.symbols.get(symbol.upper())
+                events = list(state.history) if state else []
+            else:
+                events = sorted((e for state in self.symbols.values() for e in state.history), key=lambda e: e['id'])
+        if kind is not None:
+            events = [e for e in events if e['kind'] == kind]
+        return events[::-1][:limit]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            symbols = {symbol: {
+                'threshold': round(self.threshold(symbol), 2),
+                'baseline_per_minute': state.baseline.per_minute(),
+                'clusters_seen': state.sketches['trade'].count,
+                'events': len(state.history)
+            } for symbol, state in self.symbols.items()}
+        return {**self.stats, 'subscribers': len(self.subscribers), 'symbols': symbols}
+
+
+class WhaleStream:
+    """aggTrade מה-spot ו-forceOrder מה-futures (חיבור משולב לכל אחד) שמזינים את ה-WhaleDetector.
+
+    forceOrder קיים רק ב-USDⓈ-M futures, ולכן שני חיבורים; flusher סוגר אשכולות שקטים כדי שאירוע
+    יגיע ל-subscribers תוך פחות משנייה גם אם אין עסקה נוספת אחריו.
+    """
+
+    def __init__(self, detector: Optional[WhaleDetector] = None,
+                 spot_ws_url: str = "wss://stream.binance.com:9443",
+                 futures_ws_url: str = "wss://fstream.binance.com",
+                 flush_interval: float = 0.2, liquidations: bool = True):
+        self.detector = detector or WhaleDetector()
+        self.ws_urls = {'spot': spot_ws_url, 'futures': futures_ws_url}
+        self.flush_interval = flush_interval
+        self.liquidations = liquidations
+        self.logger = logging.getLogger(__name__)
+
+        self.streams: Dict[str, List[str]] = {'spot': [], 'futures': []}
+        self._ws: Dict[str, object] = {}
+        self._connected = {name: threading.Event() for name in self.ws_urls}
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._request_id = 0
+        self.stats = {'messages': 0, 'reconnects': 0, 'last_message': None}
+
+    @staticmethod
+    def stream_names(symbol: str) -> Dict[str, str]:
+        return {'spot': f"{symbol.lower()}@aggTrade", 'futures': f"{symbol.lower()}@forceOrder"}
+
+    # =============================================
+    # 🔌 LIFECYCLE
+    # =============================================
+
+    def start(self, symbols: List[str]) -> bool:
+        """פותח את החיבורים לכל הסימלים ואת ה-flusher"""
+        if self._running:
+            for symbol in symbols:
+                self.subscribe(symbol)
+            return True
+
+        for symbol in symbols:
+            for connection, name in self.stream_names(symbol).items():
+                if name not in self.streams[connection]:
+                    self.streams[connection].append(name)
+
+        if not WEBSOCKET_AVAILABLE:
+            self.logger.warning("⚠️ websocket-client not installed - whale stream disabled")
+            return False
+
+        self._running = True
+        connections = ['spot', 'futures'] if self.liquidations else ['spot']
+        self._threads = [threading.Thread(target=self._run, args=(connection,), name=f'whale-{connection}', daemon=True)
+                         for connection in connections]
+        self._threads.append(threading.Thread(target=self._flush_loop, name='whale-flush', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        self._running = False
+        for ws in list(self._ws.values()):
+            ws.close()
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def subscribe(self, symbol: str):
+        """מוסיף סימל לחיבורים הקיימים (SUBSCRIBE)"""
+        for connection, name in self.stream_names(symbol).items():
+            if name in self.streams[connection]:
+                continue
+            self.streams[connection].append(name)
+            ws = self._ws.get(connection)
+            if ws is not None and self._connected[connection].is_set():
+                self._request_id += 1
+                ws.send(json.dumps({'method': 'SUBSCRIBE', 'params': [name], 'id': self._request_id}))
+
+    def _run(self, connection: str):
+        backoff = 1.0
+        while self._running:
+            url = f"{self.ws_urls[connection]}/stream?streams={'/'.join(self.streams[connection])}"
+            self._ws[connection] = websocket.WebSocketApp(
+                url,
+                on_open=lambda ws: self._on_open(connection),
+                on_message=self._on_message,
+                on_error=lambda ws, error: self.logger.error(f"Whale {connection} stream error: {error}"),
+                on_close=lambda ws, code, msg: self._connected[connection].clear()
+            )
+            started = time.time()
+            self._ws[connection].run_forever(ping_interval=180, ping_timeout=10)
+            self._connected[connection].clear()
+
+            if not self._running:
+                break
+            # חיבור שהחזיק מעמד מאפס את ה-backoff (Binance מנתקת כל 24 שעות)
+            backoff = 1.0 if time.time() - started > 60 else min(backoff * 2, 60.0)
+            self.stats['reconnects'] += 1
+            self.logger.warning(f"🔌 Whale {connection} stream disconnected, reconnecting in {backoff:.0f}s")
+            time.sleep(backoff)
+
+    def _on_open(self, connection: str):
+        self._connected[connection].set()
+        self.logger.info(f"✅ Whale {connection} stream connected ({len(self.streams[connection])} streams)")
+
+    def _on_message(self, ws, message: str):
+        try:
+            payload = json.loads(message)
+            data = payload.get('data', payload)
+            event_type = data.get('e')
+            if event_type == 'aggTrade':
+                self.detector.on_agg_trade(data)
+            elif event_type == 'forceOrder':
+                self.detector.on_force_order(data)
+            else:
+                return
+            self.stats['messages'] += 1
+            self.stats['last_message'] = time.time()
+        except Exception as e:
+            self.logger.error(f"Error processing whale stream message: {e}")
+
+    def _flush_loop(self):
+        while self._running:
+            try:
+                self.detector.flush()
+            except Exception as e:
+                self.logger.error(f"Error flushing whale clusters: {e}")
+            time.sleep(self.flush_interval)
+
+    def is_live(self, max_silence: float = 90.0) -> bool:
+        """חיבור ה-spot פעיל וקיבל עסקה לאחרונה"""
+        last = self.stats['last_message']
+        return self._connected['spot'].is_set() and last is not None and time.time() - last < max_silence
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'connected': {name: event.is_set() for name, event in self._connected.items()},
+                'streams': {name: sorted(streams) for name, streams in self.streams.items()},
+                'detector': self.detector.get_stats()}
+
+
+_shared_stream: Optional[WhaleStream] = None
+_shared_lock = threading.Lock()
+
+
+def get_whale_stream(liquidations: bool = True, **detector_options) -> WhaleStream:
+    """ה-stream המשותף לתהליך; האפשרויות משמשות רק ביצירה הראשונה"""
+    global _shared_stream
+    with _shared_lock:
+        if _shared_stream is None:
+            _shared_stream = WhaleStream(WhaleDetector(**detector_options), liquidations=liquidations)
+        return _shared_stream
@@ -1,13 +1,15 @@
 import requests
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import logging
 from typing import Dict, List, Optional
 import time
 
 class WhaleTracker:
-    def __init__(self):
+    def __init__(self, whale_stream=None):
         self.logger = logging.getLogger(__name__)
+        self.whale_stream = whale_stream
         self.whale_thresholds = {
             'TON': 50000,  # 50,000 TON
             'BNB': 1000,   # 1,000 BNB
@@ -15,9 +17,13 @@ class WhaleTracker:
             'ETH': 100     # 100 ETH
         }
     
-    def track_whale_transactions(self, symbol: str) -> List[Dict]:
+    def track_whale_transactions(self, symbol: str, limit: int = 50) -> List[Dict]:
         """מעקב אחר עסקאות לווייתנים"""
         try:
+            # אירועים אמיתיים מה-stream (aggTrade/forceOrder) כשהוא פועל
+            if self.whale_stream is not None and self.whale_stream.is_running():
+                return self.whale_stream.detector.events(symbol, limit)
+            
             # סימולציה - בחיים האמיתיים זה יתחבר ל-API של ביננס/בלוקצ'יין
             transactions = self._simulate_whale_activity(symbol)
             
@@ -0,0 +1,60 @@
+"""מדידת cold start של ה-ML - זמן ייבוא ואתחול ו-RSS בתהליך נקי, לפני ואחרי שימוש ראשון במודלים.
+
+    python bench_ml_startup.py --runs 5
+    python bench_ml_startup.py --first-use --models random_forest,lightgbm
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, os, sys, time
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+from ml_predictor import AdvancedMLPredictor
+imported = time.perf_counter()
+predictor = AdvancedMLPredictor({models!r})
+initialized = time.perf_counter()
+from ml_backends import import_report, rss_mb
+result = {{'import_ms': (imported - started) * 1000, 'init_ms': (initialized - imported) * 1000,
+           'rss_mb': rss_mb(), 'backends': list(import_report()['loaded'])}}
+if {first_use!r}:
+    predictor.setup_models()
+    result['first_use_ms'] = (time.perf_counter() - initialized) * 1000
+    result['first_use_rss_mb'] = rss_mb()
+    result['backends'] = list(import_report()['loaded'])
+print(json.dumps(result))
+'''
+
+
+def run_once(paths, models, first_use: bool) -> dict:
+    code = PROBE.format(paths=paths, models=models, first_use=first_use)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML cold start benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--models', default='', help='comma separated, default: all installed')
+    parser.add_argument('--first-use', action='store_true', help='also build the models (loads the backends)')
+    args = parser.parse_args()
+
+    engine_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = [os.path.join(engine_root, name) for name in sorted(os.listdir(engine_root))
+             if os.path.isdir(os.path.join(engine_root, name))]
+    models = [m.strip() for m in args.models.split(',') if m.strip()] or None
+
+    runs = [run_once(paths, models, args.first_use) for _ in range(args.runs)]
+    report = {'runs': args.runs, 'backends_loaded': runs[-1]['backends']}
+    for key in runs[0]:
+        if key != 'backends':
+            report[key] = round(statistics.median(run[key] for run in runs), 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# עמודות מצטברות (OBV) - בחישוב על זנב הנתונים מתחילות מאפס ומעוגנות לערך השמור
+CUMULATIVE_COLUMNS = ('obv',)
+
+
+def gather_windows(index: np.ndarray, columns: List[np.ndarray], as_of: List[Optional[int]],
+                   window: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """לכל as_of (epoch ms, None = הנר האחרון) - הנר האחרון עד אליו ו-window השורות שמסתיימות בו.
+
+    מחזיר (open_times (n,), values (n, window, len(columns)), valid (n,)); as_of לפני תחילת הסדרה לא valid.
+    """
+    rows = len(index)
+    targets = np.array([index[-1] if t is None else t for t in as_of], dtype=np.int64)
+    positions = np.searchsorted(index, targets, side='right') - 1
+    valid = positions >= 0
+    positions = np.clip(positions, 0, rows - 1)
+    window_index = np.clip(positions[:, None] + np.arange(1 - window, 1), 0, rows - 1)
+    values = np.stack([np.asarray(column)[window_index] for column in columns], axis=-1)
+    return np.asarray(index)[positions], values, valid
+
+
+class FeatureStore:
+    """features מחושבים לכל (symbol, interval, hash של הגדרת ה-features) - קובץ לכל עמודה.
+
+    נר חדש מחושב על זנב של warmup_bars נרות בלבד ונוסף לסוף הקבצים; הקוראים רואים רק את
+    מספר השורות שב-manifest, כך שכתיבה חלקית לא נראית. אימון קורא בלוק רציף (memory-mapped)
+    וחיזוי קורא את השורה האחרונה מהזיכרון.
+
+    קבצים קיימים רק גדלים. בנייה מלאה נכתבת ל-generation חדש (תיקייה g0001, g0002...) שה-manifest
+    עובר אליו - קובץ ש-worker אחר מחזיק ב-memmap לא מתקצר מתחתיו (SIGBUS).
+    """
+
+    def __init__(self, root_path: str = 'models/features', warmup_bars: int = 300):
+        self.root_path = root_path
+        self.warmup_bars = warmup_bars
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._manifests: Dict[Tuple, Dict] = {}
+        # (symbol, interval, definition) -> (open_time, close, שורת features)
+        self._latest: Dict[Tuple, Tuple[int, float, np.ndarray]] = {}
+        self._positions: Dict[Tuple, Dict[str, int]] = {}
+        self.stats = {'full_builds': 0, 'incremental_updates': 0, 'rows_appended': 0,
+                      'rows_rewritten': 0, 'latest_hits': 0}
+        os.makedirs(self.root_path, exist_ok=True)
+
+    # =============================================
+    # 📁 MANIFEST
+    # =============================================
+
+    def _series_dir(self, symbol: str, interval: str, definition: str) -> str:
+        return os.path.join(self.root_path, symbol.upper(), interval, definition)
+
+    def _data_dir(self, symbol: str, interval: str, definition: str, manifest: Dict) -> str:
+        """תיקיית הקבצים של ה-generation הנוכחי (0 - ישירות בתיקיית הסדרה)"""
+        series_dir = self._series_dir(symbol, interval, definition)
+        generation = manifest.get('generation', 0)
+        return os.path.join(series_dir, f"g{generation:04d}") if generation else series_dir
+
+    def _load_manifest(self, symbol: str, interval: str, definition: str, reload: bool = False) -> Dict:
+        key = (symbol.upper(), interval, definition)
+        if key in self._manifests and not reload:
+            return self._manifests[key]
+
+        manifest_path = os.path.join(self._series_dir(symbol, interval, definition), 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        else:
+            manifest = {
+                'symbol': symbol.upper(),
+                'interval': interval,
+                'definition': definition,
+                'columns': [],
+                'rows': 0,
+                'start': None,
+                'end': None,
+                'updated_at': None
+            }
+        self._manifests[key] = manifest
+        return manifest
+
+    def _save_manifest(self, symbol: str, interval: str, definition: str, manifest: Dict):
+        """שומר manifest באופן אטומי - אחריו השורות החדשות נראות לקוראים"""
+        manifest['updated_at'] = datetime.now().isoformat()
+        manifest_path = os.path.join(self._series_dir(symbol, interval, definition), 'manifest.json')
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+        self._manifests[(symbol.upper(), interval, definition)] = manifest
+
+    @contextmanager
+    def _series_lock(self, symbol: str, interval: str, definition: str):
+        """נעילה בין threads ובין תהליכים (השרת ו-workers של האימון כותבים לאותה סדרה)"""
+        series_dir = self._series_dir(symbol, interval, definition)
+        os.makedirs(series_dir, exist_ok=True)
+        with self._lock:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            with open(os.path.join(series_dir, '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # =============================================
+    # 🔄 CONVERSIONS
+    # =============================================
+
+    @staticmethod
+    def _to_epoch_ms(index) -> np.ndarray:
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        return index.values.astype('datetime64[ms]').astype(np.int64)
+
+    def _column_path(self, series_dir: str, column: str) -> str:
+        return os.path.join(series_dir, f"{column}.f8")
+
+    def _mmap(self, path: str, dtype: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+
+    # =============================================
+    # ✍️ WRITE PATH
+    # =============================================
+
+    def update(self, symbol: str, interval: str, definition: str, df: pd.DataFrame,
+               compute: Callable[[pd.DataFrame], pd.DataFrame]) -> int:
+        """מוסיף features לנרות החדשים ב-df בלבד; מחזיר כמה שורות נכתבו"""
+        if df is None or df.empty:
+            return 0
+
+        key = (symbol.upper(), interval, definition)
+
+        # מסלול מהיר - הנר האחרון כבר שמור ולא השתנה
+        latest = self._latest.get(key)
+        if latest is not None and latest[0] == pd.Timestamp(df.index[-1]).value // 10**6 \
+                and latest[1] == float(df['close'].iloc[-1]):
+            self.stats['latest_hits'] += 1
+            return 0
+
+        open_times = self._to_epoch_ms(df.index)
+
+        with self._series_lock(symbol, interval, definition):
+            # תהליך אחר אולי הוסיף שורות מאז הקריאה האחרונה
+            manifest = self._load_manifest(symbol, interval, definition, reload=True)
+            series_dir = self._data_dir(symbol, interval, definition, manifest)
+            rows = manifest['rows']
+            if rows and open_times[-1] < manifest['end']:
+                # df שנגמר לפני הסוף השמור (קורא עם חלון קצר יותר) - אין מה להוסיף, ולא בונים מחדש
+                # על חשבון השורות החדשות יותר
+                return 0
+            if rows == 0 or open_times[0] < manifest['start']:
+                # סדרה חדשה, או df עם היסטוריה ישנה מהשמור - בנייה מלאה
+                return self._rebuild(symbol, interval, definition, df, compute)
+
+            stored_index = self._mmap(os.path.join(series_dir, 'index.i8'), '<i8', rows)
+            stored_close = self._mmap(self._column_path(series_dir, 'close'), '<f8', rows)
+            position = int(np.searchsorted(open_times, stored_index[-1]))
+            if position < len(open_times) and open_times[position] == stored_index[-1] and \
+                    float(df['close'].iloc[position]) != float(stored_close[-1]):
+                # הנר האחרון שנשמר עוד נבנה - נכתב מחדש; שורות ישנות יותר לא משתנות
+                rows -= 1
+                position -= 1
+
+            if rows == 0 or position < 0 or position >= len(open_times) or \
+                    open_times[position] != stored_index[rows - 1]:
+                # אין המשכיות בין השמור ל-df (פער בנתונים) - בנייה מלאה
+                return self._rebuild(symbol, interval, definition, df, compute)
+
+            if position == len(open_times) - 1:
+                self._refresh_latest(symbol, interval, definition)
+                return 0
+
+            # features לנרות החדשים מחושבים על זנב קצר; הנר השמור האחרון משמש עוגן
+            tail_start = max(0, position - self.warmup_bars + 1)
+            computed = compute(df.iloc[tail_start:])
+            columns = manifest['columns']
+            if any(column not in computed.columns for column in columns):
+                return self._rebuild(symbol, interval, definition, df, compute)
+
+            anchor = computed.iloc[position - tail_start]
+            new_rows = computed.iloc[position - tail_start + 1:][columns].astype(np.float64)
+            for column in CUMULATIVE_COLUMNS:
+                if column in columns:
+                    stored = self._mmap(self._column_path(series_dir, column), '<f8', rows)
+                    new_rows[column] += float(stored[-1]) - float(anchor[column])
+
+            self.stats['rows_rewritten'] += manifest['rows'] - rows
+            self._write_columns(series_dir, manifest['columns'], rows, new_rows)
+            self._commit(symbol, interval, definition, manifest, rows, new_rows)
+            self.stats['incremental_updates'] += 1
+            return len(new_rows)
+
+    def _rebuild(self, symbol: str, interval: str, definition: str, df: pd.DataFrame,
+                 compute: Callable[[pd.DataFrame], pd.DataFrame]) -> int:
+        """בנייה מלאה ל-generation חדש; ה-manifest עובר אליו רק אחרי שכל הקבצים במקומם"""
+        computed = compute(df)
+        frame = computed.select_dtypes(include=[np.number, bool]).astype(np.float64)
+        manifest = self._load_manifest(symbol, interval, definition)
+        generation = manifest.get('generation', 0) + 1
+        series_dir = self._series_dir(symbol, interval, definition)
+        data_dir = os.path.join(series_dir, f"g{generation:04d}")
+        tmp_dir = f"{data_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            self._write_columns(tmp_dir, list(frame.columns), 0, frame)
+            # שארית מבנייה שנקטעה לפני שה-manifest הצביע עליה
+            shutil.rmtree(data_dir, ignore_errors=True)
+            os.rename(tmp_dir, data_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        manifest = {**manifest, 'columns': list(frame.columns), 'generation': generation}
+        self._commit(symbol, interval, definition, manifest, 0, frame)
+        self._prune_generations(series_dir, generation)
+        self.stats['full_builds'] += 1
+        self.logger.info(f"🧮 Built feature store {symbol} {interval} ({definition}) generation {generation}: "
+                         f"{len(frame)} rows x {len(frame.columns)} features")
+        return len(frame)
+
+    def _prune_generations(self, series_dir: str, generation: int):
+        """מוחק generations ישנים; הקודם נשאר לקורא שטען את ה-manifest רגע לפני המעבר.
+
+        מחיקה (unlink) בטוחה ל-memmap פתוח - המיפוי מחזיק את הקובץ עד שנסגר.
+        """
+        for name in os.listdir(series_dir):
+            match = re.fullmatch(r'g(\d{4})', name)
+            if match and int(match.group(1)) < generation - 1:
+                shutil.rmtree(os.path.join(series_dir, name), ignore_errors=True)
+            elif generation >= 2 and (name == 'index.i8' or name.endswith('.f8')):
+                # generation 0 - קבצים ישירות בתיקיית הסדרה
+                os.remove(os.path.join(series_dir, name))
+
+    def _write_columns(self, data_dir: str, columns: List[str], keep_rows: int, frame: pd.DataFrame):
+        """כותב את שורות ה-frame אחרי keep_rows השורות הראשונות - במקום, בלי לקצר קבצים"""
+        files = [('index.i8', self._to_epoch_ms(frame.index).astype('<i8'))]
+        files += [(f"{column}.f8", frame[column].to_numpy(dtype='<f8')) for column in columns]
+
+        for filename, values in files:
+            path = os.path.join(data_dir, filename)
+            # memmap פתוח בתהליך אחר לא רואה קובץ מתקצר - רק דריסה של השורה האחרונה והוספה
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.seek(keep_rows * 8)
+                f.write(values.tobytes())
+
+    def _commit(self, symbol: str, interval: str, definition: str, manifest: Dict,
+                keep_rows: int, frame: pd.DataFrame):
+        """ה-manifest נכתב אחרון - רק אחריו השורות (או ה-generation) החדשות נראות לקוראים"""
+        manifest['rows'] = keep_rows + len(frame)
+        if manifest['rows']:
+            index = self._mmap(os.path.join(self._data_dir(symbol, interval, definition, manifest), 'index.i8'),
+                               '<i8', manifest['rows'])
+            manifest['start'] = int(index[0])
+            manifest['end'] = int(index[-1])
+        self._save_manifest(symbol, interval, definition, manifest)
+        self.stats['rows_appended'] += len(frame)
+        self._refresh_latest(symbol, interval, definition)
+
+    def _refresh_latest(self, symbol: str, interval: str, definition: str):
+        manifest = self._load_manifest(symbol, interval, definition)
+        rows = manifest['rows']
+        if not rows:
+            return
+        series_dir = self._data_dir(symbol, interval, definition, manifest)
+        values = np.array([self._mmap(self._column_path(series_dir, column), '<f8', rows)[-1]
+                           for column in manifest['columns']])
+        close = float(values[manifest['columns'].index('close')]) if 'close' in manifest['columns'] else None
+        key = (symbol.upper(), interval, definition)
+        self._positions[key] = {column: i for i, column in enumerate(manifest['columns'])}
+        self._latest[key] = (manifest['end'], close, values)
+
+    # =============================================
+    # 📖 READ PATH
+    # =============================================
+
+    def read(self, symbol: str, interval: str, definition: str, start=None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """בלוק רציף מ-start עד הסוף - כל עמודה היא memmap של הקובץ שלה"""
+        manifest = self._load_manifest(symbol, interval, definition, reload=True)
+        rows = manifest['rows']
+        series_dir = self._data_dir(symbol, interval, definition, manifest)
+        index = self._mmap(os.path.join(series_dir, 'index.i8'), '<i8', rows)
+
+        first = 0
+        if start is not None and rows:
+            first = int(np.searchsorted(index, self._to_epoch_ms([start])[0]))
+
+        columns = columns or manifest['columns']
+        data = {column: self._mmap(self._column_path(series_dir, column), '<f8', rows)[first:]
+                for column in columns}
+        return pd.DataFrame(data, index=pd.DatetimeIndex(index[first:].astype('datetime64[ms]'), name='timestamp'),
+                            copy=False)
+
+    def latest_row(self, symbol: str, interval: str, definition: str,
+                   columns: List[str]) -> Optional[np.ndarray]:
+        """שורת ה-features האחרונה (1 x len(columns)) מהזיכרון, או None"""
+        key = (symbol.upper(), interval, definition)
+        if key not in self._latest:
+            self._refresh_latest(symbol, interval, definition)
+        latest = self._latest.get(key)
+        if latest is None:
+            return None
+
+        positions = self._positions[key]
+        if any(column not in positions for column in columns):
+            return None
+        return latest[2][[positions[column] for column in columns]].reshape(1, -1)
+
+    def rows_at(self, symbol: str, interval: str, definition: str, columns: List[str],
+                as_of: List[Optional[int]], window: int = 1) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """שורות ל-as_of רבים בבת אחת (ראו gather_windows) ישר מה-memmap, או None אם חסרות עמודות"""
+        manifest = self._load_manifest(symbol, interval, definition)
+        rows = manifest['rows']
+        if not rows or any(column not in manifest['columns'] for column in columns):
+            return None
+        series_dir = self._data_dir(symbol, interval, definition, manifest)
+        index = self._mmap(os.path.join(series_dir, 'index.i8'), '<i8', rows)
+        return gather_windows(index, [self._mmap(self._column_path(series_dir, column), '<f8', rows)
+                                      for column in columns], as_of, window)
+
+    def get_stats(self) -> Dict:
+        series = {f"{key[0]}_{key[1]}_{key[2]}": {'rows': manifest['rows'], 'columns': len(manifest['columns']),
+                                                   'end': manifest['end']}
+                  for key, manifest in self._manifests.items()}
+        return {**self.stats, 'series': series, 'root_path': self.root_path, 'warmup_bars': self.warmup_bars}
+
+
+_feature_store: Optional[FeatureStore] = None
+
+
+def get_feature_store(root_path: str = 'models/features', warmup_bars: int = 300) -> FeatureStore:
+    """feature store משותף לתהליך"""
+    global _feature_store
+    if _feature_store is None:
+        _feature_store = FeatureStore(root_path, warmup_bars)
+    return _feature_store
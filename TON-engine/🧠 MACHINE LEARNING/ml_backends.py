@@ -0,0 +1,113 @@
+import importlib
+import importlib.util
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# מודל -> ה-backend שהוא צריך; backend -> המודול שמייבאים בפועל
+MODEL_BACKENDS = {
+    'lstm': 'tensorflow',
+    'xgboost': 'xgboost',
+    'lightgbm': 'lightgbm',
+    'random_forest': 'sklearn',
+    'gradient_boosting': 'sklearn',
+    'svr': 'sklearn'
+}
+
+BACKEND_MODULES = {
+    'tensorflow': 'tensorflow.keras',
+    'xgboost': 'xgboost',
+    'lightgbm': 'lightgbm',
+    'sklearn': 'sklearn'
+}
+
+_loaded: Dict[str, object] = {}
+_failed: Dict[str, str] = {}
+_import_stats: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def rss_mb() -> float:
+    """RSS נוכחי (Linux) - ב-fallback שיא ה-RSS של התהליך"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _top_module(backend: str) -> str:
+    return BACKEND_MODULES[backend].split('.')[0]
+
+
+def is_installed(backend: str) -> bool:
+    """בודק אם ה-backend מותקן בלי לייבא אותו"""
+    module = _top_module(backend)
+    return module in sys.modules or importlib.util.find_spec(module) is not None
+
+
+def import_backend(backend: str):
+    """מייבא backend בפעם הראשונה שצריך אותו ומתעד זמן ייבוא ותוספת RSS; None אם לא מותקן"""
+    if backend in _loaded:
+        return _loaded[backend]
+    if backend in _failed:
+        return None
+
+    with _lock:
+        if backend in _loaded:
+            return _loaded[backend]
+
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(BACKEND_MODULES[backend])
+        except ImportError as e:
+            _failed[backend] = str(e)
+            logger.warning(f"⚠️ ML backend {backend} not available: {e}")
+            return None
+
+        _import_stats[backend] = {
+            'import_ms': round((time.perf_counter() - started) * 1000, 1),
+            'rss_added_mb': round(rss_mb() - rss_before, 1)
+        }
+        _loaded[backend] = module
+        logger.info(f"📦 Loaded ML backend {backend} in {_import_stats[backend]['import_ms']}ms "
+                    f"(+{_import_stats[backend]['rss_added_mb']}MB RSS)")
+        return module
+
+
+def available_models(requested: Optional[List[str]] = None) -> List[str]:
+    """המודלים שמותר לבנות - מבוקשים ו-backend שלהם מותקן (worker בלי TensorFlow פשוט מדלג על LSTM)"""
+    names = requested or list(MODEL_BACKENDS)
+    return [name for name in names if name in MODEL_BACKENDS and is_installed(MODEL_BACKENDS[name])]
+
+
+def import_report() -> Dict:
+    """אילו backends נטענו, כמה זמן ו-RSS עלו, ומה לא זמין"""
+    # גם backend שנטען בעקיפין (למשל sklearn דרך joblib.load) נחשב טעון
+    loaded = [backend for backend in BACKEND_MODULES if backend in _loaded or _top_module(backend) in sys.modules]
+    return {
+        'loaded': {backend: _import_stats.get(backend, {'import_ms': None, 'rss_added_mb': None}) for backend in loaded},
+        'not_loaded': [backend for backend in BACKEND_MODULES if backend not in loaded and backend not in _failed],
+        'unavailable': dict(_failed),
+        'rss_mb': rss_mb()
+    }
+
+
+def log_startup_report(startup_ms: float, budget_ms: float):
+    """מדפיס את תקציב זמן ההפעלה - ומזהיר אם backend כבד נטען כבר בעלייה"""
+    report = import_report()
+    heavy = ', '.join(report['loaded']) or 'none'
+    message = (f"📦 Startup imports: {startup_ms:.0f}ms (budget {budget_ms:.0f}ms), "
+               f"ML backends loaded: {heavy}, RSS {report['rss_mb']}MB")
+    if startup_ms > budget_ms:
+        logger.warning(f"⚠️ {message} - over budget")
+    else:
+        logger.info(message)
+    return report
@@ -1,30 +1,118 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.svm import SVR
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split, TimeSeriesSplit
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import xgboost as xgb
-import lightgbm as lgb
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.optimizers import Adam
-import joblib
+import hashlib
+import json
 import logging
+import os
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from indicator_registry import registry as indicator_registry
+# sklearn/XGBoost/LightGBM/TensorFlow נטענים רק כשמאמנים או טוענים מודל
+from ml_backends import MODEL_BACKENDS, available_models, import_backend
+from model_registry import ModelRegistry, feature_hash
+from feature_store import FeatureStore, gather_windows
+from sequence_windows import keras_batches, sliding_windows
+
+# אינדיקטורים מהרישום המשותף: שם עמודה -> (אינדיקטור, פרמטרים)
+FEATURE_INDICATORS = {
+    'returns': ('returns', {}),
+    'log_returns': ('log_returns', {}),
+    'rsi_14': ('rsi', {'window': 14}),
+    'rsi_21': ('rsi', {'window': 21}),
+    'macd': ('macd', {}),
+    'macd_signal': ('macd_signal', {}),
+    'macd_histogram': ('macd_diff', {}),
+    'bb_upper': ('bb_upper', {'window': 20, 'window_dev': 2}),
+    'bb_lower': ('bb_lower', {'window': 20, 'window_dev': 2}),
+    'bb_middle': ('bb_middle', {'window': 20}),
+    'volume_sma': ('sma', {'column': 'volume', 'window': 20}),
+    'obv': ('obv', {}),
+    'price_trend': ('returns_mean', {'window': 10}),
+    'price_zscore': ('zscore', {'column': 'close', 'window': 20}),
+    'volume_zscore': ('zscore', {'column': 'volume', 'window': 20}),
+    'volatility_cluster': ('returns_std', {'window': 5})
+}
+
+# ממוצעים נעים
+for _window in [5, 10, 20, 50]:
+    FEATURE_INDICATORS[f'sma_{_window}'] = ('sma', {'column': 'close', 'window': _window})
+    FEATURE_INDICATORS[f'ema_{_window}'] = ('ema', {'window': _window})
+    FEATURE_INDICATORS[f'returns_ma_{_window}'] = ('returns_mean', {'window': _window})
+    FEATURE_INDICATORS[f'volatility_{_window}'] = ('returns_std', {'window': _window})
+
+# להעלות בכל שינוי ב-features הנגזרים שב-prepare_features (לא דרך FEATURE_INDICATORS)
+FEATURE_SET_VERSION = 1
+
+
+def feature_definition_hash() -> str:
+    """hash של הגדרת ה-features - feature store נפרד לכל הגדרה"""
+    definition = json.dumps({'version': FEATURE_SET_VERSION, 'indicators': FEATURE_INDICATORS}, sort_keys=True)
+    return hashlib.sha1(definition.encode('utf-8')).hexdigest()[:12]
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """סט מודלים מאומן לסימל אחד - מוחלף כיחידה אחת, חיזוי תמיד רואה סט שלם"""
+    models: Dict
+    scalers: Dict
+    performance: Dict
+    best_model_name: Optional[str]
+    feature_columns: Optional[List[str]]
+    versions: Dict
+    # אופקי החיזוי (בנרות) של ה-heads; ריק = סט ישן שחוזה מחיר לצעד אחד
+    horizons: Tuple[int, ...] = ()
+
+class HorizonHeads:
+    """מודל ישיר לכל אופק - head נפרד שחוזה את התשואה עד close[t+h]; predict מחזיר (rows x horizons)"""
+    
+    def __init__(self, heads: Dict[int, object]):
+        self.heads = dict(sorted(heads.items()))
+    
+    @property
+    def horizons(self) -> List[int]:
+        return list(self.heads)
+    
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.column_stack([head.predict(X) for head in self.heads.values()])
+    
+    def get_params(self) -> Dict:
+        return {horizon: head.get_params() for horizon, head in self.heads.items() if hasattr(head, 'get_params')}
+    
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        importances = [head.feature_importances_ for head in self.heads.values() if hasattr(head, 'feature_importances_')]
+        if not importances:
+            raise AttributeError('feature_importances_')
+        return np.mean(importances, axis=0)
+
 class AdvancedMLPredictor:
     """מודל Machine Learning מתקדם לחיזוי מחירים"""
     
-    def __init__(self):
+    def __init__(self, enabled_models: Optional[List[str]] = None, registry: Optional[ModelRegistry] = None,
+                 feature_store: Optional[FeatureStore] = None, horizons: Optional[List[int]] = None):
         self.logger = logging.getLogger(__name__)
+        self.registry = registry
+        # features מחושבים נשמרים לכל סימל ומתעדכנים רק בנרות חדשים
+        self.feature_store = feature_store
+        self.feature_definition = feature_definition_hash()
+        # סימל -> ModelBundle; אימון בונה bundle חדש ומחליף את ההפניה (החיזויים לא נחסמים)
+        self._bundles: Dict[str, ModelBundle] = {}
+        self._last_bundle: Optional[ModelBundle] = None
         self.models = {}
         self.scalers = {}
         self.model_performance = {}
+        self.best_model = None
+        self.best_model_name = None
+        # רק מודלים שה-backend שלהם מותקן - בלי לייבא אותו עכשיו
+        self.enabled_models = available_models(enabled_models)
+        # אופקי חיזוי בנרות - head ישיר לכל אופק בכל מודל
+        self.horizons: Tuple[int, ...] = tuple(sorted(set(horizons or (1, 3, 6, 12))))
+        # threads לכל מודל (XGBoost/LightGBM/RandomForest); None = ברירת המחדל של הספרייה
+        self.n_jobs: Optional[int] = None
         
         # הגדרות מודלים
         self.model_config = {
@@ -33,90 +121,138 @@ class AdvancedMLPredictor:
                 'epochs': 100,
                 'batch_size': 32,
                 'units': 50,
-                'dropout': 0.2
+                'dropout': 0.2,
+                'patience': 10,
+                'validation_fraction': 0.1
             },
             'xgboost': {
                 'n_estimators': 1000,
                 'max_depth': 8,
                 'learning_rate': 0.1,
-                'subsample': 0.8
+                'subsample': 0.8,
+                'early_stopping_rounds': 50
             },
             'lightgbm': {
                 'n_estimators': 1000,
                 'max_depth': 8,
                 'learning_rate': 0.1,
-                'num_leaves': 31
+                'num_leaves': 31,
+                'early_stopping_rounds': 50
             },
             'random_forest': {
                 'n_estimators': 500,
                 'max_depth': 10,
                 'min_samples_split': 5
-            }
+            },
+            'gradient_boosting': {
+                'n_estimators': 500,
+                'n_iter_no_change': 20,
+                'validation_fraction': 0.1
+            },
+            # חלק מסט האימון (הסוף הכרונולוגי) שמשמש ל-early stopping של ה-boosters
+            'early_stopping_fraction': 0.1
         }
         
-        self.setup_models()
+        self.logger.info(f"🧠 ML predictor ready (models built on first use): {', '.join(self.enabled_models) or 'none'}")
     
     def setup_models(self):
-        """מאתחל את המודלים"""
-        try:
-            # LSTM Model
-            self.models['lstm'] = self._create_lstm_model()
-            
-            # XGBoost
-            self.models['xgboost'] = xgb.XGBRegressor(
+        """בונה את המודלים שעוד לא נבנו (מייבא את ה-backends שלהם בפעם הראשונה)"""
+        for model_name in self.enabled_models:
+            if model_name in self.models:
+                continue
+            try:
+                model = self._build_model(model_name)
+                if model is not None:
+                    self.models[model_name] = model
+            except Exception as e:
+                self.logger.error(f"Error setting up {model_name}: {e}")
+        
+        self.logger.info(f"✅ ML models initialized: {', '.join(self.models)}")
+    
+    def _build_model(self, model_name: str, params: Optional[Dict] = None):
+        """בונה מודל אחד (עם params מחיפוש, אם יש); None אם ה-backend לא זמין"""
+        model = self._create_model(model_name)
+        if model is not None and params:
+            model.set_params(**params)
+        return model
+    
+    def _create_model(self, model_name: str):
+        if import_backend(MODEL_BACKENDS[model_name]) is None:
+            return None
+        
+        if model_name == 'lstm':
+            return self._create_lstm_model()
+        
+        n_jobs = {} if self.n_jobs is None else {'n_jobs': self.n_jobs}
+        
+        if model_name == 'xgboost':
+            import xgboost as xgb
+            return xgb.XGBRegressor(
                 n_estimators=self.model_config['xgboost']['n_estimators'],
                 max_depth=self.model_config['xgboost']['max_depth'],
                 learning_rate=self.model_config['xgboost']['learning_rate'],
                 subsample=self.model_config['xgboost']['subsample'],
-                random_state=42
+                early_stopping_rounds=self.model_config['xgboost']['early_stopping_rounds'],
+                random_state=42,
+                **n_jobs
             )
-            
-            # LightGBM
-            self.models['lightgbm'] = lgb.LGBMRegressor(
+        
+        if model_name == 'lightgbm':
+            import lightgbm as lgb
+            return lgb.LGBMRegressor(
                 n_estimators=self.model_config['lightgbm']['n_estimators'],
                 max_depth=self.model_config['lightgbm']['max_depth'],
                 learning_rate=self.model_config['lightgbm']['learning_rate'],
                 num_leaves=self.model_config['lightgbm']['num_leaves'],
-                random_state=42
+                random_state=42,
+                verbose=-1,
+                **n_jobs
             )
-            
-            # Random Forest
-            self.models['random_forest'] = RandomForestRegressor(
+        
+        if model_name == 'random_forest':
+            from sklearn.ensemble import RandomForestRegressor
+            return RandomForestRegressor(
                 n_estimators=self.model_config['random_forest']['n_estimators'],
                 max_depth=self.model_config['random_forest']['max_depth'],
                 min_samples_split=self.model_config['random_forest']['min_samples_split'],
-                random_state=42
+                random_state=42,
+                **n_jobs
             )
-            
-            # Gradient Boosting
-            self.models['gradient_boosting'] = GradientBoostingRegressor(
-                n_estimators=500,
+        
+        if model_name == 'gradient_boosting':
+            from sklearn.ensemble import GradientBoostingRegressor
+            return GradientBoostingRegressor(
+                n_estimators=self.model_config['gradient_boosting']['n_estimators'],
                 learning_rate=0.1,
                 max_depth=6,
+                n_iter_no_change=self.model_config['gradient_boosting']['n_iter_no_change'],
+                validation_fraction=self.model_config['gradient_boosting']['validation_fraction'],
                 random_state=42
             )
-            
-            # SVR
-            self.models['svr'] = SVR(kernel='rbf', C=1.0, epsilon=0.1)
-            
-            self.logger.info("✅ ML models initialized successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error setting up models: {e}")
+        
+        if model_name == 'svr':
+            from sklearn.svm import SVR
+            return SVR(kernel='rbf', C=1.0, epsilon=0.1)
+        
+        return None
     
-    def _create_lstm_model(self) -> Sequential:
-        """יוצר מודל LSTM"""
+    def _create_lstm_model(self, n_features: int = 1, n_outputs: int = 1):
+        """יוצר מודל LSTM - יציאה לכל אופק"""
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import LSTM, Dense, Dropout
+        from tensorflow.keras.optimizers import Adam
+        
         model = Sequential([
             LSTM(self.model_config['lstm']['units'], 
                  return_sequences=True, 
-                 input_shape=(self.model_config['lstm']['sequence_length'], 1)),
+                 input_shape=(self.model_config['lstm']['sequence_length'], n_features)),
             Dropout(self.model_config['lstm']['dropout']),
             LSTM(self.model_config['lstm']['units'], return_sequences=True),
             Dropout(self.model_config['lstm']['dropout']),
             LSTM(self.model_config['lstm']['units']),
             Dropout(self.model_config['lstm']['dropout']),
             Dense(25),
-            Dense(1)
+            Dense(n_outputs)
         ])
         
         model.compile(optimizer=Adam(learning_rate=0.001), 
@@ -127,50 +263,20 @@ class AdvancedMLPredictor:
     def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """מכין features מתקדמים למודל"""
         try:
-            # Features בסיסיים
+            # Features בסיסיים - אינדיקטורים מהרישום המשותף (מחושבים פעם אחת בהקשר)
+            with indicator_registry.request_context('ml_features'):
+                resolved = indicator_registry.resolve_many(df, FEATURE_INDICATORS)
+            
             df = df.copy()
+            for name, series in resolved.items():
+                df[name] = series
             
-            # מחירים ו-returns
-            df['returns'] = df['close'].pct_change()
-            df['log_returns'] = np.log(df['close'] / df['close'].shift(1))
-            
-            # ממוצעים נעים
-            for window in [5, 10, 20, 50]:
-                df[f'sma_{window}'] = df['close'].rolling(window=window).mean()
-                df[f'ema_{window}'] = df['close'].ewm(span=window).mean()
-                df[f'returns_ma_{window}'] = df['returns'].rolling(window=window).mean()
-                df[f'volatility_{window}'] = df['returns'].rolling(window=window).std()
-            
-            # RSI
-            df['rsi_14'] = self._calculate_rsi(df['close'], 14)
-            df['rsi_21'] = self._calculate_rsi(df['close'], 21)
-            
-            # MACD
-            macd, signal, histogram = self._calculate_macd(df['close'])
-            df['macd'] = macd
-            df['macd_signal'] = signal
-            df['macd_histogram'] = histogram
-            
-            # Bollinger Bands
-            bb_upper, bb_lower, bb_middle = self._calculate_bollinger_bands(df['close'])
-            df['bb_upper'] = bb_upper
-            df['bb_lower'] = bb_lower
-            df['bb_middle'] = bb_middle
-            df['bb_position'] = (df['close'] - bb_lower) / (bb_upper - bb_lower)
-            
-            # Volume indicators
-            df['volume_sma'] = df['volume'].rolling(20).mean()
+            df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
             df['volume_ratio'] = df['volume'] / df['volume_sma']
-            df['obv'] = self._calculate_obv(df['close'], df['volume'])
             
             # תבניות מחיר
-            df['price_trend'] = self._calculate_price_trend(df['close'])
             df['support_resistance'] = self._calculate_support_resistance_strength(df)
             
-            # Features סטטיסטיים
-            df['price_zscore'] = (df['close'] - df['close'].rolling(20).mean()) / df['close'].rolling(20).std()
-            df['volume_zscore'] = (df['volume'] - df['volume'].rolling(20).mean()) / df['volume'].rolling(20).std()
-            
             # Features זמן
             df['hour'] = df.index.hour
             df['day_of_week'] = df.index.dayofweek
@@ -178,7 +284,6 @@ class AdvancedMLPredictor:
             df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
             
             # מידול תנודתיות (GARCH-like)
-            df['volatility_cluster'] = df['returns'].rolling(5).std()
             df['volatility_regime'] = (df['volatility_cluster'] > df['volatility_cluster'].rolling(20).mean()).astype(int)
             
             # מידול momentum
@@ -200,42 +305,16 @@ class AdvancedMLPredictor:
             self.logger.error(f"Error preparing features: {e}")
             return df
     
-    def _calculate_rsi(self, prices: pd.Series, window: int) -> pd.Series:
-        """מחשב RSI"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
-    
-    def _calculate_macd(self, prices: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
-        """מחשב MACD"""
-        ema_12 = prices.ewm(span=12).mean()
-        ema_26 = prices.ewm(span=26).mean()
-        macd = ema_12 - ema_26
-        signal = macd.ewm(span=9).mean()
-        histogram = macd - signal
-        return macd, signal, histogram
-    
-    def _calculate_bollinger_bands(self, prices: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
-        """מחשב Bollinger Bands"""
-        sma_20 = prices.rolling(20).mean()
-        std_20 = prices.rolling(20).std()
-        upper = sma_20 + (std_20 * 2)
-        lower = sma_20 - (std_20 * 2)
-        return upper, lower, sma_20
-    
-    def _calculate_obv(self, prices: pd.Series, volume: pd.Series) -> pd.Series:
-        """מחשב On Balance Volume"""
-        obv = (volume * np.sign(prices.diff())).cumsum()
-        return obv
-    
-    def _calculate_price_trend(self, prices: pd.Series) -> pd.Series:
-        """מחשב מגמת מחיר"""
-        returns = prices.pct_change()
-        trend = returns.rolling(10).mean()
-        return trend
+    def feature_frame(self, df: pd.DataFrame, symbol: Optional[str] = None, interval: str = '1h') -> pd.DataFrame:
+        """features לטווח של df - מה-feature store (רק נרות חדשים מחושבים) או חישוב מלא בלי symbol"""
+        if self.feature_store is None or not symbol:
+            return self.prepare_features(df)
+        try:
+            self.feature_store.update(symbol, interval, self.feature_definition, df, self.prepare_features)
+            return self.feature_store.read(symbol, interval, self.feature_definition, start=df.index[0])
+        except Exception as e:
+            self.logger.error(f"Error reading feature store for {symbol}: {e}")
+            return self.prepare_features(df)
     
     def _calculate_support_resistance_strength(self, df: pd.DataFrame) -> pd.Series:
         """מחשב חוזק תמיכה/התנגדות"""
@@ -258,254 +337,505 @@ class AdvancedMLPredictor:
         return pd.Series(strength, index=df.index)
     
     def create_sequences(self, data: np.ndarray, sequence_length: int) -> Tuple[np.ndarray, np.ndarray]:
-        """יוצר sequences עבור LSTM"""
-        X, y = [], []
-        for i in range(sequence_length, len(data)):
-            X.append(data[i-sequence_length:i])
-            y.append(data[i])
-        return np.array(X), np.array(y)
-    
-    def train_models(self, df: pd.DataFrame, target_col: str = 'close', test_size: float = 0.2):
-        """מאמן את כל המודלים"""
+        """יוצר sequences עבור LSTM - views מעל data (חלון i הוא data[i:i+sequence_length], היעד שלו data[i+sequence_length])"""
+        return sliding_windows(data, sequence_length)[:-1], data[sequence_length:]
+    
+    def train_models(self, df: pd.DataFrame, target_col: str = 'close', test_size: float = 0.2,
+                     symbol: Optional[str] = None, interval: str = '1h') -> Optional[ModelBundle]:
+        """מאמן סט מודלים חדש; עם symbol - נשמר ב-registry ומחליף את הסט של הסימל"""
         try:
-            # הכנת features
-            feature_df = self.prepare_features(df)
-            
-            # בחירת features רלוונטיים
-            feature_columns = [col for col in feature_df.columns 
-                             if col not in [target_col, 'open', 'high', 'low', 'volume'] 
-                             and not col.startswith('target_')]
+            import_backend('sklearn')
+            from sklearn.preprocessing import StandardScaler
             
-            X = feature_df[feature_columns].values
-            y = feature_df[target_col].values
-            
-            # הסרה של NaN values
-            mask = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
-            X = X[mask]
-            y = y[mask]
+            # הכנת features - מה-feature store כשיש symbol
+            feature_df = self.feature_frame(df, symbol, interval)
+            feature_columns, X, Y, close = self.training_matrix(feature_df, target_col)
+            horizons = list(self.horizons)
             
             if len(X) == 0:
                 self.logger.error("No valid data for training")
-                return
-            
-            # Split data - שימוש ב-TimeSeriesSplit עבור נתונים כרונולוגיים
-            tscv = TimeSeriesSplit(n_splits=5)
+                return None
+            
+            # פרמטרים ודירוג מחיפוש ה-walk-forward האחרון לאותם features (אם רץ)
+            search = None
+            if self.registry is not None and symbol:
+                search = self.registry.get_search(symbol, interval, feature_hash(feature_columns))
+            tuned = self.registry.best_params(search) if search else {}
+            
+            # מודלים חדשים בכל אימון - הסט הקודם ממשיך לשרת חיזויים עד ההחלפה
+            models = {}
+            for model_name in self.enabled_models:
+                model = self._build_model(model_name, tuned.get(model_name))
+                if model is not None:
+                    models[model_name] = model
+            if not models:
+                self.logger.error("No ML backends available for training")
+                return None
             
             # Scaling
-            self.scalers['X'] = StandardScaler()
-            self.scalers['y'] = StandardScaler()
+            scalers = {'X': StandardScaler(), 'y': StandardScaler()}
+            performance_by_model = {}
             
-            X_scaled = self.scalers['X'].fit_transform(X)
-            y_scaled = self.scalers['y'].fit_transform(y.reshape(-1, 1)).flatten()
+            X_scaled = scalers['X'].fit_transform(X)
+            Y_scaled = scalers['y'].fit_transform(Y)
+            
+            # היעד של השורות האחרונות באימון נמשך לתוך סט הבדיקה - מושמטות (purge)
+            split_idx = int(len(X_scaled) * (1 - test_size))
+            train_end = max(1, split_idx - max(horizons))
             
             # אימון כל המודלים
-            for model_name, model in self.models.items():
+            for model_name, model in models.items():
+                started = time.perf_counter()
                 try:
                     if model_name == 'lstm':
-                        # הכנת sequences ל-LSTM
+                        # הכנת sequences ל-LSTM - חלון שמסתיים בנר t, יעד של נר t
                         sequence_length = self.model_config['lstm']['sequence_length']
-                        if len(X_scaled) > sequence_length:
-                            X_seq, y_seq = self.create_sequences(X_scaled, sequence_length)
-                            
-                            # Reshape for LSTM
-                            X_seq = X_seq.reshape((X_seq.shape[0], X_seq.shape[1], 1))
-                            
-                            # Split for LSTM
-                            split_idx = int(len(X_seq) * (1 - test_size))
-                            X_train, X_test = X_seq[:split_idx], X_seq[split_idx:]
-                            y_train, y_test = y_seq[:split_idx], y_seq[split_idx:]
-                            
-                            # אימון LSTM
-                            history = model.fit(
-                                X_train, y_train,
-                                epochs=self.model_config['lstm']['epochs'],
-                                batch_size=self.model_config['lstm']['batch_size'],
-                                validation_data=(X_test, y_test),
-                                verbose=0
-                            )
-                            
-                            # חיזוי והערכת ביצועים
-                            y_pred_scaled = model.predict(X_test)
-                            y_pred = self.scalers['y'].inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
-                            y_true = self.scalers['y'].inverse_transform(y_test.reshape(-1, 1)).flatten()
-                            
-                        else:
+                        if len(X_scaled) <= sequence_length + max(horizons):
                             self.logger.warning("Not enough data for LSTM training")
                             continue
+                        X_seq, _ = self.create_sequences(X_scaled, sequence_length)
+                        Y_seq = Y_scaled[sequence_length - 1:-1]
+                        seq_split = split_idx - sequence_length + 1
+                        X_train, X_test = X_seq[:seq_split - max(horizons)], X_seq[seq_split:]
+                        y_train, Y_test = Y_seq[:seq_split - max(horizons)], Y[sequence_length - 1:-1][seq_split:]
+                        close_test = close[sequence_length - 1:-1][seq_split:]
+                        
+                        model = self._create_lstm_model(X_scaled.shape[1], len(horizons))
+                        # אימון LSTM - עוצר כשה-validation (סוף סט האימון) מפסיק להשתפר;
+                        # החלונות הם views ורק הבאצ' הנוכחי מועתק
+                        from tensorflow.keras.callbacks import EarlyStopping
+                        batch_size = self.model_config['lstm']['batch_size']
+                        n_fit = len(X_train) - int(len(X_train) * self.model_config['lstm']['validation_fraction'])
+                        model.fit(
+                            keras_batches(X_train[:n_fit], y_train[:n_fit], batch_size, shuffle=True),
+                            validation_data=keras_batches(X_train[n_fit:], y_train[n_fit:], batch_size)
+                            if n_fit < len(X_train) else None,
+                            epochs=self.model_config['lstm']['epochs'],
+                            callbacks=[EarlyStopping(patience=self.model_config['lstm']['patience'],
+                                                     restore_best_weights=True)],
+                            verbose=0
+                        )
+                        Y_pred_scaled = model.predict(keras_batches(X_test, batch_size=batch_size), verbose=0)
                     
                     else:
-                        # Split רגיל עבור מודלים אחרים
-                        split_idx = int(len(X_scaled) * (1 - test_size))
-                        X_train, X_test = X_scaled[:split_idx], X_scaled[split_idx:]
-                        y_train, y_test = y_scaled[:split_idx], y_scaled[split_idx:]
-                        
-                        # אימון המודל
-                        model.fit(X_train, y_train)
-                        
-                        # חיזוי
-                        y_pred_scaled = model.predict(X_test)
-                        y_pred = self.scalers['y'].inverse_transform(y_pred_scaled.reshape(-1, 1)).flatten()
-                        y_true = self.scalers['y'].inverse_transform(y_test.reshape(-1, 1)).flatten()
+                        # head לכל אופק - מודל חדש מאותו סוג לכל head מעבר לראשון
+                        X_train, X_test = X_scaled[:train_end], X_scaled[split_idx:]
+                        Y_test, close_test = Y[split_idx:], close[split_idx:]
+                        heads = {}
+                        for column, horizon in enumerate(horizons):
+                            head = model if column == 0 else self._build_model(model_name, tuned.get(model_name))
+                            self._fit_model(model_name, head, X_train, Y_scaled[:train_end, column])
+                            heads[horizon] = head
+                        model = HorizonHeads(heads)
+                        Y_pred_scaled = model.predict(X_test)
                     
-                    # הערכת ביצועים
-                    performance = self._evaluate_model(y_true, y_pred)
-                    self.model_performance[model_name] = performance
+                    # הערכת ביצועים - על המחיר החזוי לכל אופק; המדדים הראשיים הם של האופק הראשון
+                    Y_pred = scalers['y'].inverse_transform(np.asarray(Y_pred_scaled).reshape(len(Y_test), -1))
+                    by_horizon = {
+                        horizon: self._evaluate_model(close_test * (1 + Y_test[:, column]),
+                                                      close_test * (1 + Y_pred[:, column]))
+                        for column, horizon in enumerate(horizons)
+                    }
+                    performance = {**by_horizon[horizons[0]], 'horizons': by_horizon}
+                    performance['train_seconds'] = round(time.perf_counter() - started, 2)
+                    if model_name in tuned:
+                        performance['tuned_params'] = tuned[model_name]
+                    performance_by_model[model_name] = performance
+                    models[model_name] = model
                     
-                    self.logger.info(f"✅ Trained {model_name}: MAE={performance['mae']:.4f}, R²={performance['r2']:.4f}")
+                    self.logger.info(f"✅ Trained {model_name}: MAE={performance['mae']:.4f}, R²={performance['r2']:.4f} "
+                                     f"({len(horizons)} horizons) in {performance['train_seconds']}s")
                     
                 except Exception as e:
                     self.logger.error(f"Error training {model_name}: {e}")
             
-            # בחירת המודל הטוב ביותר
-            best_model_name = max(self.model_performance, 
-                                key=lambda x: self.model_performance[x]['r2'])
-            self.best_model = self.models[best_model_name]
-            self.best_model_name = best_model_name
-            
-            self.logger.info(f"🎯 Best model: {best_model_name} with R²={self.model_performance[best_model_name]['r2']:.4f}")
+            if not performance_by_model:
+                self.logger.error("No model trained successfully")
+                return None
+            
+            # בחירת המודל הטוב ביותר - לפי דירוג ה-walk-forward אם יש, אחרת לפי סט הבדיקה היחיד
+            ranked = [entry['model_type'] for entry in (search or {}).get('leaderboard', [])
+                      if entry['status'] == 'complete' and entry['model_type'] in performance_by_model]
+            best_model_name = ranked[0] if ranked else max(performance_by_model, 
+                                                           key=lambda x: performance_by_model[x]['r2'])
+            
+            self.logger.info(f"🎯 Best model: {best_model_name} with R²={performance_by_model[best_model_name]['r2']:.4f}"
+                             f"{' (walk-forward)' if ranked else ''}")
+            
+            trained = {name: model for name, model in models.items() if name in performance_by_model}
+            versions = {}
+            if self.registry is not None and symbol:
+                training_window = {
+                    'start': feature_df.index[0].isoformat(),
+                    'end': feature_df.index[-1].isoformat(),
+                    'rows': int(len(X)),
+                    'test_size': test_size,
+                    'horizons': horizons,
+                    'target': 'return'
+                }
+                for model_name, model in trained.items():
+                    try:
+                        meta = self.registry.save(symbol, interval, model_name, model, scalers, feature_columns,
+                                                  performance_by_model[model_name], training_window)
+                        versions[model_name] = meta['version']
+                    except Exception as e:
+                        self.logger.error(f"Error registering {symbol} {model_name}: {e}")
+            
+            bundle = ModelBundle(trained, scalers, performance_by_model, best_model_name, feature_columns, versions,
+                                 tuple(horizons))
+            self._publish(symbol, bundle)
+            return bundle
             
         except Exception as e:
             self.logger.error(f"Error in train_models: {e}")
+            return None
+    
+    def training_matrix(self, feature_df: pd.DataFrame,
+                        target_col: str = 'close') -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """(feature_columns, X, Y, close) - Y היא התשואה עד close[t+h] לכל אופק; שורות בלי יעד מושמטות"""
+        # בחירת features רלוונטיים
+        feature_columns = [col for col in feature_df.columns 
+                         if col not in [target_col, 'open', 'high', 'low', 'volume'] 
+                         and not col.startswith('target_')]
+        
+        # יעד לכל אופק: התשואה עד close[t+h] - head ישיר לכל אופק במקום רקורסיה
+        X = feature_df[feature_columns].values
+        close = feature_df[target_col].to_numpy(dtype=float)
+        Y = np.full((len(close), len(self.horizons)), np.nan)
+        for column, horizon in enumerate(self.horizons):
+            Y[:-horizon, column] = close[horizon:] / close[:-horizon] - 1
+        
+        # הסרה של NaN values (כולל הנרות האחרונים שעוד אין להם יעד)
+        mask = ~np.isnan(X).any(axis=1) & np.isfinite(Y).all(axis=1)
+        return feature_columns, X[mask], Y[mask], close[mask]
+    
+    def _fit_model(self, model_name: str, model, X_train: np.ndarray, y_train: np.ndarray):
+        """fit עם early stopping ל-boosters - על הסוף הכרונולוגי של סט האימון, לא על סט הבדיקה"""
+        if model_name not in ('xgboost', 'lightgbm'):
+            model.fit(X_train, y_train)
+            return
+        
+        split_idx = int(len(X_train) * (1 - self.model_config['early_stopping_fraction']))
+        X_fit, X_val = X_train[:split_idx], X_train[split_idx:]
+        y_fit, y_val = y_train[:split_idx], y_train[split_idx:]
+        
+        if model_name == 'xgboost':
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        else:
+            import lightgbm as lgb
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)],
+                      callbacks=[lgb.early_stopping(self.model_config['lightgbm']['early_stopping_rounds'], verbose=False)])
+    
+    def _publish(self, symbol: Optional[str], bundle: ModelBundle):
+        """החלפה אטומית של הסט לסימל (ושל מאפייני ה-legacy לסט האחרון)"""
+        if symbol:
+            self._bundles[symbol.upper()] = bundle
+        self._last_bundle = bundle
+        self.models = bundle.models
+        self.scalers = bundle.scalers
+        self.model_performance = bundle.performance
+        self.best_model_name = bundle.best_model_name
+        self.best_model = bundle.models.get(bundle.best_model_name)
+    
+    def has_model(self, symbol: str) -> bool:
+        return symbol.upper() in self._bundles
+    
+    def load_latest(self, symbol: str, interval: str = '1h') -> bool:
+        """טוען את כל המודלים מהאימון האחרון של הסימל (למשל אחרי אימון בתהליך נפרד) ומחליף את הסט"""
+        if self.registry is None:
+            return False
+        try:
+            best = next((meta for meta in self.registry.leaderboard(symbol, interval)
+                         if meta['model_type'] in self.enabled_models), None)
+            if best is None:
+                return False
+            
+            models, performance, versions = {}, {}, {}
+            scalers = None
+            for model_type in self.enabled_models:
+                meta = self.registry.get_meta(symbol, interval, best['feature_hash'], model_type)
+                # רק מודלים מאותה ריצת אימון - אותם scalers
+                if meta is None or meta['training_window'] != best['training_window']:
+                    continue
+                loaded = self.registry.load(symbol, interval, best['feature_hash'], model_type, meta['version'])
+                if loaded is None:
+                    continue
+                model, model_scalers, meta = loaded
+                models[model_type] = model
+                performance[model_type] = meta['metrics']
+                versions[model_type] = meta['version']
+                if model_type == best['model_type'] or scalers is None:
+                    scalers = model_scalers
+            
+            if not models:
+                return False
+            self._publish(symbol, ModelBundle(models, scalers, performance, best['model_type'],
+                                              best['feature_columns'], versions,
+                                              tuple(best['training_window'].get('horizons', ()))))
+            self.logger.info(f"📂 Loaded {symbol} model set from registry: {versions}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error loading latest models for {symbol}: {e}")
+            return False
+    
+    def load_best(self, symbol: str, interval: str = '1h') -> bool:
+        """טוען מה-registry את המודל הטוב ביותר של הסימל (warm load בעלייה)"""
+        if self.registry is None:
+            return False
+        try:
+            for meta in self.registry.leaderboard(symbol, interval):
+                if meta['model_type'] not in self.enabled_models:
+                    continue
+                loaded = self.registry.load(symbol, interval, meta['feature_hash'], meta['model_type'])
+                if loaded is None:
+                    continue
+                model, scalers, meta = loaded
+                bundle = ModelBundle({meta['model_type']: model}, scalers, {meta['model_type']: meta['metrics']},
+                                     meta['model_type'], meta['feature_columns'], {meta['model_type']: meta['version']},
+                                     tuple(meta['training_window'].get('horizons', ())))
+                self._publish(symbol, bundle)
+                self.logger.info(f"📂 Loaded {symbol} {meta['model_type']} v{meta['version']} from registry")
+                return True
+        except Exception as e:
+            self.logger.error(f"Error loading best model for {symbol}: {e}")
+        return False
     
     def _evaluate_model(self, y_true: np.ndarray, y_pred: np.ndarray) -> Dict:
         """מעריך את ביצועי המודל"""
+        errors = y_true - y_pred
+        mse = float(np.mean(errors ** 2))
+        total_variance = float(np.sum((y_true - np.mean(y_true)) ** 2))
         return {
-            'mae': mean_absolute_error(y_true, y_pred),
-            'mse': mean_squared_error(y_true, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
-            'r2': r2_score(y_true, y_pred),
-            'mape': np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+            'mae': float(np.mean(np.abs(errors))),
+            'mse': mse,
+            'rmse': float(np.sqrt(mse)),
+            'r2': 1 - float(np.sum(errors ** 2)) / total_variance if total_variance > 0 else 0.0,
+            'mape': float(np.mean(np.abs(errors / y_true)) * 100)
         }
     
-    def predict_future(self, df: pd.DataFrame, periods: int = 10) -> Dict:
-        """מבצע חיזוי לעתיד"""
-        try:
-            # הכנת features
-            feature_df = self.prepare_features(df)
-            
-            # בחירת features
-            feature_columns = [col for col in feature_df.columns 
-                             if col not in ['close', 'open', 'high', 'low', 'volume'] 
-                             and not col.startswith('target_')]
-            
-            X_current = feature_df[feature_columns].iloc[-1:].values
-            
-            if len(X_current) == 0:
-                return self._get_fallback_prediction(periods)
-            
-            # Scaling
-            X_scaled = self.scalers['X'].transform(X_current)
-            
-            predictions = {}
-            confidence_scores = {}
-            
-            for model_name, model in self.models.items():
-                try:
-                    if model_name == 'lstm':
-                        # חיזוי עם LSTM דורש sequences
-                        sequence_length = self.model_config['lstm']['sequence_length']
-                        if len(feature_df) >= sequence_length:
-                            # שימוש ב-sequence האחרון
-                            X_seq = X_scaled[-sequence_length:].reshape(1, sequence_length, 1)
-                            y_pred_scaled = model.predict(X_seq, verbose=0)
-                            prediction = self.scalers['y'].inverse_transform(y_pred_scaled.reshape(-1, 1))[0][0]
-                        else:
-                            continue
-                    else:
-                        # חיזוי עם מודלים אחרים
-                        y_pred_scaled = model.predict(X_scaled)
-                        prediction = self.scalers['y'].inverse_transform(y_pred_scaled.reshape(-1, 1))[0][0]
-                    
-                    predictions[model_name] = max(0, prediction)  # מחיר לא יכול להיות שלילי
-                    
-                    # ציון ביטחון מבוסס ביצועי המודל
-                    if model_name in self.model_performance:
-                        confidence_scores[model_name] = max(0, min(1, self.model_performance[model_name]['r2']))
-                    else:
-                        confidence_scores[model_name] = 0.5
-                        
-                except Exception as e:
-                    self.logger.error(f"Error predicting with {model_name}: {e}")
-                    predictions[model_name] = df['close'].iloc[-1]
-                    confidence_scores[model_name] = 0.1
-            
-            # חיזוי ממוצע משוקלל
-            if predictions:
-                current_price = df['close'].iloc[-1]
-                weighted_predictions = []
-                weights = []
-                
-                for model_name, pred in predictions.items():
-                    weight = confidence_scores[model_name]
-                    weighted_predictions.append(pred * weight)
-                    weights.append(weight)
+    # =============================================
+    # 🔮 INFERENCE
+    # =============================================
+    
+    def predict_batch(self, rows: List[Tuple[str, Optional[object]]], frames: Optional[Dict[str, pd.DataFrame]] = None,
+                      interval: str = '1h') -> Dict:
+        """חיזוי לשורות (symbol, as_of) רבות - as_of None = הנר האחרון.
+        
+        שורות של אותו סימל נערמות ל-matrix אחד וכל מודל (וכל head) מריץ predict פעם אחת עליו;
+        frames (אופציונלי) מעדכנים קודם את ה-feature store בנרות החדשים.
+        """
+        started = time.perf_counter()
+        frames = frames or {}
+        results: List[Optional[Dict]] = [None] * len(rows)
+        latency = {}
+        
+        groups: Dict[str, List[int]] = {}
+        for position, (symbol, _) in enumerate(rows):
+            groups.setdefault(symbol.upper(), []).append(position)
+        
+        for symbol, positions in groups.items():
+            # הפניה אחת לסט - אימון מקביל מחליף אותו בלי להשפיע על החיזוי הזה
+            bundle = self._bundles.get(symbol)
+            if bundle is None:
+                for position in positions:
+                    results[position] = {'symbol': symbol, 'status': 'no_model'}
+                continue
+            
+            try:
+                frame = frames.get(symbol, frames.get(symbol.lower()))
+                gathered = self._gather_rows(bundle, symbol, interval, [rows[p][1] for p in positions], frame)
+                if gathered is None:
+                    for position in positions:
+                        results[position] = {'symbol': symbol, 'status': 'no_features'}
+                    continue
                 
-                if sum(weights) > 0:
-                    ensemble_prediction = sum(weighted_predictions) / sum(weights)
-                    ensemble_confidence = sum(weights) / len(weights)
+                open_times, windows, close, valid = gathered
+                prices, latency[symbol] = self._predict_group(bundle, windows, close)
+                for row, position in enumerate(positions):
+                    if not valid[row]:
+                        results[position] = {'symbol': symbol, 'status': 'out_of_range'}
+                        continue
+                    results[position] = {
+                        'symbol': symbol,
+                        'status': 'success',
+                        'as_of': pd.Timestamp(int(open_times[row]), unit='ms').isoformat(),
+                        **self._ensemble_row(bundle, {name: p[row] for name, p in prices.items()}, float(close[row]))
+                    }
+            except Exception as e:
+                self.logger.error(f"Error in batch prediction for {symbol}: {e}")
+                for position in positions:
+                    results[position] = {'symbol': symbol, 'status': 'error', 'error': str(e)}
+        
+        return {
+            'results': results,
+            'rows': len(rows),
+            'latency_ms': latency,
+            'total_ms': round((time.perf_counter() - started) * 1000, 3),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _gather_rows(self, bundle: ModelBundle, symbol: Optional[str], interval: str, as_of: List,
+                     df: Optional[pd.DataFrame]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """(open_times, חלונות features (rows x window x features), close, valid) - מה-feature store או מ-df"""
+        as_of_ms = [None if t is None else FeatureStore._to_epoch_ms([t])[0] for t in as_of]
+        # LSTM צריך את החלון שמסתיים בנר; שאר המודלים רק את השורה עצמה
+        window = self.model_config['lstm']['sequence_length'] if 'lstm' in bundle.models else 1
+        
+        gathered = None
+        if self.feature_store is not None and symbol and bundle.feature_columns:
+            try:
+                if df is not None:
+                    self.feature_store.update(symbol, interval, self.feature_definition, df, self.prepare_features)
+                gathered = self.feature_store.rows_at(symbol, interval, self.feature_definition,
+                                                      bundle.feature_columns + ['close'], as_of_ms, window)
+            except Exception as e:
+                self.logger.error(f"Error reading feature store for {symbol}: {e}")
+        
+        if gathered is None:
+            if df is None or df.empty:
+                return None
+            feature_df = self.prepare_features(df)
+            # אותם features (ובאותו סדר) כמו באימון; סט ישן בלי רשימה שמורה - לפי העמודות
+            feature_columns = bundle.feature_columns or [col for col in feature_df.columns 
+                                                         if col not in ['close', 'open', 'high', 'low', 'volume'] 
+                                                         and not col.startswith('target_')]
+            missing = [col for col in feature_columns if col not in feature_df.columns]
+            if missing:
+                self.logger.error(f"Missing features for prediction: {missing[:5]}")
+                return None
+            values = feature_df[feature_columns + ['close']].to_numpy(dtype=float)
+            gathered = gather_windows(FeatureStore._to_epoch_ms(feature_df.index), list(values.T), as_of_ms, window)
+        
+        open_times, windows, valid = gathered
+        return open_times, windows[:, :, :-1], windows[:, -1, -1], valid
+    
+    def _predict_group(self, bundle: ModelBundle, windows: np.ndarray,
+                       close: np.ndarray) -> Tuple[Dict[str, np.ndarray], Dict[str, float]]:
+        """predict אחד לכל מודל על כל השורות; מחירים (rows x horizons) לכל מודל וזמן ה-predict שלו"""
+        X_scaled = bundle.scalers['X'].transform(windows[:, -1, :])
+        prices, latency = {}, {}
+        
+        for model_name, model in bundle.models.items():
+            started = time.perf_counter()
+            try:
+                if model_name == 'lstm':
+                    rows, window, n_features = windows.shape
+                    X_seq = bundle.scalers['X'].transform(windows.reshape(-1, n_features)).reshape(rows, window, n_features)
+                    raw = model.predict(X_seq, verbose=0)
                 else:
-                    ensemble_prediction = current_price
-                    ensemble_confidence = 0.1
+                    raw = model.predict(X_scaled)
+                raw = np.asarray(raw, dtype=float).reshape(len(X_scaled), -1)
                 
-                # חיזוי ל-multiple periods
-                future_predictions = self._predict_multiple_periods(
-                    df, ensemble_prediction, periods, ensemble_confidence
-                )
+                if bundle.horizons:
+                    model_prices = close[:, None] * (1 + bundle.scalers['y'].inverse_transform(raw))
+                else:
+                    # סט ישן - חוזה מחיר לצעד אחד
+                    model_prices = bundle.scalers['y'].inverse_transform(raw[:, :1])
+                prices[model_name] = np.maximum(model_prices, 0)  # מחיר לא יכול להיות שלילי
                 
-                return {
-                    'current_price': current_price,
-                    'predictions': predictions,
-                    'ensemble_prediction': ensemble_prediction,
-                    'confidence_scores': confidence_scores,
-                    'ensemble_confidence': ensemble_confidence,
-                    'future_predictions': future_predictions,
-                    'model_performance': self.model_performance,
-                    'best_model': self.best_model_name,
-                    'timestamp': datetime.now().isoformat()
-                }
+            except Exception as e:
+                self.logger.error(f"Error predicting with {model_name}: {e}")
+            latency[model_name] = round((time.perf_counter() - started) * 1000, 3)
+        
+        return prices, latency
+    
+    def _ensemble_row(self, bundle: ModelBundle, prices: Dict[str, np.ndarray], current_price: float) -> Dict:
+        """ממוצע משוקלל (לפי R² של כל מודל באותו אופק) לכל אופק של שורה אחת"""
+        horizons = bundle.horizons or (1,)
+        by_horizon = {}
+        for column, horizon in enumerate(horizons):
+            predictions = {name: float(p[column]) for name, p in prices.items()}
+            confidence_scores = {name: self._horizon_confidence(bundle.performance.get(name, {}), horizon)
+                                 for name in predictions}
+            weights = sum(confidence_scores.values())
+            if weights > 0:
+                ensemble = sum(predictions[name] * confidence_scores[name] for name in predictions) / weights
+                confidence = weights / len(confidence_scores)
+            else:
+                ensemble, confidence = current_price, 0.1
+            by_horizon[horizon] = {
+                'predicted_price': ensemble,
+                'price_change_percent': (ensemble - current_price) / current_price * 100 if current_price else 0.0,
+                'confidence': confidence,
+                'predictions': predictions,
+                'confidence_scores': confidence_scores
+            }
+        
+        first = by_horizon[horizons[0]]
+        return {
+            'current_price': current_price,
+            'predictions': first['predictions'],
+            'confidence_scores': first['confidence_scores'],
+            'ensemble_prediction': first['predicted_price'],
+            'ensemble_confidence': first['confidence'],
+            'horizons': by_horizon,
+            'best_model': bundle.best_model_name,
+            'model_versions': bundle.versions
+        }
+    
+    @staticmethod
+    def _horizon_confidence(performance: Dict, horizon: int) -> float:
+        """ציון ביטחון מבוסס R² של המודל באופק (מפתחות מה-registry הם מחרוזות)"""
+        by_horizon = performance.get('horizons', {})
+        metrics = by_horizon.get(horizon) or by_horizon.get(str(horizon)) or performance
+        return max(0.0, min(1.0, metrics.get('r2', 0.5)))
+    
+    def predict_future(self, df: pd.DataFrame, periods: int = 10, symbol: Optional[str] = None,
+                       interval: str = '1h') -> Dict:
+        """מבצע חיזוי לעתיד - עם symbol לפי הסט של הסימל, אחרת לפי הסט האחרון שאומן"""
+        try:
+            if symbol:
+                row = self.predict_batch([(symbol, None)], {symbol.upper(): df}, interval)
+                result = row['results'][0]
+                latency = row['latency_ms'].get(symbol.upper(), {})
             else:
+                bundle = self._last_bundle
+                if bundle is None:
+                    return self._get_fallback_prediction(periods)
+                gathered = self._gather_rows(bundle, None, interval, [None], df)
+                if gathered is None:
+                    return self._get_fallback_prediction(periods)
+                _, windows, close, _ = gathered
+                prices, latency = self._predict_group(bundle, windows, close)
+                result = {'status': 'success', **self._ensemble_row(bundle, {n: p[0] for n, p in prices.items()},
+                                                                     float(close[0]))}
+            
+            if result.get('status') != 'success' or not result['predictions']:
                 return self._get_fallback_prediction(periods)
+            
+            bundle = self._bundles.get(symbol.upper()) if symbol else self._last_bundle
+            return {
+                **{key: value for key, value in result.items() if key != 'status'},
+                'future_predictions': self._interpolate_horizons(result, periods),
+                'model_performance': bundle.performance if bundle else {},
+                'model_latency_ms': latency,
+                'timestamp': datetime.now().isoformat()
+            }
                 
         except Exception as e:
             self.logger.error(f"Error in predict_future: {e}")
             return self._get_fallback_prediction(periods)
     
-    def _predict_multiple_periods(self, df: pd.DataFrame, next_prediction: float, 
-                                periods: int, confidence: float) -> List[Dict]:
-        """מבצע חיזוי ל-multiple periods"""
-        try:
-            predictions = []
-            current_price = df['close'].iloc[-1]
-            
-            for i in range(periods):
-                # חישוב שינוי אחוזי משוער
-                if i == 0:
-                    price_change = (next_prediction - current_price) / current_price
-                else:
-                    # שימוש בתנודתיות היסטורית לחיזוי עתידי
-                    historical_volatility = df['close'].pct_change().std()
-                    price_change = np.random.normal(0, historical_volatility)
-                
-                predicted_price = current_price * (1 + price_change)
-                
-                # ירידה בביטחון ככל שהחיזוי רחוק יותר
-                period_confidence = confidence * (1 - (i * 0.1))
-                
-                predictions.append({
-                    'period': i + 1,
-                    'predicted_price': max(0, predicted_price),
-                    'price_change_percent': price_change * 100,
-                    'confidence': max(0.1, period_confidence),
-                    'time_horizon': f"{i+1} period{'s' if i+1 > 1 else ''}"
-                })
-                
-                current_price = predicted_price
-            
-            return predictions
-            
-        except Exception as e:
-            self.logger.error(f"Error in multiple periods prediction: {e}")
-            return []
+    def _interpolate_horizons(self, result: Dict, periods: int) -> List[Dict]:
+        """חיזוי לכל נר עד periods - מה-heads הישירים; בין אופקים אינטרפולציה לינארית של התשואה.
+        נרות אחרי האופק הרחוק ביותר לא מוחזרים (אין להם head)"""
+        horizons = sorted(result['horizons'])
+        returns = [0.0] + [result['horizons'][h]['price_change_percent'] for h in horizons]
+        confidences = [result['horizons'][horizons[0]]['confidence']] + [result['horizons'][h]['confidence'] for h in horizons]
+        steps = [0] + horizons
+        
+        predictions = []
+        for period in range(1, min(periods, horizons[-1]) + 1):
+            change = float(np.interp(period, steps, returns))
+            predictions.append({
+                'period': period,
+                'predicted_price': max(0, result['current_price'] * (1 + change / 100)),
+                'price_change_percent': change,
+                'confidence': max(0.1, float(np.interp(period, steps, confidences))),
+                'time_horizon': f"{period} period{'s' if period > 1 else ''}",
+                'direct': period in result['horizons']
+            })
+        return predictions
     
     def _get_fallback_prediction(self, periods: int) -> Dict:
         """מחזיר חיזוי גיבוי"""
@@ -530,7 +860,7 @@ class AdvancedMLPredictor:
     def save_models(self, path: str = 'models/'):
         """שומר את המודלים"""
         try:
-            import os
+            import joblib
             os.makedirs(path, exist_ok=True)
             
             for model_name, model in self.models.items():
@@ -541,6 +871,9 @@ class AdvancedMLPredictor:
             
             joblib.dump(self.scalers, f'{path}/scalers.pkl')
             joblib.dump(self.model_performance, f'{path}/model_performance.pkl')
+            if self._last_bundle is not None:
+                joblib.dump(self._last_bundle.feature_columns, f'{path}/feature_columns.pkl')
+                joblib.dump(list(self._last_bundle.horizons), f'{path}/horizons.pkl')
             
             self.logger.info(f"💾 Models saved to {path}")
             
@@ -550,15 +883,26 @@ class AdvancedMLPredictor:
     def load_models(self, path: str = 'models/'):
         """טוען מודלים שמורים"""
         try:
-            for model_name in self.models.keys():
+            import joblib
+            models = {}
+            for model_name in self.enabled_models:
                 if model_name == 'lstm':
+                    if not os.path.exists(f'{path}/{model_name}_model.h5') or import_backend('tensorflow') is None:
+                        continue
                     from tensorflow.keras.models import load_model
-                    self.models[model_name] = load_model(f'{path}/{model_name}_model.h5')
-                else:
-                    self.models[model_name] = joblib.load(f'{path}/{model_name}_model.pkl')
-            
-            self.scalers = joblib.load(f'{path}/scalers.pkl')
-            self.model_performance = joblib.load(f'{path}/model_performance.pkl')
+                    models[model_name] = load_model(f'{path}/{model_name}_model.h5')
+                elif os.path.exists(f'{path}/{model_name}_model.pkl'):
+                    import_backend(MODEL_BACKENDS[model_name])
+                    models[model_name] = joblib.load(f'{path}/{model_name}_model.pkl')
+            
+            scalers = joblib.load(f'{path}/scalers.pkl')
+            performance = joblib.load(f'{path}/model_performance.pkl')
+            feature_columns = (joblib.load(f'{path}/feature_columns.pkl')
+                               if os.path.exists(f'{path}/feature_columns.pkl') else None)
+            best_model_name = max(performance, key=lambda x: performance[x]['r2']) if performance else None
+            self._publish(None, ModelBundle(models, scalers, performance, best_model_name, feature_columns, {},
+                                            tuple(joblib.load(f'{path}/horizons.pkl'))
+                                            if os.path.exists(f'{path}/horizons.pkl') else ()))
             
             self.logger.info("📂 Models loaded successfully")
             
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ml_backends import MODEL_BACKENDS, import_backend
+
+
+def feature_hash(feature_columns: List[str]) -> str:
+    """hash של רשימת ה-features (לפי הסדר) - מודל נטען רק מול אותה הגדרת features"""
+    return hashlib.sha1('\n'.join(feature_columns).encode('utf-8')).hexdigest()[:12]
+
+
+def _json_safe(value):
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if hasattr(value, 'item'):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class ModelRegistry:
+    """מודלים מאומנים לפי (symbol, interval, feature hash, סוג מודל, גרסה).
+
+    כל גרסה היא תיקייה עם model.pkl/model.keras, scalers.pkl ו-meta.json (חלון אימון, מדדים, features).
+    כתיבה לתיקייה זמנית ו-rename - גרסה חלקית לא נראית לקוראים; טעינה עם mmap_mode למערכים גדולים.
+    """
+
+    def __init__(self, root_path: str = 'models/registry', keep_versions: int = 3):
+        self.root_path = root_path
+        self.keep_versions = keep_versions
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.stats = {'saved': 0, 'loaded': 0, 'pruned': 0, 'load_errors': 0}
+        os.makedirs(self.root_path, exist_ok=True)
+
+    def _model_dir(self, symbol: str, interval: str, features: str, model_type: str) -> str:
+        return os.path.join(self.root_path, symbol.upper(), interval, features, model_type)
+
+    def versions(self, symbol: str, interval: str, features: str, model_type: str) -> List[int]:
+        model_dir = self._model_dir(symbol, interval, features, model_type)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(int(name[1:]) for name in os.listdir(model_dir)
+                      if name.startswith('v') and name[1:].isdigit())
+
+    # =============================================
+    # 💾 SAVE
+    # =============================================
+
+    def save(self, symbol: str, interval: str, model_type: str, model, scalers: Dict,
+             feature_columns: List[str], metrics: Dict, training_window: Dict) -> Dict:
+        """שומר גרסה חדשה באופן אטומי ומחזיר את ה-meta שלה"""
+        import joblib
+
+        features = feature_hash(feature_columns)
+        model_dir = self._model_dir(symbol, interval, features, model_type)
+        os.makedirs(model_dir, exist_ok=True)
+        tmp_dir = os.path.join(model_dir, f".tmp-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        try:
+            if model_type == 'lstm':
+                artifact = 'model.keras'
+                model.save(os.path.join(tmp_dir, artifact))
+            else:
+                artifact = 'model.pkl'
+                # בלי דחיסה - אחרת mmap_mode לא עובד
+                joblib.dump(model, os.path.join(tmp_dir, artifact))
+            joblib.dump(scalers, os.path.join(tmp_dir, 'scalers.pkl'))
+
+            meta = {
+                'symbol': symbol.upper(),
+                'interval': interval,
+                'feature_hash': features,
+                'model_type': model_type,
+                'backend': MODEL_BACKENDS.get(model_type),
+                'artifact': artifact,
+                'created_at': datetime.now().isoformat(),
+                'training_window': _json_safe(training_window),
+                'metrics': _json_safe(metrics),
+                'feature_columns': list(feature_columns),
+                'params': _json_safe(model.get_params()) if hasattr(model, 'get_params') else {}
+            }
+
+            with self._lock:
+                # גרסה פנויה הבאה; rename נכשל אם תהליך אחר תפס אותה בינתיים
+                while True:
+                    version = (self.versions(symbol, interval, features, model_type) or [0])[-1] + 1
+                    meta['version'] = version
+                    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                        json.dump(meta, f, ensure_ascii=False, indent=2)
+                    try:
+                        os.rename(tmp_dir, os.path.join(model_dir, f"v{version:04d}"))
+                        break
+                    except OSError:
+                        if not os.path.isdir(os.path.join(model_dir, f"v{version:04d}")):
+                            raise
+            self.stats['saved'] += 1
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.logger.info(f"💾 Registered {symbol} {interval} {model_type} v{version} "
+                         f"(R²={meta['metrics'].get('r2', 0):.4f}, features={features})")
+        self.prune(symbol, interval, features, model_type)
+        return meta
+
+    def prune(self, symbol: str, interval: str, features: str, model_type: str):
+        """משאיר רק את keep_versions הגרסאות האחרונות"""
+        for version in self.versions(symbol, interval, features, model_type)[:-self.keep_versions]:
+            shutil.rmtree(os.path.join(self._model_dir(symbol, interval, features, model_type), f"v{version:04d}"),
+                          ignore_errors=True)
+            self.stats['pruned'] += 1
+
+    # =============================================
+    # 📂 LOAD
+    # =============================================
+
+    def get_meta(self, symbol: str, interval: str, features: str, model_type: str,
+                 version: Optional[int] = None) -> Optional[Dict]:
+        versions = self.versions(symbol, interval, features, model_type)
+        if not versions:
+            return None
+        version = version or versions[-1]
+        path = os.path.join(self._model_dir(symbol, interval, features, model_type), f"v{version:04d}", 'meta.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error reading model meta {path}: {e}")
+            return None
+
+    def load(self, symbol: str, interval: str, features: str, model_type: str,
+             version: Optional[int] = None, mmap: bool = True) -> Optional[Tuple[object, Dict, Dict]]:
+        """(model, scalers, meta) של הגרסה המבוקשת (ברירת מחדל - האחרונה), או None"""
+        meta = self.get_meta(symbol, interval, features, model_type, version)
+        if meta is None:
+            return None
+
+        version_dir = os.path.join(self._model_dir(symbol, interval, features, model_type), f"v{meta['version']:04d}")
+        try:
+            if import_backend(MODEL_BACKENDS[model_type]) is None:
+                return None
+            import joblib
+
+            if model_type == 'lstm':
+                from tensorflow.keras.models import load_model
+                model = load_model(os.path.join(version_dir, meta['artifact']))
+            else:
+                # mmap_mode - מערכי העצים/מקדמים נקראים מהדיסק לפי דרישה ומשותפים בין תהליכים
+                model = joblib.load(os.path.join(version_dir, meta['artifact']), mmap_mode='r' if mmap else None)
+            scalers = joblib.load(os.path.join(version_dir, 'scalers.pkl'))
+        except Exception as e:
+            self.stats['load_errors'] += 1
+            self.logger.error(f"Error loading {symbol} {model_type} v{meta['version']}: {e}")
+            return None
+
+        self.stats['loaded'] += 1
+        return model, scalers, meta
+
+    def leaderboard(self, symbol: str, interval: str, features: Optional[str] = None) -> List[Dict]:
+        """הגרסה האחרונה של כל סוג מודל, מהטוב (R²) לגרוע"""
+        symbol_dir = os.path.join(self.root_path, symbol.upper(), interval)
+        if not os.path.isdir(symbol_dir):
+            return []
+
+        entries = []
+        for feature_dir in ([features] if features else os.listdir(symbol_dir)):
+            if not os.path.isdir(os.path.join(symbol_dir, feature_dir)):
+                continue
+            for model_type in os.listdir(os.path.join(symbol_dir, feature_dir)):
+                if not os.path.isdir(os.path.join(symbol_dir, feature_dir, model_type)):
+                    continue
+                meta = self.get_meta(symbol, interval, feature_dir, model_type)
+                if meta is not None:
+                    entries.append(meta)
+        return sorted(entries, key=lambda meta: meta['metrics'].get('r2', float('-inf')), reverse=True)
+
+    def best(self, symbol: str, interval: str, features: Optional[str] = None) -> Optional[Dict]:
+        board = self.leaderboard(symbol, interval, features)
+        return board[0] if board else None
+
+    # =============================================
+    # 🔎 SEARCH
+    # =============================================
+
+    def _search_path(self, symbol: str, interval: str, features: str) -> str:
+        return os.path.join(self.root_path, symbol.upper(), interval, features, 'search.json')
+
+    def save_search(self, symbol: str, interval: str, features: str, report: Dict) -> str:
+        """שומר את ה-leaderboard של חיפוש ה-walk-forward האחרון (מחליף את הקודם)"""
+        path = self._search_path(symbol, interval, features)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_json_safe({**report, 'symbol': symbol.upper(), 'interval': interval, 'feature_hash': features}),
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        self.logger.info(f"🔎 Saved {symbol} {interval} search leaderboard ({len(report.get('leaderboard', []))} configs)")
+        return path
+
+    def get_search(self, symbol: str, interval: str, features: str) -> Optional[Dict]:
+        path = self._search_path(symbol, interval, features)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error reading search leaderboard {path}: {e}")
+            return None
+
+    @staticmethod
+    def best_params(search: Dict) -> Dict[str, Dict]:
+        """הפרמטרים של הקונפיגורציה הטובה ביותר שסיימה את כל ה-folds, לכל סוג מודל"""
+        params = {}
+        for entry in search.get('leaderboard', []):
+            if entry['status'] == 'complete':
+                params.setdefault(entry['model_type'], entry['params'])
+        return params
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'root_path': self.root_path, 'keep_versions': self.keep_versions}
+
+
+_model_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry(root_path: str = 'models/registry', keep_versions: int = 3) -> ModelRegistry:
+    """registry משותף לתהליך"""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry(root_path, keep_versions)
+    return _model_registry
@@ -0,0 +1,286 @@
+"""חיפוש היפר-פרמטרים ב-walk-forward לכל סוגי המודלים, ב-pool של תהליכים.
+
+ה-folds מחושבים פעם אחת כטווחי אינדקסים (חלון אימון מתרחב, בלוק בדיקה אחריו); ה-matrix המנורמל
+נכתב פעם אחת ל-shared memory וה-workers קוראים ממנו בלי העתקה. כל סבב מריץ את הקונפיגורציות
+ששרדו על ה-fold הבא ומשמיט את החלשות (successive halving) - רוב זמן ה-CPU הולך למבטיחות.
+ה-leaderboard נשמר ב-registry ו-train_models משתמש בו לפרמטרים ולבחירת המודל הטוב.
+
+רץ כתהליך נפרד (ה-pool הוא spawn, שמייבא מחדש את ה-__main__ - לא את השרת):
+
+    python model_search.py --symbol TONUSDT --data /tmp/TONUSDT.pkl --registry models/registry --features models/features
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+# הצמדה ל-cpus של ה-worker לפני ייבוא numpy/BLAS - ה-thread pools שלהם נקבעים לפי הליבות הזמינות ביבוא
+if __name__ == '__main__' and os.environ.get('WORKER_CPUS') and hasattr(os, 'sched_setaffinity'):
+    try:
+        os.sched_setaffinity(0, [int(cpu) for cpu in os.environ['WORKER_CPUS'].split(',')])
+    except (OSError, ValueError):
+        pass
+
+import numpy as np
+import pandas as pd
+
+# גריד לכל סוג מודל; LSTM לא בחיפוש (אימון ארוך מדי לכל fold)
+SEARCH_SPACE = {
+    'xgboost': {'max_depth': [4, 6, 8], 'learning_rate': [0.05, 0.1], 'subsample': [0.8, 1.0]},
+    'lightgbm': {'num_leaves': [15, 31, 63], 'learning_rate': [0.05, 0.1], 'max_depth': [-1, 8]},
+    'random_forest': {'max_depth': [6, 10, None], 'min_samples_split': [2, 5, 10], 'n_estimators': [200]},
+    'gradient_boosting': {'max_depth': [3, 6], 'learning_rate': [0.05, 0.1]},
+    'svr': {'C': [0.1, 1.0, 10.0], 'epsilon': [0.01, 0.1]}
+}
+
+
+def walk_forward_folds(n_rows: int, n_folds: int = 5, gap: int = 0,
+                       min_train_rows: Optional[int] = None) -> np.ndarray:
+    """(train_end, test_start, test_end) לכל fold; gap נרות לפני הבדיקה מושמטים (היעד שלהם חופף אליה)"""
+    test_rows = n_rows // (n_folds + 1)
+    test_starts = n_rows - test_rows * np.arange(n_folds, 0, -1)
+    folds = np.column_stack([test_starts - gap, test_starts, test_starts + test_rows]).astype(np.int64)
+    return folds[folds[:, 0] >= (min_train_rows or 1)]
+
+
+def expand_grid(search_space: Dict[str, Dict[str, List]], models: List[str]) -> List[Tuple[str, Dict]]:
+    configs = []
+    for model_type in models:
+        grid = search_space.get(model_type, {})
+        for values in itertools.product(*grid.values()):
+            configs.append((model_type, dict(zip(grid.keys(), values))))
+    return configs
+
+
+# =============================================
+# 🏋️ WORKER
+# =============================================
+
+_worker: Dict = {}
+
+
+def _init_worker(shared: Dict[str, Tuple[str, Tuple[int, ...]]], folds: np.ndarray, y_offset: Tuple[float, float]):
+    """מצמיד את ה-worker ל-shared memory (בלי העתקה) ובונה predictor לבניית המודלים"""
+    from ml_predictor import AdvancedMLPredictor
+
+    for name, (shm_name, shape) in shared.items():
+        shm = SharedMemory(name=shm_name)
+        _worker[name] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        _worker[f"_{name}_shm"] = shm
+    _worker['folds'] = folds
+    _worker['y_offset'] = y_offset
+    predictor = AdvancedMLPredictor(list(SEARCH_SPACE))
+    predictor.n_jobs = 1
+    _worker['predictor'] = predictor
+
+
+def _evaluate(model_type: str, params: Dict, fold: int) -> Dict:
+    X, y = _worker['X'], _worker['y']
+    train_end, test_start, test_end = _worker['folds'][fold]
+    predictor = _worker['predictor']
+
+    started = time.perf_counter()
+    model = predictor._build_model(model_type, params)
+    predictor._fit_model(model_type, model, X[:train_end], y[:train_end])
+    predicted = model.predict(X[test_start:test_end])
+    fit_seconds = time.perf_counter() - started
+
+    actual = y[test_start:test_end]
+    errors = actual - predicted
+    total_variance = float(np.sum((actual - actual.mean()) ** 2))
+    mean, scale = _worker['y_offset']
+    return {
+        'mse': float(np.mean(errors ** 2)),
+        'r2': 1 - float(np.sum(errors ** 2)) / total_variance if total_variance > 0 else 0.0,
+        # כיוון התשואה האמיתית (לא המנורמלת)
+        'direction_accuracy': float(np.mean(np.sign(predicted * scale + mean) == np.sign(actual * scale + mean))),
+        'fit_seconds': fit_seconds
+    }
+
+
+# =============================================
+# 🔎 SEARCH
+# =============================================
+
+class ModelSearch:
+    """walk-forward לכל הקונפיגורציות ב-pool תהליכים, עם pruning של החלשות אחרי כל fold"""
+
+    def __init__(self, max_workers: Optional[int] = None, n_folds: int = 5, keep_fraction: float = 0.5,
+                 search_space: Optional[Dict] = None, enabled_models: Optional[List[str]] = None):
+        from ml_backends import available_models
+
+        self.logger = logging.getLogger(__name__)
+        available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+        self.max_workers = max_workers or available
+        self.n_folds = n_folds
+        self.keep_fraction = keep_fraction
+        self.search_space = search_space or SEARCH_SPACE
+        self.models = [name for name in available_models(enabled_models) if name in self.search_space]
+
+    def run(self, X: np.ndarray, y: np.ndarray, folds: np.ndarray, y_offset: Tuple[float, float] = (0.0, 1.0)) -> Dict:
+        """X ו-y כבר מנורמלים; מחזיר דוח עם leaderboard ממוין (הטוב ראשון)"""
+        started = time.perf_counter()
+        configs = [{'model_type': model_type, 'params': params, 'status': 'running', 'folds': []}
+                   for model_type, params in expand_grid(self.search_space, self.models)]
+        self.logger.info(f"🔎 Walk-forward search: {len(configs)} configs x {len(folds)} folds, "
+                         f"{self.max_workers} workers")
+
+        # ה-matrix נכתב פעם אחת ל-shared memory; ה-workers מקבלים רק את השם
+        arrays = {'X': np.ascontiguousarray(X, dtype=np.float64), 'y': np.ascontiguousarray(y, dtype=np.float64)}
+        segments = {}
+        try:
+            for name, array in arrays.items():
+                segments[name] = SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=np.float64, buffer=segments[name].buf)[:] = array
+            shared = {name: (segments[name].name, arrays[name].shape) for name in arrays}
+
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(shared, folds, y_offset)) as pool:
+                alive = configs
+                for fold in range(len(folds)):
+                    futures = {pool.submit(_evaluate, c['model_type'], c['params'], fold): c for c in alive}
+                    for future in as_completed(futures):
+                        config = futures[future]
+                        try:
+                            config['folds'].append(future.result())
+                        except Exception as e:
+                            config['status'] = 'failed'
+                            config['error'] = str(e)
+                    alive = [c for c in alive if c['status'] == 'running']
+                    if fold < len(folds) - 1:
+                        alive = self._prune(alive, fold)
+                for config in alive:
+                    config['status'] = 'complete'
+        finally:
+            for segment in segments.values():
+                segment.close()
+                segment.unlink()
+
+        leaderboard = sorted((self._summarize(c) for c in configs),
+                             key=lambda e: (e['status'] != 'complete', -e['folds_evaluated'], e['mse']))
+        fits = sum(len(c['folds']) for c in configs)
+        report = {
+            'leaderboard': leaderboard,
+            'folds': folds.tolist(),
+            'configs': len(configs),
+            'fits': fits,
+            'fits_pruned': len(configs) * len(folds) - fits,
+            'workers': self.max_workers,
+            'wall_seconds': round(time.perf_counter() - started, 2),
+            'created_at': datetime.now().isoformat()
+        }
+        best = leaderboard[0] if leaderboard else None
+        self.logger.info(f"🏁 Search finished in {report['wall_seconds']}s: {fits} fits "
+                         f"({report['fits_pruned']} pruned)" +
+                         (f", best {best['model_type']} {best['params']} MSE={best['mse']:.4f}" if best else ''))
+        return report
+
+    def _prune(self, alive: List[Dict], fold: int) -> List[Dict]:
+        """משאיר את החלק הטוב (לפי MSE ממוצע על אותם folds) - ותמיד את הטובה של כל סוג מודל"""
+        ranked = sorted(alive, key=lambda c: np.mean([f['mse'] for f in c['folds']]))
+        keep = ranked[:max(1, math.ceil(len(ranked) * self.keep_fraction))]
+        for config in ranked:
+            if not any(c['model_type'] == config['model_type'] for c in keep):
+                keep.append(config)
+        for config in ranked:
+            if config not in keep:
+                config['status'] = 'pruned'
+                config['pruned_after_fold'] = fold
+        return keep
+
+    @staticmethod
+    def _summarize(config: Dict) -> Dict:
+        folds = config['folds']
+        entry = {
+            'model_type': config['model_type'],
+            'params': config['params'],
+            'status': config['status'],
+            'folds_evaluated': len(folds),
+            'mse': float(np.mean([f['mse'] for f in folds])) if folds else float('inf'),
+            'r2': float(np.mean([f['r2'] for f in folds])) if folds else None,
+            'direction_accuracy': float(np.mean([f['direction_accuracy'] for f in folds])) if folds else None,
+            'fit_seconds': round(sum(f['fit_seconds'] for f in folds), 2)
+        }
+        for key in ('pruned_after_fold', 'error'):
+            if key in config:
+                entry[key] = config[key]
+        return entry
+
+
+def run_search(symbol: str, data_path: str, registry_root: str, feature_root: Optional[str], interval: str,
+               workers: Optional[int], n_folds: int, models: Optional[List[str]],
+               horizons: Optional[List[int]] = None) -> Dict:
+    """features ויעד כמו ב-train_models (אופק ראשון), חיפוש, ושמירת ה-leaderboard ב-registry"""
+    from feature_store import FeatureStore
+    from ml_predictor import AdvancedMLPredictor
+    from model_registry import ModelRegistry, feature_hash
+    from sklearn.preprocessing import StandardScaler
+
+    df = pd.read_pickle(data_path)
+    predictor = AdvancedMLPredictor(models, feature_store=FeatureStore(feature_root) if feature_root else None,
+                                    horizons=horizons)
+    feature_columns, X, Y, _ = predictor.training_matrix(predictor.feature_frame(df, symbol, interval))
+
+    folds = walk_forward_folds(len(X), n_folds, gap=max(predictor.horizons))
+    if len(folds) == 0:
+        return {'status': 'error', 'error': f'not enough rows for {n_folds} folds', 'symbol': symbol}
+
+    # נרמול לפי חלון האימון של ה-fold הראשון בלבד - בלי מידע מאף בלוק בדיקה
+    initial = int(folds[0][0])
+    y = Y[:, 0]
+    x_scaler = StandardScaler().fit(X[:initial])
+    y_mean, y_scale = float(y[:initial].mean()), float(y[:initial].std() or 1.0)
+
+    search = ModelSearch(workers, n_folds, enabled_models=predictor.enabled_models)
+    report = search.run(x_scaler.transform(X), (y - y_mean) / y_scale, folds, (y_mean, y_scale))
+    report.update({'horizon': predictor.horizons[0], 'rows': int(len(X))})
+    ModelRegistry(registry_root).save_search(symbol, interval, feature_hash(feature_columns), report)
+
+    best = report['leaderboard'][0] if report['leaderboard'] else {}
+    return {
+        'status': 'success',
+        'symbol': symbol,
+        'best': {key: best.get(key) for key in ('model_type', 'params', 'mse', 'r2', 'direction_accuracy')},
+        **{key: report[key] for key in ('configs', 'fits', 'fits_pruned', 'workers', 'wall_seconds')}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward hyperparameter search for one symbol')
+    parser.add_argument('--symbol', required=True)
+    parser.add_argument('--data', required=True, help='pickled OHLCV DataFrame')
+    parser.add_argument('--registry', default='models/registry')
+    parser.add_argument('--features', default='', help='feature store root, default: compute in memory')
+    parser.add_argument('--interval', default='1h')
+    parser.add_argument('--workers', type=int, default=0, help='0 = all available CPUs')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--models', default='', help='comma separated, default: all installed')
+    parser.add_argument('--horizons', default='', help='comma separated bars, default: predictor default')
+    args = parser.parse_args()
+
+    # thread אחד לכל worker - המקביליות היא בין הקונפיגורציות
+    from training_orchestrator import THREAD_ENV_VARS
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, '1')
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    models = [m.strip() for m in args.models.split(',') if m.strip()] or None
+    horizons = [int(h) for h in args.horizons.split(',') if h.strip()] or None
+    report = run_search(args.symbol, args.data, args.registry, args.features or None, args.interval,
+                        args.workers or None, args.folds, models, horizons)
+    print(json.dumps(report))
+    sys.exit(0 if report['status'] == 'success' else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""חלונות זמן ל-LSTM בלי להעתיק את הסדרה.
+
+sliding_windows מחזיר view מעל המערך המקורי (strides בלבד, 0 בתים נוספים); WindowBatches מעתיק
+רק את החלונות של הבאצ' הנוכחי. כך זיכרון האימון הוא (שורות x features) ולא פי sequence_length.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data: np.ndarray, sequence_length: int) -> np.ndarray:
+    """view בצורה (rows - sequence_length + 1, sequence_length, features); חלון i מסתיים בשורה i + sequence_length - 1"""
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, None]
+    return sliding_window_view(data, sequence_length, axis=0).transpose(0, 2, 1)
+
+
+class WindowBatches:
+    """באצ'ים של (חלונות, יעדים) מעל view - מועתק רק הבאצ' שמבוקש"""
+
+    def __init__(self, windows: np.ndarray, targets: Optional[np.ndarray] = None, batch_size: int = 32,
+                 shuffle: bool = False, seed: Optional[int] = None):
+        super().__init__()
+        self.windows = windows
+        self.targets = targets
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+        self._order = np.arange(len(windows))
+        if shuffle:
+            self._rng.shuffle(self._order)
+
+    def __len__(self) -> int:
+        return math.ceil(len(self._order) / self.batch_size)
+
+    def __getitem__(self, batch: int):
+        if not 0 <= batch < len(self):
+            raise IndexError(batch)
+        index = self._order[batch * self.batch_size:(batch + 1) * self.batch_size]
+        # fancy indexing על ה-view - עותק רציף של הבאצ' בלבד
+        X = self.windows[index].astype(np.float32)
+        if self.targets is None:
+            return X
+        return X, self.targets[index].astype(np.float32)
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._rng.shuffle(self._order)
+
+
+_keras_batches_class = None
+
+
+def keras_batches(windows: np.ndarray, targets: Optional[np.ndarray] = None, batch_size: int = 32,
+                  shuffle: bool = False, seed: Optional[int] = None) -> WindowBatches:
+    """WindowBatches שהוא גם keras Sequence - ל-fit/predict בלי להמיר את כל החלונות ל-tensor"""
+    global _keras_batches_class
+    if _keras_batches_class is None:
+        from tensorflow.keras.utils import Sequence
+        _keras_batches_class = type('KerasWindowBatches', (WindowBatches, Sequence), {})
+    return _keras_batches_class(windows, targets, batch_size, shuffle, seed)
@@ -0,0 +1,258 @@
+"""אימון מודלים לכל סימל בתהליך נפרד, במקביל ועם מכסת CPU לכל תהליך.
+
+כל worker הוא interpreter נקי (לא fork של השרת ולא ייבוא מחדש של app.py): מקבל את נתוני הסימל
+מקובץ זמני, מעדכן את ה-feature store, מאמן סט מודלים, רושם אותו ב-registry ומדפיס דוח JSON.
+השרת רק טוען את הגרסה החדשה.
+
+    python training_orchestrator.py --symbol TONUSDT --data /tmp/TONUSDT.pkl --registry models/registry \
+        --features models/features
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from queue import Queue
+from typing import Callable, Dict, List, Optional
+
+# הצמדה ל-cpus של ה-worker לפני ייבוא numpy/BLAS - ה-thread pools שלהם נקבעים לפי הליבות הזמינות ביבוא
+if __name__ == '__main__' and os.environ.get('WORKER_CPUS') and hasattr(os, 'sched_setaffinity'):
+    try:
+        os.sched_setaffinity(0, [int(cpu) for cpu in os.environ['WORKER_CPUS'].split(',')])
+    except (OSError, ValueError):
+        pass
+
+import pandas as pd
+
+# משתני הסביבה שקובעים כמה threads כל ספרייה פותחת - נקבעים לפני שה-worker מייבא אותן
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                   'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')
+
+
+class TrainingOrchestrator:
+    """מאמן סט מודלים לכל סימל ב-pool של תהליכים; כל תהליך מקבל threads_per_worker ליבות משלו"""
+
+    def __init__(self, registry_root: str = 'models/registry', keep_versions: int = 3,
+                 max_workers: Optional[int] = None, cpu_quota: Optional[int] = None,
+                 enabled_models: Optional[List[str]] = None, interval: str = '1h', timeout: float = 600,
+                 feature_root: Optional[str] = None, horizons: Optional[List[int]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.registry_root = registry_root
+        self.feature_root = feature_root
+        self.horizons = horizons
+        self.keep_versions = keep_versions
+        self.enabled_models = enabled_models
+        self.interval = interval
+        self.timeout = timeout
+
+        available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+        self.cpus = available[:cpu_quota] if cpu_quota else available
+        self.max_workers = max(1, min(max_workers or len(self.cpus), len(self.cpus)))
+        self.threads_per_worker = max(1, len(self.cpus) // self.max_workers)
+
+        # כל slot מחזיק קבוצת ליבות קבועה; worker תופס slot פנוי ומשחרר בסוף
+        self._slots: Queue = Queue()
+        for slot in range(self.max_workers):
+            self._slots.put(self.cpus[slot * self.threads_per_worker:(slot + 1) * self.threads_per_worker])
+
+    def train_all(self, frames: Dict[str, pd.DataFrame],
+                  on_complete: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """מאמן את כל הסימלים במקביל; on_complete נקרא לכל סימל שהסתיים בהצלחה (למשל טעינה לשרת)"""
+        started = time.perf_counter()
+        results = {}
+        self.logger.info(f"🏋️ Training {len(frames)} symbols: {self.max_workers} workers x "
+                         f"{self.threads_per_worker} threads")
+
+        with tempfile.TemporaryDirectory(prefix='ml-train-') as work_dir, \
+                ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ml-train') as pool:
+            futures = {pool.submit(self._run_worker, symbol, df, work_dir): symbol for symbol, df in frames.items()}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                report = future.result()
+                results[symbol] = report
+                if report.get('status') == 'success' and on_complete is not None:
+                    try:
+                        on_complete(symbol, report)
+                    except Exception as e:
+                        self.logger.error(f"Error handling trained models for {symbol}: {e}")
+
+        summary = {
+            'symbols': results,
+            'succeeded': sorted(s for s, r in results.items() if r.get('status') == 'success'),
+            'failed': sorted(s for s, r in results.items() if r.get('status') != 'success'),
+            'workers': self.max_workers,
+            'threads_per_worker': self.threads_per_worker,
+            'wall_seconds': round(time.perf_counter() - started, 2),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.logger.info(f"🏁 Training finished in {summary['wall_seconds']}s "
+                         f"({len(summary['succeeded'])} ok, {len(summary['failed'])} failed)")
+        return summary
+
+    def search_all(self, frames: Dict[str, pd.DataFrame], n_folds: int = 5, timeout: float = 3600) -> Dict:
+        """חיפוש walk-forward לכל סימל, אחד אחרי השני - כל חיפוש מפזר את הקונפיגורציות על כל הליבות"""
+        started = time.perf_counter()
+        results = {}
+        with tempfile.TemporaryDirectory(prefix='ml-search-') as work_dir:
+            for symbol, df in frames.items():
+                data_path = os.path.join(work_dir, f"{symbol}.pkl")
+                df.to_pickle(data_path)
+                command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_search.py'),
+                           '--symbol', symbol, '--data', data_path, '--registry', self.registry_root,
+                           '--interval', self.interval, '--workers', str(len(self.cpus)), '--folds', str(n_folds)]
+                if self.enabled_models:
+                    command += ['--models', ','.join(self.enabled_models)]
+                if self.feature_root:
+                    command += ['--features', self.feature_root]
+                if self.horizons:
+                    command += ['--horizons', ','.join(str(h) for h in self.horizons)]
+                results[symbol] = self._run_process(symbol, command, self.cpus, 1, timeout, 'Search')
+                if results[symbol].get('status') == 'success':
+                    best = results[symbol]['best']
+                    self.logger.info(f"🔎 {symbol} search: {results[symbol]['fits']} fits "
+                                     f"({results[symbol]['fits_pruned']} pruned) in {results[symbol]['wall_seconds']}s, "
+                                     f"best {best['model_type']} {best['params']}")
+
+        summary = {
+            'symbols': results,
+            'succeeded': sorted(s for s, r in results.items() if r.get('status') == 'success'),
+            'failed': sorted(s for s, r in results.items() if r.get('status') != 'success'),
+            'wall_seconds': round(time.perf_counter() - started, 2),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.logger.info(f"🏁 Search finished in {summary['wall_seconds']}s "
+                         f"({len(summary['succeeded'])} ok, {len(summary['failed'])} failed)")
+        return summary
+
+    def _run_worker(self, symbol: str, df: pd.DataFrame, work_dir: str) -> Dict:
+        data_path = os.path.join(work_dir, f"{symbol}.pkl")
+        df.to_pickle(data_path)
+
+        cpus = self._slots.get()
+        try:
+            command = [sys.executable, os.path.abspath(__file__), '--symbol', symbol, '--data', data_path,
+                       '--registry', self.registry_root, '--keep', str(self.keep_versions),
+                       '--interval', self.interval, '--threads', str(len(cpus))]
+            if self.enabled_models:
+                command += ['--models', ','.join(self.enabled_models)]
+            if self.feature_root:
+                command += ['--features', self.feature_root]
+            if self.horizons:
+                command += ['--horizons', ','.join(str(h) for h in self.horizons)]
+
+            report = self._run_process(symbol, command, cpus, len(cpus), self.timeout, 'Training')
+            if report.get('status') == 'success':
+                report['cpus'] = cpus
+                self.logger.info(f"✅ {symbol} trained in {report.get('wall_seconds')}s: " +
+                                 ', '.join(f"{name}={info['train_seconds']}s" for name, info in report.get('models', {}).items()))
+            return report
+        finally:
+            self._slots.put(cpus)
+
+    def _run_process(self, symbol: str, command: List[str], cpus: List[int], threads: int,
+                     timeout: float, label: str) -> Dict:
+        """מריץ תהליך worker מוצמד ל-cpus ומחזיר את דוח ה-JSON שבשורה האחרונה של stdout"""
+        started = time.perf_counter()
+        try:
+            env = dict(os.environ)
+            env.update({name: str(threads) for name in THREAD_ENV_VARS})
+            # ה-worker מייבא את מודולי המנוע כמו השרת
+            env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+            # ה-worker מצמיד את עצמו בתחילת הריצה - sched_setaffinity אחרי Popen מגיע אחרי ייבוא numpy
+            # (ו-preexec_fn לא בטוח בתהליך עם threads)
+            env['WORKER_CPUS'] = ','.join(str(cpu) for cpu in cpus)
+
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                self.logger.error(f"⏱️ {label} {symbol} timed out after {timeout}s")
+                return {'status': 'timeout', 'wall_seconds': round(time.perf_counter() - started, 2)}
+
+            report = None
+            lines = stdout.strip().splitlines()
+            if lines:
+                try:
+                    report = json.loads(lines[-1])
+                except ValueError:
+                    pass
+            if report is None or report.get('status') != 'success':
+                error = report.get('error') if report else (stderr.strip().splitlines() or ['no output'])[-1]
+                self.logger.error(f"{label} {symbol} failed (exit {process.returncode}): {error}")
+                return {'status': 'error', 'error': error, 'wall_seconds': round(time.perf_counter() - started, 2)}
+            return report
+
+        except Exception as e:
+            self.logger.error(f"Error running {label.lower()} worker for {symbol}: {e}")
+            return {'status': 'error', 'error': str(e)}
+
+
+# =============================================
+# 🏋️ WORKER
+# =============================================
+
+def run_worker(symbol: str, data_path: str, registry_root: str, keep_versions: int,
+               interval: str, threads: int, models: Optional[List[str]],
+               feature_root: Optional[str] = None, horizons: Optional[List[int]] = None) -> Dict:
+    """רץ בתהליך ה-worker: אימון סט מודלים לסימל אחד ורישום ב-registry"""
+    from feature_store import FeatureStore
+    from ml_predictor import AdvancedMLPredictor
+    from model_registry import ModelRegistry
+
+    started = time.perf_counter()
+    df = pd.read_pickle(data_path)
+    predictor = AdvancedMLPredictor(models, registry=ModelRegistry(registry_root, keep_versions),
+                                    feature_store=FeatureStore(feature_root) if feature_root else None,
+                                    horizons=horizons)
+    predictor.n_jobs = threads
+
+    bundle = predictor.train_models(df, symbol=symbol, interval=interval)
+    if bundle is None:
+        return {'status': 'error', 'error': 'training produced no model', 'symbol': symbol}
+
+    return {
+        'status': 'success',
+        'symbol': symbol,
+        'best_model': bundle.best_model_name,
+        'versions': bundle.versions,
+        'horizons': list(bundle.horizons),
+        'models': {name: {'r2': round(perf['r2'], 4), 'train_seconds': perf.get('train_seconds')}
+                   for name, perf in bundle.performance.items()},
+        'rows': len(df),
+        'wall_seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train one symbol model set and register it')
+    parser.add_argument('--symbol', required=True)
+    parser.add_argument('--data', required=True, help='pickled OHLCV DataFrame')
+    parser.add_argument('--registry', default='models/registry')
+    parser.add_argument('--keep', type=int, default=3)
+    parser.add_argument('--interval', default='1h')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--models', default='', help='comma separated, default: all installed')
+    parser.add_argument('--features', default='', help='feature store root, default: compute in memory')
+    parser.add_argument('--horizons', default='', help='comma separated bars, default: predictor default')
+    args = parser.parse_args()
+
+    # הלוגים ל-stderr; stdout שמור לדוח
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    models = [m.strip() for m in args.models.split(',') if m.strip()] or None
+    report = run_worker(args.symbol, args.data, args.registry, args.keep, args.interval, args.threads, models,
+                        args.features or None, [int(h) for h in args.horizons.split(',') if h.strip()] or None)
+    print(json.dumps(report))
+    sys.exit(0 if report['status'] == 'success' else 1)
+
+
+if __name__ == '__main__':
+    main()